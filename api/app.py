@@ -8,14 +8,10 @@ from fastapi import FastAPI, HTTPException, Query
 from fastapi.responses import StreamingResponse
 import io
 from pydantic import BaseModel, Field
-import psycopg2
-from psycopg2.extras import RealDictCursor
 from psycopg2.extras import Json
 from dotenv import load_dotenv
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from io import BytesIO
-import pandas as pd
 from pydantic import BaseModel
 import httpx
 import json
@@ -55,7 +51,9 @@ from src.scrapers.x.scraper import (
 from src.scrapers.x.config import X_CONFIG
 from src.utils.url import normalize_input_url, extract_username_from_url, normalize_post_url
 from src.utils.images import local_or_proxy_photo_url
+from api.db import get_conn, get_direct_conn, run_db
 from api.services.pool_session import checkout_pool_session
+from api.services.export_stream import EXPORT_FORMATS, export_chunks, export_filename, relation_rows
 from src.services.session_manager import ResourceExhaustedException
 
 # Load env variables from ./db/.env if present
@@ -63,14 +61,6 @@ load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '..', 'db', '.en
 
 logger = logging.getLogger(__name__)
 
-DB_CONFIG = {
-    "host": os.getenv("POSTGRES_HOST"),
-    "port": int(os.getenv("POSTGRES_PORT")),
-    "dbname": os.getenv("POSTGRES_DB"),
-    "user": os.getenv("POSTGRES_USER"),
-    "password": os.getenv("POSTGRES_PASSWORD"),
-}
-
 app = FastAPI(title="Scr4per DB API", version="0.1.0")
 
 # CORS configuration to allow requests from the Vite frontend
@@ -168,9 +158,8 @@ class ExportInput(BaseModel):
     }
 
 # ---------- DB helpers ----------
-
-def get_conn():
-    return psycopg2.connect(cursor_factory=RealDictCursor, **DB_CONFIG)
+# Conexiones del pool compartido (api.db): get_conn() en handlers síncronos (threadpool),
+# run_db() en los async para no bloquear el event loop
 
 # Upsert profile and return id
 
@@ -377,24 +366,27 @@ async def save_graph_session(body: GraphSessionIn):
         rel_path = os.path.relpath(final_path, start=os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
         # Insertar o actualizar los datos del grafo en la base de datos (usando el esquema correcto)
-        with get_conn() as conn:
-            with conn.cursor() as cur:
-                cur.execute(f"""
-                    INSERT INTO {schema}.graph_sessions (owner_username, elements, style, layout, elements_path, updated_at)
-                    VALUES (%s, %s, %s, %s, %s, NOW())
-                    ON CONFLICT (owner_username) DO UPDATE
-                    SET elements = EXCLUDED.elements,
-                        style = EXCLUDED.style,
-                        layout = EXCLUDED.layout,
-                        elements_path = EXCLUDED.elements_path,
-                        updated_at = NOW()
-                    RETURNING id, owner_username, updated_at;
-                """, (body.owner_username, Json(body.elements), Json(body.style), Json(body.layout), rel_path))
-                conn.commit()
-                return cur.fetchone()
+        return await run_db(_upsert_graph_session, schema, body, rel_path)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+
+def _upsert_graph_session(conn, schema: str, body: GraphSessionIn, rel_path: str):
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            INSERT INTO {schema}.graph_sessions (owner_username, elements, style, layout, elements_path, updated_at)
+            VALUES (%s, %s, %s, %s, %s, NOW())
+            ON CONFLICT (owner_username) DO UPDATE
+            SET elements = EXCLUDED.elements,
+                style = EXCLUDED.style,
+                layout = EXCLUDED.layout,
+                elements_path = EXCLUDED.elements_path,
+                updated_at = NOW()
+            RETURNING id, owner_username, updated_at;
+        """, (body.owner_username, Json(body.elements), Json(body.style), Json(body.layout), rel_path))
+        conn.commit()
+        return cur.fetchone()
+
 @app.get("/health")
 def health():
     try:
@@ -623,6 +615,11 @@ def _build_related_from_db(cur, platform: str, owner_username: str) -> List[Dict
 
     return relacionados
 # api/app.py (añade esto, reutilizando _build_related_from_db y _schema)
+def _related_from_db(conn, platform: str, owner_username: str) -> List[Dict[str, Any]]:
+    with conn.cursor() as cur:
+        return _build_related_from_db(cur, platform, owner_username)
+
+
 from fastapi import Path
 
 @app.get("/related/{platform}/{username}")
@@ -731,7 +728,9 @@ async def scrape(req: ScrapeRequest):
             reactors_usernames = [u for u in ([_extract_username(x) for x in (reactions or [])] if reactions else []) if u]
 
             # Persist into DB
-            with get_conn() as conn:
+            # Conexión dedicada: el bloque descarga fotos (await) entre queries y
+            # retendría un slot del pool durante toda la descarga
+            with get_direct_conn() as conn:
                 with conn.cursor() as cur:
                     # Ensure target profile exists (store local photo path)
                     try:
@@ -951,9 +950,7 @@ async def scrape(req: ScrapeRequest):
 
             # Build response from DB to ensure completeness (requested for Facebook)
             try:
-                with get_conn() as conn2:
-                    with conn2.cursor() as cur2:
-                        relacionados = _build_related_from_db(cur2, platform, perfil_obj['username'])
+                relacionados = await run_db(_related_from_db, platform, perfil_obj['username'])
             except Exception:
                 # Fallback a una lista con múltiples apariciones por tipo
                 relacionados = []
@@ -1017,58 +1014,23 @@ async def scrape(req: ScrapeRequest):
 
 
 @app.post("/export")
-def export_to_excel(payload: ExportInput):
-    """Exporta a Excel con 3 columnas: Perfil objetivo, Tipo de relacion, Perfiles asociados.
-    Espera el JSON que devuelve /scrape o equivalente.
+def export_to_excel(payload: ExportInput, format: str = Query('xlsx', description="xlsx | csv | parquet")):
+    """Exporta con 3 columnas: Perfil objetivo, Tipo de relacion, Perfiles asociados.
+    Espera el JSON que devuelve /scrape o equivalente. Las filas se escriben en streaming
+    (xlsx write-only, csv o parquet), sin DataFrame ni workbook completo en memoria.
     """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Formato no soportado: {format} (use {', '.join(EXPORT_FORMATS)})")
+    perfiles = [payload]
     try:
-        objetivo = payload.perfil_objetivo or {}
-        relacionados = payload.perfiles_relacionados or []
-
-        objetivo_str = None
-        # Prefer username; fallback to full_name or profile_url
-        for key in ["username", "nombre_usuario", "nombre_completo", "full_name", "profile_url", "url_usuario", "updated_at"]:
-            if objetivo.get(key):
-                objetivo_str = str(objetivo.get(key))
-                break
-        objetivo_str = objetivo_str or ""
-
-        rows = []
-        for item in relacionados:
-            tipo = item.get("tipo de relacion") or item.get("tipo") or ""
-            # Build a compact representation for the related profile
-            rel_username = item.get("username") or item.get("username_usuario") or ""
-            rel_name = item.get("full_name") or item.get("nombre_usuario") or ""
-            rel_url = item.get("profile_url") or item.get("link_usuario") or ""
-
-            if rel_username:
-                asociado = rel_username
-                # Add name in parentheses if available
-                if rel_name and rel_name != rel_username:
-                    asociado = f"{rel_username} ({rel_name})"
-            elif rel_name:
-                asociado = rel_name
-            else:
-                asociado = rel_url or ""
-
-            rows.append({
-                "Perfil objetivo": objetivo_str,
-                "Tipo de relacion": tipo,
-                "Perfiles asociados": asociado,
-            })
-
-        # Create DataFrame and Excel in-memory
-        df = pd.DataFrame(rows, columns=["Perfil objetivo", "Tipo de relacion", "Perfiles asociados"])
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine="openpyxl") as writer:
-            df.to_excel(writer, index=False, sheet_name="export")
-        output.seek(0)
-
-        filename = f"export_{objetivo_str or 'perfil'}.xlsx"
-        return StreamingResponse(
-            output,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": f"attachment; filename={filename}"},
-        )
+        chunks = export_chunks(relation_rows(perfiles), format)
+        filename = export_filename(perfiles, format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    return StreamingResponse(
+        chunks,
+        media_type=EXPORT_FORMATS[format][0],
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
@@ -1,11 +1,25 @@
+import asyncio
+import logging
 import os
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, Optional, TypeVar
+
 import psycopg2
+from psycopg2 import extensions
 from psycopg2.extras import RealDictCursor
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, Session
+from psycopg2.pool import PoolError, ThreadedConnectionPool
 from dotenv import load_dotenv
 from urllib.parse import quote_plus
 
+from src.utils.metrics import counter, gauge, get_metrics_registry, histogram
+
+if TYPE_CHECKING:
+    from sqlalchemy.engine import Engine
+    from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
 # Load env from db/.env if present
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '..', 'db', '.env'))
 
@@ -17,6 +31,11 @@ DB_CONFIG = {
     "password": os.getenv("POSTGRES_PASSWORD"),
 }
 
+# Pool psycopg2 compartido por proceso (API o worker)
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN") or 1)
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX") or 10)
+DB_POOL_TIMEOUT_S = float(os.getenv("DB_POOL_TIMEOUT_S") or 10.0)
+
 # PostgreSQL connection string para SQLAlchemy
 # URL-encode user and password to handle special characters like @, :, /, etc.
 DATABASE_URL = (
@@ -24,16 +43,300 @@ DATABASE_URL = (
     f"@{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['dbname']}"
 )
 
-# SQLAlchemy engine y SessionLocal
-engine = create_engine(DATABASE_URL, pool_pre_ping=True, echo=False)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# SQLAlchemy (pool de cuentas, cola de trabajos) se importa y crea al primer uso:
+# los procesos que sólo sirven /health o SSE no cargan SQLAlchemy
+_engine: Optional['Engine'] = None
+_session_factory = None
+_engine_lock = threading.Lock()
+
+T = TypeVar('T')
+
+_DB_STATEMENTS = counter('scr4per_db_statements_total', 'Sentencias ejecutadas por tipo', ('kind', 'status'))
+_DB_STATEMENT_SECONDS = histogram(
+    'scr4per_db_statement_seconds', 'Latencia de execute/copy por tipo de sentencia', ('kind',),
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+_DB_POOL_WAIT_SECONDS = histogram(
+    'scr4per_db_pool_wait_seconds', 'Espera por una conexión del pool psycopg2', (),
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10),
+)
+_DB_POOL_TIMEOUTS = counter('scr4per_db_pool_timeouts_total', 'Préstamos que vencieron DB_POOL_TIMEOUT_S', ())
+_DB_POOL_CONNECTIONS = gauge('scr4per_db_pool_connections', 'Conexiones del pool psycopg2 por estado', ('state',))
+
+
+_STATEMENT_KINDS = frozenset((
+    'select', 'insert', 'update', 'delete', 'with', 'copy', 'create', 'drop', 'truncate',
+    'alter', 'begin', 'commit', 'rollback', 'set', 'declare', 'listen', 'notify',
+))
+
+
+def _statement_kind(query) -> str:
+    """Primera palabra de la sentencia ('select', 'insert', 'copy'...); acota la cardinalidad."""
+    if isinstance(query, bytes):
+        query = query[:64].decode('utf-8', 'ignore')
+    elif not isinstance(query, str):
+        # psycopg2.sql.Composed y similares
+        return 'composed'
+    words = query[:64].split(None, 1)
+    word = words[0].lower().strip('(') if words else ''
+    return word if word in _STATEMENT_KINDS else 'other'
+
+
+class TimedCursor(RealDictCursor):
+    """RealDictCursor que registra sentencias y latencia por tipo (``scr4per_db_statement_*``)."""
+
+    def _timed(self, kind: str, fn, *args, **kwargs):
+        t0 = time.perf_counter()
+        status = 'error'
+        try:
+            result = fn(*args, **kwargs)
+            status = 'ok'
+            return result
+        finally:
+            _DB_STATEMENT_SECONDS.observe(time.perf_counter() - t0, kind=kind)
+            _DB_STATEMENTS.inc(kind=kind, status=status)
+
+    def execute(self, query, vars=None):
+        return self._timed(_statement_kind(query), super().execute, query, vars)
+
+    def executemany(self, query, vars_list):
+        return self._timed(_statement_kind(query), super().executemany, query, vars_list)
+
+    def copy_expert(self, sql, file, size=8192):
+        return self._timed('copy', super().copy_expert, sql, file, size)
+
+
+class PoolTimeoutError(PoolError):
+    """No se liberó ninguna conexión del pool dentro de ``DB_POOL_TIMEOUT_S``."""
+
+
+class PooledConnection:
+    """
+    Conexión prestada por el pool con la misma interfaz que la de psycopg2.
+
+    ``close()`` y la salida de ``with`` la devuelven al pool en lugar de cerrarla
+    (``with`` conserva la semántica de psycopg2: commit o rollback del bloque).
+    """
+
+    __slots__ = ('_conn', '_pool', '_released')
+
+    def __init__(self, conn, pool: 'DBPool'):
+        self._conn = conn
+        self._pool = pool
+        self._released = False
+
+    def __getattr__(self, name):
+        if name in PooledConnection.__slots__:
+            raise AttributeError(name)
+        return getattr(self._conn, name)
+
+    def __setattr__(self, name, value):
+        if name in PooledConnection.__slots__:
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._conn, name, value)
+
+    def __enter__(self) -> 'PooledConnection':
+        self._conn.__enter__()
+        return self
 
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            return self._conn.__exit__(exc_type, exc, tb)
+        finally:
+            self.close()
 
-def get_conn():
-    """Retorna conexión psycopg2 con RealDictCursor (uso legacy)."""
+    def close(self) -> None:
+        if not self._released:
+            self._released = True
+            self._pool._release(self._conn)
+
+    def __del__(self):
+        # Red de seguridad para código legacy que nunca cierra la conexión
+        if not getattr(self, '_released', True):
+            logger.warning("db.pool.leaked_connection released_by_gc")
+            self.close()
+
+
+class DBPool:
+    """Pool de conexiones psycopg2 con espera acotada y métricas de ocupación."""
+
+    def __init__(self, minconn: int = DB_POOL_MIN, maxconn: int = DB_POOL_MAX,
+                 timeout_s: float = DB_POOL_TIMEOUT_S):
+        self.minconn = max(0, minconn)
+        self.maxconn = max(1, maxconn, self.minconn)
+        self.timeout_s = timeout_s
+        self._pool: Optional[ThreadedConnectionPool] = None
+        self._init_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.maxconn)
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._checkouts = 0
+        self._waited = 0
+        self._wait_ms_total = 0.0
+        self._wait_ms_max = 0.0
+        self._timeouts = 0
+        self._discarded = 0
+
+    def _ensure_pool(self) -> ThreadedConnectionPool:
+        if self._pool is None:
+            with self._init_lock:
+                if self._pool is None:
+                    self._pool = ThreadedConnectionPool(
+                        self.minconn, self.maxconn, cursor_factory=TimedCursor, **DB_CONFIG
+                    )
+                    logger.info(f"db.pool.open min={self.minconn} max={self.maxconn}")
+        return self._pool
+
+    def acquire(self, timeout_s: Optional[float] = None) -> PooledConnection:
+        """Presta una conexión; bloquea hasta ``timeout_s`` si el pool está agotado."""
+        pool = self._ensure_pool()
+        t0 = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout_s if timeout_s is None else timeout_s):
+            with self._lock:
+                self._timeouts += 1
+            _DB_POOL_TIMEOUTS.inc()
+            raise PoolTimeoutError(f"db pool exhausted (max={self.maxconn})")
+        wait_ms = (time.perf_counter() - t0) * 1000
+        _DB_POOL_WAIT_SECONDS.observe(wait_ms / 1000)
+        try:
+            conn = pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+            self._wait_ms_total += wait_ms
+            self._wait_ms_max = max(self._wait_ms_max, wait_ms)
+            if wait_ms >= 1.0:
+                self._waited += 1
+        return PooledConnection(conn, self)
+
+    def _release(self, conn) -> None:
+        discard = bool(conn.closed)
+        if not discard:
+            try:
+                if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                if conn.autocommit:
+                    conn.autocommit = False
+            except Exception:
+                discard = True
+        try:
+            if self._pool is not None:
+                self._pool.putconn(conn, close=discard)
+        finally:
+            with self._lock:
+                self._in_use -= 1
+                if discard:
+                    self._discarded += 1
+            self._slots.release()
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.closeall()
+            self._pool = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            open_conns = 0
+            if self._pool is not None:
+                open_conns = len(self._pool._pool) + len(self._pool._used)
+            return {
+                'min': self.minconn,
+                'max': self.maxconn,
+                'open': open_conns,
+                'in_use': self._in_use,
+                'idle': max(0, open_conns - self._in_use),
+                'checkouts': self._checkouts,
+                'waited': self._waited,
+                'wait_ms_avg': round(self._wait_ms_total / self._checkouts, 2) if self._checkouts else 0.0,
+                'wait_ms_max': round(self._wait_ms_max, 1),
+                'timeouts': self._timeouts,
+                'discarded': self._discarded,
+                'timeout_s': self.timeout_s,
+            }
+
+
+_db_pool_instance: Optional[DBPool] = None
+
+
+def get_db_pool() -> DBPool:
+    """
+    Get singleton DB pool instance.
+
+    Returns:
+        DBPool (DB_POOL_MIN / DB_POOL_MAX / DB_POOL_TIMEOUT_S)
+    """
+    global _db_pool_instance
+    if _db_pool_instance is None:
+        _db_pool_instance = DBPool()
+        get_metrics_registry().register_collector(_collect_db_pool)
+    return _db_pool_instance
+
+
+def _collect_db_pool() -> None:
+    stats = get_db_pool().stats()
+    for state in ('open', 'in_use', 'idle'):
+        _DB_POOL_CONNECTIONS.set(stats[state], state=state)
+
+
+def get_conn() -> PooledConnection:
+    """Retorna una conexión del pool con RealDictCursor (``TimedCursor``); ``close()`` la devuelve al pool."""
+    return get_db_pool().acquire()
+
+
+def get_direct_conn():
+    """Conexión psycopg2 dedicada fuera del pool (LISTEN y otras conexiones de larga vida)."""
     return psycopg2.connect(cursor_factory=RealDictCursor, **DB_CONFIG)
 
 
-def get_sqlalchemy_session() -> Session:
+def get_db() -> Iterator[PooledConnection]:
+    """
+    Dependencia FastAPI: presta una conexión durante la request.
+
+    Usar sólo en endpoints ``def`` (FastAPI los ejecuta en su threadpool); los
+    endpoints ``async def`` deben usar ``run_db``.
+    """
+    conn = get_conn()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+async def run_db(fn: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Ejecuta ``fn(conn, *args, **kwargs)`` en un hilo con una conexión del pool.
+
+    Para código ``async``: ni la espera por conexión ni las queries bloquean el
+    event loop (SSE, otros requests). Si ``fn`` no hace commit se revierte al devolverla.
+    """
+    def _call():
+        conn = get_conn()
+        try:
+            return fn(conn, *args, **kwargs)
+        finally:
+            conn.close()
+    return await asyncio.to_thread(_call)
+
+
+def get_engine() -> 'Engine':
+    """Engine de SQLAlchemy compartido (se crea en la primera llamada)."""
+    global _engine, _session_factory
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                from sqlalchemy import create_engine
+                from sqlalchemy.orm import sessionmaker
+                engine = create_engine(DATABASE_URL, pool_pre_ping=True, echo=False)
+                _session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+                _engine = engine
+    return _engine
+
+
+def get_sqlalchemy_session() -> 'Session':
     """Retorna una nueva sesión de SQLAlchemy para usar con el pool de cuentas."""
-    return SessionLocal()
\ No newline at end of file
+    get_engine()
+    return _session_factory()
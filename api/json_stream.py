@@ -0,0 +1,101 @@
+"""Serialización JSON rápida e incremental para payloads de grafo.
+
+Los grafos (``profiles``/``relations`` con decenas de miles de elementos) se
+serializaban con ``json.dumps(..., indent=2)`` en un solo string, y las respuestas
+de ``/multi-scrape``/``/multi-related`` pasaban antes por ``jsonable_encoder`` y la
+validación del ``response_model``. Aquí:
+
+- ``dumps(obj)`` -> bytes / ``loads`` con orjson (fallback a ``json`` compacto si no está instalado).
+- ``iter_json(obj)`` produce el mismo JSON en trozos de ~``JSON_STREAM_CHUNK_BYTES``:
+  las listas largas se codifican por lotes, sin materializar el documento completo.
+- ``JSONStreamResponse`` envía ``iter_json`` como respuesta HTTP en streaming y
+  ``FTPClient.aupload_stream`` lo sube al FTP del mismo modo.
+- ``FastJSONResponse``: clase de respuesta por defecto del API (orjson si está disponible).
+
+Uso:
+    return JSONStreamResponse(graph)
+    await ftp.aupload_stream(path, lambda: iter_json(graph))
+"""
+from __future__ import annotations
+
+import json
+import os
+from typing import Any, Iterator, List
+
+from fastapi.responses import JSONResponse, StreamingResponse
+
+try:
+    import orjson
+    from fastapi.responses import ORJSONResponse as FastJSONResponse
+except ImportError:  # orjson no instalado: json de la stdlib
+    orjson = None
+    FastJSONResponse = JSONResponse
+
+JSON_STREAM_CHUNK_BYTES = int(os.getenv('JSON_STREAM_CHUNK_BYTES') or 64 * 1024)
+# Elementos por lote al codificar listas largas
+_BATCH_ITEMS = 1000
+
+
+def dumps(obj: Any) -> bytes:
+    """JSON compacto UTF-8 (claves no-str y tipos desconocidos como ``str``)."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, default=str, separators=(',', ':')).encode('utf-8')
+
+
+def loads(data: bytes | str) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _iter_value(value: Any) -> Iterator[bytes]:
+    if isinstance(value, dict):
+        yield b'{'
+        first = True
+        for key, item in value.items():
+            yield (b'' if first else b',') + dumps(str(key)) + b':'
+            first = False
+            yield from _iter_value(item)
+        yield b'}'
+    elif isinstance(value, list) and len(value) > _BATCH_ITEMS:
+        yield b'['
+        for start in range(0, len(value), _BATCH_ITEMS):
+            # "[a,b,...]" del lote sin los corchetes
+            batch = dumps(value[start:start + _BATCH_ITEMS])[1:-1]
+            yield batch if start == 0 else b',' + batch
+        yield b']'
+    else:
+        yield dumps(value)
+
+
+def iter_json(obj: Any, chunk_bytes: int = JSON_STREAM_CHUNK_BYTES) -> Iterator[bytes]:
+    """Trozos de ~``chunk_bytes`` cuya concatenación es ``dumps(obj)``."""
+    pending: List[bytes] = []
+    size = 0
+    for piece in _iter_value(obj):
+        pending.append(piece)
+        size += len(piece)
+        if size >= chunk_bytes:
+            yield b''.join(pending)
+            pending.clear()
+            size = 0
+    if pending:
+        yield b''.join(pending)
+
+
+class JSONStreamResponse(StreamingResponse):
+    """Respuesta JSON enviada en streaming con ``iter_json`` (sin validar ni re-codificar el payload)."""
+
+    def __init__(self, content: Any, status_code: int = 200, headers: dict | None = None):
+        super().__init__(iter_json(content), status_code=status_code, headers=headers,
+                         media_type='application/json')
+
+
+__all__ = [
+    'FastJSONResponse',
+    'JSONStreamResponse',
+    'dumps',
+    'iter_json',
+    'loads',
+]
@@ -21,7 +21,8 @@ if ROOT_DIR not in sys.path:
 def create_app() -> FastAPI:
     # Configure logging early
     setup_logging()
-    app = FastAPI(title="Scr4per DB API", version="0.1.0")
+    from .json_stream import FastJSONResponse
+    app = FastAPI(title="Scr4per DB API", version="0.1.0", default_response_class=FastJSONResponse)
 
     # Ensure logging configured (scripts call setup_logging, API didn't)
     try:
@@ -79,6 +80,7 @@ def create_app() -> FastAPI:
     from .routers.targets import router as targets_router
     from .routers.realtime import router as realtime_router
     from .routers.pool import router as pool_router
+    from .routers.metrics import router as metrics_router
 
 
     app.include_router(health_router)
@@ -99,6 +101,32 @@ def create_app() -> FastAPI:
     app.include_router(targets_router)
     app.include_router(realtime_router)
     app.include_router(pool_router)
+    app.include_router(metrics_router)
+
+    @app.on_event("startup")
+    async def _start_job_event_relay() -> None:
+        # En modo cola los eventos SSE los emiten los workers; se reenvían a los suscriptores de este proceso
+        from .services.job_queue import get_job_queue, job_mode, relay_events
+        if job_mode() == 'queue':
+            app.state.job_event_relay = asyncio.create_task(relay_events(get_job_queue()))
+
+    @app.on_event("shutdown")
+    async def _close_browser_pool() -> None:
+        relay = getattr(app.state, 'job_event_relay', None)
+        if relay is not None:
+            relay.cancel()
+        from src.scrapers.browser_pool import get_browser_pool
+        from src.scrapers.context_cache import get_context_cache
+        await get_context_cache().close()
+        await get_browser_pool().close()
+        from .db import get_db_pool
+        get_db_pool().close()
+        from src.utils.ftp_storage import close_ftp_client
+        close_ftp_client()
+        from src.utils.images import close_http_clients
+        await close_http_clients()
+        from .routers.proxy import close_proxy_client
+        await close_proxy_client()
 
     return app
 
@@ -19,11 +19,19 @@ from ..schemas_batch import (
     BatchAnalysisRequest,
     BatchAnalysisResponse
 )
-from ..db import get_conn
+from ..db import get_conn, run_db
+from ..bulk_writer import BulkWriter
+from ..json_stream import JSONStreamResponse, iter_json, loads
 import logging
 from src.utils.event_manager import event_manager
+from src.utils.metrics import PhaseTimer, counter, histogram
+from src.utils.thumbnails import with_graph_thumbnail
 
 logger = logging.getLogger(__name__)
+
+# prepare -> scrape -> graph -> upload -> persist (y 'total' por trabajo)
+_JOB_PHASE_SECONDS = histogram('scr4per_job_phase_seconds', 'Duración por fase de ejecutar_analisis_background', ('kind', 'platform', 'phase'))
+_JOBS = counter('scr4per_jobs_total', 'Análisis de identidad terminados por resultado', ('kind', 'platform', 'outcome'))
 router = APIRouter(prefix="/analyze", tags=["analyze"])
 
 # Semáforo global para limitar concurrencia de navegadores
@@ -68,8 +76,7 @@ def get_identidad_digital(conn, id_identidad: int) -> Optional[dict]:
         return cur.fetchone()
 
 
-def update_identidad_estado(conn, id_identidad: int, estado: str, id_caso: int):
-    """Actualiza el estado de una identidad digital en el contexto de un caso."""
+def _update_identidad_estado(conn, id_identidad: int, estado: str, id_caso: int):
     with conn.cursor() as cur:
         cur.execute("""
             UPDATE casos.analisis_identidad
@@ -77,15 +84,19 @@ def update_identidad_estado(conn, id_identidad: int, estado: str, id_caso: int):
             WHERE id_identidad = %s AND idcaso = %s
         """, (estado, id_identidad, id_caso))
         conn.commit()
+
+
+async def update_identidad_estado(id_identidad: int, estado: str, id_caso: Optional[int]):
+    """Actualiza el estado de una identidad digital en el contexto de un caso (query en el pool)."""
+    await run_db(_update_identidad_estado, id_identidad, estado, id_caso)
     
     # Emitir evento SSE
-    asyncio.create_task(event_manager.broadcast_status(id_identidad, estado, id_caso))
+    await event_manager.broadcast_status(id_identidad, estado, id_caso)
 
 
-def update_identidad_resultado(conn, id_identidad: int, id_caso: int,
-                               id_perfil_scraped: Optional[int],
-                               ruta_grafo_ftp: Optional[str]):
-    """Actualiza los resultados del análisis en el contexto de un caso."""
+def _update_identidad_resultado(conn, id_identidad: int, id_caso: int,
+                                id_perfil_scraped: Optional[int],
+                                ruta_grafo_ftp: Optional[str]):
     with conn.cursor() as cur:
         cur.execute("""
             UPDATE casos.analisis_identidad
@@ -96,9 +107,37 @@ def update_identidad_resultado(conn, id_identidad: int, id_caso: int,
             WHERE id_identidad = %s AND idcaso = %s
         """, (id_perfil_scraped, ruta_grafo_ftp, id_identidad, id_caso))
         conn.commit()
+
+
+async def update_identidad_resultado(id_identidad: int, id_caso: int,
+                                     id_perfil_scraped: Optional[int],
+                                     ruta_grafo_ftp: Optional[str]):
+    """Actualiza los resultados del análisis en el contexto de un caso."""
+    await run_db(_update_identidad_resultado, id_identidad, id_caso, id_perfil_scraped, ruta_grafo_ftp)
     
     # Emitir evento SSE
-    asyncio.create_task(event_manager.broadcast_status(id_identidad, 'analizado', id_caso))
+    await event_manager.broadcast_status(id_identidad, 'analizado', id_caso)
+
+
+def get_relaciones_raiz(conn, plataforma: str, username: str) -> List[dict]:
+    """Relaciones salientes de la raíz con los datos del perfil relacionado (máx. 500)."""
+    from ..deps import _schema
+    schema = _schema(plataforma)
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            SELECT 
+                r.rel_type,
+                p_related.username as related_username,
+                p_related.full_name,
+                p_related.profile_url,
+                p_related.photo_url
+            FROM {schema}.relationships r
+            JOIN {schema}.profiles p_owner ON r.owner_profile_id = p_owner.id
+            JOIN {schema}.profiles p_related ON r.related_profile_id = p_related.id
+            WHERE p_owner.username = %s
+            LIMIT 500
+        """, (username,))
+        return cur.fetchall()
 
 
 def increment_intentos_fallidos(conn, id_identidad: int):
@@ -118,7 +157,8 @@ async def ejecutar_analisis_background(
     context: dict,
     max_photos: int,
     headless: bool,
-    max_depth: int
+    max_depth: int,
+    raise_errors: bool = False,
 ):
     """
     Tarea en background que ejecuta el scraping completo.
@@ -130,6 +170,10 @@ async def ejecutar_analisis_background(
     4. Genera grafo JSON
     5. Sube archivos a FTP con ruta jerárquica
     6. Actualiza estado a 'analizado' con rutas
+
+    Si falla marca la identidad en 'error'. Con ``raise_errors`` (worker de la cola,
+    ``ejecutar_analisis_con_pool``) además re-lanza la excepción para que el caller
+    pueda reintentar; en BackgroundTasks no hay nadie que la reciba.
     """
     from src.utils.storage_paths import (
         build_graph_file_path,
@@ -138,16 +182,14 @@ async def ejecutar_analisis_background(
     )
     from src.utils.ftp_storage import get_ftp_client
     from datetime import datetime
-    import json
-    
-    conn = None
     
+    phases = PhaseTimer(_JOB_PHASE_SECONDS, kind='analyze', platform=plataforma)
+    outcome = 'error'
+    # Sin conexión retenida durante el scraping: cada paso de BD toma una del pool
     try:
-        conn = get_conn()
-        
         # 1. Actualizar estado a procesando
         id_caso = context.get('id_caso')
-        update_identidad_estado(conn, id_identidad, 'procesando', id_caso)
+        await update_identidad_estado(id_identidad, 'procesando', id_caso)
         logger.info(f"Iniciando análisis de identidad {id_identidad}: {plataforma}/{usuario_o_url}")
         
         # 2. Extraer username de la URL si es necesario
@@ -155,7 +197,7 @@ async def ejecutar_analisis_background(
         username = extract_username_from_url(usuario_o_url, plataforma) or usuario_o_url
         
         # Obtener persona_id para construir rutas
-        identidad = get_identidad_digital(conn, id_identidad)
+        identidad = await run_db(get_identidad_digital, id_identidad)
         if not identidad:
             raise Exception(f"Identidad {id_identidad} no encontrada")
         persona_id = identidad['id_persona']
@@ -174,6 +216,8 @@ async def ejecutar_analisis_background(
             category='images'
         )
 
+        phases.lap('prepare')
+
         # 3. Ejecutar scraping simplificado
         result = await _scrape_single_profile(
             platform=plataforma,
@@ -187,12 +231,11 @@ async def ejecutar_analisis_background(
         
         if not result or 'error' in result:
             raise Exception(result.get('error', 'Error desconocido en scraping'))
+        phases.lap('scrape')
         
         profile_id = result.get('profile_id')
         
         # 4. Generar grafo JSON estandarizado (Schema V2 Multi-Scrape)
-        from ..deps import _schema
-        
         # Estructuras para el grafo
         profiles_map = {}
         relations_list = []
@@ -210,54 +253,39 @@ async def ejecutar_analisis_background(
         profiles_map[(plataforma, username)] = root_prof_data
 
         # 4.2 Obtener relaciones y perfiles relacionados desde BD
-        with conn.cursor() as cur:
-            schema = _schema(plataforma)
-            cur.execute(f"""
-                SELECT 
-                    r.rel_type,
-                    p_related.username as related_username,
-                    p_related.full_name,
-                    p_related.profile_url,
-                    p_related.photo_url
-                FROM {schema}.relationships r
-                JOIN {schema}.profiles p_owner ON r.owner_profile_id = p_owner.id
-                JOIN {schema}.profiles p_related ON r.related_profile_id = p_related.id
-                WHERE p_owner.username = %s
-                LIMIT 500
-            """, (username,))
-            
-            for row in cur.fetchall():
-                rel_username = row['related_username']
-                rel_type = row['rel_type']
+        for row in await run_db(get_relaciones_raiz, plataforma, username):
+            rel_username = row['related_username']
+            rel_type = row['rel_type']
                 
-                # Agregar relación
-                relations_list.append({
-                    "platform": plataforma,
-                    "source": username,
-                    "target": rel_username,
-                    "type": rel_type
-                })
+            # Agregar relación
+            relations_list.append({
+                "platform": plataforma,
+                "source": username,
+                "target": rel_username,
+                "type": rel_type
+            })
                 
-                # Agregar perfil relacionado
-                rel_key = (plataforma, rel_username)
-                if rel_key not in profiles_map:
-                    profiles_map[rel_key] = {
-                        "platform": plataforma,
-                        "username": rel_username,
-                        "full_name": row['full_name'],
-                        "profile_url": row['profile_url'],
-                        "photo_url": row['photo_url'],
-                        "sources": [root_id]
-                    }
-                else:
-                    if root_id not in profiles_map[rel_key].get('sources', []):
-                         profiles_map[rel_key]['sources'].append(root_id)
+            # Agregar perfil relacionado
+            rel_key = (plataforma, rel_username)
+            if rel_key not in profiles_map:
+                profiles_map[rel_key] = {
+                    "platform": plataforma,
+                    "username": rel_username,
+                    "full_name": row['full_name'],
+                    "profile_url": row['profile_url'],
+                    "photo_url": row['photo_url'],
+                    "sources": [root_id]
+                }
+            else:
+                if root_id not in profiles_map[rel_key].get('sources', []):
+                     profiles_map[rel_key]['sources'].append(root_id)
         
         # 4.3 Construir objeto final
         grafo_data = {
             "schema_version": 2,
             "root_profiles": [root_id],
-            "profiles": list(profiles_map.values()),
+            # photo_url -> miniatura WebP (original en photo_url_full)
+            "profiles": [with_graph_thumbnail(p) for p in profiles_map.values()],
             "relations": relations_list,
             "warnings": [],
             "meta": {
@@ -272,8 +300,6 @@ async def ejecutar_analisis_background(
             }
         }
         
-        grafo_json = json.dumps(grafo_data, ensure_ascii=False, indent=2)
-        
         ruta_grafo = build_graph_file_path(
             **path_params,
             persona_id=persona_id,
@@ -290,44 +316,47 @@ async def ejecutar_analisis_background(
             departamento=path_params.get('departamento')
         )
         
+        phases.lap('graph')
+
         # 6. Subir archivos a FTP
         ftp_client = get_ftp_client()
         
-        # Usar la ruta jerárquica calculada previamente
-        ftp_client.upload_file(
-            path=ruta_grafo,
-            data=grafo_json.encode('utf-8')
-        )
+        # Usar la ruta jerárquica calculada previamente; el JSON se codifica por lotes mientras se sube
+        await ftp_client.aupload_stream(ruta_grafo, lambda: iter_json(grafo_data))
         
         logger.info(f"Grafo subido a FTP: {ruta_grafo}")
+        phases.lap('upload')
         
         # 7. Actualizar BD con resultados
-        update_identidad_resultado(
-            conn,
+        await update_identidad_resultado(
             id_identidad=id_identidad,
             id_caso=id_caso,
             id_perfil_scraped=profile_id,
             ruta_grafo_ftp=ruta_grafo
         )
+        phases.lap('persist')
+        outcome = 'ok'
         
         logger.info(f"Análisis completado exitosamente para identidad {id_identidad}")
         
     except Exception as e:
         logger.exception(f"Error en análisis de identidad {id_identidad}: {e}")
         
-        if conn:
+        try:
             id_caso = context.get('id_caso')
-            update_identidad_estado(
-                conn,
+            await update_identidad_estado(
                 id_identidad=id_identidad,
                 estado='error',
                 id_caso=id_caso
             )
-            increment_intentos_fallidos(conn, id_identidad)
-    
+            await run_db(increment_intentos_fallidos, id_identidad)
+        except Exception as db_err:
+            logger.error(f"No se pudo registrar el error de identidad {id_identidad}: {db_err}")
+        if raise_errors:
+            raise
     finally:
-        if conn:
-            conn.close()
+        _JOB_PHASE_SECONDS.observe(phases.total(), kind='analyze', platform=plataforma, phase='total')
+        _JOBS.inc(kind='analyze', platform=plataforma, outcome=outcome)
 
 
 # Helper function para scraping completo (usando adapters como multi_scrape)
@@ -340,7 +369,6 @@ async def _scrape_single_profile(platform: str, username: str, max_photos: int,
     from src.utils.exceptions import SessionExpiredException, AccountBannedException, SessionNotFoundException
     import os
     
-    conn = get_conn()
     profile_id = None
     
     try:
@@ -414,7 +442,7 @@ async def _scrape_single_profile(platform: str, username: str, max_photos: int,
                 await manager.close()
                 
                 # 4. Guardar en BD
-                with conn.cursor() as cur:
+                with get_conn() as conn, conn.cursor() as cur:
                     # Perfil principal
                     profile_id = upsert_profile(
                         cur,
@@ -473,7 +501,9 @@ async def _scrape_single_profile(platform: str, username: str, max_photos: int,
         # CASO 2: Otras plataformas - usar adapters (con posible cuenta del pool)
         else:
             from ..deps import storage_state_for
-            from ..services.adapters import launch_browser, close_browser, get_adapter
+            from ..services.adapters import get_adapter
+            from src.scrapers.browser_pool import get_browser_pool
+            from src.scrapers.context_cache import get_context_cache
             
             # Verificar storage_state (prioriza credenciales inyectadas por pool)
             storage_state_override = context.get('_cookies') if isinstance(context, dict) else None
@@ -483,161 +513,117 @@ async def _scrape_single_profile(platform: str, username: str, max_photos: int,
             if isinstance(resolved_storage_state, str) and not os.path.isfile(resolved_storage_state):
                 raise Exception(f"Storage state no encontrado para {platform}. Inicia sesión primero.")
 
-            # Lanzar browser y obtener adapter
-            browser = await launch_browser(headless=headless)
-            adapter = get_adapter(platform, browser, tenant=None, storage_state=resolved_storage_state)
-        
-            try:
-                # 1. Obtener perfil principal
-                logger.info(f"Obteniendo perfil de {username}...")
-                root_profile = await adapter.get_root_profile(username, image_base_path=image_base_path)
+            # Tomar browser del pool (afinidad con el contexto cacheado de la cuenta) y obtener adapter
+            account_id = context.get('_account_id') if isinstance(context, dict) else None
+            async with get_browser_pool().lease(platform, headless=headless, prefer=get_context_cache().browser_for(account_id)) as browser:
+                adapter = get_adapter(platform, browser, tenant=None, storage_state=resolved_storage_state, account_id=account_id)
+                try:
+                    # 1. Obtener perfil principal
+                    logger.info(f"Obteniendo perfil de {username}...")
+                    root_profile = await adapter.get_root_profile(username, image_base_path=image_base_path)
                 
-                # 2. Obtener seguidores y seguidos
-                logger.info(f"Obteniendo seguidores de {username}...")
-                followers = await adapter.get_followers(username, max_photos, image_base_path=image_base_path)
+                    # 2. Obtener seguidores y seguidos
+                    logger.info(f"Obteniendo seguidores de {username}...")
+                    followers = await adapter.get_followers(username, max_photos, image_base_path=image_base_path)
                 
-                logger.info(f"Obteniendo seguidos de {username}...")
-                following = await adapter.get_following(username, max_photos, image_base_path=image_base_path)
+                    logger.info(f"Obteniendo seguidos de {username}...")
+                    following = await adapter.get_following(username, max_photos, image_base_path=image_base_path)
                 
-                # 3. Si es Facebook, obtener amigos, reacciones y comentarios
-                friends = []
-                reactors = []
-                commenters = []
+                    # 3. Si es Facebook, obtener amigos, reacciones y comentarios
+                    friends = []
+                    reactors = []
+                    commenters = []
                 
-                if platform == 'facebook':
-                    logger.info(f"Obteniendo amigos de {username}...")
-                    try:
-                        friends = await adapter.get_friends(username)
-                    except Exception as e:
-                        logger.warning(f"No se pudieron obtener amigos: {e}")
+                    if platform == 'facebook':
+                        logger.info(f"Obteniendo amigos de {username}...")
+                        try:
+                            friends = await adapter.get_friends(username)
+                        except Exception as e:
+                            logger.warning(f"No se pudieron obtener amigos: {e}")
                     
-                    logger.info(f"Obteniendo reacciones en fotos de {username}...")
-                    try:
-                        reactors = await adapter.get_photo_reactors(username, max_photos, include_comment_reactions=False)
-                    except Exception as e:
-                        logger.warning(f"No se pudieron obtener reacciones: {e}")
+                        logger.info(f"Obteniendo reacciones en fotos de {username}...")
+                        try:
+                            reactors = await adapter.get_photo_reactors(username, max_photos, include_comment_reactions=False)
+                        except Exception as e:
+                            logger.warning(f"No se pudieron obtener reacciones: {e}")
                         
-                    logger.info(f"Obteniendo comentarios en fotos de {username}...")
-                    try:
-                        commenters = await adapter.get_photo_commenters(username, max_photos)
-                    except Exception as e:
-                        logger.warning(f"No se pudieron obtener comentarios: {e}")
-
-                # 3b. Instagram: engagement de posts (reacciones + comentarios)
-                if platform == 'instagram':
-                    logger.info(f"Obteniendo reacciones en posts de {username}...")
-                    try:
-                        reactors = await adapter.get_post_reactors(username, max_photos, image_base_path=image_base_path)
-                    except Exception as e:
-                        logger.warning(f"No se pudieron obtener reacciones de Instagram: {e}")
-
-                    logger.info(f"Obteniendo comentarios en posts de {username}...")
-                    try:
-                        commenters = await adapter.get_post_commenters(username, max_photos, image_base_path=image_base_path)
-                    except Exception as e:
-                        logger.warning(f"No se pudieron obtener comentarios de Instagram: {e}")
+                        logger.info(f"Obteniendo comentarios en fotos de {username}...")
+                        try:
+                            commenters = await adapter.get_photo_commenters(username, max_photos)
+                        except Exception as e:
+                            logger.warning(f"No se pudieron obtener comentarios: {e}")
+
+                    # 3b. Instagram: engagement de posts (reacciones + comentarios)
+                    if platform == 'instagram':
+                        logger.info(f"Obteniendo reacciones en posts de {username}...")
+                        try:
+                            reactors = await adapter.get_post_reactors(username, max_photos, image_base_path=image_base_path)
+                        except Exception as e:
+                            logger.warning(f"No se pudieron obtener reacciones de Instagram: {e}")
+
+                        logger.info(f"Obteniendo comentarios en posts de {username}...")
+                        try:
+                            commenters = await adapter.get_post_commenters(username, max_photos, image_base_path=image_base_path)
+                        except Exception as e:
+                            logger.warning(f"No se pudieron obtener comentarios de Instagram: {e}")
                 
-                # 4. Guardar en BD
-                with conn.cursor() as cur:
-                    # Perfil principal
-                    profile_id = upsert_profile(
-                        cur,
-                        platform=platform,
-                        username=root_profile.get('username', username),
-                        full_name=root_profile.get('full_name'),
-                        profile_url=root_profile.get('profile_url'),
-                        photo_url=root_profile.get('photo_url')
+                    # 4. Guardar en BD (un COPY + merge por tabla, en un hilo del pool)
+                    profile_id = await run_db(
+                        _persist_scraped_profile, platform, username, root_profile,
+                        followers, following, friends, reactors, commenters,
                     )
-                    
-                    # Relaciones - Seguidores
-                    for follower in followers[:100]:  # Limitar a 100 para no saturar
-                        if follower.get('username') and follower['username'] != username:
-                            upsert_profile(
-                                cur,
-                                platform=platform,
-                                username=follower['username'],
-                                full_name=follower.get('full_name'),
-                                profile_url=follower.get('profile_url'),
-                                photo_url=follower.get('photo_url')
-                            )
-                            add_relationship(cur, platform, username, follower['username'], 'follower')
-                    
-                    # Relaciones - Seguidos
-                    for followed in following[:100]:
-                        if followed.get('username') and followed['username'] != username:
-                            upsert_profile(
-                                cur,
-                                platform=platform,
-                                username=followed['username'],
-                                full_name=followed.get('full_name'),
-                                profile_url=followed.get('profile_url'),
-                                photo_url=followed.get('photo_url')
-                            )
-                            add_relationship(cur, platform, username, followed['username'], 'following')
-                    
-                    # Relaciones - Amigos (Facebook)
-                    for friend in friends[:100]:
-                        if friend.get('username') and friend['username'] != username:
-                            upsert_profile(
-                                cur,
-                                platform=platform,
-                                username=friend['username'],
-                                full_name=friend.get('full_name'),
-                                profile_url=friend.get('profile_url'),
-                                photo_url=friend.get('photo_url')
-                            )
-                            add_relationship(cur, platform, username, friend['username'], 'friend')
-
-                    # Relaciones - Reacciones (Facebook)
-                    for reactor in reactors[:100]:
-                        if reactor.get('username') and reactor['username'] != username:
-                            upsert_profile(
-                                cur,
-                                platform=platform,
-                                username=reactor['username'],
-                                full_name=reactor.get('full_name'),
-                                profile_url=reactor.get('profile_url'),
-                                photo_url=reactor.get('photo_url')
-                            )
-                            add_relationship(cur, platform, username, reactor['username'], 'reacted')
-
-                    # Relaciones - Comentarios (Facebook)
-                    for commenter in commenters[:100]:
-                        if commenter.get('username') and commenter['username'] != username:
-                            upsert_profile(
-                                cur,
-                                platform=platform,
-                                username=commenter['username'],
-                                full_name=commenter.get('full_name'),
-                                profile_url=commenter.get('profile_url'),
-                                photo_url=commenter.get('photo_url')
-                            )
-                            add_relationship(cur, platform, username, commenter['username'], 'commented')
-                    
-                    conn.commit()
                 
-                logger.info(f"Scraping completado: {len(followers)} seguidores, {len(following)} seguidos, {len(friends)} amigos, {len(reactors)} reacciones, {len(commenters)} comentarios")
+                    logger.info(f"Scraping completado: {len(followers)} seguidores, {len(following)} seguidos, {len(friends)} amigos, {len(reactors)} reacciones, {len(commenters)} comentarios")
                 
-                return {
-                    'profile_id': profile_id,
-                    'profile': root_profile,
-                    'followers_count': len(followers),
-                    'following_count': len(following),
-                    'friends_count': len(friends),
-                    'reactors_count': len(reactors),
-                    'commenters_count': len(commenters)
-                }
-                
-            finally:
-                await close_browser(browser)
-        
+                    return {
+                        'profile_id': profile_id,
+                        'profile': root_profile,
+                        'followers_count': len(followers),
+                        'following_count': len(following),
+                        'friends_count': len(friends),
+                        'reactors_count': len(reactors),
+                        'commenters_count': len(commenters)
+                    }
+                finally:
+                    await adapter.close()
+
     except Exception as e:
         logger.error(f"Error en scraping de {platform}/{username}: {e}")
         return {'error': str(e)}
-    
-    finally:
-        if conn:
-            conn.close()
+
+
+def _persist_scraped_profile(conn, platform: str, username: str, root_profile: dict,
+                             followers: list, following: list, friends: list,
+                             reactors: list, commenters: list) -> Optional[int]:
+    """Guarda el perfil raíz y sus relaciones (máx. 100 por tipo); retorna el id del perfil raíz."""
+    with conn.cursor() as cur:
+        root_username = root_profile.get('username', username)
+        writer = BulkWriter(cur, platform)
+        writer.add_profile(
+            root_username,
+            full_name=root_profile.get('full_name'),
+            profile_url=root_profile.get('profile_url'),
+            photo_url=root_profile.get('photo_url')
+        )
+        for items, rel_type in (
+            (followers, 'follower'),
+            (following, 'following'),
+            (friends, 'friend'),
+            (reactors, 'reacted'),
+            (commenters, 'commented'),
+        ):
+            for item in items[:100]:  # Limitar a 100 para no saturar
+                if item.get('username') and item['username'] != username:
+                    writer.add_profile(
+                        item['username'],
+                        full_name=item.get('full_name'),
+                        profile_url=item.get('profile_url'),
+                        photo_url=item.get('photo_url')
+                    )
+                    writer.add_relationship(username, item['username'], rel_type)
+        profile_id = writer.flush()['profile_ids'].get(root_username)
+        conn.commit()
+    return profile_id
 
 
 async def ejecutar_analisis_con_semaforo(
@@ -684,68 +670,82 @@ async def start_analysis(request: AnalysisRequest, background_tasks: BackgroundT
         404: Identidad digital no encontrada
         409: Identidad ya está siendo procesada (a menos que force=true)
     """
-    conn = get_conn()
+    # Validar que existe la identidad
+    identidad = await run_db(get_identidad_digital, request.id_identidad)
     
-    try:
-        # Validar que existe la identidad
-        identidad = get_identidad_digital(conn, request.id_identidad)
-        
-        if not identidad:
-            raise HTTPException(
-                status_code=404,
-                detail=f"Identidad digital {request.id_identidad} no encontrada"
-            )
-        
-        # Validar que no esté ya procesándose
-        # Permitir reintentar si está en error o si pasaron más de 10 minutos
-        if identidad['estado'] == 'procesando':
-            from datetime import datetime, timedelta
-            ultimo_analisis = identidad.get('ultimo_analisis')
-            
-            # Si ha pasado más de 10 minutos, asumir que el proceso murió
-            if ultimo_analisis:
-                tiempo_transcurrido = datetime.now(ultimo_analisis.tzinfo) - ultimo_analisis
-                if tiempo_transcurrido > timedelta(minutes=10):
-                    logger.warning(f"Análisis {request.id_identidad} lleva más de 10 min en 'procesando'. Permitiendo reinicio.")
-                else:
-                    raise HTTPException(
-                        status_code=409,
-                        detail="El análisis ya está en proceso. Espera a que termine o reinténtalo después de 10 minutos."
-                    )
+    if not identidad:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Identidad digital {request.id_identidad} no encontrada"
+        )
+    
+    # Validar que no esté ya procesándose
+    # En modo cola la tabla de trabajos decide (dedupe_key); si no, permitir
+    # reintentar si está en error o si pasaron más de 10 minutos
+    # job_queue arrastra SQLAlchemy: se importa al primer análisis, no al arrancar el API
+    from ..services.job_queue import get_job_queue, job_mode
+    queued = job_mode() == 'queue'
+    if identidad['estado'] == 'procesando' and not queued:
+        from datetime import datetime, timedelta
+        ultimo_analisis = identidad.get('ultimo_analisis')
+        
+        # Si ha pasado más de 10 minutos, asumir que el proceso murió
+        if ultimo_analisis:
+            tiempo_transcurrido = datetime.now(ultimo_analisis.tzinfo) - ultimo_analisis
+            if tiempo_transcurrido > timedelta(minutes=10):
+                logger.warning(f"Análisis {request.id_identidad} lleva más de 10 min en 'procesando'. Permitiendo reinicio.")
             else:
                 raise HTTPException(
                     status_code=409,
-                    detail="El análisis ya está en proceso"
+                    detail="El análisis ya está en proceso. Espera a que termine o reinténtalo después de 10 minutos."
                 )
-        
-        # Agendar análisis en background
-        background_tasks.add_task(
-            ejecutar_analisis_background,
-            id_identidad=request.id_identidad,
-            plataforma=identidad['plataforma'],
-            usuario_o_url=identidad['usuario_o_url'],
-            context=request.context.dict(),
-            max_photos=request.max_photos,
-            headless=request.headless,
-            max_depth=request.max_depth
-        )
-        
-        # Actualizar estado a procesando inmediatamente
-        update_identidad_estado(conn, request.id_identidad, 'procesando')
-        
-        logger.info(f"Análisis agendado para identidad {request.id_identidad}")
-        
-        return AnalysisStatusResponse(
-            id_identidad=request.id_identidad,
-            estado='procesando',
-            mensaje_error=None,
-            progreso={"mensaje": "Análisis iniciado"},
-            ultimo_analisis=None,
-            ruta_grafo_ftp=None
-        )
-        
-    finally:
-        conn.close()
+        else:
+            raise HTTPException(
+                status_code=409,
+                detail="El análisis ya está en proceso"
+            )
+    
+    # Agendar análisis en background (o en la cola de workers)
+    job_kwargs = dict(
+        id_identidad=request.id_identidad,
+        plataforma=identidad['plataforma'],
+        usuario_o_url=identidad['usuario_o_url'],
+        context=request.context.dict(),
+        max_photos=request.max_photos,
+        headless=request.headless,
+        max_depth=request.max_depth
+    )
+    # Actualizar estado a procesando antes de encolar: un worker rápido puede
+    # terminar (y escribir el estado final) antes de que vuelva enqueue
+    await update_identidad_estado(request.id_identidad, 'procesando', request.context.id_caso)
+    
+    if queued:
+        try:
+            job_id = await asyncio.to_thread(
+                get_job_queue().enqueue, 'analyze', job_kwargs, dedupe_key=f"identidad:{request.id_identidad}"
+            )
+        except Exception:
+            await update_identidad_estado(request.id_identidad, identidad['estado'], request.context.id_caso)
+            raise
+        if job_id is None:
+            await update_identidad_estado(request.id_identidad, identidad['estado'], request.context.id_caso)
+            raise HTTPException(
+                status_code=409,
+                detail="El análisis ya está en cola o en proceso"
+            )
+    else:
+        background_tasks.add_task(ejecutar_analisis_background, **job_kwargs)
+    
+    logger.info(f"Análisis agendado para identidad {request.id_identidad}")
+    
+    return AnalysisStatusResponse(
+        id_identidad=request.id_identidad,
+        estado='procesando',
+        mensaje_error=None,
+        progreso={"mensaje": "Análisis iniciado"},
+        ultimo_analisis=None,
+        ruta_grafo_ftp=None
+    )
 
 
 @router.get("/status/{id_identidad}", response_model=AnalysisStatusResponse)
@@ -762,37 +762,31 @@ async def get_analysis_status(id_identidad: int):
     Raises:
         404: Identidad digital no encontrada
     """
-    conn = get_conn()
+    identidad = await run_db(get_identidad_digital, id_identidad)
     
-    try:
-        identidad = get_identidad_digital(conn, id_identidad)
-        
-        if not identidad:
-            raise HTTPException(
-                status_code=404,
-                detail=f"Identidad digital {id_identidad} no encontrada"
-            )
-        
-        # Construir información de progreso según el estado
-        progreso = None
-        if identidad['estado'] == 'procesando':
-            progreso = {"mensaje": "Análisis en curso..."}
-        elif identidad['estado'] == 'analizado':
-            progreso = {"mensaje": "Análisis completado"}
-        elif identidad['estado'] == 'error':
-            progreso = {"mensaje": "El análisis falló"}
-        
-        return AnalysisStatusResponse(
-            id_identidad=id_identidad,
-            estado=identidad['estado'],
-            mensaje_error=identidad.get('mensaje_error'),
-            progreso=progreso,
-            ultimo_analisis=identidad['ultimo_analisis'],
-            ruta_grafo_ftp=identidad['ruta_grafo_ftp']
+    if not identidad:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Identidad digital {id_identidad} no encontrada"
         )
-        
-    finally:
-        conn.close()
+    
+    # Construir información de progreso según el estado
+    progreso = None
+    if identidad['estado'] == 'procesando':
+        progreso = {"mensaje": "Análisis en curso..."}
+    elif identidad['estado'] == 'analizado':
+        progreso = {"mensaje": "Análisis completado"}
+    elif identidad['estado'] == 'error':
+        progreso = {"mensaje": "El análisis falló"}
+    
+    return AnalysisStatusResponse(
+        id_identidad=id_identidad,
+        estado=identidad['estado'],
+        mensaje_error=identidad.get('mensaje_error'),
+        progreso=progreso,
+        ultimo_analisis=identidad['ultimo_analisis'],
+        ruta_grafo_ftp=identidad['ruta_grafo_ftp']
+    )
 
 
 @router.post("/reset/{id_identidad}")
@@ -811,29 +805,23 @@ async def reset_analysis(id_identidad: int):
     Raises:
         404: Identidad digital no encontrada
     """
-    conn = get_conn()
+    identidad = await run_db(get_identidad_digital, id_identidad)
     
-    try:
-        identidad = get_identidad_digital(conn, id_identidad)
-        
-        if not identidad:
-            raise HTTPException(
-                status_code=404,
-                detail=f"Identidad digital {id_identidad} no encontrada"
-            )
-        
-        update_identidad_estado(conn, id_identidad, 'pendiente', mensaje_error=None)
-        
-        logger.info(f"Estado de identidad {id_identidad} reseteado a 'pendiente'")
-        
-        return {
-            "id_identidad": id_identidad,
-            "mensaje": "Estado reseteado a 'pendiente'. Puedes iniciar el análisis nuevamente.",
-            "estado_anterior": identidad['estado']
-        }
-        
-    finally:
-        conn.close()
+    if not identidad:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Identidad digital {id_identidad} no encontrada"
+        )
+    
+    await update_identidad_estado(id_identidad, 'pendiente', None)
+    
+    logger.info(f"Estado de identidad {id_identidad} reseteado a 'pendiente'")
+    
+    return {
+        "id_identidad": id_identidad,
+        "mensaje": "Estado reseteado a 'pendiente'. Puedes iniciar el análisis nuevamente.",
+        "estado_anterior": identidad['estado']
+    }
 
 
 @router.get("/result/{id_identidad}")
@@ -851,55 +839,49 @@ async def get_analysis_result(id_identidad: int):
         404: Identidad no encontrada o análisis no completado
         500: Error al recuperar archivo de FTP
     """
-    conn = get_conn()
+    identidad = await run_db(get_identidad_digital, id_identidad)
+    
+    if not identidad:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Identidad digital {id_identidad} no encontrada"
+        )
+    
+    if identidad['estado'] != 'analizado':
+        raise HTTPException(
+            status_code=404,
+            detail=f"Análisis no completado. Estado actual: {identidad['estado']}"
+        )
+    
+    if not identidad['ruta_grafo_ftp']:
+        raise HTTPException(
+            status_code=404,
+            detail="Ruta del grafo no disponible"
+        )
+    
+    # Obtener archivo desde FTP
+    from src.utils.ftp_storage import get_ftp_client
+    import json
+    
+    ftp_client = get_ftp_client()
     
     try:
-        identidad = get_identidad_digital(conn, id_identidad)
-        
-        if not identidad:
-            raise HTTPException(
-                status_code=404,
-                detail=f"Identidad digital {id_identidad} no encontrada"
-            )
-        
-        if identidad['estado'] != 'analizado':
-            raise HTTPException(
-                status_code=404,
-                detail=f"Análisis no completado. Estado actual: {identidad['estado']}"
-            )
-        
-        if not identidad['ruta_grafo_ftp']:
-            raise HTTPException(
-                status_code=404,
-                detail="Ruta del grafo no disponible"
-            )
-        
-        # Obtener archivo desde FTP
-        from src.utils.ftp_storage import get_ftp_client
-        import json
-        
-        ftp_client = get_ftp_client()
-        
-        try:
-            # TODO: Implementar método download en FTPClient
-            # Por ahora retornar metadata
-            return {
-                "id_identidad": id_identidad,
-                "ruta_ftp": identidad['ruta_grafo_ftp'],
-                "plataforma": identidad['plataforma'],
-                "ultimo_analisis": identidad['ultimo_analisis'],
-                "mensaje": "Descarga desde FTP pendiente de implementación"
-            }
-            
-        except Exception as e:
-            logger.error(f"Error al obtener grafo desde FTP: {e}")
-            raise HTTPException(
-                status_code=500,
-                detail=f"Error al recuperar archivo: {str(e)}"
-            )
+        # TODO: Implementar método download en FTPClient
+        # Por ahora retornar metadata
+        return {
+            "id_identidad": id_identidad,
+            "ruta_ftp": identidad['ruta_grafo_ftp'],
+            "plataforma": identidad['plataforma'],
+            "ultimo_analisis": identidad['ultimo_analisis'],
+            "mensaje": "Descarga desde FTP pendiente de implementación"
+        }
         
-    finally:
-        conn.close()
+    except Exception as e:
+        logger.error(f"Error al obtener grafo desde FTP: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error al recuperar archivo: {str(e)}"
+        )
 
 
 def _merge_graphs(graphs_data: List[dict]) -> dict:
@@ -936,6 +918,8 @@ def _merge_graphs(graphs_data: List[dict]) -> dict:
             key = (p.get("platform"), p.get("username"))
             if not key[0] or not key[1]:
                 continue
+            # Grafos guardados antes de las miniaturas
+            p = with_graph_thumbnail(p)
                 
             if key not in profiles_map:
                 profiles_map[key] = p
@@ -948,6 +932,7 @@ def _merge_graphs(graphs_data: List[dict]) -> dict:
                 # Merge other fields if needed (e.g. take the one with more info)
                 if not profiles_map[key].get("photo_url") and p.get("photo_url"):
                     profiles_map[key]["photo_url"] = p.get("photo_url")
+                    profiles_map[key]["photo_url_full"] = p.get("photo_url_full")
                     
         # Merge relations
         for r in g.get("relations", []):
@@ -1004,22 +989,24 @@ def get_analysis_graph(identidades_ids: str, id_caso: int):
             
         # 3. Descargar y acumular grafos
         from src.utils.ftp_storage import get_ftp_client
-        import json
         
         ftp = get_ftp_client()
         graphs_data = []
         
-        for row in analisis_rows:
-            if row['estado'] == 'analizado' and row['ruta_grafo_ftp']:
-                try:
-                    content = ftp.download_file(row['ruta_grafo_ftp'])
-                    graphs_data.append(json.loads(content))
-                except Exception as e:
-                    logger.error(f"Error descargando grafo {row['id_identidad']}: {e}")
-                    # Podríamos agregar un warning al resultado final en lugar de fallar todo
-            else:
-                # Análisis no listo o sin archivo
-                pass
+        # Análisis no listos o sin archivo se omiten
+        listos = [row for row in analisis_rows if row['estado'] == 'analizado' and row['ruta_grafo_ftp']]
+        # Descarga en paralelo sobre el pool FTP
+        contenidos = ftp.download_files([row['ruta_grafo_ftp'] for row in listos])
+        
+        for row in listos:
+            content = contenidos[row['ruta_grafo_ftp']]
+            try:
+                if isinstance(content, Exception):
+                    raise content
+                graphs_data.append(loads(content))
+            except Exception as e:
+                logger.error(f"Error descargando grafo {row['id_identidad']}: {e}")
+                # Podríamos agregar un warning al resultado final en lugar de fallar todo
 
         if not graphs_data:
              # Si pedimos varios y ninguno está listo, es un 404 o 400.
@@ -1030,7 +1017,7 @@ def get_analysis_graph(identidades_ids: str, id_caso: int):
         # 4. Fusionar grafos
         merged_graph = _merge_graphs(graphs_data)
         
-        return merged_graph
+        return JSONStreamResponse(merged_graph)
             
     finally:
         conn.close()
@@ -2,25 +2,32 @@
 Router para análisis de identidades digitales con integración a casos.
 Implementa la lógica de Batch Analysis con semáforo global y pool de cuentas.
 """
-from typing import Optional, List, Dict, Any
+from typing import List, Dict, Any
 from fastapi import APIRouter, HTTPException, BackgroundTasks
 import asyncio
 import logging
+import time
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session as SQLAlchemySession
 
 from ..schemas_batch import (
     BatchAnalysisRequest,
     BatchAnalysisResponse
 )
-from ..db import get_conn, get_sqlalchemy_session
-from .analyze import ejecutar_analisis_background, GLOBAL_SEMAPHORE
+from ..db import get_sqlalchemy_session, run_db
+from ..services.pool_session import POOL_CHECKOUT_WAIT_SECONDS, POOL_EXHAUSTED
+from .analyze import (
+    ejecutar_analisis_background,
+    GLOBAL_SEMAPHORE,
+    _update_identidad_estado,
+    update_identidad_estado,
+)
 from src.utils.event_manager import event_manager
-from src.services.session_manager import SessionManager, ResourceExhaustedException
+from src.scrapers.context_cache import get_context_cache
 from src.utils.exceptions import (
     SessionExpiredException,
     AccountBannedException,
     NetworkException,
+    ResourceExhaustedException,
     StorageException,
     ScraperException,
     log_exception
@@ -70,18 +77,14 @@ def ensure_identidad_en_caso(conn, id_identidad: int, id_caso: int):
         """, (id_caso, id_identidad))
         conn.commit()
 
-def update_identidad_estado(conn, id_identidad: int, estado: str, id_caso: int):
-    """Actualiza el estado de una identidad digital en el caso."""
-    with conn.cursor() as cur:
-        cur.execute("""
-            UPDATE casos.analisis_identidad
-            SET estado = %s::casos.estado_analisis_enum
-            WHERE id_identidad = %s AND idcaso = %s
-        """, (estado, id_identidad, id_caso))
-        conn.commit()
-    
-    # Emitir evento SSE
-    asyncio.create_task(event_manager.broadcast_status(id_identidad, estado, id_caso))
+
+class _ReintentarConOtraCuenta(Exception):
+    """Reintento con otra cuenta: se lanza para salir del semáforo antes de volver a pedirlo."""
+
+    def __init__(self, retry_count: int):
+        super().__init__(retry_count)
+        self.retry_count = retry_count
+
 
 async def ejecutar_analisis_con_pool(
     id_identidad: int,
@@ -92,8 +95,7 @@ async def ejecutar_analisis_con_pool(
     headless: bool,
     max_depth: int,
     max_retries: int = 3,
-    _retry_count: int = 0,
-    _attempted_accounts: List[int] = None
+    raise_errors: bool = False,
 ):
     """
     Wrapper que ejecuta el análisis con control de concurrencia, pool de cuentas y retry automático.
@@ -115,33 +117,49 @@ async def ejecutar_analisis_con_pool(
     
     Args:
         max_retries: Número máximo de intentos totales (default: 3)
-        _retry_count: Contador interno de reintentos (NO pasar manualmente)
-        _attempted_accounts: Lista de IDs de cuentas ya intentadas (NO pasar manualmente)
+        raise_errors: Re-lanzar los fallos definitivos (worker de la cola: ``queue.fail`` reintenta)
     """
+    retry_count = 0
+    attempted_accounts: List[int] = []
+    while True:
+        try:
+            return await _intento_con_pool(
+                id_identidad, plataforma, usuario_o_url, context,
+                max_photos, headless, max_depth, max_retries,
+                retry_count, attempted_accounts, raise_errors,
+            )
+        except _ReintentarConOtraCuenta as retry:
+            retry_count = retry.retry_count
+
+
+async def _intento_con_pool(
+    id_identidad: int,
+    plataforma: str,
+    usuario_o_url: str,
+    context: dict,
+    max_photos: int,
+    headless: bool,
+    max_depth: int,
+    max_retries: int,
+    _retry_count: int,
+    _attempted_accounts: List[int],
+    raise_errors: bool,
+):
+    """Un intento con una cuenta del pool; ``_ReintentarConOtraCuenta`` pide el siguiente."""
+    from src.services.session_manager import SessionManager
     session_manager = SessionManager()
-    db: Optional[SQLAlchemySession] = None
+    db = None
     account = None
     
-    # Inicializar lista de cuentas intentadas en el primer intento
-    if _attempted_accounts is None:
-        _attempted_accounts = []
-    
     # Verificar límite de reintentos
     if _retry_count >= max_retries:
         logger.error(
             f"[ID:{id_identidad}] Se alcanzó el límite de reintentos ({max_retries}). "
             f"Cuentas intentadas: {_attempted_accounts}"
         )
-        conn_psycopg = get_conn()
-        try:
-            update_identidad_estado(
-                conn_psycopg, 
-                id_identidad, 
-                'error', 
-                context.get('id_caso')
-            )
-        finally:
-            conn_psycopg.close()
+        await update_identidad_estado(id_identidad, 'error', context.get('id_caso'))
+        if raise_errors:
+            raise ScraperException(f"Reintentos agotados ({max_retries}) para identidad {id_identidad}", platform=plataforma)
         return  # Salir sin más reintentos
     
     async with GLOBAL_SEMAPHORE:
@@ -155,8 +173,12 @@ async def ejecutar_analisis_con_pool(
             db = get_sqlalchemy_session()
             
             # 2. Obtener cuenta del pool (bloqueo atómico)
+            t_checkout = time.perf_counter()
             try:
-                account = session_manager.checkout_account(plataforma, db)
+                try:
+                    account = await asyncio.to_thread(session_manager.checkout_account, plataforma, db)
+                finally:
+                    POOL_CHECKOUT_WAIT_SECONDS.observe(time.perf_counter() - t_checkout, platform=plataforma)
                 
                 # Verificar si ya intentamos con esta cuenta
                 if account.id in _attempted_accounts:
@@ -164,14 +186,10 @@ async def ejecutar_analisis_con_pool(
                         f"[ID:{id_identidad}] Cuenta {account.username} (ID:{account.id}) "
                         f"ya fue intentada. Liberando y buscando otra..."
                     )
-                    session_manager.release_account(account.id, success=True, db=db)
-                    db.close()
-                    # Reintentar inmediatamente con otra cuenta
-                    return await ejecutar_analisis_con_pool(
-                        id_identidad, plataforma, usuario_o_url, context,
-                        max_photos, headless, max_depth, max_retries,
-                        _retry_count, _attempted_accounts
-                    )
+                    await asyncio.to_thread(session_manager.release_account, account.id, success=True, db=db)
+                    # Reintentar con otra cuenta; cuenta como intento para que max_retries
+                    # acote el loop aunque el pool sólo tenga esta cuenta activa
+                    raise _ReintentarConOtraCuenta(_retry_count + 1)
                 
                 # Registrar cuenta intentada
                 _attempted_accounts.append(account.id)
@@ -182,17 +200,9 @@ async def ejecutar_analisis_con_pool(
                 )
             except ResourceExhaustedException as e:
                 logger.error(f"[ID:{id_identidad}] {str(e)}")
+                POOL_EXHAUSTED.inc(platform=plataforma)
                 # Actualizar estado en caso
-                conn_psycopg = get_conn()
-                try:
-                    update_identidad_estado(
-                        conn_psycopg, 
-                        id_identidad, 
-                        'error', 
-                        context.get('id_caso')
-                    )
-                finally:
-                    conn_psycopg.close()
+                await update_identidad_estado(id_identidad, 'error', context.get('id_caso'))
                 # Propagar excepción para que se registre como error
                 raise HTTPException(
                     status_code=503,
@@ -215,27 +225,34 @@ async def ejecutar_analisis_con_pool(
                 context_with_account, 
                 max_photos, 
                 headless, 
-                max_depth
+                max_depth,
+                # Los fallos llegan a los except de abajo (suspender/banear cuenta, reintentar)
+                raise_errors=True,
             )
             
             # 4. Éxito: Liberar cuenta como exitosa (resetea error_count)
-            session_manager.release_account(account.id, success=True, db=db)
+            await asyncio.to_thread(session_manager.release_account, account.id, success=True, db=db)
             logger.info(
                 f"[ID:{id_identidad}] Análisis exitoso. "
                 f"Cuenta {account.username} liberada y limpia."
             )
         
+        except _ReintentarConOtraCuenta:
+            raise
+
         # 5. Manejo de excepciones específicas del scraper
         except SessionExpiredException as e:
             # Sesión expirada: Suspender cuenta y REINTENTAR con otra
             log_exception(e, logger)
             
             if account and db:
-                session_manager.mark_as_suspended(
+                await asyncio.to_thread(
+                    session_manager.mark_as_suspended,
                     account.id,
                     db,
                     reason=f"Session Expired: {e.message}"
                 )
+                await get_context_cache().invalidate(account.id, reason='session_expired')
                 logger.warning(
                     f"[ID:{id_identidad}] Sesión expirada en cuenta {account.username}. "
                     f"Suspendida. Reintentando con otra cuenta..."
@@ -247,22 +264,20 @@ async def ejecutar_analisis_con_pool(
                 db = None
             
             # REINTENTAR con otra cuenta
-            return await ejecutar_analisis_con_pool(
-                id_identidad, plataforma, usuario_o_url, context,
-                max_photos, headless, max_depth, max_retries,
-                _retry_count + 1, _attempted_accounts
-            )
+            raise _ReintentarConOtraCuenta(_retry_count + 1)
         
         except AccountBannedException as e:
             # Cuenta baneada: Marcar como banned y REINTENTAR con otra
             log_exception(e, logger)
             
             if account and db:
-                session_manager.mark_as_banned(
+                await asyncio.to_thread(
+                    session_manager.mark_as_banned,
                     account.id,
                     db,
                     reason=f"Account Banned: {e.message} (Type: {e.ban_type})"
                 )
+                await get_context_cache().invalidate(account.id, reason='account_banned')
                 logger.critical(
                     f"[ID:{id_identidad}] Cuenta {account.username} baneada permanentemente. "
                     f"Reintentando con otra cuenta..."
@@ -274,11 +289,7 @@ async def ejecutar_analisis_con_pool(
                 db = None
             
             # REINTENTAR con otra cuenta
-            return await ejecutar_analisis_con_pool(
-                id_identidad, plataforma, usuario_o_url, context,
-                max_photos, headless, max_depth, max_retries,
-                _retry_count + 1, _attempted_accounts
-            )
+            raise _ReintentarConOtraCuenta(_retry_count + 1)
         
         except NetworkException as e:
             # Error de red: Incrementar error leve y REINTENTAR con otra cuenta
@@ -286,7 +297,8 @@ async def ejecutar_analisis_con_pool(
             
             if account and db:
                 # Liberar sin penalizar mucho (incrementa error_count levemente)
-                session_manager.release_account(
+                await asyncio.to_thread(
+                    session_manager.release_account,
                     account.id,
                     success=False,
                     db=db,
@@ -303,11 +315,7 @@ async def ejecutar_analisis_con_pool(
                 db = None
             
             # REINTENTAR con otra cuenta
-            return await ejecutar_analisis_con_pool(
-                id_identidad, plataforma, usuario_o_url, context,
-                max_photos, headless, max_depth, max_retries,
-                _retry_count + 1, _attempted_accounts
-            )
+            raise _ReintentarConOtraCuenta(_retry_count + 1)
         
         except StorageException as e:
             # Fallo de almacenamiento (FTP): ERROR CRÍTICO
@@ -315,19 +323,10 @@ async def ejecutar_analisis_con_pool(
             
             if account and db:
                 # No penalizar la cuenta (no es culpa de ella)
-                session_manager.release_account(account.id, success=True, db=db)
+                await asyncio.to_thread(session_manager.release_account, account.id, success=True, db=db)
             
             # Actualizar estado en caso
-            conn_psycopg = get_conn()
-            try:
-                update_identidad_estado(
-                    conn_psycopg, 
-                    id_identidad, 
-                    'error', 
-                    context.get('id_caso')
-                )
-            finally:
-                conn_psycopg.close()
+            await update_identidad_estado(id_identidad, 'error', context.get('id_caso'))
             
             # Abortar con HTTP 500
             logger.critical(f"[ID:{id_identidad}] Fallo crítico de almacenamiento: {e.message}")
@@ -342,7 +341,8 @@ async def ejecutar_analisis_con_pool(
             
             if account and db:
                 # Liberar con error leve (puede ser cambio temporal de layout)
-                session_manager.release_account(
+                await asyncio.to_thread(
+                    session_manager.release_account,
                     account.id,
                     success=False,
                     db=db,
@@ -350,18 +350,11 @@ async def ejecutar_analisis_con_pool(
                 )
             
             # Actualizar estado en caso
-            conn_psycopg = get_conn()
-            try:
-                update_identidad_estado(
-                    conn_psycopg, 
-                    id_identidad, 
-                    'error', 
-                    context.get('id_caso')
-                )
-            finally:
-                conn_psycopg.close()
+            await update_identidad_estado(id_identidad, 'error', context.get('id_caso'))
             
             logger.error(f"[ID:{id_identidad}] Scraper exception: {e.message}")
+            if raise_errors:
+                raise
         
         except Exception as e:
             # Excepción genérica: Error inesperado
@@ -369,7 +362,8 @@ async def ejecutar_analisis_con_pool(
             
             # Liberar cuenta con error
             if account and db:
-                session_manager.release_account(
+                await asyncio.to_thread(
+                    session_manager.release_account,
                     account.id, 
                     success=False, 
                     db=db,
@@ -377,16 +371,7 @@ async def ejecutar_analisis_con_pool(
                 )
             
             # Actualizar estado en caso
-            conn_psycopg = get_conn()
-            try:
-                update_identidad_estado(
-                    conn_psycopg, 
-                    id_identidad, 
-                    'error', 
-                    context.get('id_caso')
-                )
-            finally:
-                conn_psycopg.close()
+            await update_identidad_estado(id_identidad, 'error', context.get('id_caso'))
             
             # Re-lanzar para que se registre el error
             raise
@@ -398,6 +383,77 @@ async def ejecutar_analisis_con_pool(
             
             logger.info(f"[ID:{id_identidad}] Semáforo liberado")
 
+
+def _registrar_batch(conn, request: BatchAnalysisRequest, queued: bool):
+    """
+    Parte transaccional del batch (corre en un hilo con una conexión del pool).
+
+    Returns:
+        (total_identidades, iniciadas, omitidas, job_kwargs de las iniciadas)
+    """
+    # 1. Obtener TODAS las identidades de las personas solicitadas (incluyendo las no seleccionadas)
+    identidades = get_identidades_por_personas(conn, request.personas_ids, request.context.id_caso)
+    
+    iniciadas = []
+    omitidas = []
+    jobs: List[Dict[str, Any]] = []
+    
+    for ident in identidades:
+        id_identidad = ident['id_identidad']
+        estado = ident['estado'] # Puede ser None si no estaba seleccionada
+        ultimo_analisis = ident['ultimo_analisis']
+        
+        # Si no estaba en el caso (estado is None), la agregamos ahora
+        if estado is None:
+            ensure_identidad_en_caso(conn, id_identidad, request.context.id_caso)
+            estado = 'pendiente' # Asumimos pendiente tras insertar
+
+        # Lógica de filtrado:
+        # Si está 'procesando' y hace menos de 10 min, omitir.
+        # En modo cola la tabla de trabajos decide (dedupe_key por identidad).
+        should_process = True
+        if estado == 'procesando' and not queued:
+            if ultimo_analisis:
+                tiempo_transcurrido = datetime.now(ultimo_analisis.tzinfo) - ultimo_analisis
+                if tiempo_transcurrido < timedelta(minutes=10):
+                    should_process = False
+            else:
+                # Si dice procesando pero no tiene fecha, asumimos estancado y procesamos
+                pass
+        
+        if should_process:
+            # Encolar tarea con semáforo y pool (in-process o en la cola de workers)
+            job_kwargs = dict(
+                id_identidad=id_identidad,
+                plataforma=ident['plataforma'],
+                usuario_o_url=ident['usuario_o_url'],
+                context=request.context.dict(),
+                max_photos=request.max_photos,
+                headless=request.headless,
+                max_depth=request.max_depth
+            )
+            # Actualizar estado a procesando inmediatamente para evitar doble submit
+            # (antes de encolar: un worker rápido puede escribir el estado final primero)
+            _update_identidad_estado(conn, id_identidad, 'procesando', request.context.id_caso)
+            if queued:
+                from ..services.job_queue import get_job_queue
+                try:
+                    job_id = get_job_queue().enqueue('analyze_pool', job_kwargs, dedupe_key=f"identidad:{id_identidad}")
+                except Exception:
+                    _update_identidad_estado(conn, id_identidad, estado, request.context.id_caso)
+                    raise
+                if job_id is None:
+                    _update_identidad_estado(conn, id_identidad, estado, request.context.id_caso)
+                    omitidas.append(id_identidad)
+                    continue
+            jobs.append(job_kwargs)
+            iniciadas.append(id_identidad)
+        else:
+            omitidas.append(id_identidad)
+    
+    return len(identidades), iniciadas, omitidas, jobs
+
+
 # ==================================================================
 # ENDPOINTS
 # ==================================================================
@@ -412,62 +468,20 @@ async def start_batch_analysis_by_persons(
     Busca todas las identidades digitales asociadas y las encola para análisis.
     Si las identidades no estaban seleccionadas previamente para el caso, las agrega automáticamente.
     """
-    conn = get_conn()
-    try:
-        # 1. Obtener TODAS las identidades de las personas solicitadas (incluyendo las no seleccionadas)
-        identidades = get_identidades_por_personas(conn, request.personas_ids, request.context.id_caso)
-        
-        iniciadas = []
-        omitidas = []
-        
-        for ident in identidades:
-            id_identidad = ident['id_identidad']
-            estado = ident['estado'] # Puede ser None si no estaba seleccionada
-            ultimo_analisis = ident['ultimo_analisis']
-            
-            # Si no estaba en el caso (estado is None), la agregamos ahora
-            if estado is None:
-                ensure_identidad_en_caso(conn, id_identidad, request.context.id_caso)
-                estado = 'pendiente' # Asumimos pendiente tras insertar
-
-            # Lógica de filtrado:
-            # Si está 'procesando' y hace menos de 10 min, omitir.
-            should_process = True
-            if estado == 'procesando':
-                if ultimo_analisis:
-                    tiempo_transcurrido = datetime.now(ultimo_analisis.tzinfo) - ultimo_analisis
-                    if tiempo_transcurrido < timedelta(minutes=10):
-                        should_process = False
-                else:
-                    # Si dice procesando pero no tiene fecha, asumimos estancado y procesamos
-                    pass
-            
-            if should_process:
-                # Actualizar estado a procesando inmediatamente para evitar doble submit
-                update_identidad_estado(conn, id_identidad, 'procesando', request.context.id_caso)
-                
-                # Encolar tarea con semáforo y pool
-                background_tasks.add_task(
-                    ejecutar_analisis_con_pool,
-                    id_identidad=id_identidad,
-                    plataforma=ident['plataforma'],
-                    usuario_o_url=ident['usuario_o_url'],
-                    context=request.context.dict(),
-                    max_photos=request.max_photos,
-                    headless=request.headless,
-                    max_depth=request.max_depth
-                )
-                iniciadas.append(id_identidad)
-            else:
-                omitidas.append(id_identidad)
-        
-        return BatchAnalysisResponse(
-            mensaje="Proceso de análisis en lote iniciado",
-            total_identidades_encontradas=len(identidades),
-            identidades_iniciadas=iniciadas,
-            identidades_omitidas=omitidas,
-            detalle=f"Se iniciaron {len(iniciadas)} análisis. {len(omitidas)} omitidos por estar ya en proceso."
-        )
-        
-    finally:
-        conn.close()
+    from ..services.job_queue import job_mode
+    queued = job_mode() == 'queue'
+    total, iniciadas, omitidas, jobs = await run_db(_registrar_batch, request, queued)
+    
+    # Eventos SSE y tareas in-process fuera del hilo de BD
+    for job_kwargs in jobs:
+        await event_manager.broadcast_status(job_kwargs['id_identidad'], 'procesando', request.context.id_caso)
+        if not queued:
+            background_tasks.add_task(ejecutar_analisis_con_pool, **job_kwargs)
+    
+    return BatchAnalysisResponse(
+        mensaje="Proceso de análisis en lote iniciado",
+        total_identidades_encontradas=total,
+        identidades_iniciadas=iniciadas,
+        identidades_omitidas=omitidas,
+        detalle=f"Se iniciaron {len(iniciadas)} análisis. {len(omitidas)} omitidos por estar ya en proceso."
+    )
@@ -1,9 +1,11 @@
-from io import BytesIO
-from typing import Union
-import pandas as pd
-from fastapi import APIRouter, HTTPException
+from typing import Any, Optional
+
+from fastapi import APIRouter, HTTPException, Query
 from fastapi.responses import StreamingResponse
-from typing import Any
+
+from ..db import get_conn
+from ..services.case_export import case_export_filename, iter_case_rows, resolve_case_roots
+from ..services.export_stream import EXPORT_FORMATS, export_chunks, export_filename, relation_rows
 
 # Nota: aceptamos varios formatos de payload desde el frontend:
 # - { "perfiles": [...] }
@@ -12,71 +14,76 @@ from typing import Any
 
 router = APIRouter()
 
+
+def _check_format(format: str) -> None:
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Formato no soportado: {format} (use {', '.join(EXPORT_FORMATS)})")
+
+
+def _export_response(chunks, format: str, filename: str) -> StreamingResponse:
+    return StreamingResponse(
+        chunks,
+        media_type=EXPORT_FORMATS[format][0],
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
+
 @router.post("/export")
-def export_to_excel(payload: Any):
+def export_to_excel(payload: Any, format: str = Query('xlsx', description="xlsx | csv | parquet")):
+    """Exporta Perfil objetivo / Tipo de relacion / Perfiles asociados en streaming (memoria constante)."""
+    _check_format(format)
+    # Normalizar payload: soportar varios formatos
+    if isinstance(payload, list):
+        perfiles = payload
+    elif isinstance(payload, dict):
+        perfiles = payload.get('perfiles') or payload.get('profiles') or []
+    else:
+        perfiles = []
+
     try:
-        # Normalizar payload: soportar varios formatos
-        rows = []
-        objetivo_str = ""
-
-        if isinstance(payload, list):
-            perfiles = payload
-        elif isinstance(payload, dict):
-            perfiles = payload.get('perfiles') or payload.get('profiles') or []
-        else:
-            perfiles = []
-
-        for perfil in perfiles:
-            objetivo = perfil.perfil_objetivo or {}
-            # perfil puede venir como dict si el frontend no usa Pydantic
-            if isinstance(perfil, dict):
-                objetivo = perfil.get('perfil_objetivo') or perfil.get('objetivo') or objetivo
-                relacionados = perfil.get('perfiles_relacionados') or perfil.get('relacionados') or []
-            else:
-                relacionados = perfil.perfiles_relacionados or []
-            
-            # Extraer identificador del perfil objetivo
-            for key in ["username", "nombre_usuario", "nombre_completo", "full_name", "profile_url", "url_usuario", "updated_at"]:
-                if objetivo.get(key):
-                    objetivo_str = str(objetivo.get(key))
-                    break
-            objetivo_str = objetivo_str or "perfil"
-            
-            # Procesar cada relacionado
-            for item in relacionados:
-                tipo = item.get("tipo_de_relacion") or item.get("tipo de relacion") or item.get("tipo") or ""
-                rel_username = item.get("username") or item.get("username_usuario") or ""
-                rel_name = item.get("full_name") or item.get("nombre_usuario") or ""
-                rel_url = item.get("profile_url") or item.get("link_usuario") or ""
-                if rel_username:
-                    asociado = rel_username
-                    if rel_name and rel_name != rel_username:
-                        asociado = f"{rel_username} ({rel_name})"
-                elif rel_name:
-                    asociado = rel_name
-                else:
-                    asociado = rel_url or ""
-                rows.append({
-                    "Perfil objetivo": objetivo_str,
-                    "Tipo de relacion": tipo,
-                    "Perfiles asociados": asociado,
-                })
-
-        df = pd.DataFrame(rows, columns=["Perfil objetivo", "Tipo de relacion", "Perfiles asociados"])
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine="openpyxl") as writer:
-            df.to_excel(writer, index=False, sheet_name="export")
-        output.seek(0)
-
-        # Build filename
-        if len(blocks) > 1:
-            filename = "export_multi.xlsx"
-        else:
-            filename = f"export_{first_objetivo_str_for_filename or 'perfil'}.xlsx"
-        return StreamingResponse(
-            output,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": f"attachment; filename={filename}"},
-        )
+        chunks = export_chunks(relation_rows(perfiles), format)
+        filename = export_filename(perfiles, format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+    return _export_response(chunks, format, filename)
+
+
+def _export_case(id_caso: int, id_identidad: Optional[int], format: str) -> StreamingResponse:
+    _check_format(format)
+    conn = get_conn()
+    try:
+        roots = resolve_case_roots(conn, id_caso, [id_identidad] if id_identidad is not None else None)
+        if not roots:
+            raise HTTPException(status_code=404, detail="No hay identidades analizadas para exportar en este caso")
+        # iter_case_rows devuelve conn al pool al terminar: xlsx/parquet aquí mismo, csv al final del envío
+        rows = iter_case_rows(conn, roots)
+        conn = None
+        chunks = export_chunks(rows, format)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if conn is not None:
+            conn.close()
+    return _export_response(chunks, format, case_export_filename(id_caso, EXPORT_FORMATS[format][1], id_identidad))
+
+
+@router.get("/export/case/{id_caso}")
+def export_case(id_caso: int, format: str = Query('xlsx', description="xlsx | csv | parquet")):
+    """
+    Exporta relaciones, comentarios y reacciones de todas las identidades analizadas del caso,
+    leídas de ``red_*`` con un cursor server-side (sin reenviar el payload desde el frontend).
+    """
+    return _export_case(id_caso, None, format)
+
+
+@router.get("/export/case/{id_caso}/identity/{id_identidad}")
+def export_case_identity(id_caso: int, id_identidad: int,
+                         format: str = Query('xlsx', description="xlsx | csv | parquet")):
+    """Como ``/export/case/{id_caso}`` pero sólo para una identidad del caso."""
+    return _export_case(id_caso, id_identidad, format)
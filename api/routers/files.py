@@ -1,12 +1,16 @@
+import asyncio
 import os
 import re
 import uuid
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from fastapi.responses import StreamingResponse
+from typing import Awaitable, Callable, Optional
+from fastapi import APIRouter, UploadFile, File, HTTPException, Header, Query
+from fastapi.responses import FileResponse, Response
 from paths import IMAGES_DIR, PUBLIC_IMAGES_PREFIX_PRIMARY, PUBLIC_IMAGES_PREFIX_COMPAT, ensure_dirs
 from src.utils.ftp_storage import get_ftp_client
+from src.utils.image_store import get_image_store
+from src.utils.image_disk_cache import CachedImage, ImageDiskCache, blob_sha, etag_matches, get_image_disk_cache
+from src.utils.thumbnails import make_thumbnail, pick_size, thumbnail_path
 import logging
-from io import BytesIO
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -15,6 +19,15 @@ _IMAGES_SUBDIR = os.path.join('..', 'data', 'storage', 'images')
 
 ensure_dirs()
 
+_CONTENT_TYPES = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp',
+    '.bmp': 'image/bmp',
+}
+
 _filename_safe_re = re.compile(r"[^a-zA-Z0-9._-]+")
 
 def _safe_ext(filename: str) -> str:
@@ -51,42 +64,122 @@ async def upload_image(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+class PinnedFileResponse(FileResponse):
+    """``FileResponse`` de una entrada de la caché en disco, fijada hasta terminar el envío."""
+
+    def __init__(self, cache: ImageDiskCache, entry: CachedImage, **kwargs):
+        super().__init__(entry.path, **kwargs)
+        self._cache = cache
+        self._entry = entry
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            # También si el cliente se desconecta a mitad del envío
+            self._cache.unpin(self._entry)
+
+
+async def _serve_cached(cache_key: str, filename: str, loader: Callable[[], Awaitable[bytes]],
+                        if_none_match: Optional[str]) -> Response:
+    """
+    Sirve ``cache_key`` (ruta FTP) desde la caché en disco local, llenándola con
+    ``loader`` en el primer acceso. Responde 304 si ``If-None-Match`` coincide.
+    """
+    cache = get_image_disk_cache()
+    headers = {
+        "Cache-Control": "public, max-age=86400",  # Cache for 24 hours
+    }
+
+    # Blobs y entradas frescas: el ETag se conoce sin tocar disco ni FTP
+    etag = cache.known_etag(cache_key)
+    if etag and etag_matches(if_none_match, etag):
+        cache.count_not_modified()
+        return Response(status_code=304, headers={**headers, "ETag": f'"{etag}"'})
+
+    entry = await cache.get(cache_key, loader)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    headers["ETag"] = entry.etag_header
+    if etag_matches(if_none_match, entry.etag):
+        cache.count_not_modified()
+        return Response(status_code=304, headers=headers)
+
+    ext = os.path.splitext(filename)[1].lower()
+    media_type = _CONTENT_TYPES.get(ext, 'image/jpeg')
+    headers["Content-Disposition"] = f'inline; filename="{filename}"'
+    # Fijada hasta terminar el envío: la expulsión LRU no puede borrar el archivo antes
+    if not cache.pin(cache_key, entry):
+        # Expulsada entre el lookup y aquí: volver a llenarla una vez
+        entry = await cache.get(cache_key, loader)
+        if entry is None or not cache.pin(cache_key, entry):
+            # Caché saturada por otras peticiones: se sirve directo del loader
+            data = await loader()
+            if not data:
+                raise HTTPException(status_code=404, detail="Image not found")
+            return Response(data, media_type=media_type, headers=headers)
+    return PinnedFileResponse(cache, entry, media_type=media_type, headers=headers)
+
+
+async def _serve_image(cache_key: str, filename: str, loader: Callable[[], Awaitable[bytes]],
+                       if_none_match: Optional[str], size: Optional[int]) -> Response:
+    """
+    Como ``_serve_cached`` pero con ``size``: sirve la miniatura WebP más pequeña que
+    cubra ``size`` px. Las de blobs se leen del FTP; si el blob es anterior a las
+    miniaturas se generan desde el original y se suben para la próxima vez.
+    """
+    variant = pick_size(size)
+    if variant is None:
+        return await _serve_cached(cache_key, filename, loader, if_none_match)
+
+    thumb_key = thumbnail_path(cache_key, variant)
+    immutable = blob_sha(cache_key) is not None
+
+    async def _thumb_loader() -> bytes:
+        ftp = get_ftp_client()
+        if immutable:
+            try:
+                return await ftp.adownload_file(thumb_key)
+            except FileNotFoundError:
+                pass
+        original = await loader()
+        if not original:
+            return original
+        thumb = await asyncio.to_thread(make_thumbnail, original, variant)
+        if immutable:
+            try:
+                await ftp.aupload_file(thumb_key, thumb)
+            except Exception as e:
+                logger.debug(f"thumbnail backfill upload failed {thumb_key}: {e}")
+        return thumb
+
+    return await _serve_cached(thumb_key, thumbnail_path(filename, variant), _thumb_loader, if_none_match)
+
+
 @router.get("/scraped-image/{platform}/{username}/{filename}")
-async def serve_scraped_image(platform: str, username: str, filename: str):
+async def serve_scraped_image(platform: str, username: str, filename: str,
+                              size: Optional[int] = Query(None, ge=1, le=4096, description="Lado en px de la miniatura"),
+                              if_none_match: Optional[str] = Header(None)):
     """
     Serve images from FTP storage.
     Path format: /files/scraped-image/{platform}/{username}/{filename}
-    Maps to FTP: rs/{platform}/{username}/images/{filename}
+    Maps to the image store blob referenced by {platform}/{username}/images/{filename}
+    (legacy files: rs/{platform}/{username}/images/{filename})
+    Served from the local disk cache; supports If-None-Match -> 304.
+    ?size=N serves the smallest WebP thumbnail >= N px (original if none is large enough).
     """
     try:
         ftp = get_ftp_client()
-        
-        # Download file from FTP into memory
-        file_data = ftp.download(platform, username, 'images', filename)
-        
-        if not file_data:
-            raise HTTPException(status_code=404, detail="Image not found")
-        
-        # Determine content type from extension
-        ext = os.path.splitext(filename)[1].lower()
-        content_type_map = {
-            '.jpg': 'image/jpeg',
-            '.jpeg': 'image/jpeg',
-            '.png': 'image/png',
-            '.gif': 'image/gif',
-            '.webp': 'image/webp',
-            '.bmp': 'image/bmp',
-        }
-        content_type = content_type_map.get(ext, 'image/jpeg')
-        
-        # Return as streaming response with cache headers
-        return StreamingResponse(
-            BytesIO(file_data),
-            media_type=content_type,
-            headers={
-                "Cache-Control": "public, max-age=86400",  # Cache for 24 hours
-                "Content-Disposition": f'inline; filename="{filename}"'
-            }
+
+        blob_path = await get_image_store().resolve(f"{platform}/{username}/images/{filename}")
+        if blob_path:
+            return await _serve_image(blob_path, filename, lambda: ftp.adownload_file(blob_path), if_none_match, size)
+        return await _serve_image(
+            f"legacy/{platform}/{username}/images/{filename}",
+            filename,
+            lambda: ftp.adownload(platform, username, 'images', filename),
+            if_none_match,
+            size,
         )
     except HTTPException:
         raise
@@ -96,42 +189,26 @@ async def serve_scraped_image(platform: str, username: str, filename: str):
 
 
 @router.get("/scraped-image-path/{file_path:path}")
-async def serve_scraped_image_by_path(file_path: str):
+async def serve_scraped_image_by_path(file_path: str,
+                                      size: Optional[int] = Query(None, ge=1, le=4096, description="Lado en px de la miniatura"),
+                                      if_none_match: Optional[str] = Header(None)):
     """
     Serve images from FTP storage using full path.
     Path format: /files/scraped-image-path/{full_ftp_path}
+    Served from the local disk cache; supports If-None-Match -> 304.
+    ?size=N serves the smallest WebP thumbnail >= N px (original if none is large enough).
     """
     try:
         ftp = get_ftp_client()
-        
-        # Download file from FTP into memory
-        # Note: download_file takes the full relative path
-        file_data = ftp.download_file(file_path)
-        
-        if not file_data:
-            raise HTTPException(status_code=404, detail="Image not found")
-        
-        # Determine content type from extension
-        filename = os.path.basename(file_path)
-        ext = os.path.splitext(filename)[1].lower()
-        content_type_map = {
-            '.jpg': 'image/jpeg',
-            '.jpeg': 'image/jpeg',
-            '.png': 'image/png',
-            '.gif': 'image/gif',
-            '.webp': 'image/webp',
-            '.bmp': 'image/bmp',
-        }
-        content_type = content_type_map.get(ext, 'image/jpeg')
-        
-        # Return as streaming response with cache headers
-        return StreamingResponse(
-            BytesIO(file_data),
-            media_type=content_type,
-            headers={
-                "Cache-Control": "public, max-age=86400",  # Cache for 24 hours
-                "Content-Disposition": f'inline; filename="{filename}"'
-            }
+
+        # Note: download_file takes the full relative path; image store refs resolve to their blob
+        blob_path = await get_image_store().resolve(file_path) or file_path
+        return await _serve_image(
+            blob_path,
+            os.path.basename(file_path),
+            lambda: ftp.adownload_file(blob_path),
+            if_none_match,
+            size,
         )
     except HTTPException:
         raise
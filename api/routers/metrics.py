@@ -0,0 +1,25 @@
+"""
+Router de métricas en formato Prometheus (registro de src/utils/metrics.py).
+"""
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+from src.utils.metrics import CONTENT_TYPE, get_metrics_registry
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics")
+def get_metrics():
+    """
+    Counters, gauges e histogramas de este proceso del API (los workers exponen
+    los suyos con ``WORKER_METRICS_PORT``).
+
+    Returns:
+        # HELP scr4per_scroll_runs_total Ejecuciones de scroll_loop por motivo de salida
+        # TYPE scr4per_scroll_runs_total counter
+        scr4per_scroll_runs_total{platform="instagram",list="seguidores",reason="stagnation"} 3
+        scr4per_db_statement_seconds_bucket{kind="select",le="0.005"} 120
+        ...
+    """
+    return Response(content=get_metrics_registry().render(), media_type=CONTENT_TYPE)
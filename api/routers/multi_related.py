@@ -12,6 +12,7 @@ import uuid
 import logging
 
 from ..schemas_multi import MultiRelatedRequest, MultiRelatedResponse
+from ..json_stream import JSONStreamResponse
 from ..services import multi_related as mr
 
 logger = logging.getLogger(__name__)
@@ -88,7 +89,9 @@ async def multi_related(payload: MultiRelatedRequest) -> Any:
             f"truncated={data.get('meta', {}).get('truncated', False)}"
         )
         
-        return data
+        # response_model queda para la documentación: el dict del extractor ya cumple el
+        # schema y se envía en streaming sin re-validar miles de perfiles
+        return JSONStreamResponse(data)
         
     except HTTPException:
         logger.warning(f"multi_related.http_error rid={request_id}")
@@ -1,8 +1,9 @@
 from fastapi import APIRouter, HTTPException, Header
-from typing import Any, Dict
+from typing import Any
 import logging
 
 from ..schemas import MultiScrapeRequest
+from ..json_stream import JSONStreamResponse
 from .. import services  # noqa: F401
 from ..services import multi_scrape as ms
 
@@ -11,14 +12,15 @@ router = APIRouter()
 
 
 @router.post("/multi-scrape")
-async def multi_scrape(request: MultiScrapeRequest, x_tenant_id: str | None = Header(default=None, alias="X-Tenant-Id")) -> Dict[str, Any]:
+async def multi_scrape(request: MultiScrapeRequest, x_tenant_id: str | None = Header(default=None, alias="X-Tenant-Id")) -> Any:
     try:
         # Pasamos un dict simple para facilitar monkeypatch en tests
         payload = request.dict()
         if x_tenant_id:
             payload["tenant"] = x_tenant_id
         data = await ms.multi_scrape_execute(payload)
-        return data
+        # Payload ya serializable: se envía en streaming sin pasar por jsonable_encoder
+        return JSONStreamResponse(data)
     except HTTPException:
         raise
     except ValueError as ve:
@@ -3,10 +3,15 @@ Router para gestión del pool global de cuentas de scraping.
 """
 from typing import Optional
 from fastapi import APIRouter, HTTPException
-from sqlalchemy.orm import Session
 
-from ..db import get_sqlalchemy_session
-from src.services.session_manager import SessionManager
+from ..db import get_db_pool, get_engine, get_sqlalchemy_session
+from src.scrapers.browser_pool import get_browser_pool
+from src.scrapers.context_cache import get_context_cache
+from src.utils.ftp_storage import get_ftp_client
+from src.utils.image_store import get_image_store
+from src.utils.cdn_expiry import get_negative_cache
+from src.utils.image_disk_cache import get_image_disk_cache
+from .proxy import proxy_stats
 
 router = APIRouter(prefix="/pool", tags=["pool"])
 
@@ -30,7 +35,9 @@ def get_pool_status(platform: Optional[str] = None):
             "banned": 0
         }
     """
-    db: Session = get_sqlalchemy_session()
+    # SessionManager/SQLAlchemy se cargan al primer uso (arranque liviano del API)
+    from src.services.session_manager import SessionManager
+    db = get_sqlalchemy_session()
     session_manager = SessionManager()
     
     try:
@@ -55,7 +62,8 @@ def reset_cooldown_accounts():
     Returns:
         {"mensaje": "X cuentas reseteadas de cooldown"}
     """
-    db: Session = get_sqlalchemy_session()
+    from src.services.session_manager import SessionManager
+    db = get_sqlalchemy_session()
     session_manager = SessionManager()
     
     try:
@@ -73,3 +81,136 @@ def reset_cooldown_accounts():
         }
     finally:
         db.close()
+
+
+@router.get("/browsers")
+def get_browser_pool_status():
+    """
+    Métricas del pool compartido de navegadores Chromium.
+    
+    Returns:
+        {
+            "pools": {"facebook:headless": {"size": 2, "idle": 1, "leased": 1, ...}},
+            "leases": 42,
+            "lease_wait_ms_avg": 3.1,
+            "launched": 3,
+            "recycled": 1,
+            "crashed": 0,
+            ...
+        }
+    """
+    return get_browser_pool().stats()
+
+
+@router.get("/contexts")
+def get_context_cache_status():
+    """
+    Métricas del cache de contextos pre-autenticados por cuenta del pool.
+    
+    Returns:
+        {"entries": 3, "hits": 12, "misses": 3, "hit_ratio": 0.8, "evicted_ttl": 1, ...}
+    """
+    return get_context_cache().stats()
+
+
+@router.get("/jobs")
+def get_job_queue_status():
+    """
+    Estado de la cola de trabajos consumida por los procesos ``python -m api.worker``.
+    
+    Returns:
+        {
+            "backend": "postgres", "mode": "queue", "lease_s": 30.0,
+            "pending": 4, "pending_retry": 1, "running": 6, "expired_leases": 0,
+            "done_1h": 38, "failed_1h": 1,
+            "oldest_pending_age_s": 12.3, "wait_s_avg": 4.2, "run_s_avg": 311.7
+        }
+    """
+    from ..services.job_queue import get_job_queue
+    return get_job_queue().stats()
+
+
+@router.get("/db")
+def get_db_pool_status():
+    """
+    Métricas del pool de conexiones psycopg2 del proceso y del pool de SQLAlchemy.
+    
+    Returns:
+        {
+            "psycopg": {"max": 10, "open": 4, "in_use": 1, "idle": 3, "checkouts": 812,
+                        "waited": 3, "wait_ms_avg": 0.4, "wait_ms_max": 38.0, "timeouts": 0, ...},
+            "sqlalchemy": {"size": 5, "checked_out": 1, "overflow": 0}
+        }
+    """
+    sa_pool = get_engine().pool
+    return {
+        "psycopg": get_db_pool().stats(),
+        "sqlalchemy": {
+            "size": sa_pool.size(),
+            "checked_out": sa_pool.checkedout(),
+            "overflow": sa_pool.overflow(),
+        },
+    }
+
+
+@router.get("/ftp")
+def get_ftp_pool_status():
+    """
+    Métricas del pool de conexiones FTP y throughput de transferencias.
+    
+    Returns:
+        {
+            "size": 4, "open": 3, "in_use": 1, "idle": 2, "leases": 530,
+            "wait_ms_avg": 2.1, "timeouts": 0, "health_checks": 12, "health_failures": 1,
+            "uploads": 480, "downloads": 50, "bytes_up": 21504000,
+            "files_per_s": 6.4, "bytes_per_s": 287000, "window_s": 60.0, ...
+        }
+    """
+    return get_ftp_client().stats()
+
+
+@router.get("/images")
+def get_image_store_status():
+    """
+    Métricas del image store direccionado por contenido.
+    
+    Returns:
+        {
+            "requests": 1200, "url_hits": 700, "inflight_joins": 20, "fetched": 480,
+            "content_hits": 130, "uploads": 350, "bytes_uploaded": 9100000, "bytes_saved": 21000000,
+            "dedupe_ratio": 0.708, "cdn_requests_saved": 720, "content_dedupe_ratio": 0.271, ...,
+            "negative_cache": {"checks": 900, "skipped_expired": 40, "skipped_cached": 25,
+                               "recorded": 30, "evicted": 0, "entries": 28}
+        }
+    """
+    return {**get_image_store().stats(), 'negative_cache': get_negative_cache().stats()}
+
+
+@router.get("/image-cache")
+def get_image_disk_cache_status():
+    """
+    Métricas de la caché en disco local que sirve /files/scraped-image*.
+    
+    Returns:
+        {
+            "hits": 5400, "misses": 310, "inflight_joins": 12, "stale_refreshes": 3, "not_modified": 2100,
+            "bytes_served_from_disk": 98000000, "bytes_filled": 6100000, "evictions": 0, "bytes_evicted": 0,
+            "hit_ratio": 0.946, "entries": 310, "bytes": 6100000, "max_bytes": 1073741824, "directory": "..."
+        }
+    """
+    return get_image_disk_cache().stats()
+
+
+@router.get("/proxy")
+def get_proxy_status():
+    """
+    Métricas de /proxy-image (caché DNS, cliente compartido y caché de respuestas en disco).
+    
+    Returns:
+        {
+            "requests": 800, "cache_hits": 610, "not_modified": 120, "dns_hits": 60, "dns_lookups": 10,
+            "upstream_requests": 70, "upstream_errors": 4, "bytes_streamed": 2100000, "rejected_too_large": 0,
+            "dns_cached_hosts": 6, "cache": {"hits": 610, "misses": 70, "entries": 66, "bytes": 2000000, ...}
+        }
+    """
+    return proxy_stats()
@@ -1,15 +1,48 @@
+import asyncio
+import hashlib
 import ipaddress
-import socket
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
 from urllib.parse import urlparse
 
-from fastapi import APIRouter, HTTPException, Query
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import Response, StreamingResponse
 import httpx
-import io
+
+from paths import PROXY_CACHE_DIR
+from src.utils.cdn_expiry import get_negative_cache
+from src.utils.image_disk_cache import ImageDiskCache, etag_matches
+from .files import PinnedFileResponse
+
+logger = logging.getLogger(__name__)
 
 MAX_IMAGE_BYTES = 10 * 1024 * 1024  # 10 MB
 ALLOWED_SCHEMES = {"http", "https"}
 
+PROXY_HTTP_MAX_CONNECTIONS = int(os.getenv("PROXY_HTTP_MAX_CONNECTIONS") or 20)
+PROXY_HTTP_TIMEOUT_S = float(os.getenv("PROXY_HTTP_TIMEOUT_S") or 10.0)
+PROXY_DNS_CACHE_TTL_S = float(os.getenv("PROXY_DNS_CACHE_TTL_S") or 300)
+PROXY_CACHE_MAX_MB = int(os.getenv("PROXY_CACHE_MAX_MB") or 512)
+PROXY_CACHE_TTL_S = float(os.getenv("PROXY_CACHE_TTL_S") or 86400)
+_DNS_CACHE_MAX = 4096
+# Un fallo de resolución se recuerda poco: puede ser transitorio
+_DNS_FAILURE_TTL_S = 30.0
+_CACHE_CONTROL = "public, max-age=86400"
+
+# host -> (destino no permitido, expira en monotonic)
+_dns_cache: "OrderedDict[str, Tuple[bool, float]]" = OrderedDict()
+_client: Optional[Tuple[httpx.AsyncClient, asyncio.AbstractEventLoop]] = None
+_counters: Dict[str, int] = {
+    'requests': 0, 'cache_hits': 0, 'not_modified': 0, 'dns_hits': 0, 'dns_lookups': 0,
+    'upstream_requests': 0, 'upstream_errors': 0, 'bytes_streamed': 0, 'rejected_too_large': 0,
+}
+
+# Singleton instance
+_proxy_cache_instance: Optional[ImageDiskCache] = None
+
 
 def _is_disallowed_ip(ip: str) -> bool:
     try:
@@ -26,28 +59,86 @@ def _is_disallowed_ip(ip: str) -> bool:
         return True
 
 
-def _host_resolves_to_disallowed(host: str) -> bool:
+async def _host_resolves_to_disallowed(host: str) -> bool:
+    # If host is already an IP
     try:
-        # If host is already an IP
-        try:
-            if _is_disallowed_ip(host):
-                return True
-        except Exception:
-            pass
-        infos = socket.getaddrinfo(host, None)
-        for family, _type, _proto, _canonname, sockaddr in infos:
-            ip = sockaddr[0]
-            if _is_disallowed_ip(ip):
-                return True
-        return False
+        ipaddress.ip_address(host)
+        return _is_disallowed_ip(host)
+    except ValueError:
+        pass
+
+    now = time.monotonic()
+    cached = _dns_cache.get(host)
+    if cached is not None and cached[1] > now:
+        _counters['dns_hits'] += 1
+        return cached[0]
+
+    _counters['dns_lookups'] += 1
+    try:
+        # getaddrinfo del loop corre en el executor: no bloquea el event loop
+        infos = await asyncio.get_running_loop().getaddrinfo(host, None)
+        disallowed = not infos or any(_is_disallowed_ip(sockaddr[0]) for *_rest, sockaddr in infos)
+        ttl = PROXY_DNS_CACHE_TTL_S
     except Exception:
         # On resolution failure, be conservative
-        return True
+        disallowed = True
+        ttl = _DNS_FAILURE_TTL_S
+
+    _dns_cache[host] = (disallowed, now + ttl)
+    _dns_cache.move_to_end(host)
+    while len(_dns_cache) > _DNS_CACHE_MAX:
+        _dns_cache.popitem(last=False)
+    return disallowed
+
+
+def _get_client() -> httpx.AsyncClient:
+    """Cliente compartido del proxy (sin seguir redirecciones: el destino ya se validó)."""
+    global _client
+    loop = asyncio.get_running_loop()
+    if _client is not None and _client[1] is loop and not _client[0].is_closed:
+        return _client[0]
+    client = httpx.AsyncClient(
+        timeout=PROXY_HTTP_TIMEOUT_S,
+        follow_redirects=False,
+        limits=httpx.Limits(
+            max_connections=PROXY_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=PROXY_HTTP_MAX_CONNECTIONS,
+            keepalive_expiry=30.0,
+        ),
+    )
+    _client = (client, loop)
+    return client
+
+
+async def close_proxy_client() -> None:
+    """Cierra el cliente del proxy si pertenece al loop actual (shutdown del API)."""
+    global _client
+    if _client is not None and _client[1] is asyncio.get_running_loop():
+        await _client[0].aclose()
+        _client = None
+
+
+def get_proxy_cache() -> ImageDiskCache:
+    global _proxy_cache_instance
+    if _proxy_cache_instance is None:
+        _proxy_cache_instance = ImageDiskCache(
+            directory=PROXY_CACHE_DIR,
+            max_bytes=PROXY_CACHE_MAX_MB * 1024 * 1024,
+            mutable_ttl_s=PROXY_CACHE_TTL_S,
+        )
+    return _proxy_cache_instance
+
+
+def proxy_stats() -> Dict[str, object]:
+    return {**_counters, 'dns_cached_hosts': len(_dns_cache), 'cache': get_proxy_cache().stats()}
+
 
 router = APIRouter()
 
 @router.get("/proxy-image")
-async def proxy_image(url: str = Query(..., description="URL de la imagen externa")):
+async def proxy_image(url: str = Query(..., description="URL de la imagen externa"),
+                      if_none_match: Optional[str] = Header(None)):
+    _counters['requests'] += 1
     # 1) Validar esquema y host
     try:
         parsed = urlparse(url)
@@ -61,24 +152,82 @@ async def proxy_image(url: str = Query(..., description="URL de la imagen extern
     if not host:
         raise HTTPException(status_code=400, detail="Host inválido")
 
-    if _host_resolves_to_disallowed(host):
+    # 2) Caché en disco: las respuestas guardadas ya pasaron la validación de destino
+    cache = get_proxy_cache()
+    cache_key = f"proxy/{hashlib.sha1(url.encode('utf-8')).hexdigest()}"
+    etag = cache.known_etag(cache_key)
+    if etag and etag_matches(if_none_match, etag):
+        _counters['not_modified'] += 1
+        cache.count_not_modified()
+        return Response(status_code=304, headers={"Cache-Control": _CACHE_CONTROL, "ETag": f'"{etag}"'})
+    entry = cache.lookup(cache_key)
+    if entry is not None and entry.media_type:
+        # False si la expulsión LRU borró el archivo tras el lookup: se trata como miss
+        if cache.pin(cache_key, entry):
+            _counters['cache_hits'] += 1
+            return PinnedFileResponse(
+                cache,
+                entry,
+                media_type=entry.media_type,
+                headers={"Cache-Control": _CACHE_CONTROL, "ETag": entry.etag_header},
+            )
+
+    if await _host_resolves_to_disallowed(host):
         raise HTTPException(status_code=403, detail="Destino no permitido")
 
-    # 2) Descargar con timeout y límites de tamaño
+    # Firma caducada (oe=) o fallo permanente reciente: el origen respondería lo mismo
+    negative_cache = get_negative_cache()
+    skip_reason = negative_cache.skip_reason(url)
+    if skip_reason:
+        raise HTTPException(status_code=410, detail=f"Imagen no disponible en el origen ({skip_reason})")
+
+    # 3) Descargar en streaming con timeout y límite de tamaño incremental
+    client = _get_client()
+    _counters['upstream_requests'] += 1
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            resp = await client.get(url)
-            resp.raise_for_status()
-            content_type = resp.headers.get("content-type", "")
-            if not content_type.startswith("image/"):
-                raise HTTPException(status_code=400, detail="La URL no apunta a una imagen válida")
-
-            # Enforce size limit (buffer up to MAX_IMAGE_BYTES)
-            data = resp.content
-            if data is None:
-                raise HTTPException(status_code=502, detail="Respuesta inválida del origen")
-            if len(data) > MAX_IMAGE_BYTES:
-                raise HTTPException(status_code=413, detail="Imagen demasiado grande")
-            return StreamingResponse(io.BytesIO(data), media_type=content_type)
+        resp = await client.send(client.build_request("GET", url), stream=True)
     except httpx.HTTPError as e:
-        raise HTTPException(status_code=500, detail=f"Error al obtener la imagen: {str(e)}")
\ No newline at end of file
+        _counters['upstream_errors'] += 1
+        raise HTTPException(status_code=500, detail=f"Error al obtener la imagen: {str(e)}")
+
+    negative_cache.record(url, resp.status_code)
+    content_type = resp.headers.get("content-type", "")
+    declared = resp.headers.get("content-length")
+    error: Optional[HTTPException] = None
+    if not resp.is_success:
+        _counters['upstream_errors'] += 1
+        error = HTTPException(status_code=500, detail=f"Error al obtener la imagen: HTTP {resp.status_code}")
+    elif not content_type.startswith("image/"):
+        error = HTTPException(status_code=400, detail="La URL no apunta a una imagen válida")
+    elif declared and declared.isdigit() and int(declared) > MAX_IMAGE_BYTES:
+        _counters['rejected_too_large'] += 1
+        error = HTTPException(status_code=413, detail="Imagen demasiado grande")
+    if error is not None:
+        await resp.aclose()
+        raise error
+
+    async def _body():
+        # Se reenvía cada chunk según llega y se guarda una copia para la caché
+        received = bytearray()
+        try:
+            async for chunk in resp.aiter_bytes():
+                if len(received) + len(chunk) > MAX_IMAGE_BYTES:
+                    # Sin Content-Length del origen no se pudo rechazar antes: se corta la respuesta
+                    _counters['rejected_too_large'] += 1
+                    logger.warning(f"proxy_image.too_large url={url[:100]}")
+                    return
+                received.extend(chunk)
+                _counters['bytes_streamed'] += len(chunk)
+                yield chunk
+        finally:
+            await resp.aclose()
+        if received:
+            try:
+                await cache.put(cache_key, bytes(received), content_type)
+            except OSError as e:
+                logger.debug(f"proxy_image.cache_write_failed url={url[:100]} err={e}")
+
+    headers = {"Cache-Control": _CACHE_CONTROL}
+    if declared and declared.isdigit() and not resp.headers.get("content-encoding"):
+        headers["Content-Length"] = declared
+    return StreamingResponse(_body(), media_type=content_type, headers=headers)
@@ -96,6 +96,11 @@ def _build_related_from_db(cur, platform: str, owner_username: str) -> List[Dict
 
     return relacionados
 
+def fetch_related(conn, platform: str, owner_username: str) -> List[Dict[str, Any]]:
+    """``_build_related_from_db`` con un cursor propio (para ``run_db`` desde código async)."""
+    with conn.cursor() as cur:
+        return _build_related_from_db(cur, platform, owner_username)
+
 @router.get("/related/{platform}/{username}")
 def get_related(
     platform: Literal['x','instagram','facebook'] = Path(...),
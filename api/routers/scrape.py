@@ -1,37 +1,15 @@
 from typing import List, Dict, Any, Optional, Literal
 from fastapi import APIRouter, HTTPException
-from playwright.async_api import async_playwright
 from ..schemas import ScrapeRequest
-from ..db import get_conn
-from ..repositories import upsert_profile, add_relationship, add_post, add_comment, add_reaction
+from ..db import run_db
+from ..bulk_writer import BulkWriter, flush_and_commit
 from ..services.pool_session import checkout_pool_session
 from src.utils.url import normalize_input_url, normalize_post_url
 from src.utils.images import local_or_proxy_photo_url
-from src.services.session_manager import ResourceExhaustedException
-from .related import _build_related_from_db
-
-# Scrapers
-from src.scrapers.facebook.scraper import (
-    obtener_datos_usuario_facebook,
-    scrap_followers as fb_scrap_followers,
-    scrap_followed as fb_scrap_followed,
-    scrap_friends_all as fb_scrap_friends,
-    scrap_comentarios_fotos as fb_scrap_comments,
-    scrap_reacciones_fotos as fb_scrap_reactions,
-)
-from src.scrapers.instagram.scraper import (
-    obtener_datos_usuario_principal as ig_obtener_datos,
-    scrap_seguidores as ig_scrap_followers,
-    scrap_seguidos as ig_scrap_followed,
-    scrap_comentadores_instagram as ig_scrap_commenters,
-    scrap_reacciones_instagram as ig_scrap_reactions,
-)
-from src.scrapers.x.scraper import (
-    obtener_datos_usuario_principal as x_obtener_datos,
-    scrap_seguidores as x_scrap_followers,
-    scrap_seguidos as x_scrap_followed,
-    scrap_comentadores as x_scrap_commenters,
-)
+from src.utils.exceptions import ResourceExhaustedException
+from src.scrapers.browser_pool import get_browser_pool
+from src.scrapers.context_cache import get_context_cache
+from .related import fetch_related
 
 router = APIRouter()
 
@@ -58,12 +36,22 @@ async def scrape(req: ScrapeRequest):
 
     try:
         async with checkout_pool_session(platform) as pool_session:
-            async with async_playwright() as pw:
-                browser = await pw.chromium.launch(headless=req.headless)
-                context = await browser.new_context(storage_state=pool_session.storage_state)
-                page = await context.new_page()
+            context_cache = get_context_cache()
+            async with get_browser_pool().lease(platform, headless=req.headless, prefer=context_cache.browser_for(pool_session.account_id)) as browser:
+                # Mismas opciones que los adapters: comparten el contexto cacheado de la cuenta
+                from ..services.adapters import CONTEXT_OPTS
+                context, page = await context_cache.open_page(browser, pool_session.account_id, pool_session.storage_state, context_opts=CONTEXT_OPTS)
                 try:
+                    # Scrapers (Playwright) se importan al primer scrape de cada plataforma
                     if platform == 'facebook':
+                        from src.scrapers.facebook.scraper import (
+                            obtener_datos_usuario_facebook,
+                            scrap_followers as fb_scrap_followers,
+                            scrap_followed as fb_scrap_followed,
+                            scrap_friends_all as fb_scrap_friends,
+                            scrap_comentarios_fotos as fb_scrap_comments,
+                            scrap_reacciones_fotos as fb_scrap_reactions,
+                        )
                         datos = await obtener_datos_usuario_facebook(page, url)
                         username = datos.get('username') or 'unknown'
                         perfil_obj = {
@@ -80,6 +68,13 @@ async def scrape(req: ScrapeRequest):
                         commenters = await fb_scrap_comments(page, url, username, max_fotos=max_photos)
                         reactions = await fb_scrap_reactions(page, url, username, max_fotos=max_photos, incluir_comentarios=True)
                     elif platform == 'instagram':
+                        from src.scrapers.instagram.scraper import (
+                            obtener_datos_usuario_principal as ig_obtener_datos,
+                            scrap_seguidores as ig_scrap_followers,
+                            scrap_seguidos as ig_scrap_followed,
+                            scrap_comentadores_instagram as ig_scrap_commenters,
+                            scrap_reacciones_instagram as ig_scrap_reactions,
+                        )
                         datos = await ig_obtener_datos(page, url)
                         username = datos.get('username') or 'unknown'
                         perfil_obj = {
@@ -95,6 +90,12 @@ async def scrape(req: ScrapeRequest):
                         commenters = await ig_scrap_commenters(page, url, username, max_posts=max_photos)
                         reactions = await ig_scrap_reactions(page, url, username, max_posts=max_photos)
                     elif platform == 'x':
+                        from src.scrapers.x.scraper import (
+                            obtener_datos_usuario_principal as x_obtener_datos,
+                            scrap_seguidores as x_scrap_followers,
+                            scrap_seguidos as x_scrap_followed,
+                            scrap_comentadores as x_scrap_commenters,
+                        )
                         datos = await x_obtener_datos(page, url)
                         username = datos.get('username') or 'unknown'
                         perfil_obj = {
@@ -119,112 +120,89 @@ async def scrape(req: ScrapeRequest):
                     commenters_usernames = [(_extract_username(x)) for x in commenters_items if _extract_username(x)]
                     reactors_usernames = [u for u in ([_extract_username(x) for x in (reactions or [])] if reactions else []) if u]
 
-                    with get_conn() as conn:
-                        with conn.cursor() as cur:
-                            try:
-                                if perfil_obj.get('photo_url') and not str(perfil_obj['photo_url']).startswith(('/storage/', '/files/')):
-                                    perfil_obj['photo_url'] = await local_or_proxy_photo_url(
-                                        perfil_obj.get('photo_url'),
-                                        perfil_obj.get('username'),
-                                        platform_schema,
-                                        mode='download',
-                                        page=page,
-                                        on_failure='empty',
-                                        retries=5,
-                                        backoff_seconds=0.5,
-                                    )
-                            except Exception:
-                                perfil_obj['photo_url'] = ""
-                            upsert_profile(cur, platform, perfil_obj['username'], perfil_obj.get('full_name'), perfil_obj.get('profile_url'), perfil_obj.get('photo_url'), perfil_obj.get('facebook_id'))
-
-                            by_username: Dict[str, Dict[str, Any]] = {}
-                            for lst in [followers or [], following or [], friends or [], commenters or [], reactions or []]:
-                                for it in lst:
-                                    uname = _extract_username(it)
-                                    if not uname:
-                                        continue
-                                    if uname not in by_username:
-                                        by_username[uname] = _extract_fields(it)
-                                    else:
-                                        fields = _extract_fields(it)
-                                        curf = by_username[uname]
-                                        by_username[uname] = {
-                                            'full_name': curf.get('full_name') or fields.get('full_name'),
-                                            'profile_url': curf.get('profile_url') or fields.get('profile_url'),
-                                            'photo_url': curf.get('photo_url') or fields.get('photo_url'),
-                                        }
-
-                            async def _ensure_local_photo(url: Optional[str], uname: str) -> str:
-                                if not url:
-                                    return ""
-                                if str(url).startswith(('/storage/', '/files/')):
-                                    return url
-                                try:
-                                    return await local_or_proxy_photo_url(
-                                        url, uname, platform_schema, mode='download', page=page, on_failure='empty', retries=5, backoff_seconds=0.5
-                                    )
-                                except Exception:
-                                    return ""
+                    try:
+                        if perfil_obj.get('photo_url') and not str(perfil_obj['photo_url']).startswith(('/storage/', '/files/')):
+                            perfil_obj['photo_url'] = await local_or_proxy_photo_url(
+                                perfil_obj.get('photo_url'),
+                                perfil_obj.get('username'),
+                                platform_schema,
+                                mode='download',
+                                page=page,
+                                on_failure='empty',
+                                retries=5,
+                                backoff_seconds=0.5,
+                            )
+                    except Exception:
+                        perfil_obj['photo_url'] = ""
+                    root_username = perfil_obj['username']
+                    # Staging sin conexión: las descargas de fotos no retienen una conexión del pool
+                    writer = BulkWriter(None, platform)
+                    writer.add_profile(root_username, perfil_obj.get('full_name'), perfil_obj.get('profile_url'), perfil_obj.get('photo_url'), perfil_obj.get('facebook_id'))
 
-                            for u in followers_usernames:
-                                f = by_username.get(u, {})
-                                photo_local = await _ensure_local_photo(f.get('photo_url'), u)
-                                upsert_profile(cur, platform, u, f.get('full_name'), f.get('profile_url'), photo_local)
-                                add_relationship(cur, platform, perfil_obj['username'], u, 'follower')
+                    by_username: Dict[str, Dict[str, Any]] = {}
+                    for lst in [followers or [], following or [], friends or [], commenters or [], reactions or []]:
+                        for it in lst:
+                            uname = _extract_username(it)
+                            if not uname:
+                                continue
+                            if uname not in by_username:
+                                by_username[uname] = _extract_fields(it)
+                            else:
+                                fields = _extract_fields(it)
+                                curf = by_username[uname]
+                                by_username[uname] = {
+                                    'full_name': curf.get('full_name') or fields.get('full_name'),
+                                    'profile_url': curf.get('profile_url') or fields.get('profile_url'),
+                                    'photo_url': curf.get('photo_url') or fields.get('photo_url'),
+                                }
 
-                            for u in following_usernames:
-                                f = by_username.get(u, {})
-                                photo_local = await _ensure_local_photo(f.get('photo_url'), u)
-                                upsert_profile(cur, platform, u, f.get('full_name'), f.get('profile_url'), photo_local)
-                                add_relationship(cur, platform, perfil_obj['username'], u, 'following')
+                    async def _ensure_local_photo(url: Optional[str], uname: str) -> str:
+                        if not url:
+                            return ""
+                        if str(url).startswith(('/storage/', '/files/')):
+                            return url
+                        try:
+                            return await local_or_proxy_photo_url(
+                                url, uname, platform_schema, mode='download', page=page, on_failure='empty', retries=5, backoff_seconds=0.5
+                            )
+                        except Exception:
+                            return ""
 
-                            if platform == 'facebook':
-                                for u in friends_usernames:
-                                    f = by_username.get(u, {})
-                                    photo_local = await _ensure_local_photo(f.get('photo_url'), u)
-                                    upsert_profile(cur, platform, u, f.get('full_name'), f.get('profile_url'), photo_local)
-                                    add_relationship(cur, platform, perfil_obj['username'], u, 'friend')
+                    rel_lists = [(followers_usernames, 'follower'), (following_usernames, 'following')]
+                    if platform == 'facebook':
+                        rel_lists.append((friends_usernames, 'friend'))
+                    for usernames, rel_type in rel_lists:
+                        for u in usernames:
+                            f = by_username.get(u, {})
+                            photo_local = await _ensure_local_photo(f.get('photo_url'), u)
+                            writer.add_profile(u, f.get('full_name'), f.get('profile_url'), photo_local)
+                            writer.add_relationship(root_username, u, rel_type)
 
-                            post_urls = set()
-                            for item in commenters_items:
-                                purl = normalize_post_url(platform, item.get('post_url')) if item.get('post_url') else None
-                                if purl:
-                                    post_urls.add(purl)
-                            for purl in post_urls:
-                                add_post(cur, platform, perfil_obj['username'], purl)
-                            for item in commenters_items:
-                                purl = normalize_post_url(platform, item.get('post_url')) if item.get('post_url') else None
-                                uname = _extract_username(item)
-                                if purl and uname:
-                                    f = _extract_fields(item)
-                                    photo_local = await _ensure_local_photo(f.get('photo_url'), uname)
-                                    upsert_profile(cur, platform, uname, f.get('full_name'), f.get('profile_url'), photo_local)
-                                    try:
-                                        add_comment(cur, platform, purl, uname)
-                                    except ValueError:
-                                        add_post(cur, platform, perfil_obj['username'], purl)
-                                        add_comment(cur, platform, purl, uname)
+                    # Los posts faltantes se crean con la raíz como dueño (post_owner)
+                    for item in commenters_items:
+                        purl = normalize_post_url(platform, item.get('post_url')) if item.get('post_url') else None
+                        uname = _extract_username(item)
+                        if purl:
+                            writer.add_post(root_username, purl)
+                        if purl and uname:
+                            f = _extract_fields(item)
+                            photo_local = await _ensure_local_photo(f.get('photo_url'), uname)
+                            writer.add_profile(uname, f.get('full_name'), f.get('profile_url'), photo_local)
+                            writer.add_comment(purl, uname, post_owner=root_username)
 
-                            for rx in reactions or []:
-                                purl = normalize_post_url(platform, rx.get('post_url')) if rx.get('post_url') else None
-                                uname = _extract_username(rx)
-                                if purl and uname:
-                                    f = _extract_fields(rx)
-                                    photo_local = await _ensure_local_photo(f.get('photo_url'), uname)
-                                    upsert_profile(cur, platform, uname, f.get('full_name'), f.get('profile_url'), photo_local)
-                                    add_post(cur, platform, perfil_obj['username'], purl)
-                                    try:
-                                        add_reaction(cur, platform, purl, uname, rx.get('reaction_type'))
-                                    except ValueError:
-                                        add_post(cur, platform, perfil_obj['username'], purl)
-                                        add_reaction(cur, platform, purl, uname, rx.get('reaction_type'))
+                    for rx in reactions or []:
+                        purl = normalize_post_url(platform, rx.get('post_url')) if rx.get('post_url') else None
+                        uname = _extract_username(rx)
+                        if purl and uname:
+                            f = _extract_fields(rx)
+                            photo_local = await _ensure_local_photo(f.get('photo_url'), uname)
+                            writer.add_profile(uname, f.get('full_name'), f.get('profile_url'), photo_local)
+                            writer.add_reaction(purl, uname, rx.get('reaction_type'), post_owner=root_username)
 
-                            conn.commit()
+                    await run_db(flush_and_commit, writer)
 
                     try:
-                        with get_conn() as conn2:
-                            with conn2.cursor() as cur2:
-                                relacionados = _build_related_from_db(cur2, platform, perfil_obj['username'])
+                        relacionados = await run_db(fetch_related, platform, perfil_obj['username'])
                     except Exception:
                         relacionados = []
                         relacionados += [
@@ -287,7 +265,6 @@ async def scrape(req: ScrapeRequest):
                         "Perfiles relacionados": relacionados_out,
                     }
                 finally:
-                    await context.close()
-                    await browser.close()
+                    await context_cache.release_page(pool_session.account_id, page)
     except ResourceExhaustedException as exc:
         raise HTTPException(status_code=503, detail=f"account pool exhausted for {platform}: {exc}") from exc
\ No newline at end of file
@@ -95,7 +95,7 @@ def get_user_id_from_header(x_user_id: Optional[str] = Header(None)) -> int:
 
 
 @router.put("/{platform}", response_model=SessionStatusResponse, status_code=status.HTTP_200_OK)
-async def create_or_update_session(
+def create_or_update_session(
     platform: str,
     request: Request,
     cookies_raw: List[Dict[str, Any]] = Body(...),
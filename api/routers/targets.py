@@ -10,7 +10,7 @@ from ..schemas_targets import (
     IdentidadCreate, IdentidadResponse,
     BatchDeleteRequest, BatchDeleteResponse
 )
-from ..db import get_conn
+from ..db import get_db
 import logging
 import json
 
@@ -40,12 +40,11 @@ class VinculoOut(VinculoObjetivoCasoIn):
 # ==================================================================
 
 @router.post("/", response_model=PersonaResponse, status_code=status.HTTP_201_CREATED)
-def create_persona_atomic(payload: PersonaCreate):
+def create_persona_atomic(payload: PersonaCreate, conn=Depends(get_db)):
     """
     Crea una nueva persona, la vincula al caso especificado y registra sus redes sociales iniciales.
     Todo en una sola transacción atómica.
     """
-    conn = get_conn()
     try:
         with conn.cursor() as cur:
             # 1. Crear la Persona Física
@@ -110,17 +109,14 @@ def create_persona_atomic(payload: PersonaCreate):
         conn.rollback()
         logger.error(f"Error creando persona atomicamente: {e}")
         raise HTTPException(status_code=400, detail=str(e))
-    finally:
-        conn.close()
 
 @router.put("/{id_persona}", response_model=PersonaResponse)
-def update_persona(id_persona: int, payload: PersonaUpdate):
+def update_persona(id_persona: int, payload: PersonaUpdate, conn=Depends(get_db)):
     """
     Actualiza datos biográficos de la persona.
     Los campos enviados se actualizan (incluso si son null).
     Los campos no enviados se mantienen sin cambios.
     """
-    conn = get_conn()
     try:
         with conn.cursor() as cur:
             # Verificar existencia
@@ -189,11 +185,9 @@ def update_persona(id_persona: int, payload: PersonaUpdate):
         conn.rollback()
         logger.error(f"Error actualizando persona: {e}")
         raise HTTPException(status_code=400, detail=str(e))
-    finally:
-        conn.close()
 
 @router.delete("/{personas_ids}", status_code=status.HTTP_200_OK)
-def delete_personas(personas_ids: str, id_caso: Optional[int] = None):
+def delete_personas(personas_ids: str, id_caso: Optional[int] = None, conn=Depends(get_db)):
     """
     Elimina o desvincula una o varias personas.
     
@@ -202,7 +196,6 @@ def delete_personas(personas_ids: str, id_caso: Optional[int] = None):
     
     Retorna un resumen de la operación.
     """
-    conn = get_conn()
     deleted = []
     failed = []
     
@@ -263,15 +256,12 @@ def delete_personas(personas_ids: str, id_caso: Optional[int] = None):
         conn.rollback()
         logger.error(f"Error eliminando personas: {e}")
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        conn.close()
 
 @router.post("/{id_persona}/identities", response_model=IdentidadResponse)
-def add_identity_to_persona(id_persona: int, payload: IdentidadCreate):
+def add_identity_to_persona(id_persona: int, payload: IdentidadCreate, conn=Depends(get_db)):
     """
     Agrega una red social extra a una persona existente.
     """
-    conn = get_conn()
     try:
         with conn.cursor() as cur:
             # Verificar persona
@@ -305,11 +295,9 @@ def add_identity_to_persona(id_persona: int, payload: IdentidadCreate):
         conn.rollback()
         logger.error(f"Error agregando identidad: {e}")
         raise HTTPException(status_code=400, detail=str(e))
-    finally:
-        conn.close()
 
 @router.delete("/{id_persona}/identities/{id_identidad}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_identity_from_persona(id_persona: int, id_identidad: int, id_caso: Optional[int] = None):
+def delete_identity_from_persona(id_persona: int, id_identidad: int, id_caso: Optional[int] = None, conn=Depends(get_db)):
     """
     Elimina o desvincula una red social.
 
@@ -319,7 +307,6 @@ def delete_identity_from_persona(id_persona: int, id_identidad: int, id_caso: Op
     - Si NO se proporciona 'id_caso': Intenta eliminar la identidad GLOBALMENTE.
       Falla si la identidad tiene análisis activos en otros casos.
     """
-    conn = get_conn()
     try:
         with conn.cursor() as cur:
             # Verificar existencia de la identidad y que pertenezca a la persona
@@ -365,40 +352,33 @@ def delete_identity_from_persona(id_persona: int, id_identidad: int, id_caso: Op
         conn.rollback()
         logger.error(f"Error eliminando identidad: {e}")
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        conn.close()
 
 # ==================================================================
 # PERSONAS (Nueva Tabla entidades.personas)
 # ==================================================================
 
 @router.get("/personas", response_model=List[PersonaOut])
-def list_personas(limit: int = 100, offset: int = 0):
+def list_personas(limit: int = 100, offset: int = 0, conn=Depends(get_db)):
     """Lista personas (nueva tabla)."""
-    conn = get_conn()
-    try:
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT 
-                    id_persona, nombre, apellido_paterno, apellido_materno,
-                    curp, rfc, fecha_nacimiento, tipo_sangre,
-                    datos_adicionales, fecha_creacion, foto
-                FROM entidades.personas 
-                ORDER BY fecha_creacion DESC
-                LIMIT %s OFFSET %s
-            """, (limit, offset))
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT 
+                id_persona, nombre, apellido_paterno, apellido_materno,
+                curp, rfc, fecha_nacimiento, tipo_sangre,
+                datos_adicionales, fecha_creacion, foto
+            FROM entidades.personas 
+            ORDER BY fecha_creacion DESC
+            LIMIT %s OFFSET %s
+        """, (limit, offset))
             
-            results = []
-            for row in cur.fetchall():
-                results.append(row)
-            return results
-    finally:
-        conn.close()
+        results = []
+        for row in cur.fetchall():
+            results.append(row)
+        return results
 
 @router.post("/personas", response_model=PersonaOut)
-def create_persona(persona: PersonaIn):
+def create_persona(persona: PersonaIn, conn=Depends(get_db)):
     """Crea una nueva Persona en la tabla actualizada."""
-    conn = get_conn()
     try:
         with conn.cursor() as cur:
             datos_json = json.dumps(persona.datos_adicionales or {})
@@ -427,39 +407,32 @@ def create_persona(persona: PersonaIn):
     except Exception as e:
         logger.error(f"Error creando persona: {e}")
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        conn.close()
 
 @router.get("/personas/{id_persona}", response_model=PersonaOut)
-def get_persona(id_persona: int):
+def get_persona(id_persona: int, conn=Depends(get_db)):
     """Obtiene detalles de una Persona."""
-    conn = get_conn()
-    try:
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT 
-                    id_persona, nombre, apellido_paterno, apellido_materno,
-                    curp, rfc, fecha_nacimiento, tipo_sangre,
-                    datos_adicionales, fecha_creacion, foto
-                FROM entidades.personas 
-                WHERE id_persona = %s
-            """, (id_persona,))
-            row = cur.fetchone()
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT 
+                id_persona, nombre, apellido_paterno, apellido_materno,
+                curp, rfc, fecha_nacimiento, tipo_sangre,
+                datos_adicionales, fecha_creacion, foto
+            FROM entidades.personas 
+            WHERE id_persona = %s
+        """, (id_persona,))
+        row = cur.fetchone()
             
-            if not row:
-                raise HTTPException(status_code=404, detail="Persona no encontrada")
-            return row
-    finally:
-        conn.close()
+        if not row:
+            raise HTTPException(status_code=404, detail="Persona no encontrada")
+        return row
 
 # ==================================================================
 # VINCULOS (CASOS <-> PERSONAS)
 # ==================================================================
 
 @router.post("/vinculos", response_model=VinculoOut)
-def vincular_persona_caso(vinculo: VinculoObjetivoCasoIn):
+def vincular_persona_caso(vinculo: VinculoObjetivoCasoIn, conn=Depends(get_db)):
     """Vincula una Persona existente a un Caso."""
-    conn = get_conn()
     try:
         with conn.cursor() as cur:
             # Verificar si ya existe el vínculo
@@ -490,29 +463,23 @@ def vincular_persona_caso(vinculo: VinculoObjetivoCasoIn):
         if 'foreign key constraint' in str(e).lower():
              raise HTTPException(status_code=404, detail="Caso o Persona no encontrados")
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        conn.close()
 
 @router.get("/casos/{id_caso}/personas", response_model=List[PersonaOut])
-def list_personas_por_caso(id_caso: int):
+def list_personas_por_caso(id_caso: int, conn=Depends(get_db)):
     """Lista todas las personas vinculadas a un caso específico."""
-    conn = get_conn()
-    try:
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT p.* 
-                FROM entidades.personas p
-                JOIN casos.vinculos_objetivo v ON p.id_persona = v.id_persona
-                WHERE v.idcaso = %s
-                ORDER BY v.fecha_agregado DESC
-            """, (id_caso,))
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT p.* 
+            FROM entidades.personas p
+            JOIN casos.vinculos_objetivo v ON p.id_persona = v.id_persona
+            WHERE v.idcaso = %s
+            ORDER BY v.fecha_agregado DESC
+        """, (id_caso,))
             
-            results = []
-            for row in cur.fetchall():
-                results.append(row)
-            return results
-    finally:
-        conn.close()
+        results = []
+        for row in cur.fetchall():
+            results.append(row)
+        return results
 
 # ==================================================================
 # VISTA TABLERO: Personas + Identidades (optimizada para frontend)
@@ -544,67 +511,58 @@ class PersonaCardOut(BaseModel):
 
 
 @router.get("/casos/{id_caso}/tablero", response_model=List[PersonaCardOut])
-def get_tablero_personas(id_caso: int):
+def get_tablero_personas(id_caso: int, conn=Depends(get_db)):
     """Devuelve la vista `casos.vista_tablero_personas` para el caso solicitado.
 
     La vista ya retorna la estructura JSON con `identidades_asociadas`.
     """
-    conn = get_conn()
-    try:
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT 
-                    idcaso AS id_caso,
-                    id_persona,
-                    nombre,
-                    apellido_paterno,
-                    apellido_materno,
-                    foto,
-                    curp,
-                    rfc,
-                    fecha_nacimiento,
-                    tipo_sangre,
-                    datos_adicionales,
-                    fecha_agregado,
-                    identidades_asociadas
-                FROM casos.vista_tablero_personas 
-                WHERE idcaso = %s
-            """, (id_caso,))
-            rows = cur.fetchall()
-
-            results = []
-            for row in rows:
-                # `identidades_asociadas` viene como JSONB desde la vista;
-                # RealDictCursor ya lo convierte a estructuras Python.
-                results.append(row)
-
-            return results
-    finally:
-        conn.close()
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT 
+                idcaso AS id_caso,
+                id_persona,
+                nombre,
+                apellido_paterno,
+                apellido_materno,
+                foto,
+                curp,
+                rfc,
+                fecha_nacimiento,
+                tipo_sangre,
+                datos_adicionales,
+                fecha_agregado,
+                identidades_asociadas
+            FROM casos.vista_tablero_personas 
+            WHERE idcaso = %s
+        """, (id_caso,))
+        rows = cur.fetchall()
+
+        results = []
+        for row in rows:
+            # `identidades_asociadas` viene como JSONB desde la vista;
+            # RealDictCursor ya lo convierte a estructuras Python.
+            results.append(row)
+
+        return results
 
 # ==================================================================
 # IDENTIDADES DIGITALES
 # ==================================================================
 
 @router.get("/identidades", response_model=List[IdentidadDigitalOut])
-def list_identidades(limit: int = 100, offset: int = 0):
+def list_identidades(limit: int = 100, offset: int = 0, conn=Depends(get_db)):
     """Lista todas las identidades digitales."""
-    conn = get_conn()
-    try:
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT * FROM entidades.identidades_digitales
-                ORDER BY id_identidad DESC
-                LIMIT %s OFFSET %s
-            """, (limit, offset))
-            return cur.fetchall()
-    finally:
-        conn.close()
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT * FROM entidades.identidades_digitales
+            ORDER BY id_identidad DESC
+            LIMIT %s OFFSET %s
+        """, (limit, offset))
+        return cur.fetchall()
 
 @router.post("/identidades", response_model=IdentidadDigitalOut)
-def add_identidad(identidad: IdentidadDigitalIn):
+def add_identidad(identidad: IdentidadDigitalIn, conn=Depends(get_db)):
     """Agrega una Identidad Digital a una Persona."""
-    conn = get_conn()
     try:
         with conn.cursor() as cur:
             # Verificar si ya existe
@@ -632,51 +590,40 @@ def add_identidad(identidad: IdentidadDigitalIn):
     except Exception as e:
         logger.error(f"Error agregando identidad: {e}")
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        conn.close()
 
 @router.get("/identidades/{id_identidad}", response_model=IdentidadDigitalOut)
-def get_identidad(id_identidad: int):
+def get_identidad(id_identidad: int, conn=Depends(get_db)):
     """Obtiene detalles de una Identidad Digital."""
-    conn = get_conn()
-    try:
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT * FROM entidades.identidades_digitales WHERE id_identidad = %s
-            """, (id_identidad,))
-            row = cur.fetchone()
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT * FROM entidades.identidades_digitales WHERE id_identidad = %s
+        """, (id_identidad,))
+        row = cur.fetchone()
             
-            if not row:
-                raise HTTPException(status_code=404, detail="Identidad no encontrada")
+        if not row:
+            raise HTTPException(status_code=404, detail="Identidad no encontrada")
                 
-            return row
-    finally:
-        conn.close()
+        return row
 
 @router.get("/personas/{id_persona}/identidades", response_model=List[IdentidadDigitalOut])
-def list_identidades_persona(id_persona: int):
+def list_identidades_persona(id_persona: int, conn=Depends(get_db)):
     """Lista todas las identidades de una persona."""
-    conn = get_conn()
-    try:
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT * FROM entidades.identidades_digitales WHERE id_persona = %s
-            """, (id_persona,))
-            return cur.fetchall()
-    finally:
-        conn.close()
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT * FROM entidades.identidades_digitales WHERE id_persona = %s
+        """, (id_persona,))
+        return cur.fetchall()
 
 # ==================================================================
 # GESTIÓN DE IDENTIDADES EN CASOS (SELECCIÓN)
 # ==================================================================
 
 @router.post("/casos/{id_caso}/identidades/seleccionar", response_model=List[AnalisisIdentidadOut])
-def seleccionar_identidades_caso(id_caso: int, seleccion: SeleccionIdentidadIn):
+def seleccionar_identidades_caso(id_caso: int, seleccion: SeleccionIdentidadIn, conn=Depends(get_db)):
     """
     Selecciona qué identidades de una persona serán analizadas en este caso.
     Crea registros en casos.analisis_identidad.
     """
-    conn = get_conn()
     try:
         with conn.cursor() as cur:
             results = []
@@ -695,22 +642,16 @@ def seleccionar_identidades_caso(id_caso: int, seleccion: SeleccionIdentidadIn):
     except Exception as e:
         logger.error(f"Error seleccionando identidades: {e}")
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        conn.close()
 
 @router.get("/casos/{id_caso}/identidades", response_model=List[AnalisisIdentidadOut])
-def list_identidades_caso(id_caso: int):
+def list_identidades_caso(id_caso: int, conn=Depends(get_db)):
     """Lista las identidades seleccionadas para un caso con su estado de análisis."""
-    conn = get_conn()
-    try:
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT 
-                    id_analisis, idcaso AS id_caso, id_identidad, 
-                    estado, ruta_grafo_ftp, fecha_analisis
-                FROM casos.analisis_identidad
-                WHERE idcaso = %s
-            """, (id_caso,))
-            return cur.fetchall()
-    finally:
-        conn.close()
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT 
+                id_analisis, idcaso AS id_caso, id_identidad, 
+                estado, ruta_grafo_ftp, fecha_analisis
+            FROM casos.analisis_identidad
+            WHERE idcaso = %s
+        """, (id_caso,))
+        return cur.fetchall()
@@ -2,41 +2,18 @@ from __future__ import annotations
 
 import os
 import logging
-from typing import Any, Dict, List, Optional
-
-from playwright.async_api import Browser, async_playwright
+from contextlib import nullcontext
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
 
 from src.utils.url import normalize_input_url
 from src.utils.images import local_or_proxy_photo_url
+from src.utils.photo_pipeline import PhotoPipeline
+from src.scrapers.context_cache import get_context_cache
 
-logger = logging.getLogger(__name__)
-
-async def launch_browser(headless: bool = True) -> Browser:
-    pw = await async_playwright().start()
-    browser = await pw.chromium.launch(
-        headless=headless,
-        args=[
-            "--disable-gpu",
-            "--disable-dev-shm-usage",
-            "--no-sandbox",
-            "--disable-infobars",
-            "--disable-blink-features=AutomationControlled",
-            "--disable-features=IsolateOrigins,site-per-process",
-        ],
-    )
-    # Attach playwright instance for later stop()
-    browser._scr4per_pw = pw  # type: ignore[attr-defined]
-    return browser
-
-
-async def close_browser(browser: Browser):
-    try:
-        await browser.close()
-    finally:
-        pw = getattr(browser, "_scr4per_pw", None)
-        if pw:
-            await pw.stop()
+if TYPE_CHECKING:
+    from playwright.async_api import Browser
 
+logger = logging.getLogger(__name__)
 
 def _profile_url(platform: str, username: str) -> str:
     base = {
@@ -69,24 +46,48 @@ CONTEXT_OPTS = {
 }
 
 
+async def _open_context_page(browser: Browser, storage_state: Optional[Any], account_id: Optional[int]):
+    """Con cuenta del pool reutiliza su contexto cacheado; sin ella crea un contexto efímero."""
+    if account_id is not None:
+        return await get_context_cache().open_page(browser, account_id, storage_state, context_opts=CONTEXT_OPTS)
+    context = await browser.new_context(storage_state=storage_state, **CONTEXT_OPTS)
+    page = await context.new_page()
+    return context, page
+
+
+async def _close_context_page(context, page, account_id: Optional[int]):
+    if account_id is not None:
+        await get_context_cache().release_page(account_id, page)
+    else:
+        await context.close()
+
+
 class InstagramAdapter:
     platform = 'instagram'
 
-    def __init__(self, browser: Browser, tenant: Optional[str] = None, storage_state: Optional[Any] = None):
+    def __init__(self, browser: Browser, tenant: Optional[str] = None, storage_state: Optional[Any] = None, account_id: Optional[int] = None):
         self.browser = browser
         self.tenant = tenant
         self.storage_state = storage_state
+        self.account_id = account_id
         self._engagement_cache: Dict[tuple, Dict[str, List[Dict[str, Any]]]] = {}
+        self.photos = PhotoPipeline(f"red_{self.platform}")
 
     async def _new_page(self):
-        context = await self.browser.new_context(storage_state=self.storage_state, **CONTEXT_OPTS)
-        page = await context.new_page()
+        context, page = await _open_context_page(self.browser, self.storage_state, self.account_id)
         try:
-            logger.info("ctx.open platform=%s tenant=%s ctx=%s", self.platform, self.tenant, id(context))
+            logger.info("ctx.open platform=%s tenant=%s ctx=%s account_id=%s", self.platform, self.tenant, id(context), self.account_id)
         except Exception:
             pass
         return context, page
 
+    async def _close_page(self, context, page):
+        await _close_context_page(context, page, self.account_id)
+
+    async def close(self) -> Dict[str, Any]:
+        """Fin del trabajo: detiene el pipeline de fotos y devuelve sus métricas."""
+        return await self.photos.aclose()
+
     async def get_root_profile(self, username: str, image_base_path: Optional[str] = None) -> Dict[str, Any]:
         from src.scrapers.instagram.scraper import obtener_datos_usuario_principal
         context, page = await self._new_page()
@@ -121,7 +122,7 @@ class InstagramAdapter:
                 )
             return prof
         finally:
-            await context.close()
+            await self._close_page(context, page)
 
     async def get_followers(self, username: str, max_photos: int = 5, image_base_path: Optional[str] = None) -> List[Dict[str, Any]]:
         from src.scrapers.instagram.scraper import scrap_seguidores
@@ -129,8 +130,8 @@ class InstagramAdapter:
         try:
             logger.info("list.start platform=%s type=followers username=%s ctx=%s", self.platform, username, id(context))
             perfil_url = _profile_url(self.platform, username)
-            rows = await scrap_seguidores(page, perfil_url, username)
-            platform_ftp = f"red_{self.platform}"
+            with self.photos.collecting():
+                rows = await scrap_seguidores(page, perfil_url, username)
             
             # Prepare ftp_path
             ftp_path = image_base_path if image_base_path else None
@@ -142,28 +143,11 @@ class InstagramAdapter:
                 item = _map_user_item_to_profile(self.platform, r)
                 out.append(item)
             
-            import asyncio
-            async def process_image(item):
-                if item.get('photo_url'):
-                    try:
-                        item['photo_url'] = await local_or_proxy_photo_url(
-                            item['photo_url'], 
-                            username, 
-                            platform_ftp, 
-                            mode='download', 
-                            photo_owner=item['username'], 
-                            page=page,
-                            ftp_path=ftp_path
-                        )
-                    except Exception:
-                        pass
-            
-            if out:
-                await asyncio.gather(*(process_image(item) for item in out))
+            await self.photos.process(out, username, page=page, ftp_path=ftp_path)
 
             return out
         finally:
-            await context.close()
+            await self._close_page(context, page)
 
     async def get_following(self, username: str, max_photos: int = 5, image_base_path: Optional[str] = None) -> List[Dict[str, Any]]:
         from src.scrapers.instagram.scraper import scrap_seguidos
@@ -171,8 +155,8 @@ class InstagramAdapter:
         try:
             logger.info("list.start platform=%s type=following username=%s ctx=%s", self.platform, username, id(context))
             perfil_url = _profile_url(self.platform, username)
-            rows = await scrap_seguidos(page, perfil_url, username)
-            platform_ftp = f"red_{self.platform}"
+            with self.photos.collecting():
+                rows = await scrap_seguidos(page, perfil_url, username)
             
             # Prepare ftp_path
             ftp_path = image_base_path if image_base_path else None
@@ -184,28 +168,11 @@ class InstagramAdapter:
                 item = _map_user_item_to_profile(self.platform, r)
                 out.append(item)
             
-            import asyncio
-            async def process_image(item):
-                if item.get('photo_url'):
-                    try:
-                        item['photo_url'] = await local_or_proxy_photo_url(
-                            item['photo_url'], 
-                            username, 
-                            platform_ftp, 
-                            mode='download', 
-                            photo_owner=item['username'], 
-                            page=page,
-                            ftp_path=ftp_path
-                        )
-                    except Exception:
-                        pass
-            
-            if out:
-                await asyncio.gather(*(process_image(item) for item in out))
+            await self.photos.process(out, username, page=page, ftp_path=ftp_path)
 
             return out
         finally:
-            await context.close()
+            await self._close_page(context, page)
 
     async def _get_post_engagement_bundle(self, username: str, max_photos: int = 5, image_base_path: Optional[str] = None) -> Dict[str, List[Dict[str, Any]]]:
         """Extrae likes+comentarios en una sola pasada y cachea por request/adapter."""
@@ -218,7 +185,8 @@ class InstagramAdapter:
         try:
             logger.info("list.start platform=%s type=post_engagement_bundle username=%s ctx=%s", self.platform, username, id(context))
             perfil_url = _profile_url(self.platform, username)
-            result = await scrap_post_engagements_scrapling(page, perfil_url, username, max_posts=max_photos)
+            with self.photos.collecting():
+                result = await scrap_post_engagements_scrapling(page, perfil_url, username, max_posts=max_photos)
 
             reactions_rows = result.get('reactions', []) or []
             comments_rows = result.get('comments', []) or []
@@ -226,31 +194,11 @@ class InstagramAdapter:
             reactions_out: List[Dict[str, Any]] = [_map_user_item_to_profile(self.platform, r) for r in reactions_rows]
             comments_out: List[Dict[str, Any]] = [_map_user_item_to_profile(self.platform, r) for r in comments_rows]
 
-            platform_ftp = f"red_{self.platform}"
             ftp_path = image_base_path if image_base_path else None
             if ftp_path and not ftp_path.endswith('/'):
                 ftp_path += '/'
 
-            import asyncio
-
-            async def process_image(item):
-                if item.get('photo_url'):
-                    try:
-                        item['photo_url'] = await local_or_proxy_photo_url(
-                            item['photo_url'],
-                            username,
-                            platform_ftp,
-                            mode='download',
-                            photo_owner=item['username'],
-                            page=page,
-                            ftp_path=ftp_path
-                        )
-                    except Exception:
-                        pass
-
-            combined = reactions_out + comments_out
-            if combined:
-                await asyncio.gather(*(process_image(item) for item in combined))
+            await self.photos.process(reactions_out + comments_out, username, page=page, ftp_path=ftp_path)
 
             payload = {
                 'reactions': reactions_out,
@@ -259,7 +207,7 @@ class InstagramAdapter:
             self._engagement_cache[cache_key] = payload
             return payload
         finally:
-            await context.close()
+            await self._close_page(context, page)
 
     async def get_post_reactors(self, username: str, max_photos: int = 5, image_base_path: Optional[str] = None) -> List[Dict[str, Any]]:
         bundle = await self._get_post_engagement_bundle(username, max_photos=max_photos, image_base_path=image_base_path)
@@ -276,25 +224,33 @@ class InstagramAdapter:
 class FacebookAdapter:
     platform = 'facebook'
 
-    def __init__(self, browser: Browser, tenant: Optional[str] = None, process_images: bool = True, storage_state: Optional[Any] = None):
+    def __init__(self, browser: Browser, tenant: Optional[str] = None, process_images: bool = True, storage_state: Optional[Any] = None, account_id: Optional[int] = None):
         self.browser = browser
         self.tenant = tenant
         self.process_images = process_images
         self.storage_state = storage_state
+        self.account_id = account_id
         self._shared_context = None
         self._shared_page = None
+        self.photos = PhotoPipeline(f"red_{self.platform}")
 
     async def _new_page(self):
         if self._shared_context is not None and self._shared_page is not None:
             return self._shared_context, self._shared_page, False
-        context = await self.browser.new_context(storage_state=self.storage_state, **CONTEXT_OPTS)
-        page = await context.new_page()
+        context, page = await _open_context_page(self.browser, self.storage_state, self.account_id)
         try:
-            logger.info("ctx.open platform=%s tenant=%s ctx=%s", self.platform, self.tenant, id(context))
+            logger.info("ctx.open platform=%s tenant=%s ctx=%s account_id=%s", self.platform, self.tenant, id(context), self.account_id)
         except Exception:
             pass
         return context, page, True
 
+    async def _close_page(self, context, page):
+        await _close_context_page(context, page, self.account_id)
+
+    async def close(self) -> Dict[str, Any]:
+        """Fin del trabajo: detiene el pipeline de fotos y devuelve sus métricas."""
+        return await self.photos.aclose()
+
     async def open_flow_session(self):
         if self._shared_context is not None and self._shared_page is not None:
             return
@@ -306,38 +262,24 @@ class FacebookAdapter:
         if self._shared_context is None:
             return
         context = self._shared_context
+        page = self._shared_page
         self._shared_context = None
         self._shared_page = None
-        await context.close()
+        await self._close_page(context, page)
 
     async def _maybe_process_images(self, items: List[Dict[str, Any]], username: str, page, image_base_path: Optional[str] = None) -> List[Dict[str, Any]]:
         if not self.process_images or not items:
             return items
 
-        platform_ftp = f"red_{self.platform}"
         ftp_path = image_base_path if image_base_path else None
         if ftp_path and not ftp_path.endswith('/'):
             ftp_path += '/'
 
-        import asyncio
-
-        async def process_image(item):
-            if item.get('photo_url'):
-                try:
-                    item['photo_url'] = await local_or_proxy_photo_url(
-                        item['photo_url'],
-                        username,
-                        platform_ftp,
-                        mode='download',
-                        photo_owner=item['username'],
-                        page=page,
-                        ftp_path=ftp_path,
-                    )
-                except Exception:
-                    pass
-
-        await asyncio.gather(*(process_image(item) for item in items))
-        return items
+        return await self.photos.process(items, username, page=page, ftp_path=ftp_path)
+
+    def _collecting(self):
+        """Pre-descarga de fotos durante el scroll sólo si este adapter procesa imágenes."""
+        return self.photos.collecting() if self.process_images else nullcontext()
 
     async def get_root_profile(self, username: str, image_base_path: Optional[str] = None) -> Dict[str, Any]:
         from src.scrapers.facebook.scraper import obtener_datos_usuario_facebook
@@ -368,7 +310,7 @@ class FacebookAdapter:
             return prof
         finally:
             if should_close:
-                await context.close()
+                await self._close_page(context, page)
 
     async def _list(self, username: str, lista: str, image_base_path: Optional[str] = None) -> List[Dict[str, Any]]:
         from src.scrapers.facebook.scraper import (
@@ -389,8 +331,8 @@ class FacebookAdapter:
                 logger.warning("list.unsupported platform=%s type=%s username=%s", self.platform, lista, username)
                 return []
 
-            rows = await fetcher(page, perfil_url, username)
-            platform_ftp = f"red_{self.platform}"
+            with self._collecting():
+                rows = await fetcher(page, perfil_url, username)
             
             # Prepare ftp_path
             ftp_path = image_base_path if image_base_path else None
@@ -405,7 +347,7 @@ class FacebookAdapter:
             return await self._maybe_process_images(out, username, page, image_base_path=image_base_path)
         finally:
             if should_close:
-                await context.close()
+                await self._close_page(context, page)
 
     async def get_followers(self, username: str, max_photos: int = 5, image_base_path: Optional[str] = None) -> List[Dict[str, Any]]:
         return await self._list(username, 'followers', image_base_path)
@@ -425,7 +367,8 @@ class FacebookAdapter:
         try:
             logger.info("list.start platform=%s type=photo_reactors username=%s ctx=%s", self.platform, username, id(context))
             perfil_url = _profile_url(self.platform, username)
-            rows = await scrap_reacciones_fotos(page, perfil_url, username, max_fotos=max_photos, incluir_comentarios=include_comment_reactions)
+            with self._collecting():
+                rows = await scrap_reacciones_fotos(page, perfil_url, username, max_fotos=max_photos, incluir_comentarios=include_comment_reactions)
 
             out: List[Dict[str, Any]] = []
             for r in rows:
@@ -435,7 +378,7 @@ class FacebookAdapter:
             return await self._maybe_process_images(out, username, page, image_base_path=image_base_path)
         finally:
             if should_close:
-                await context.close()
+                await self._close_page(context, page)
 
     async def get_photo_commenters(self, username: str, max_photos: int = 5, image_base_path: Optional[str] = None) -> List[Dict[str, Any]]:
         """Devuelve perfiles que comentaron en las últimas fotos públicas del usuario.
@@ -446,7 +389,8 @@ class FacebookAdapter:
         try:
             logger.info("list.start platform=%s type=photo_commenters username=%s ctx=%s", self.platform, username, id(context))
             perfil_url = _profile_url(self.platform, username)
-            rows = await scrap_comentarios_fotos(page, perfil_url, username, max_fotos=max_photos)
+            with self._collecting():
+                rows = await scrap_comentarios_fotos(page, perfil_url, username, max_fotos=max_photos)
 
             out: List[Dict[str, Any]] = []
             for r in rows:
@@ -456,26 +400,34 @@ class FacebookAdapter:
             return await self._maybe_process_images(out, username, page, image_base_path=image_base_path)
         finally:
             if should_close:
-                await context.close()
+                await self._close_page(context, page)
 
 
 class XAdapter:
     platform = 'x'
 
-    def __init__(self, browser: Browser, tenant: Optional[str] = None, storage_state: Optional[Any] = None):
+    def __init__(self, browser: Browser, tenant: Optional[str] = None, storage_state: Optional[Any] = None, account_id: Optional[int] = None):
         self.browser = browser
         self.tenant = tenant
         self.storage_state = storage_state
+        self.account_id = account_id
+        self.photos = PhotoPipeline(f"red_{self.platform}")
 
     async def _new_page(self):
-        context = await self.browser.new_context(storage_state=self.storage_state, **CONTEXT_OPTS)
-        page = await context.new_page()
+        context, page = await _open_context_page(self.browser, self.storage_state, self.account_id)
         try:
-            logger.info("ctx.open platform=%s tenant=%s ctx=%s", self.platform, self.tenant, id(context))
+            logger.info("ctx.open platform=%s tenant=%s ctx=%s account_id=%s", self.platform, self.tenant, id(context), self.account_id)
         except Exception:
             pass
         return context, page
 
+    async def _close_page(self, context, page):
+        await _close_context_page(context, page, self.account_id)
+
+    async def close(self) -> Dict[str, Any]:
+        """Fin del trabajo: detiene el pipeline de fotos y devuelve sus métricas."""
+        return await self.photos.aclose()
+
     async def get_root_profile(self, username: str, image_base_path: Optional[str] = None) -> Dict[str, Any]:
         from src.scrapers.x.utils import obtener_nombre_usuario_x, obtener_foto_perfil_x
         context, page = await self._new_page()
@@ -510,7 +462,7 @@ class XAdapter:
                 )
             return prof
         finally:
-            await context.close()
+            await self._close_page(context, page)
 
     async def _list(self, username: str, list_suffix: str, image_base_path: Optional[str] = None) -> List[Dict[str, Any]]:
         from src.scrapers.x.scraper import extraer_usuarios_lista
@@ -521,8 +473,8 @@ class XAdapter:
             list_url = normalize_input_url('x', f"{perfil_url.rstrip('/')}/{list_suffix}")
             await page.goto(list_url)
             await page.wait_for_timeout(3000)
-            rows = await extraer_usuarios_lista(page, tipo_lista=list_suffix)
-            platform_ftp = f"red_{self.platform}"
+            with self.photos.collecting():
+                rows = await extraer_usuarios_lista(page, tipo_lista=list_suffix)
             
             # Prepare ftp_path for list items
             ftp_path = image_base_path if image_base_path else None
@@ -534,30 +486,12 @@ class XAdapter:
                 item = _map_user_item_to_profile(self.platform, r)
                 out.append(item)
             
-            # Process images in parallel
-            import asyncio
-            
-            async def process_image(profile_item):
-                if profile_item.get('photo_url'):
-                    try:
-                        profile_item['photo_url'] = await local_or_proxy_photo_url(
-                            profile_item['photo_url'], 
-                            username, 
-                            platform_ftp, 
-                            mode='download', 
-                            photo_owner=profile_item['username'], 
-                            page=page,
-                            ftp_path=ftp_path
-                        )
-                    except Exception as e:
-                        logger.warning(f"Failed to process image for {profile_item.get('username')}: {e}")
-
-            if out:
-                await asyncio.gather(*(process_image(item) for item in out))
+            # Fotos con concurrencia acotada (las vistas durante el scroll ya están pre-descargadas)
+            await self.photos.process(out, username, page=page, ftp_path=ftp_path)
 
             return out
         finally:
-            await context.close()
+            await self._close_page(context, page)
 
     async def get_followers(self, username: str, max_photos: int = 5, image_base_path: Optional[str] = None) -> List[Dict[str, Any]]:
         return await self._list(username, 'followers', image_base_path)
@@ -569,9 +503,9 @@ class XAdapter:
         return []
 
 
-def get_adapter(platform: str, browser: Browser, tenant: Optional[str] = None, process_images: bool = True, storage_state: Optional[Any] = None):
+def get_adapter(platform: str, browser: Browser, tenant: Optional[str] = None, process_images: bool = True, storage_state: Optional[Any] = None, account_id: Optional[int] = None):
     if platform == 'instagram':
-        return InstagramAdapter(browser, tenant, storage_state=storage_state)
+        return InstagramAdapter(browser, tenant, storage_state=storage_state, account_id=account_id)
     if platform == 'facebook':
-        return FacebookAdapter(browser, tenant, process_images=process_images, storage_state=storage_state)
-    return XAdapter(browser, tenant, storage_state=storage_state)
+        return FacebookAdapter(browser, tenant, process_images=process_images, storage_state=storage_state, account_id=account_id)
+    return XAdapter(browser, tenant, storage_state=storage_state, account_id=account_id)
@@ -1,8 +1,12 @@
 from __future__ import annotations
+from array import array
 from dataclasses import dataclass, field
 from typing import Dict, Tuple, Set, List, Optional, Iterable, Any
+import sys
 import time
 
+from src.utils.thumbnails import thumbnail_url
+
 RelationTuple = Tuple[str, str, str, str]  # (platform, source_username, target_username, type)
 ProfileKey = Tuple[str, str]
 
@@ -53,37 +57,135 @@ class ProfileAccum:
             self.photo_url = other.photo_url
         self.sources |= other.sources
 
-@dataclass
+# Códigos de tipo de relación para las aristas (3 bits)
+_REL_NAMES: Tuple[str, ...] = tuple(sorted(RELATION_TYPES))
+_REL_CODES: Dict[str, int] = {name: code for code, name in enumerate(_REL_NAMES)}
+
+
+class _ProfileRec:
+    """Perfil acumulado: ``sources`` es una máscara de bits sobre ``Aggregator._sources``."""
+    __slots__ = ('full_name', 'profile_url', 'photo_url', 'sources')
+
+    def __init__(self, full_name: Optional[str], profile_url: Optional[str],
+                 photo_url: Optional[str], sources: int):
+        self.full_name = full_name
+        self.profile_url = profile_url
+        self.photo_url = photo_url
+        self.sources = sources
+
+
 class Aggregator:
-    profiles: Dict[ProfileKey, ProfileAccum] = field(default_factory=dict)
-    relations: Set[RelationTuple] = field(default_factory=set)
-    roots: List[ProfileKey] = field(default_factory=list)
-    warnings: List[Dict[str, Any]] = field(default_factory=list)
-    started_at: float = field(default_factory=time.time)
+    """Acumula perfiles y relaciones de varios roots con ids enteros.
+
+    Cada (platform, username) se interna una vez en ``_ids`` y a partir de ahí
+    todo se guarda por id: perfiles en registros con ``__slots__`` (fuentes como
+    máscara de bits), aristas en ``array`` (origen, destino, código de tipo) y la
+    deduplicación de aristas en un set de enteros. ``build_payload`` mantiene el
+    contrato de schema v2.
+    """
 
+    def __init__(self) -> None:
+        self.roots: List[ProfileKey] = []
+        self.warnings: List[Dict[str, Any]] = []
+        self.started_at: float = time.time()
+        # Interning: platform -> username -> id; id -> username / código de plataforma
+        self._ids: Dict[str, Dict[str, int]] = {}
+        self._names: List[str] = []
+        self._platforms: List[str] = []
+        self._platform_codes: Dict[str, int] = {}
+        self._platform_of = array('B')
+        # Perfil por id (None si el id sólo aparece en relaciones) y orden de alta (el del payload)
+        self._recs: List[Optional[_ProfileRec]] = []
+        self._order = array('I')
+        # Fuentes: bit i de la máscara = self._sources[i]
+        self._sources: List[ProfileKey] = []
+        self._source_bits: Dict[ProfileKey, int] = {}
+        # Aristas
+        self._edge_src = array('I')
+        self._edge_tgt = array('I')
+        self._edge_type = array('B')
+        self._edge_seen: Set[int] = set()
+
+    # --------------------------- interning ---------------------------
+    def _intern(self, platform: str, username: str) -> int:
+        by_user = self._ids.get(platform)
+        if by_user is None:
+            platform = sys.intern(platform)
+            by_user = self._ids[platform] = {}
+            self._platform_codes[platform] = len(self._platforms)
+            self._platforms.append(platform)
+        pid = by_user.get(username)
+        if pid is None:
+            pid = len(self._names)
+            by_user[username] = pid
+            self._names.append(username)
+            self._platform_of.append(self._platform_codes[platform])
+            self._recs.append(None)
+        return pid
+
+    def _source_mask(self, sources: Iterable[ProfileKey]) -> int:
+        if len(sources) == 1:
+            # Caso habitual: una sola fuente (el root que se está scrapeando)
+            for key in sources:
+                bit = self._source_bits.get(key)
+                if bit is not None:
+                    return 1 << bit
+        mask = 0
+        for key in sources:
+            bit = self._source_bits.get(key)
+            if bit is None:
+                bit = self._source_bits[key] = len(self._sources)
+                self._sources.append(key)
+            mask |= 1 << bit
+        return mask
+
+    # --------------------------- ingesta ---------------------------
     def add_root(self, p: ProfileAccum):
+        self.add_profile(p)
         key = (p.platform, p.username)
-        if key not in self.profiles:
-            self.profiles[key] = p
-        else:
-            self.profiles[key].merge(p)
         if key not in self.roots:
             self.roots.append(key)
 
     def add_profile(self, p: ProfileAccum):
-        key = (p.platform, p.username)
-        if key in self.profiles:
-            self.profiles[key].merge(p)
-        else:
-            self.profiles[key] = p
+        pid = self._intern(p.platform, p.username)
+        mask = self._source_mask(p.sources)
+        rec = self._recs[pid]
+        if rec is None:
+            self._recs[pid] = _ProfileRec(p.full_name, p.profile_url, p.photo_url, mask)
+            self._order.append(pid)
+            return
+        rec.full_name = merge_full_name(rec.full_name, p.full_name)
+        if not rec.profile_url and p.profile_url:
+            rec.profile_url = p.profile_url
+        if not rec.photo_url and p.photo_url:
+            rec.photo_url = p.photo_url
+        rec.sources |= mask
 
     def add_relation(self, platform: str, source: str, target: str, rel_type: str):
-        if rel_type not in RELATION_TYPES:
+        code = _REL_CODES.get(rel_type)
+        if code is None:
             return
         if source == target:
             return
-        self.relations.add((platform, source, target, rel_type))
+        src = self._intern(platform, source)
+        tgt = self._intern(platform, target)
+        edge = (((src << 32) | tgt) << 3) | code
+        if edge in self._edge_seen:
+            return
+        self._edge_seen.add(edge)
+        self._edge_src.append(src)
+        self._edge_tgt.append(tgt)
+        self._edge_type.append(code)
+
+    @property
+    def profile_count(self) -> int:
+        return len(self._order)
+
+    @property
+    def relation_count(self) -> int:
+        return len(self._edge_src)
 
+    # --------------------------- salida ---------------------------
     def build_payload(self, *, roots_requested: int) -> Dict[str, Any]:
         """Build final payload according to documented schema v2.
         Contract (F1):
@@ -91,20 +193,36 @@ class Aggregator:
           profiles[i].sources: ["platform:root_username", ...]
           relations: items with flat keys (platform, source, target, type)
         """
+        names = self._names
+        platforms = [self._platforms[code] for code in self._platform_of]
         # Root profile identifiers preserving request order
-        root_profiles_ids: List[str] = [f"{p}:{u}" for (p, u) in self.roots if (p, u) in self.profiles]
+        root_profiles_ids: List[str] = []
+        for (p, u) in self.roots:
+            pid = self._ids.get(p, {}).get(u)
+            if pid is not None and self._recs[pid] is not None:
+                root_profiles_ids.append(f"{p}:{u}")
+        # "platform:username" de cada fuente, calculado una vez por máscara distinta
+        source_ids = [f"{p}:{u}" for (p, u) in self._sources]
+        source_order = sorted(range(len(self._sources)), key=self._sources.__getitem__)
+        sources_by_mask: Dict[int, List[str]] = {}
         # Profiles list
         profiles_out: List[Dict[str, Any]] = []
-        for acc in self.profiles.values():
-            profiles_out.append(_profile_to_dict(acc))
+        for pid in self._order:
+            rec = self._recs[pid]
+            sources = sources_by_mask.get(rec.sources)
+            if sources is None:
+                sources = sources_by_mask[rec.sources] = [
+                    source_ids[bit] for bit in source_order if rec.sources >> bit & 1
+                ]
+            profiles_out.append(_profile_to_dict(rec, platforms[pid], names[pid], sources))
         # Relations list
         relations_out: List[Dict[str, Any]] = []
-        for (platform, src, tgt, typ) in self.relations:
+        for src, tgt, code in zip(self._edge_src, self._edge_tgt, self._edge_type):
             relations_out.append({
-                "platform": platform,
-                "source": src,
-                "target": tgt,
-                "type": typ,
+                "platform": platforms[src],
+                "source": names[src],
+                "target": names[tgt],
+                "type": _REL_NAMES[code],
             })
         roots_processed = len(root_profiles_ids)
         return {
@@ -126,14 +244,17 @@ def _iso_now() -> str:
     import datetime
     return datetime.datetime.utcnow().replace(microsecond=0).isoformat() + 'Z'
 
-def _profile_to_dict(acc: ProfileAccum) -> Dict[str, Any]:
+def _profile_to_dict(rec: _ProfileRec, platform: str, username: str, sources: List[str]) -> Dict[str, Any]:
+    # photo_url -> miniatura WebP para el grafo; el original queda en photo_url_full
     return {
-        "platform": acc.platform,
-        "username": acc.username,
-        "full_name": acc.full_name,
-        "profile_url": acc.profile_url,
-        "photo_url": acc.photo_url,
-        "sources": [f"{p}:{u}" for (p, u) in sorted(acc.sources)],
+        "platform": platform,
+        "username": username,
+        "full_name": rec.full_name,
+        "profile_url": rec.profile_url,
+        "photo_url": thumbnail_url(rec.photo_url),
+        "photo_url_full": rec.photo_url,
+        # Copia: perfiles con las mismas fuentes comparten la lista calculada
+        "sources": list(sources),
     }
 
 # Helper to create ProfileAccum from raw dict
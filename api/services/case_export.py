@@ -0,0 +1,151 @@
+"""Export de un caso leído directamente de los esquemas ``red_*``.
+
+``POST /export`` obliga al frontend a reenviar el payload que ya descargó. Aquí el
+servidor resuelve las identidades analizadas del caso (``casos.analisis_identidad``
+-> ``id_perfil_scraped``) y lee relaciones, comentarios y reacciones con un cursor
+con nombre (server-side): PostgreSQL entrega ``EXPORT_DB_FETCH_ROWS`` filas por
+viaje y Python nunca tiene el resultado completo. Las filas alimentan
+``export_chunks`` (xlsx / csv / parquet) con las mismas columnas que ``/export``.
+
+Uso:
+    conn = get_conn()
+    roots = resolve_case_roots(conn, id_caso, [id_identidad])
+    chunks = export_chunks(iter_case_rows(conn, roots), 'csv')  # cierra conn al terminar
+"""
+from __future__ import annotations
+
+import logging
+import os
+import secrets
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from psycopg2 import extensions
+
+from ..deps import SCHEMA_BY_PLATFORM
+from .export_stream import asociado_label
+from src.utils.url import extract_username_from_url
+
+logger = logging.getLogger(__name__)
+
+EXPORT_DB_FETCH_ROWS = int(os.getenv('EXPORT_DB_FETCH_ROWS') or 5000)
+
+REL_LABELS: Dict[str, str] = {
+    'follower': 'seguidor',
+    'following': 'seguido',
+    'followed': 'seguido',
+    'friend': 'amigo',
+    'commented': 'comentó',
+    'reacted': 'reaccionó',
+}
+
+# (perfil objetivo, tipo, username, full_name, profile_url) de las raíces en %(roots)s.
+# Comentarios/reacciones con DISTINCT: un mismo perfil comenta varios posts.
+_CASE_ROWS_SQL = """
+    SELECT o.username, r.rel_type::text, p.username, p.full_name, p.profile_url
+    FROM {schema}.relationships r
+    JOIN {schema}.profiles o ON o.id = r.owner_profile_id
+    JOIN {schema}.profiles p ON p.id = r.related_profile_id
+    WHERE r.owner_profile_id = ANY(%(roots)s)
+    UNION ALL
+    SELECT DISTINCT o.username, 'commented', p.username, p.full_name, p.profile_url
+    FROM {schema}.comments c
+    JOIN {schema}.posts po ON po.id = c.post_id
+    JOIN {schema}.profiles o ON o.id = po.owner_profile_id
+    JOIN {schema}.profiles p ON p.id = c.commenter_profile_id
+    WHERE po.owner_profile_id = ANY(%(roots)s)
+    UNION ALL
+    SELECT DISTINCT o.username, 'reacted', p.username, p.full_name, p.profile_url
+    FROM {schema}.reactions rx
+    JOIN {schema}.posts po ON po.id = rx.post_id
+    JOIN {schema}.profiles o ON o.id = po.owner_profile_id
+    JOIN {schema}.profiles p ON p.id = rx.reactor_profile_id
+    WHERE po.owner_profile_id = ANY(%(roots)s)
+"""
+
+
+def resolve_case_roots(conn, id_caso: int, identidades: Optional[Sequence[int]] = None) -> Dict[str, List[int]]:
+    """
+    Perfiles raíz (``red_<plataforma>.profiles.id``) de las identidades del caso.
+
+    Usa ``id_perfil_scraped``; si falta, busca por el username de ``usuario_o_url``.
+    Sin ``identidades`` toma todas las del caso.
+
+    Returns:
+        {'instagram': [12, 40], 'x': [7]}  (plataformas sin raíces se omiten)
+    """
+    query = """
+        SELECT ai.id_identidad, ai.id_perfil_scraped, i.plataforma, i.usuario_o_url
+        FROM casos.analisis_identidad ai
+        JOIN entidades.identidades_digitales i ON i.id_identidad = ai.id_identidad
+        WHERE ai.idcaso = %s
+    """
+    params: List[object] = [id_caso]
+    if identidades:
+        query += " AND ai.id_identidad = ANY(%s)"
+        params.append(list(identidades))
+    with conn.cursor() as cur:
+        cur.execute(query, params)
+        rows = cur.fetchall()
+
+        by_platform: Dict[str, Tuple[List[int], List[str]]] = {}
+        for row in rows:
+            plataforma = row['plataforma']
+            if plataforma not in SCHEMA_BY_PLATFORM:
+                continue
+            ids, usernames = by_platform.setdefault(plataforma, ([], []))
+            if row['id_perfil_scraped']:
+                ids.append(row['id_perfil_scraped'])
+            else:
+                usernames.append(extract_username_from_url(plataforma, row['usuario_o_url']) or row['usuario_o_url'])
+
+        roots: Dict[str, List[int]] = {}
+        for plataforma, (ids, usernames) in by_platform.items():
+            if usernames:
+                schema = SCHEMA_BY_PLATFORM[plataforma]
+                cur.execute(
+                    f"SELECT id FROM {schema}.profiles WHERE platform = %s AND username = ANY(%s)",
+                    (plataforma, usernames),
+                )
+                ids.extend(r['id'] for r in cur.fetchall())
+            if ids:
+                roots[plataforma] = sorted(set(ids))
+    return roots
+
+
+def iter_case_rows(conn, roots: Dict[str, List[int]]) -> Iterator[Tuple[str, str, str]]:
+    """
+    Filas (Perfil objetivo, Tipo de relacion, Perfiles asociados) leídas con un cursor
+    con nombre por plataforma. Devuelve ``conn`` al pool al terminar o si se abandona.
+    """
+    total = 0
+    try:
+        for plataforma, profile_ids in roots.items():
+            schema = SCHEMA_BY_PLATFORM[plataforma]
+            # Cursor de tuplas (no RealDictCursor): sin un dict por fila
+            cur = conn.cursor(name=f"export_{secrets.token_hex(4)}", cursor_factory=extensions.cursor)
+            cur.itersize = EXPORT_DB_FETCH_ROWS
+            try:
+                cur.execute(_CASE_ROWS_SQL.format(schema=schema), {'roots': profile_ids})
+                for objetivo, rel_type, username, full_name, profile_url in cur:
+                    total += 1
+                    yield objetivo, REL_LABELS.get((rel_type or '').lower(), rel_type), asociado_label(username, full_name, profile_url)
+            finally:
+                cur.close()
+    finally:
+        logger.info(f"case_export.rows platforms={','.join(roots)} rows={total}")
+        conn.close()
+
+
+def case_export_filename(id_caso: int, fmt_ext: str, id_identidad: Optional[int] = None) -> str:
+    if id_identidad is not None:
+        return f"export_caso_{id_caso}_identidad_{id_identidad}.{fmt_ext}"
+    return f"export_caso_{id_caso}.{fmt_ext}"
+
+
+__all__ = [
+    'EXPORT_DB_FETCH_ROWS',
+    'REL_LABELS',
+    'case_export_filename',
+    'iter_case_rows',
+    'resolve_case_roots',
+]
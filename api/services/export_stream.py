@@ -0,0 +1,201 @@
+"""Motor de exportación en streaming (XLSX / CSV / Parquet).
+
+``/export`` construía un DataFrame de pandas, luego un workbook openpyxl en un
+``BytesIO`` y recién entonces lo enviaba: tres copias completas en memoria. Aquí
+las filas se generan de una en una y van directo al escritor del formato:
+
+- ``csv``: se codifica por bloques mientras se envía (sin archivo intermedio).
+- ``xlsx``: openpyxl en modo write-only (cada fila se vuelca al XML temporal del
+  worksheet) a un archivo temporal que luego se envía por trozos.
+- ``parquet``: ``pyarrow.parquet.ParquetWriter`` por lotes de ``_PARQUET_BATCH_ROWS``
+  (requiere pyarrow).
+
+La memoria queda acotada por el tamaño de bloque/lote, no por la cantidad de filas.
+
+Uso:
+    rows = relation_rows(perfiles)
+    chunks = export_chunks(rows, 'xlsx', EXPORT_COLUMNS)
+    return StreamingResponse(chunks, media_type=EXPORT_FORMATS['xlsx'][0], ...)
+"""
+from __future__ import annotations
+
+import csv
+import io
+import tempfile
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+EXPORT_COLUMNS: Tuple[str, ...] = ("Perfil objetivo", "Tipo de relacion", "Perfiles asociados")
+
+# formato -> (media type, extensión)
+EXPORT_FORMATS: Dict[str, Tuple[str, str]] = {
+    'xlsx': ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", 'xlsx'),
+    'csv': ("text/csv; charset=utf-8", 'csv'),
+    'parquet': ("application/vnd.apache.parquet", 'parquet'),
+}
+
+_FILE_CHUNK_BYTES = 256 * 1024
+_CSV_FLUSH_ROWS = 2000
+_PARQUET_BATCH_ROWS = 65536
+
+_OBJETIVO_KEYS = ("username", "nombre_usuario", "nombre_completo", "full_name", "profile_url", "url_usuario", "updated_at")
+
+
+def _get(obj: Any, key: str) -> Any:
+    if isinstance(obj, dict):
+        return obj.get(key)
+    return getattr(obj, key, None)
+
+
+def objetivo_label(objetivo: Optional[Dict[str, Any]]) -> str:
+    """Identificador del perfil objetivo: username, o nombre / URL si falta."""
+    objetivo = objetivo or {}
+    for key in _OBJETIVO_KEYS:
+        if objetivo.get(key):
+            return str(objetivo.get(key))
+    return ""
+
+
+def asociado_label(username: Optional[str], full_name: Optional[str], profile_url: Optional[str]) -> str:
+    """"username (nombre)", o el nombre / URL si falta el username."""
+    if username:
+        # Add name in parentheses if available
+        if full_name and full_name != username:
+            return f"{username} ({full_name})"
+        return username
+    return full_name or profile_url or ""
+
+
+def _asociado(item: Dict[str, Any]) -> str:
+    return asociado_label(
+        item.get("username") or item.get("username_usuario") or "",
+        item.get("full_name") or item.get("nombre_usuario") or "",
+        item.get("profile_url") or item.get("link_usuario") or "",
+    )
+
+
+def relation_rows(perfiles: Iterable[Any]) -> Iterator[Tuple[str, str, str]]:
+    """(Perfil objetivo, Tipo de relacion, Perfiles asociados) por cada relacionado, en orden."""
+    for perfil in perfiles:
+        objetivo = _get(perfil, 'perfil_objetivo') or _get(perfil, 'objetivo') or {}
+        relacionados = _get(perfil, 'perfiles_relacionados') or _get(perfil, 'relacionados') or []
+        objetivo_str = objetivo_label(objetivo) or "perfil"
+        for item in relacionados:
+            tipo = item.get("tipo_de_relacion") or item.get("tipo de relacion") or item.get("tipo") or ""
+            yield objetivo_str, tipo, _asociado(item)
+
+
+def export_filename(perfiles: Sequence[Any], fmt: str) -> str:
+    """``export_multi.<ext>`` con varios perfiles, si no ``export_<objetivo>.<ext>``."""
+    ext = EXPORT_FORMATS[fmt][1]
+    if len(perfiles) > 1:
+        return f"export_multi.{ext}"
+    objetivo = (_get(perfiles[0], 'perfil_objetivo') or _get(perfiles[0], 'objetivo')) if perfiles else None
+    return f"export_{objetivo_label(objetivo) or 'perfil'}.{ext}"
+
+
+def _iter_file(fileobj) -> Iterator[bytes]:
+    """Lee ``fileobj`` desde el inicio por trozos y lo cierra al terminar (o si se corta la respuesta)."""
+    try:
+        fileobj.seek(0)
+        while True:
+            chunk = fileobj.read(_FILE_CHUNK_BYTES)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        fileobj.close()
+
+
+def iter_csv(rows: Iterable[Sequence[Any]], header: Sequence[str]) -> Iterator[bytes]:
+    """CSV UTF-8 con BOM (Excel detecta la codificación) en bloques de ``_CSV_FLUSH_ROWS`` filas."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    yield b'\xef\xbb\xbf' + buffer.getvalue().encode('utf-8')
+    buffer.seek(0)
+    buffer.truncate()
+    pending = 0
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= _CSV_FLUSH_ROWS:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if pending:
+        yield buffer.getvalue().encode('utf-8')
+
+
+def write_xlsx(rows: Iterable[Sequence[Any]], header: Sequence[str], fileobj, sheet_name: str = "export") -> int:
+    """Workbook write-only: las filas no quedan en memoria. Devuelve la cantidad de filas."""
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=sheet_name)
+    ws.append(list(header))
+    count = 0
+    for row in rows:
+        ws.append(list(row))
+        count += 1
+    wb.save(fileobj)
+    return count
+
+
+def write_parquet(rows: Iterable[Sequence[Any]], header: Sequence[str], fileobj) -> int:
+    """Parquet (todas las columnas string) escrito por lotes. Devuelve la cantidad de filas."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ValueError("El formato parquet requiere pyarrow instalado") from e
+
+    schema = pa.schema([(name, pa.string()) for name in header])
+    count = 0
+    columns: List[List[Any]] = [[] for _ in header]
+    with pq.ParquetWriter(fileobj, schema, compression='zstd') as writer:
+        for row in rows:
+            for col, value in zip(columns, row):
+                col.append(value)
+            count += 1
+            if len(columns[0]) >= _PARQUET_BATCH_ROWS:
+                writer.write_table(pa.Table.from_arrays([pa.array(c, pa.string()) for c in columns], schema=schema))
+                columns = [[] for _ in header]
+        if columns[0] or count == 0:
+            writer.write_table(pa.Table.from_arrays([pa.array(c, pa.string()) for c in columns], schema=schema))
+    return count
+
+
+def export_chunks(rows: Iterable[Sequence[Any]], fmt: str, header: Sequence[str] = EXPORT_COLUMNS) -> Iterator[bytes]:
+    """
+    Bytes del export en ``fmt``. CSV se genera al consumirse; XLSX/Parquet se escriben
+    aquí (los errores salen antes de empezar la respuesta) a un temporal que se envía por trozos.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Formato no soportado: {fmt} (use {', '.join(EXPORT_FORMATS)})")
+    if fmt == 'csv':
+        return iter_csv(rows, header)
+    tmp = tempfile.TemporaryFile()
+    try:
+        if fmt == 'xlsx':
+            write_xlsx(rows, header, tmp)
+        else:
+            write_parquet(rows, header, tmp)
+    except BaseException:
+        tmp.close()
+        raise
+    return _iter_file(tmp)
+
+
+__all__ = [
+    'EXPORT_COLUMNS',
+    'EXPORT_FORMATS',
+    'asociado_label',
+    'export_chunks',
+    'export_filename',
+    'iter_csv',
+    'objetivo_label',
+    'relation_rows',
+    'write_parquet',
+    'write_xlsx',
+]
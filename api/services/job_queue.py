@@ -0,0 +1,555 @@
+"""Cola de trabajos de scraping compartida entre el API y los procesos worker.
+
+El API encola (``enqueue``) y los procesos de ``python -m api.worker`` reclaman
+trabajos (``claim``) cada uno con su propio event loop y navegadores.
+
+Backends (env ``SCR4PER_JOB_BACKEND``):
+
+``postgres`` (default) - tabla ``entidades.jobs`` (db/migrations/2026-10-16_add_jobs_queue.sql).
+    Los workers arriendan filas con ``FOR UPDATE SKIP LOCKED`` (mismo patrón que
+    ``SessionManager.checkout_account``) y renuevan ``lease_expires_at`` con
+    heartbeats; si un worker muere, el lease vence y otro lo toma en segundos.
+    Un índice único parcial sobre ``dedupe_key`` garantiza un solo trabajo activo
+    por identidad. Los eventos SSE de los workers viajan por ``pg_notify``.
+
+``local`` - spool en disco (``data/queue``), un archivo JSON por trabajo, para un
+    solo host sin la migración. Reclamar es un ``os.rename`` de ``pending/`` a
+    ``running/`` (atómico en el mismo filesystem).
+
+        data/queue/pending/<prio>-<ts>-<id>.json
+        data/queue/running/<id>.json     (incluye pid del worker dueño)
+        data/queue/failed/<id>.json
+        data/queue/events/<ts>-<id>.json (eventos SSE emitidos por workers)
+
+Modo de ejecución (env ``SCR4PER_JOB_MODE``):
+ - ``inline`` (default): BackgroundTasks dentro del proceso uvicorn (comportamiento histórico).
+ - ``queue``: el API sólo encola; los workers ejecutan.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import secrets
+import time
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Union
+
+from sqlalchemy import and_, or_, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.sql import func
+
+from db.models import Job as JobRow, JobStatus
+from paths import DATA_DIR
+from ..db import get_direct_conn, get_sqlalchemy_session
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUE_DIR = os.path.join(DATA_DIR, 'queue')
+_SUBDIRS = ('pending', 'running', 'failed', 'events')
+
+DEFAULT_LEASE_S = 30.0
+EVENTS_CHANNEL = 'scr4per_events'
+_NOTIFY_MAX_BYTES = 7900  # límite de payload de NOTIFY: 8000 bytes
+
+# Singleton instance
+_job_queue_instance: Optional[Union['LocalJobQueue', 'PostgresJobQueue']] = None
+
+
+def job_mode() -> str:
+    mode = (os.getenv('SCR4PER_JOB_MODE') or 'inline').strip().lower()
+    return mode if mode in ('inline', 'queue') else 'inline'
+
+
+def job_backend() -> str:
+    backend = (os.getenv('SCR4PER_JOB_BACKEND') or 'postgres').strip().lower()
+    return backend if backend in ('postgres', 'local') else 'postgres'
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    payload: Dict[str, Any]
+    priority: int = 100
+    dedupe_key: Optional[str] = None
+    attempts: int = 0
+    enqueued_at: float = field(default_factory=time.time)
+    claimed_at: Optional[float] = None
+    worker: Optional[str] = None
+    pid: Optional[int] = None
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'payload': self.payload,
+            'priority': self.priority,
+            'dedupe_key': self.dedupe_key,
+            'attempts': self.attempts,
+            'enqueued_at': self.enqueued_at,
+            'claimed_at': self.claimed_at,
+            'worker': self.worker,
+            'pid': self.pid,
+            'error': self.error,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Job':
+        return cls(**{k: data.get(k) for k in cls.__dataclass_fields__ if k in data})
+
+
+class LocalJobQueue:
+    """Cola de trabajos sobre un directorio spool (un host, N procesos)."""
+
+    heartbeat_interval_s = 0.0  # Sin leases: la vida del pid marca a los huérfanos
+
+    def __init__(self, root: str = JOB_QUEUE_DIR, max_attempts: int = 3):
+        self.root = root
+        self.max_attempts = max_attempts
+        for sub in _SUBDIRS:
+            os.makedirs(os.path.join(root, sub), exist_ok=True)
+
+    def _path(self, sub: str, name: str) -> str:
+        return os.path.join(self.root, sub, name)
+
+    def _write_atomic(self, sub: str, name: str, data: Dict[str, Any]) -> None:
+        tmp = self._path(sub, f".{name}.tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, default=str)
+        os.replace(tmp, self._path(sub, name))
+
+    # ------------------------------ Producer ---------------------------------
+    def enqueue(self, kind: str, payload: Dict[str, Any], priority: int = 100, dedupe_key: Optional[str] = None) -> Optional[str]:
+        """Encola y devuelve el id, o None si ya hay un trabajo activo con ``dedupe_key``."""
+        if dedupe_key and self._active_dedupe_key(dedupe_key):
+            logger.info(f"job_queue.dedupe kind={kind} key={dedupe_key}")
+            return None
+        job = Job(id=secrets.token_hex(8), kind=kind, payload=payload, priority=priority, dedupe_key=dedupe_key)
+        self._write_pending(job)
+        logger.info(f"job_queue.enqueue id={job.id} kind={kind} priority={priority}")
+        return job.id
+
+    def _active_dedupe_key(self, dedupe_key: str) -> bool:
+        for sub in ('pending', 'running'):
+            for name in os.listdir(self._path(sub, '')):
+                if not name.endswith('.json') or name.startswith('.'):
+                    continue
+                try:
+                    with open(self._path(sub, name), 'r', encoding='utf-8') as f:
+                        if json.load(f).get('dedupe_key') == dedupe_key:
+                            return True
+                except Exception:
+                    continue
+        return False
+
+    def _write_pending(self, job: Job) -> None:
+        # Orden lexicográfico = prioridad asc, luego FIFO
+        name = f"{job.priority:05d}-{int(job.enqueued_at * 1000):015d}-{job.id}.json"
+        self._write_atomic('pending', name, job.to_dict())
+
+    # ------------------------------ Consumer ---------------------------------
+    def claim(self, worker: str) -> Optional[Job]:
+        """Reclama el siguiente trabajo pendiente o devuelve None si la cola está vacía."""
+        try:
+            names = sorted(n for n in os.listdir(self._path('pending', '')) if n.endswith('.json') and not n.startswith('.'))
+        except FileNotFoundError:
+            return None
+        for name in names:
+            job_id = name.rsplit('-', 1)[-1][:-len('.json')]
+            running = self._path('running', f"{job_id}.json")
+            try:
+                os.rename(self._path('pending', name), running)
+            except (FileNotFoundError, PermissionError):
+                continue  # otro worker lo ganó
+            try:
+                with open(running, 'r', encoding='utf-8') as f:
+                    job = Job.from_dict(json.load(f))
+            except Exception as e:
+                logger.error(f"job_queue.corrupt id={job_id} err={e}")
+                os.replace(running, self._path('failed', f"{job_id}.json"))
+                continue
+            job.attempts += 1
+            job.claimed_at = time.time()
+            job.worker = worker
+            job.pid = os.getpid()
+            self._write_atomic('running', f"{job.id}.json", job.to_dict())
+            logger.info(f"job_queue.claim id={job.id} kind={job.kind} worker={worker} attempt={job.attempts} waited_s={job.claimed_at - job.enqueued_at:.1f}")
+            return job
+        return None
+
+    def heartbeat(self, job: Job) -> bool:
+        return True
+
+    def complete(self, job: Job) -> None:
+        try:
+            os.remove(self._path('running', f"{job.id}.json"))
+        except FileNotFoundError:
+            pass
+        logger.info(f"job_queue.complete id={job.id} kind={job.kind} duration_s={time.time() - (job.claimed_at or time.time()):.1f}")
+
+    def fail(self, job: Job, error: str) -> None:
+        job.error = error[:2000]
+        running = self._path('running', f"{job.id}.json")
+        if job.attempts < self.max_attempts:
+            self._write_pending(job)
+            logger.warning(f"job_queue.retry id={job.id} kind={job.kind} attempt={job.attempts} err={job.error[:200]}")
+        else:
+            self._write_atomic('failed', f"{job.id}.json", job.to_dict())
+            logger.error(f"job_queue.failed id={job.id} kind={job.kind} attempts={job.attempts} err={job.error[:200]}")
+        try:
+            os.remove(running)
+        except FileNotFoundError:
+            pass
+
+    def requeue_orphans(self) -> int:
+        """Devuelve a pending los trabajos 'running' cuyo proceso worker ya no existe."""
+        count = 0
+        for name in os.listdir(self._path('running', '')):
+            if not name.endswith('.json') or name.startswith('.'):
+                continue
+            path = self._path('running', name)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    job = Job.from_dict(json.load(f))
+            except Exception:
+                continue
+            if job.pid and _pid_alive(job.pid):
+                continue
+            self.fail(job, f"worker pid={job.pid} died")
+            count += 1
+        if count:
+            logger.warning(f"job_queue.requeue_orphans count={count}")
+        return count
+
+    # ------------------------------- Events ----------------------------------
+    def publish_event(self, payload: Dict[str, Any]) -> None:
+        name = f"{int(time.time() * 1000):015d}-{secrets.token_hex(4)}.json"
+        self._write_atomic('events', name, payload)
+
+    def drain_events(self) -> List[Dict[str, Any]]:
+        events: List[Dict[str, Any]] = []
+        try:
+            names = sorted(n for n in os.listdir(self._path('events', '')) if n.endswith('.json') and not n.startswith('.'))
+        except FileNotFoundError:
+            return events
+        for name in names:
+            path = self._path('events', name)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    events.append(json.load(f))
+                os.remove(path)
+            except Exception:
+                continue
+        return events
+
+    # ------------------------------- Metrics ---------------------------------
+    def stats(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {'backend': 'local', 'mode': job_mode()}
+        oldest: Optional[float] = None
+        for sub in ('pending', 'running', 'failed'):
+            try:
+                names = [n for n in os.listdir(self._path(sub, '')) if n.endswith('.json') and not n.startswith('.')]
+            except FileNotFoundError:
+                names = []
+            out[sub] = len(names)
+            if sub == 'pending' and names:
+                try:
+                    oldest = min(os.path.getmtime(self._path(sub, n)) for n in names)
+                except OSError:
+                    oldest = None
+        out['oldest_pending_age_s'] = round(time.time() - oldest, 1) if oldest else 0.0
+        return out
+
+
+class PostgresJobQueue:
+    """Cola durable sobre ``entidades.jobs`` con leases, heartbeats, reintentos y prioridad."""
+
+    def __init__(self, *, lease_s: Optional[float] = None, max_attempts: int = 3):
+        self.lease_s = lease_s or float(os.getenv('JOB_LEASE_S') or DEFAULT_LEASE_S)
+        self.heartbeat_interval_s = self.lease_s / 3
+        self.max_attempts = max_attempts
+        self._listen_conn = None
+
+    @staticmethod
+    def _to_job(row: JobRow) -> Job:
+        return Job(
+            id=str(row.id),
+            kind=row.kind,
+            payload=row.payload,
+            priority=row.priority,
+            dedupe_key=row.dedupe_key,
+            attempts=row.attempts,
+            enqueued_at=row.enqueued_at.timestamp() if row.enqueued_at else time.time(),
+            claimed_at=time.time(),
+            worker=row.worker,
+            pid=os.getpid(),
+        )
+
+    # ------------------------------ Producer ---------------------------------
+    def enqueue(self, kind: str, payload: Dict[str, Any], priority: int = 100, dedupe_key: Optional[str] = None) -> Optional[str]:
+        """Encola y devuelve el id, o None si ya hay un trabajo activo con ``dedupe_key``."""
+        db = get_sqlalchemy_session()
+        try:
+            row = JobRow(
+                kind=kind,
+                payload=payload,
+                priority=priority,
+                dedupe_key=dedupe_key,
+                max_attempts=self.max_attempts,
+            )
+            db.add(row)
+            db.commit()
+            logger.info(f"job_queue.enqueue id={row.id} kind={kind} priority={priority}")
+            return str(row.id)
+        except IntegrityError:
+            # uq_jobs_active_dedupe: ya hay un trabajo pending/running para esta clave
+            db.rollback()
+            logger.info(f"job_queue.dedupe kind={kind} key={dedupe_key}")
+            return None
+        finally:
+            db.close()
+
+    # ------------------------------ Consumer ---------------------------------
+    def claim(self, worker: str) -> Optional[Job]:
+        """
+        Arrienda el siguiente trabajo: pendiente y listo, o en ejecución con el lease vencido
+        (worker caído). SKIP LOCKED deja que N workers desencolen sin bloquearse entre sí.
+        """
+        db = get_sqlalchemy_session()
+        try:
+            self._reap_exhausted(db)
+            row = db.query(JobRow).filter(
+                or_(
+                    and_(JobRow.status == JobStatus.PENDING, JobRow.run_after <= func.now()),
+                    and_(JobRow.status == JobStatus.RUNNING, JobRow.lease_expires_at < func.now()),
+                )
+            ).order_by(
+                JobRow.priority.asc(),
+                JobRow.id.asc()
+            ).with_for_update(
+                skip_locked=True
+            ).first()
+            if row is None:
+                db.commit()
+                return None
+            if row.status == JobStatus.RUNNING:
+                logger.warning(f"job_queue.lease_expired id={row.id} prev_worker={row.worker} attempt={row.attempts}")
+            row.status = JobStatus.RUNNING
+            row.attempts += 1
+            row.worker = worker
+            row.claimed_at = func.now()
+            row.heartbeat_at = func.now()
+            row.lease_expires_at = func.now() + timedelta(seconds=self.lease_s)
+            db.commit()
+            db.refresh(row)
+            job = self._to_job(row)
+            waited = (row.claimed_at - row.enqueued_at).total_seconds() if row.claimed_at and row.enqueued_at else 0.0
+            logger.info(f"job_queue.claim id={job.id} kind={job.kind} worker={worker} attempt={job.attempts} waited_s={waited:.1f}")
+            return job
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _reap_exhausted(self, db) -> int:
+        """Marca como fallidos los trabajos con lease vencido que ya agotaron sus intentos."""
+        count = db.query(JobRow).filter(
+            JobRow.status == JobStatus.RUNNING,
+            JobRow.lease_expires_at < func.now(),
+            JobRow.attempts >= JobRow.max_attempts,
+        ).update({
+            JobRow.status: JobStatus.FAILED,
+            JobRow.finished_at: func.now(),
+            JobRow.lease_expires_at: None,
+            JobRow.error: 'lease expired on last attempt',
+        }, synchronize_session=False)
+        if count:
+            logger.error(f"job_queue.reaped count={count}")
+        return count
+
+    def _update_owned(self, job: Job, values: Dict[Any, Any]) -> bool:
+        """Actualiza el trabajo sólo si este worker sigue siendo el dueño del lease."""
+        db = get_sqlalchemy_session()
+        try:
+            count = db.query(JobRow).filter(
+                JobRow.id == int(job.id),
+                JobRow.worker == job.worker,
+                JobRow.status == JobStatus.RUNNING,
+            ).update(values, synchronize_session=False)
+            db.commit()
+            return bool(count)
+        finally:
+            db.close()
+
+    def heartbeat(self, job: Job) -> bool:
+        """Renueva el lease; False si otro worker lo tomó (el lease venció)."""
+        ok = self._update_owned(job, {
+            JobRow.heartbeat_at: func.now(),
+            JobRow.lease_expires_at: func.now() + timedelta(seconds=self.lease_s),
+        })
+        if not ok:
+            logger.warning(f"job_queue.lease_lost id={job.id} worker={job.worker}")
+        return ok
+
+    def complete(self, job: Job) -> None:
+        self._update_owned(job, {
+            JobRow.status: JobStatus.DONE,
+            JobRow.finished_at: func.now(),
+            JobRow.lease_expires_at: None,
+        })
+        logger.info(f"job_queue.complete id={job.id} kind={job.kind} duration_s={time.time() - (job.claimed_at or time.time()):.1f}")
+
+    def fail(self, job: Job, error: str) -> None:
+        error = error[:2000]
+        if job.attempts < self.max_attempts:
+            backoff_s = 5 * (2 ** (job.attempts - 1))
+            self._update_owned(job, {
+                JobRow.status: JobStatus.PENDING,
+                JobRow.run_after: func.now() + timedelta(seconds=backoff_s),
+                JobRow.lease_expires_at: None,
+                JobRow.error: error,
+            })
+            logger.warning(f"job_queue.retry id={job.id} kind={job.kind} attempt={job.attempts} backoff_s={backoff_s} err={error[:200]}")
+        else:
+            self._update_owned(job, {
+                JobRow.status: JobStatus.FAILED,
+                JobRow.finished_at: func.now(),
+                JobRow.lease_expires_at: None,
+                JobRow.error: error,
+            })
+            logger.error(f"job_queue.failed id={job.id} kind={job.kind} attempts={job.attempts} err={error[:200]}")
+
+    def requeue_orphans(self) -> int:
+        """Devuelve a pending los trabajos cuyo lease venció (el worker dejó de latir)."""
+        db = get_sqlalchemy_session()
+        try:
+            self._reap_exhausted(db)
+            count = db.query(JobRow).filter(
+                JobRow.status == JobStatus.RUNNING,
+                JobRow.lease_expires_at < func.now(),
+            ).update({
+                JobRow.status: JobStatus.PENDING,
+                JobRow.lease_expires_at: None,
+                JobRow.run_after: func.now(),
+            }, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+        if count:
+            logger.warning(f"job_queue.requeue_orphans count={count}")
+        return count
+
+    # ------------------------------- Events ----------------------------------
+    def publish_event(self, payload: Dict[str, Any]) -> None:
+        message = json.dumps(payload, ensure_ascii=False, default=str)
+        if len(message.encode('utf-8')) > _NOTIFY_MAX_BYTES:
+            logger.warning(f"job_queue.event_too_large type={payload.get('type')} bytes={len(message)}")
+            return
+        db = get_sqlalchemy_session()
+        try:
+            db.execute(text("SELECT pg_notify(:channel, :message)"), {'channel': EVENTS_CHANNEL, 'message': message})
+            db.commit()
+        finally:
+            db.close()
+
+    def drain_events(self) -> List[Dict[str, Any]]:
+        events: List[Dict[str, Any]] = []
+        try:
+            if self._listen_conn is None or self._listen_conn.closed:
+                # Conexión dedicada: LISTEN la retiene mientras viva el API
+                conn = get_direct_conn()
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {EVENTS_CHANNEL}")
+                self._listen_conn = conn
+            self._listen_conn.poll()
+            while self._listen_conn.notifies:
+                notify = self._listen_conn.notifies.pop(0)
+                try:
+                    events.append(json.loads(notify.payload))
+                except ValueError:
+                    continue
+        except Exception as e:
+            logger.warning(f"job_queue.listen_error err={e}")
+            try:
+                if self._listen_conn is not None:
+                    self._listen_conn.close()
+            except Exception:
+                pass
+            self._listen_conn = None
+        return events
+
+    # ------------------------------- Metrics ---------------------------------
+    def stats(self) -> Dict[str, Any]:
+        """Profundidad por estado y latencias (espera en cola / ejecución) de la última hora."""
+        db = get_sqlalchemy_session()
+        try:
+            row = db.execute(text("""
+                SELECT
+                    COUNT(*) FILTER (WHERE status = 'pending') AS pending,
+                    COUNT(*) FILTER (WHERE status = 'pending' AND run_after > NOW()) AS pending_retry,
+                    COUNT(*) FILTER (WHERE status = 'running') AS running,
+                    COUNT(*) FILTER (WHERE status = 'running' AND lease_expires_at < NOW()) AS expired_leases,
+                    COUNT(*) FILTER (WHERE status = 'done' AND finished_at > NOW() - INTERVAL '1 hour') AS done_1h,
+                    COUNT(*) FILTER (WHERE status = 'failed' AND finished_at > NOW() - INTERVAL '1 hour') AS failed_1h,
+                    EXTRACT(EPOCH FROM NOW() - MIN(enqueued_at) FILTER (WHERE status = 'pending')) AS oldest_pending_age_s,
+                    AVG(EXTRACT(EPOCH FROM claimed_at - enqueued_at)) FILTER (WHERE claimed_at > NOW() - INTERVAL '1 hour') AS wait_s_avg,
+                    AVG(EXTRACT(EPOCH FROM finished_at - claimed_at)) FILTER (WHERE status = 'done' AND finished_at > NOW() - INTERVAL '1 hour') AS run_s_avg
+                FROM entidades.jobs
+                WHERE status IN ('pending', 'running') OR finished_at > NOW() - INTERVAL '1 hour'
+            """)).mappings().first()
+        finally:
+            db.close()
+        out: Dict[str, Any] = {'backend': 'postgres', 'mode': job_mode(), 'lease_s': self.lease_s}
+        for key, value in dict(row or {}).items():
+            if key in ('oldest_pending_age_s', 'wait_s_avg', 'run_s_avg'):
+                out[key] = round(float(value), 1) if value is not None else 0.0
+            else:
+                out[key] = int(value or 0)
+        return out
+
+
+async def relay_events(queue: Union[LocalJobQueue, PostgresJobQueue], interval_s: float = 1.0) -> None:
+    """Reenvía a los suscriptores SSE del API los eventos publicados por los workers."""
+    from src.utils.event_manager import event_manager
+    while True:
+        try:
+            for payload in await asyncio.to_thread(queue.drain_events):
+                await event_manager.broadcast_local(payload)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"job_queue.relay_error err={e}")
+        await asyncio.sleep(interval_s)
+
+
+def get_job_queue() -> Union[LocalJobQueue, PostgresJobQueue]:
+    """
+    Get singleton job queue instance.
+
+    Returns:
+        PostgresJobQueue (default) or LocalJobQueue per SCR4PER_JOB_BACKEND
+    """
+    global _job_queue_instance
+    if _job_queue_instance is None:
+        _job_queue_instance = LocalJobQueue() if job_backend() == 'local' else PostgresJobQueue()
+    return _job_queue_instance
@@ -7,9 +7,9 @@ Does NOT trigger new scraping; only reads existing profiles and relationships.
 """
 from __future__ import annotations
 from typing import List, Dict, Any, Set, Tuple, Optional
+import asyncio
 import time
 import logging
-from collections import deque
 
 from fastapi import HTTPException
 from ..db import get_conn
@@ -37,7 +37,7 @@ def _normalize_public_photo_url(url: Optional[str]) -> Optional[str]:
 
 
 class GraphExtractor:
-    """Extracts a subgraph from the database using BFS expansion."""
+    """Extracts a subgraph from the database using layer-by-layer BFS expansion."""
 
     def __init__(
         self,
@@ -55,10 +55,12 @@ class GraphExtractor:
 
         self.profile_map: Dict[ProfileKey, Dict[str, Any]] = {}
         self.relations: List[Dict[str, Any]] = []
+        self._relation_keys: Set[Tuple[str, str, str, str]] = set()
         self.root_keys: Set[ProfileKey] = set()
         self.visited: Set[ProfileKey] = set()
         self.warnings: List[Dict[str, Any]] = []
         self.truncated = False
+        self.layer_queries = 0
 
     def execute(self) -> Dict[str, Any]:
         """Main entry point: extract graph and return formatted payload."""
@@ -117,13 +119,19 @@ class GraphExtractor:
         return root_ids
 
     def _expand_graph(self, root_ids: Dict[ProfileKey, int]):
-        """BFS expansion from roots up to specified depth."""
-        # Queue: (profile_key, profile_id, current_depth)
-        queue: deque[Tuple[ProfileKey, int, int]] = deque()
-        
+        """
+        BFS expansion from roots up to specified depth, one BFS layer at a time.
+
+        Each layer fetches the outgoing edges of the whole frontier with one query per
+        platform schema (``owner_profile_id = ANY(...)``) instead of one query per
+        visited profile; owners are then processed in frontier order so the result
+        matches the per-profile BFS.
+        """
+        frontier: List[Tuple[ProfileKey, int]] = []
+
         # Initialize with roots at depth 0
         for key, pid in root_ids.items():
-            queue.append((key, pid, 0))
+            frontier.append((key, pid))
             self.visited.add(key)
             self.profile_map[key] = {
                 'platform': key[0],
@@ -134,43 +142,22 @@ class GraphExtractor:
 
         with get_conn() as conn:
             with conn.cursor() as cur:
-                while queue:
-                    if self.max_profiles and len(self.profile_map) >= self.max_profiles:
-                        self.truncated = True
-                        logger.warning(f"multi_related.truncated limit={self.max_profiles}")
-                        break
-
-                    current_key, current_id, current_depth = queue.popleft()
-                    platform = current_key[0]
-                    schema = _schema(platform)
-
-                    # Don't expand beyond max depth
-                    if current_depth >= self.depth:
-                        continue
-
-                    # Fetch all relationships where this profile is the owner
-                    try:
-                        rel_filter = ""
-                        params = [current_id]
-                        if self.relation_types:
-                            placeholders = ','.join(['%s'] * len(self.relation_types))
-                            rel_filter = f" AND r.rel_type IN ({placeholders})"
-                            params.extend(self.relation_types)
-
-                        cur.execute(
-                            f"""
-                            SELECT p.id, p.platform, p.username, r.rel_type, r.collected_at
-                            FROM {schema}.relationships r
-                            JOIN {schema}.profiles p ON p.id = r.related_profile_id
-                            WHERE r.owner_profile_id = %s{rel_filter}
-                            """,
-                            params
-                        )
-                        
-                        for row in cur.fetchall() or []:
+                current_depth = 0
+                while frontier and current_depth < self.depth and not self.truncated:
+                    edges = self._fetch_layer_edges(cur, frontier)
+                    self.layer_queries += 1
+                    next_frontier: List[Tuple[ProfileKey, int]] = []
+
+                    for current_key, current_id in frontier:
+                        if self.max_profiles and len(self.profile_map) >= self.max_profiles:
+                            self.truncated = True
+                            logger.warning(f"multi_related.truncated limit={self.max_profiles}")
+                            break
+
+                        platform = current_key[0]
+                        for row in edges.get((platform, current_id), ()):
                             related_key = (row['platform'], row['username'])
-                            related_id = row['id']
-                            
+
                             # Skip if already visited
                             if related_key in self.visited:
                                 # But still record the relation
@@ -188,7 +175,7 @@ class GraphExtractor:
                                 if related_key in self.root_keys and current_key in self.root_keys:
                                     continue
 
-                            # Add to visited and queue
+                            # Add to visited and next layer
                             self.visited.add(related_key)
                             self.profile_map[related_key] = {
                                 'platform': related_key[0],
@@ -196,7 +183,7 @@ class GraphExtractor:
                                 'is_root': related_key in self.root_keys,
                                 'depth_level': current_depth + 1,
                             }
-                            
+
                             # Record the relation
                             self._add_relation(
                                 platform=platform,
@@ -206,43 +193,71 @@ class GraphExtractor:
                                 created_at=row.get('collected_at')
                             )
 
-                            # Add to queue for next level expansion
                             if current_depth + 1 < self.depth:
-                                queue.append((related_key, related_id, current_depth + 1))
+                                next_frontier.append((related_key, row['id']))
 
                             # Check truncation limit
                             if self.max_profiles and len(self.profile_map) >= self.max_profiles:
                                 self.truncated = True
                                 break
 
-                    except Exception as e:
-                        logger.exception(f"multi_related.expand_error platform={platform} username={current_key[1]}")
-                        self.warnings.append({
-                            "code": "EXPANSION_ERROR",
-                            "message": f"Error expanding {platform}:{current_key[1]}: {str(e)}"
-                        })
-
-        logger.info(f"multi_related.expansion_complete profiles={len(self.profile_map)} relations={len(self.relations)} truncated={self.truncated}")
+                    frontier = next_frontier
+                    current_depth += 1
+
+        logger.info(
+            f"multi_related.expansion_complete profiles={len(self.profile_map)} relations={len(self.relations)} "
+            f"layers={current_depth} queries={self.layer_queries} truncated={self.truncated}"
+        )
+
+    def _fetch_layer_edges(self, cur, frontier: List[Tuple[ProfileKey, int]]) -> Dict[Tuple[str, int], List[Dict[str, Any]]]:
+        """Outgoing edges of every profile in ``frontier``, grouped by (platform, owner_id)."""
+        by_platform: Dict[str, List[int]] = {}
+        for (platform, _username), pid in frontier:
+            by_platform.setdefault(platform, []).append(pid)
+
+        edges: Dict[Tuple[str, int], List[Dict[str, Any]]] = {}
+        for platform, owner_ids in by_platform.items():
+            schema = _schema(platform)
+            rel_filter = ""
+            params: List[Any] = [owner_ids]
+            if self.relation_types:
+                rel_filter = " AND r.rel_type::text = ANY(%s)"
+                params.append(list(self.relation_types))
+            try:
+                cur.execute(
+                    f"""
+                    SELECT r.owner_profile_id, p.id, p.platform, p.username, r.rel_type, r.collected_at
+                    FROM {schema}.relationships r
+                    JOIN {schema}.profiles p ON p.id = r.related_profile_id
+                    WHERE r.owner_profile_id = ANY(%s){rel_filter}
+                    ORDER BY r.owner_profile_id, r.id
+                    """,
+                    params
+                )
+                for row in cur.fetchall() or []:
+                    edges.setdefault((platform, row['owner_profile_id']), []).append(row)
+            except Exception as e:
+                logger.exception(f"multi_related.expand_error platform={platform} frontier={len(owner_ids)}")
+                cur.connection.rollback()
+                self.warnings.append({
+                    "code": "EXPANSION_ERROR",
+                    "message": f"Error expanding {len(owner_ids)} {platform} profiles: {str(e)}"
+                })
+        return edges
 
     def _add_relation(self, platform: str, source: str, target: str, rel_type: str, created_at: Any):
         """Add a relation to the list (deduplicate by tuple)."""
-        # Normalize rel_type to English for consistency
         rel_key = (platform, source, target, rel_type)
-        # Simple dedup check (not super efficient but works for moderate sizes)
-        if not any(
-            r['platform'] == platform and 
-            r['source'] == source and 
-            r['target'] == target and 
-            r['type'] == rel_type 
-            for r in self.relations
-        ):
-            self.relations.append({
-                'platform': platform,
-                'source': source,
-                'target': target,
-                'type': rel_type,
-                'created_at': str(created_at) if created_at else None,
-            })
+        if rel_key in self._relation_keys:
+            return
+        self._relation_keys.add(rel_key)
+        self.relations.append({
+            'platform': platform,
+            'source': source,
+            'target': target,
+            'type': rel_type,
+            'created_at': str(created_at) if created_at else None,
+        })
 
     def _fetch_profiles(self):
         """Fetch full profile details for all profiles in profile_map."""
@@ -258,16 +273,14 @@ class GraphExtractor:
             with conn.cursor() as cur:
                 for platform, usernames in by_platform.items():
                     schema = _schema(platform)
-                    placeholders = ','.join(['%s'] * len(usernames))
-                    
                     try:
                         cur.execute(
                             f"""
                             SELECT platform, username, full_name, profile_url, photo_url, updated_at
                             FROM {schema}.profiles
-                            WHERE platform = %s AND username IN ({placeholders})
+                            WHERE platform = %s AND username = ANY(%s)
                             """,
-                            [platform] + usernames
+                            (platform, usernames)
                         )
                         
                         for row in cur.fetchall() or []:
@@ -384,7 +397,8 @@ async def multi_related_execute(request_data: Dict[str, Any]) -> Dict[str, Any]:
     )
 
     try:
-        return extractor.execute()
+        # Consultas psycopg2 bloqueantes: fuera del event loop
+        return await asyncio.to_thread(extractor.execute)
     except Exception as e:
         logger.exception("multi_related.execute_error")
         raise HTTPException(status_code=500, detail={
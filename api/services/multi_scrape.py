@@ -5,11 +5,12 @@ import time
 from datetime import datetime, timezone
 from typing import Any, Dict, List, Tuple
 
-from ..db import get_conn
-from ..repositories import upsert_profile, add_relationship
-from .adapters import launch_browser, close_browser, get_adapter
+from ..db import run_db
+from ..bulk_writer import BulkWriter, flush_and_commit
+from .adapters import get_adapter
 from .pool_session import checkout_pool_session
-from src.services.session_manager import ResourceExhaustedException
+from src.utils.exceptions import ResourceExhaustedException
+from src.scrapers.browser_pool import get_browser_pool
 
 logger = logging.getLogger('api.routers.multi_scrape')
 
@@ -45,7 +46,7 @@ async def _process_root(root: Dict[str, Any], browser) -> Dict[str, Any]:
 
     try:
         async with checkout_pool_session(platform) as pool_session:
-            adapter = get_adapter(platform, browser, tenant, process_images=process_images, storage_state=pool_session.storage_state)
+            adapter = get_adapter(platform, browser, tenant, process_images=process_images, storage_state=pool_session.storage_state, account_id=pool_session.account_id)
             logger.info("root.start rid=%s platform=%s username=%s account_id=%s", rid, platform, username, pool_session.account_id)
             if platform == 'facebook':
                 await adapter.open_flow_session()
@@ -148,24 +149,23 @@ async def _process_root(root: Dict[str, Any], browser) -> Dict[str, Any]:
             finally:
                 if platform == 'facebook':
                     await adapter.close_flow_session()
+                await adapter.close()
 
         # Persist per root (transaction)
         if persist and profiles_map:
             try:
-                with get_conn() as conn:
-                    with conn.cursor() as cur:
-                        # Ensure root first
-                        upsert_profile(cur, platform, username, root_prof.get("full_name"), root_prof.get("profile_url"), root_prof.get("photo_url"))
-                        for r in relations:
-                            rel_type = r["type"]
-                            tgt = r["target"]
-                            if not _valid_username(tgt) or tgt == username:
-                                continue
-                            # Upsert related profile with whatever info we collected
-                            p = profiles_map.get((platform, tgt))
-                            upsert_profile(cur, platform, tgt, p.get("full_name") if p else None, p.get("profile_url") if p else None, p.get("photo_url") if p else None)
-                            add_relationship(cur, platform, username, tgt, rel_type)
-                        conn.commit()
+                writer = BulkWriter(None, platform)
+                writer.add_profile(username, root_prof.get("full_name"), root_prof.get("profile_url"), root_prof.get("photo_url"))
+                for r in relations:
+                    rel_type = r["type"]
+                    tgt = r["target"]
+                    if not _valid_username(tgt) or tgt == username:
+                        continue
+                    # Upsert related profile with whatever info we collected
+                    p = profiles_map.get((platform, tgt))
+                    writer.add_profile(tgt, p.get("full_name") if p else None, p.get("profile_url") if p else None, p.get("photo_url") if p else None)
+                    writer.add_relationship(username, tgt, rel_type)
+                await run_db(flush_and_commit, writer)
             except Exception as db_ex:  # pragma: no cover
                 logger.warning("root.db_warning rid=%s error=%s", rid, db_ex)
                 warnings.append({"code": "DB_WARNING", "message": f"{rid} persistence issue: {db_ex}"})
@@ -233,38 +233,37 @@ async def multi_scrape_execute(request: Dict[str, Any]) -> Dict[str, Any]:
     run_id = secrets.token_hex(6)
     logger.info("multi_scrape.start rid=%s roots=%d", run_id, len(roots))
 
-    browser = await launch_browser(headless=headless)
-    try:
-        async def _guarded(root):
-            platform = root.get("platform")
-            psem = sem_platforms.get(platform, sem)
-            async with sem:
-                async with psem:
-                    # inject global flags into root for processing
-                    r = dict(root)
-                    r["headless"] = headless
-                    r["persist"] = persist
-                    r["process_images"] = process_images
-                    r["strict_sessions"] = strict_sessions
-                    r["tenant"] = tenant
+    browser_pool = get_browser_pool()
+
+    async def _guarded(root):
+        platform = root.get("platform")
+        psem = sem_platforms.get(platform, sem)
+        async with sem:
+            async with psem:
+                # inject global flags into root for processing
+                r = dict(root)
+                r["headless"] = headless
+                r["persist"] = persist
+                r["process_images"] = process_images
+                r["strict_sessions"] = strict_sessions
+                r["tenant"] = tenant
+                async with browser_pool.lease(platform, headless=headless) as browser:
                     return await _process_root(r, browser)
 
-        tasks = [asyncio.create_task(_guarded(r)) for r in roots]
-        results: List[Dict[str, Any]] = []
-        for t in tasks:
-            try:
-                results.append(await t)
-            except Exception as e:  # pragma: no cover
-                rid = _root_id(roots[len(results)]["platform"], roots[len(results)]["username"]) if len(results) < len(roots) else ""
-                results.append({
-                    "root_id": rid,
-                    "profiles": [],
-                    "relations": [],
-                    "warnings": [{"code": "PARTIAL_FAILURE", "message": str(e)}],
-                    "timing_seconds": 0.0,
-                })
-    finally:
-        await close_browser(browser)
+    tasks = [asyncio.create_task(_guarded(r)) for r in roots]
+    results: List[Dict[str, Any]] = []
+    for t in tasks:
+        try:
+            results.append(await t)
+        except Exception as e:  # pragma: no cover
+            rid = _root_id(roots[len(results)]["platform"], roots[len(results)]["username"]) if len(results) < len(roots) else ""
+            results.append({
+                "root_id": rid,
+                "profiles": [],
+                "relations": [],
+                "warnings": [{"code": "PARTIAL_FAILURE", "message": str(e)}],
+                "timing_seconds": 0.0,
+            })
 
     # Merge results
     root_profiles: List[str] = []
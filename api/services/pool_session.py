@@ -1,12 +1,29 @@
 from __future__ import annotations
 
+import asyncio
+import time
 from contextlib import asynccontextmanager
 from dataclasses import dataclass
 from typing import Any, AsyncIterator, Optional
 
 from ..db import get_sqlalchemy_session
-from src.services.session_manager import SessionManager, ResourceExhaustedException
-from src.utils.exceptions import AccountBannedException, NetworkException, SessionExpiredException
+from src.scrapers.context_cache import get_context_cache
+from src.utils.exceptions import (
+    AccountBannedException,
+    NetworkException,
+    ResourceExhaustedException,
+    SessionExpiredException,
+)
+from src.utils.metrics import counter, gauge, histogram
+
+POOL_CHECKOUT_WAIT_SECONDS = histogram(
+    'scr4per_pool_checkout_wait_seconds', 'Espera de checkout_account (incluye reintentos)', ('platform',),
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+_CHECKOUT_HOLD_SECONDS = histogram('scr4per_pool_session_hold_seconds', 'Tiempo con la cuenta del pool tomada', ('platform',))
+POOL_EXHAUSTED = counter('scr4per_pool_exhausted_total', 'Checkouts sin cuentas disponibles (ResourceExhaustedException)', ('platform',))
+_CHECKOUTS = counter('scr4per_pool_checkouts_total', 'Checkouts del pool de cuentas por resultado', ('platform', 'outcome'))
+_SESSIONS_IN_USE = gauge('scr4per_pool_sessions_in_use', 'Cuentas del pool tomadas por este proceso', ('platform',))
 
 
 @dataclass
@@ -19,12 +36,22 @@ class PoolSession:
 
 @asynccontextmanager
 async def checkout_pool_session(platform: str) -> AsyncIterator[PoolSession]:
+    # SessionManager (SQLAlchemy + modelos) se importa al primer checkout, no al arrancar el API
+    from src.services.session_manager import SessionManager
     db = get_sqlalchemy_session()
     session_manager = SessionManager()
     account = None
+    outcome = 'error'
+    t0 = time.perf_counter()
 
     try:
-        account = session_manager.checkout_account(platform, db)
+        # SessionManager usa SQLAlchemy síncrono: fuera del event loop
+        try:
+            account = await asyncio.to_thread(session_manager.checkout_account, platform, db)
+        finally:
+            POOL_CHECKOUT_WAIT_SECONDS.observe(time.perf_counter() - t0, platform=platform)
+        t0 = time.perf_counter()
+        _SESSIONS_IN_USE.inc(platform=platform)
         yield PoolSession(
             account_id=account.id,
             username=account.username,
@@ -32,24 +59,36 @@ async def checkout_pool_session(platform: str) -> AsyncIterator[PoolSession]:
             proxy_url=account.proxy_url,
         )
     except ResourceExhaustedException:
+        outcome = 'exhausted'
+        POOL_EXHAUSTED.inc(platform=platform)
         raise
     except SessionExpiredException as exc:
+        outcome = 'session_expired'
         if account:
-            session_manager.mark_as_suspended(account.id, db, reason=f"Session Expired: {exc.message}")
+            await asyncio.to_thread(session_manager.mark_as_suspended, account.id, db, reason=f"Session Expired: {exc.message}")
+            await get_context_cache().invalidate(account.id, reason='session_expired')
         raise
     except AccountBannedException as exc:
+        outcome = 'banned'
         if account:
-            session_manager.mark_as_banned(account.id, db, reason=f"Account Banned: {exc.message}")
+            await asyncio.to_thread(session_manager.mark_as_banned, account.id, db, reason=f"Account Banned: {exc.message}")
+            await get_context_cache().invalidate(account.id, reason='account_banned')
         raise
     except Exception as exc:
+        outcome = 'network_error' if isinstance(exc, NetworkException) else 'error'
         if account:
             if isinstance(exc, NetworkException):
-                session_manager.release_account(account.id, success=True, db=db)
+                await asyncio.to_thread(session_manager.release_account, account.id, success=True, db=db)
             else:
-                session_manager.release_account(account.id, success=False, db=db, error_message=str(exc))
+                await asyncio.to_thread(session_manager.release_account, account.id, success=False, db=db, error_message=str(exc))
         raise
     else:
+        outcome = 'ok'
         if account:
-            session_manager.release_account(account.id, success=True, db=db)
+            await asyncio.to_thread(session_manager.release_account, account.id, success=True, db=db)
     finally:
+        _CHECKOUTS.inc(platform=platform, outcome=outcome)
+        if account:
+            _SESSIONS_IN_USE.dec(platform=platform)
+            _CHECKOUT_HOLD_SECONDS.observe(time.perf_counter() - t0, platform=platform)
         db.close()
\ No newline at end of file
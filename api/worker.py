@@ -0,0 +1,250 @@
+"""Granja de workers de scraping, separada del proceso del API.
+
+Lanza N procesos (cada uno con su event loop, pool de navegadores y cache de
+contextos) que reclaman trabajos de la cola compartida (api.services.job_queue).
+
+Uso:
+    python -m api.worker --processes 4 --concurrency 3
+
+Variables de entorno equivalentes: WORKER_PROCESSES, WORKER_CONCURRENCY,
+WORKER_POLL_INTERVAL_S, WORKER_METRICS_PORT (``/metrics`` de Prometheus en
+puerto + índice del proceso; 0 = desactivado). El API debe correr con SCR4PER_JOB_MODE=queue para
+encolar en lugar de ejecutar en BackgroundTasks.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import platform
+import signal
+import socket
+import sys
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from src.utils.metrics import counter, histogram, serve_metrics
+
+logger = logging.getLogger('api.worker')
+
+_JOB_QUEUE_WAIT_SECONDS = histogram(
+    'scr4per_worker_queue_wait_seconds', 'Tiempo en cola hasta que un worker reclama el trabajo', ('kind',),
+    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600),
+)
+_JOB_SECONDS = histogram('scr4per_worker_job_seconds', 'Duración de los trabajos en el worker', ('kind',))
+_WORKER_JOBS = counter('scr4per_worker_jobs_total', 'Trabajos procesados por el worker', ('kind', 'outcome'))
+
+
+# ==================================================================
+# HANDLERS (kind -> coroutine)
+# ==================================================================
+
+async def _handle_analyze(payload: Dict[str, Any]) -> None:
+    from api.routers.analyze import ejecutar_analisis_background
+    # Re-lanza los fallos: queue.fail decide el reintento (attempts / max_attempts)
+    await ejecutar_analisis_background(**payload, raise_errors=True)
+
+
+async def _handle_analyze_pool(payload: Dict[str, Any]) -> None:
+    from api.routers.batch_analyze import ejecutar_analisis_con_pool
+    await ejecutar_analisis_con_pool(**payload, raise_errors=True)
+
+
+JOB_HANDLERS: Dict[str, Callable[[Dict[str, Any]], Awaitable[None]]] = {
+    'analyze': _handle_analyze,
+    'analyze_pool': _handle_analyze_pool,
+}
+
+
+# ==================================================================
+# PROCESO WORKER
+# ==================================================================
+
+async def _heartbeat(queue, job, work: asyncio.Task, lease_lost: asyncio.Event) -> None:
+    """Renueva el lease mientras el trabajo corre (la cola local no usa leases).
+
+    Si la cola dice que el lease se perdió (otro worker ya reclamó el trabajo)
+    cancela ``work``: seguir scrapeando duplicaría el trabajo y el resultado ya
+    no es nuestro para marcarlo.
+    """
+    interval = getattr(queue, 'heartbeat_interval_s', 0.0)
+    if not interval:
+        return
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            ok = await asyncio.to_thread(queue.heartbeat, job)
+        except Exception as e:
+            logger.warning(f"worker.heartbeat_error id={job.id} err={e}")
+            continue
+        if not ok:
+            logger.warning(f"worker.lease_lost id={job.id} kind={job.kind} cancelling")
+            lease_lost.set()
+            work.cancel()
+            return
+
+
+async def _run_job(queue, job) -> None:
+    handler = JOB_HANDLERS.get(job.kind)
+    if handler is None:
+        await asyncio.to_thread(queue.fail, job, f"unknown job kind: {job.kind}")
+        return
+    _JOB_QUEUE_WAIT_SECONDS.observe(max(0.0, (job.claimed_at or time.time()) - job.enqueued_at), kind=job.kind)
+    lease_lost = asyncio.Event()
+    work = asyncio.create_task(handler(job.payload))
+    beat = asyncio.create_task(_heartbeat(queue, job, work, lease_lost))
+    t0 = time.perf_counter()
+    outcome = 'error'
+    try:
+        await work
+    except asyncio.CancelledError:
+        if not lease_lost.is_set():
+            raise
+        # El trabajo ya es de otro worker: ni complete ni fail
+        outcome = 'lease_lost'
+    except Exception as e:  # noqa: BLE001
+        logger.exception(f"worker.job_error id={job.id} kind={job.kind}")
+        await asyncio.to_thread(queue.fail, job, f"{type(e).__name__}: {e}")
+    else:
+        outcome = 'ok'
+        await asyncio.to_thread(queue.complete, job)
+    finally:
+        beat.cancel()
+        _JOB_SECONDS.observe(time.perf_counter() - t0, kind=job.kind)
+        _WORKER_JOBS.inc(kind=job.kind, outcome=outcome)
+
+
+async def worker_loop(worker_id: str, concurrency: int, poll_interval_s: float, stop: asyncio.Event) -> None:
+    from api.services.job_queue import get_job_queue
+    from src.scrapers.browser_pool import get_browser_pool
+    from src.scrapers.context_cache import get_context_cache
+    from src.utils.ftp_storage import close_ftp_client
+    from src.utils.images import close_http_clients
+    from src.utils.event_manager import event_manager
+
+    queue = get_job_queue()
+    event_manager.publisher = queue.publish_event
+    slots = asyncio.Semaphore(concurrency)
+    running: set[asyncio.Task] = set()
+    logger.info(f"worker.start id={worker_id} pid={os.getpid()} concurrency={concurrency}")
+
+    try:
+        while not stop.is_set():
+            await slots.acquire()
+            try:
+                job = await asyncio.to_thread(queue.claim, worker_id)
+            except Exception as e:
+                logger.warning(f"worker.claim_error id={worker_id} err={e}")
+                job = None
+            if job is None:
+                slots.release()
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=poll_interval_s)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            task = asyncio.create_task(_run_job(queue, job))
+            running.add(task)
+            task.add_done_callback(running.discard)
+            task.add_done_callback(lambda _t: slots.release())
+    finally:
+        if running:
+            logger.info(f"worker.draining id={worker_id} jobs={len(running)}")
+            await asyncio.gather(*running, return_exceptions=True)
+        await get_context_cache().close()
+        await get_browser_pool().close()
+        close_ftp_client()
+        await close_http_clients()
+        logger.info(f"worker.stop id={worker_id}")
+
+
+def _process_main(index: int, concurrency: int, poll_interval_s: float, metrics_port: int = 0) -> None:
+    from src.utils.logging_config import setup_logging
+    setup_logging()
+    if metrics_port:
+        serve_metrics(metrics_port + index)
+    if platform.system() == 'Windows':
+        asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{index}"
+
+    async def _main():
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+        await worker_loop(worker_id, concurrency, poll_interval_s, stop)
+
+    asyncio.run(_main())
+
+
+# ==================================================================
+# SUPERVISOR
+# ==================================================================
+
+def run_supervisor(processes: int, concurrency: int, poll_interval_s: float, metrics_port: int = 0) -> None:
+    """Mantiene ``processes`` workers vivos; reinicia los que mueren y re-encola sus trabajos."""
+    from api.services.job_queue import get_job_queue
+
+    ctx = multiprocessing.get_context('spawn')
+    queue = get_job_queue()
+    queue.requeue_orphans()
+    stopping = False
+    procs: List[Optional[multiprocessing.process.BaseProcess]] = [None] * processes
+
+    def _stop(_signum, _frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    logger.info(f"worker.supervisor.start processes={processes} concurrency={concurrency}")
+    while not stopping:
+        for i, proc in enumerate(procs):
+            if proc is not None and proc.is_alive():
+                continue
+            if proc is not None:
+                logger.warning(f"worker.supervisor.restart index={i} exitcode={proc.exitcode}")
+                queue.requeue_orphans()
+            p = ctx.Process(target=_process_main, args=(i, concurrency, poll_interval_s, metrics_port), name=f"scr4per-worker-{i}")
+            p.start()
+            procs[i] = p
+        time.sleep(1.0)
+
+    logger.info("worker.supervisor.stopping")
+    for proc in procs:
+        if proc is not None and proc.is_alive():
+            proc.terminate()
+    for proc in procs:
+        if proc is not None:
+            proc.join(timeout=60)
+    queue.requeue_orphans()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog='scr4per worker', description='Procesos worker de scraping')
+    parser.add_argument('--processes', type=int, default=int(os.getenv('WORKER_PROCESSES') or max(1, (os.cpu_count() or 2) // 2)))
+    parser.add_argument('--concurrency', type=int, default=int(os.getenv('WORKER_CONCURRENCY') or 3),
+                        help='Trabajos simultáneos por proceso')
+    parser.add_argument('--poll-interval', type=float, default=float(os.getenv('WORKER_POLL_INTERVAL_S') or 1.0))
+    parser.add_argument('--metrics-port', type=int, default=int(os.getenv('WORKER_METRICS_PORT') or 0),
+                        help='Puerto base de /metrics (proceso i escucha en puerto + i; 0 = sin métricas)')
+    args = parser.parse_args(argv)
+
+    from src.utils.logging_config import setup_logging
+    setup_logging()
+    run_supervisor(max(1, args.processes), max(1, args.concurrency), max(0.1, args.poll_interval),
+                   max(0, args.metrics_port))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+-- Content-addressed image store (src/utils/image_store.py)
+-- Each distinct image is uploaded once to FTP under {FTP_BASE_PATH}/blobs/<sha[:2]>/<sha><ext>;
+-- per-case/per-root paths are rows in image_refs pointing at the blob.
+
+CREATE TABLE IF NOT EXISTS entidades.image_blobs (
+    sha256 CHAR(64) PRIMARY KEY,
+    ext VARCHAR(10) NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    ftp_path TEXT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Normalized CDN URL (signature/edge params stripped) -> blob: skips the CDN request on repeat
+CREATE TABLE IF NOT EXISTS entidades.image_sources (
+    url_key CHAR(40) PRIMARY KEY,
+    normalized_url TEXT NOT NULL,
+    sha256 CHAR(64) NOT NULL REFERENCES entidades.image_blobs(sha256) ON DELETE CASCADE,
+    hits INTEGER NOT NULL DEFAULT 0,
+    first_seen TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    last_seen TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Logical path served by /files/scraped-image* -> blob
+CREATE TABLE IF NOT EXISTS entidades.image_refs (
+    ref_path TEXT PRIMARY KEY,
+    sha256 CHAR(64) NOT NULL REFERENCES entidades.image_blobs(sha256) ON DELETE CASCADE,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_image_refs_sha256 ON entidades.image_refs (sha256);
@@ -0,0 +1,48 @@
+-- Durable job queue for analyses (consumed by `python -m api.worker`)
+-- Workers lease rows with FOR UPDATE SKIP LOCKED and renew lease_expires_at via heartbeats.
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_type t
+        JOIN pg_namespace n ON n.oid = t.typnamespace
+        WHERE t.typname = 'job_status_enum' AND n.nspname = 'entidades'
+    ) THEN
+        CREATE TYPE entidades.job_status_enum AS ENUM ('pending', 'running', 'done', 'failed');
+    END IF;
+END$$;
+
+CREATE TABLE IF NOT EXISTS entidades.jobs (
+    id BIGSERIAL PRIMARY KEY,
+    kind VARCHAR(50) NOT NULL,
+    payload JSONB NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 100,
+    status entidades.job_status_enum NOT NULL DEFAULT 'pending',
+    dedupe_key TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    run_after TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    error TEXT,
+    worker VARCHAR(200),
+    claimed_at TIMESTAMPTZ,
+    heartbeat_at TIMESTAMPTZ,
+    lease_expires_at TIMESTAMPTZ,
+    enqueued_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    finished_at TIMESTAMPTZ
+);
+
+-- Dequeue: next pending job by priority, then FIFO
+CREATE INDEX IF NOT EXISTS idx_jobs_pending
+    ON entidades.jobs (priority, id) WHERE status = 'pending';
+
+-- Lease reaper: running jobs whose worker stopped heartbeating
+CREATE INDEX IF NOT EXISTS idx_jobs_running_lease
+    ON entidades.jobs (lease_expires_at) WHERE status = 'running';
+
+-- At most one active job per identity (replaces the 10-minute 'procesando' heuristic)
+CREATE UNIQUE INDEX IF NOT EXISTS uq_jobs_active_dedupe
+    ON entidades.jobs (dedupe_key) WHERE status IN ('pending', 'running') AND dedupe_key IS NOT NULL;
+
+-- Queue latency/throughput stats over recent jobs
+CREATE INDEX IF NOT EXISTS idx_jobs_finished_at
+    ON entidades.jobs (finished_at) WHERE finished_at IS NOT NULL;
@@ -1,7 +1,7 @@
 """
 Modelos SQLAlchemy para la base de datos del scraper.
 """
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Enum as SQLEnum
+from sqlalchemy import Column, BigInteger, Integer, String, Text, DateTime, ForeignKey, Enum as SQLEnum
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
@@ -99,3 +99,53 @@ class ScraperAccount(Base):
         if isinstance(self.cookies, dict):
             return self.cookies
         return {'cookies': self.cookies, 'origins': []}
+
+
+class JobStatus(enum.Enum):
+    """Estados de un trabajo en la cola durable (entidades.jobs)."""
+    PENDING = "pending"     # Esperando worker (o reintento programado en run_after)
+    RUNNING = "running"     # Arrendado por un worker; lease_expires_at se renueva con heartbeats
+    DONE = "done"           # Terminado correctamente
+    FAILED = "failed"       # Agotó max_attempts
+
+
+class Job(Base):
+    """
+    Cola durable de trabajos de análisis consumida por ``python -m api.worker``.
+    
+    Un worker arrienda el trabajo (FOR UPDATE SKIP LOCKED, igual que el pool de cuentas)
+    y renueva ``lease_expires_at`` con heartbeats; si muere, el lease vence y otro worker
+    lo vuelve a tomar en segundos.
+    """
+    __tablename__ = 'jobs'
+    __table_args__ = {'schema': 'entidades'}
+    
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    kind = Column(String(50), nullable=False)  # 'analyze', 'analyze_pool'
+    payload = Column(JSONB, nullable=False)
+    priority = Column(Integer, default=100, nullable=False)  # Menor = antes
+    status = Column(
+        SQLEnum(JobStatus, name='job_status_enum', schema='entidades', values_callable=lambda obj: [e.value for e in obj]),
+        default=JobStatus.PENDING,
+        nullable=False
+    )
+    dedupe_key = Column(Text, nullable=True)  # Único entre trabajos pending/running
+    
+    # Reintentos
+    attempts = Column(Integer, default=0, nullable=False)
+    max_attempts = Column(Integer, default=3, nullable=False)
+    run_after = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    error = Column(Text, nullable=True)
+    
+    # Lease
+    worker = Column(String(200), nullable=True)
+    claimed_at = Column(DateTime(timezone=True), nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    
+    # Metadatos
+    enqueued_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    
+    def __repr__(self):
+        return f"<Job(id={self.id}, kind={self.kind}, status={self.status.value}, attempts={self.attempts})>"
@@ -13,13 +13,19 @@ DATA_DIR = os.path.join(REPO_ROOT, 'data')
 STORAGE_DIR = os.path.join(DATA_DIR, 'storage')
 IMAGES_DIR = os.path.join(STORAGE_DIR, 'images')
 GRAPH_SESSION_DIR = os.path.join(STORAGE_DIR, 'graph_session')
+# Copia local de imágenes servidas desde FTP (src/utils/image_disk_cache.py)
+IMAGE_CACHE_DIR = os.path.join(STORAGE_DIR, 'cache', 'images')
+# Respuestas de /proxy-image (api/routers/proxy.py)
+PROXY_CACHE_DIR = os.path.join(STORAGE_DIR, 'cache', 'proxy')
+# Grabaciones HAR + snapshots DOM para benchmarks offline (src/scrapers/har_replay.py)
+HAR_FIXTURES_DIR = os.path.join(DATA_DIR, 'har_fixtures')
 
 PUBLIC_IMAGES_PREFIX_PRIMARY = '/data/storage/images'
 PUBLIC_IMAGES_PREFIX_COMPAT = '/storage/images'
 
 PUBLIC_GRAPH_SESSION_PREFIX = '/data/storage/graph_session'
 
-ALL_DIRS = [STORAGE_DIR, IMAGES_DIR, GRAPH_SESSION_DIR]
+ALL_DIRS = [STORAGE_DIR, IMAGES_DIR, GRAPH_SESSION_DIR, IMAGE_CACHE_DIR, PROXY_CACHE_DIR]
 for d in ALL_DIRS:
     os.makedirs(d, exist_ok=True)
 
@@ -29,7 +35,7 @@ def ensure_dirs() -> None:
         os.makedirs(d, exist_ok=True)
 
 __all__ = [
-    'REPO_ROOT', 'DATA_DIR', 'STORAGE_DIR', 'IMAGES_DIR', 'GRAPH_SESSION_DIR',
+    'REPO_ROOT', 'DATA_DIR', 'STORAGE_DIR', 'IMAGES_DIR', 'GRAPH_SESSION_DIR', 'IMAGE_CACHE_DIR', 'PROXY_CACHE_DIR',
     'PUBLIC_IMAGES_PREFIX_PRIMARY', 'PUBLIC_IMAGES_PREFIX_COMPAT', 'PUBLIC_GRAPH_SESSION_PREFIX',
     'ensure_dirs'
 ]
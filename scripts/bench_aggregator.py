@@ -0,0 +1,161 @@
+"""Benchmark de Aggregator: representación compacta por ids vs la anterior (dataclass + sets de tuplas).
+
+Simula un multi-scrape de R roots con P perfiles por root (una fracción compartida
+entre roots, como seguidores en común) y relaciones seguidor/seguido/amigo/actividad.
+Mide memoria retenida (tracemalloc) y tiempo de ingesta + build_payload, y verifica
+que ambos payloads sean equivalentes.
+
+Uso:
+    python scripts/bench_aggregator.py --roots 5 --per-root 12000 --overlap 0.2
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Set, Tuple
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from api.services.aggregation import RELATION_TYPES, Aggregator, ProfileAccum, make_profile
+from src.utils.thumbnails import thumbnail_url
+
+PLATFORM = 'instagram'
+
+
+@dataclass
+class LegacyAggregator:
+    """Implementación previa (copiada tal cual) para comparar."""
+    profiles: Dict[Tuple[str, str], ProfileAccum] = field(default_factory=dict)
+    relations: Set[Tuple[str, str, str, str]] = field(default_factory=set)
+    roots: List[Tuple[str, str]] = field(default_factory=list)
+    warnings: List[Dict[str, Any]] = field(default_factory=list)
+
+    def add_root(self, p: ProfileAccum):
+        key = (p.platform, p.username)
+        if key not in self.profiles:
+            self.profiles[key] = p
+        else:
+            self.profiles[key].merge(p)
+        if key not in self.roots:
+            self.roots.append(key)
+
+    def add_profile(self, p: ProfileAccum):
+        key = (p.platform, p.username)
+        if key in self.profiles:
+            self.profiles[key].merge(p)
+        else:
+            self.profiles[key] = p
+
+    def add_relation(self, platform: str, source: str, target: str, rel_type: str):
+        if rel_type not in RELATION_TYPES or source == target:
+            return
+        self.relations.add((platform, source, target, rel_type))
+
+    def build_payload(self, *, roots_requested: int) -> Dict[str, Any]:
+        return {
+            "root_profiles": [f"{p}:{u}" for (p, u) in self.roots if (p, u) in self.profiles],
+            "profiles": [{
+                "platform": acc.platform,
+                "username": acc.username,
+                "full_name": acc.full_name,
+                "profile_url": acc.profile_url,
+                "photo_url": thumbnail_url(acc.photo_url),
+                "photo_url_full": acc.photo_url,
+                "sources": [f"{p}:{u}" for (p, u) in sorted(acc.sources)],
+            } for acc in self.profiles.values()],
+            "relations": [
+                {"platform": p, "source": s, "target": t, "type": ty} for (p, s, t, ty) in self.relations
+            ],
+        }
+
+
+def make_items(roots: int, per_root: int, overlap: float, seed: int) -> List[Tuple[str, List[Dict[str, Any]]]]:
+    """[(root_username, [item scrapeado, ...]), ...] con ``overlap`` de perfiles compartidos."""
+    rng = random.Random(seed)
+    shared = [f"shared_user_{i}" for i in range(int(per_root * overlap))]
+    out = []
+    for r in range(roots):
+        usernames = shared + [f"user_{r}_{i}" for i in range(per_root - len(shared))]
+        rng.shuffle(usernames)
+        items = [{
+            # str() nuevo por item, como al parsear JSON del scraper
+            'username': ''.join(u),
+            'full_name': f"Nombre {u.title()}" if rng.random() < 0.8 else None,
+            'profile_url': f"https://www.instagram.com/{u}/",
+            'photo_url': f"/files/scraped-image/red_instagram/root_{r}/{u}.jpg",
+            'kind': rng.choice(('seguidor', 'seguido', 'amigo', 'comentó')),
+        } for u in usernames]
+        out.append((f"root_{r}", items))
+    return out
+
+
+def ingest(agg, data) -> None:
+    for root, items in data:
+        agg.add_root(make_profile(PLATFORM, root, f"Root {root}", None, None, (PLATFORM, root)))
+        for it in items:
+            agg.add_profile(make_profile(PLATFORM, it['username'], it['full_name'], it['profile_url'],
+                                         it['photo_url'], (PLATFORM, root)))
+            if it['kind'] == 'seguido':
+                agg.add_relation(PLATFORM, root, it['username'], 'seguido')
+            elif it['kind'] == 'amigo':
+                agg.add_relation(PLATFORM, root, it['username'], 'amigo')
+                agg.add_relation(PLATFORM, it['username'], root, 'amigo')
+            else:
+                agg.add_relation(PLATFORM, it['username'], root, it['kind'])
+
+
+def measure(factory, data) -> Tuple[Dict[str, Any], float, float, int]:
+    """(payload, s de ingesta, s de build_payload, bytes retenidos tras la ingesta)."""
+    # Memoria en una pasada con tracemalloc y tiempos en otra (tracemalloc frena las asignaciones)
+    gc.collect()
+    tracemalloc.start()
+    agg = factory()
+    ingest(agg, data)
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del agg
+    gc.collect()
+    t0 = time.perf_counter()
+    agg = factory()
+    ingest(agg, data)
+    ingest_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    payload = agg.build_payload(roots_requested=len(data))
+    build_s = time.perf_counter() - t0
+    return payload, ingest_s, build_s, retained
+
+
+def canonical(payload: Dict[str, Any]):
+    profiles = sorted((tuple(sorted((k, str(v)) for k, v in p.items())) for p in payload['profiles']))
+    relations = sorted(tuple(sorted(r.items())) for r in payload['relations'])
+    return payload['root_profiles'], profiles, relations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de memoria/tiempo de Aggregator")
+    parser.add_argument('--roots', type=int, default=5)
+    parser.add_argument('--per-root', type=int, default=12000)
+    parser.add_argument('--overlap', type=float, default=0.2, help='Fracción de perfiles compartidos entre roots')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    data = make_items(args.roots, args.per_root, args.overlap, args.seed)
+    legacy, l_ingest, l_build, l_mem = measure(LegacyAggregator, data)
+    compact, c_ingest, c_build, c_mem = measure(Aggregator, data)
+
+    print(f"profiles={len(compact['profiles'])} relations={len(compact['relations'])}")
+    print(f"legacy   retained_mb={l_mem / 1e6:.1f} ingest_s={l_ingest:.3f} build_s={l_build:.3f}")
+    print(f"compact  retained_mb={c_mem / 1e6:.1f} ingest_s={c_ingest:.3f} build_s={c_build:.3f}")
+    print(f"memory x{l_mem / c_mem:.1f} smaller, ingest+build x{(l_ingest + l_build) / (c_ingest + c_build):.2f}")
+    same = canonical(legacy) == canonical(compact)
+    print(f"payload_equivalent={same}")
+    if not same:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Benchmark: persistencia fila a fila (repositories) vs BulkWriter (COPY + merge).
+
+Genera N seguidores sintéticos para una raíz y los persiste por ambos caminos
+dentro de transacciones que se revierten al final (no deja datos en la BD).
+
+Uso:
+    python scripts/bench_bulk_persist.py --platform instagram --n 10000 --repeat 3
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from api.db import get_conn
+from api.repositories import upsert_profile, add_relationship
+from api.bulk_writer import BulkWriter
+
+
+def _items(n: int, prefix: str):
+    return [
+        {
+            'username': f"{prefix}_{i}",
+            'full_name': f"Usuario {i}",
+            'profile_url': f"https://example.com/{prefix}_{i}",
+            'photo_url': f"/storage/bench/{prefix}_{i}.jpg",
+        }
+        for i in range(n)
+    ]
+
+
+def run_legacy(cur, platform: str, root: str, items) -> int:
+    statements = 1
+    upsert_profile(cur, platform, root)
+    for it in items:
+        upsert_profile(cur, platform, it['username'], it['full_name'], it['profile_url'], it['photo_url'])
+        add_relationship(cur, platform, root, it['username'], 'follower')
+        statements += 4  # upsert objetivo + (upsert dueño + upsert objetivo + insert relación)
+    return statements
+
+
+def run_bulk(cur, platform: str, root: str, items) -> int:
+    writer = BulkWriter(cur, platform)
+    writer.add_profile(root)
+    for it in items:
+        writer.add_profile(it['username'], it['full_name'], it['profile_url'], it['photo_url'])
+        writer.add_relationship(root, it['username'], 'follower')
+    writer.flush()
+    return 6 + 2 + 2  # DDL staging + truncate, COPY + merge perfiles, COPY + merge relaciones
+
+
+def _timed(fn, platform: str, n: int) -> tuple:
+    prefix = f"bench_{uuid.uuid4().hex[:8]}"
+    items = _items(n, prefix)
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            t0 = time.perf_counter()
+            statements = fn(cur, platform, f"{prefix}_root", items)
+            elapsed = time.perf_counter() - t0
+        conn.rollback()
+    return elapsed, statements
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de persistencia fila a fila vs COPY + merge")
+    parser.add_argument('--platform', default='instagram', choices=['x', 'instagram', 'facebook'])
+    parser.add_argument('--n', type=int, default=10000, help='Seguidores sintéticos por corrida')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    results = {}
+    for name, fn in (('legacy', run_legacy), ('bulk', run_bulk)):
+        runs = [_timed(fn, args.platform, args.n) for _ in range(args.repeat)]
+        best = min(r[0] for r in runs)
+        results[name] = best
+        print(f"{name:7s} n={args.n} best={best:.3f}s rows/s={args.n / best:,.0f} statements={runs[0][1]}")
+    print(f"speedup x{results['legacy'] / results['bulk']:.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Benchmark de /export: DataFrame + ExcelWriter en BytesIO (legacy) vs motor en streaming.
+
+Genera un payload sintético de ``--perfiles`` perfiles objetivo con ``--rows`` relaciones
+en total y mide tiempo, memoria pico (tracemalloc, en una pasada aparte) y tamaño de:
+
+    legacy   pd.DataFrame(rows) -> pd.ExcelWriter(BytesIO) (como export.py antes)
+    xlsx     export_chunks(..., 'xlsx')     openpyxl write-only a archivo temporal
+    csv      export_chunks(..., 'csv')
+    parquet  export_chunks(..., 'parquet')  (si pyarrow está instalado)
+
+Los trozos se descartan al "enviarse", como hace StreamingResponse. El payload de
+entrada se mide aparte: es lo que ya está en memoria al llegar el request.
+
+Uso:
+    python scripts/bench_export.py --rows 1000000
+    python scripts/bench_export.py --rows 1000000 --skip-legacy
+"""
+import argparse
+import gc
+import importlib.util
+import os
+import sys
+import time
+import tracemalloc
+from io import BytesIO
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from api.services.export_stream import EXPORT_COLUMNS, export_chunks, relation_rows
+
+TIPOS = ('seguidor', 'seguido', 'amigo', 'comentó', 'reaccionó')
+
+
+def make_payload(rows: int, perfiles: int):
+    per = max(1, rows // perfiles)
+    out = []
+    for p in range(perfiles):
+        out.append({
+            'perfil_objetivo': {'username': f"objetivo_{p}", 'full_name': f"Objetivo {p}"},
+            'perfiles_relacionados': [{
+                'username': f"user_{p}_{i}",
+                'full_name': f"Nombre Usuario {i}" if i % 5 else None,
+                'profile_url': f"https://www.instagram.com/user_{p}_{i}/",
+                'tipo de relacion': TIPOS[i % len(TIPOS)],
+            } for i in range(per)],
+        })
+    return out
+
+
+def _legacy(perfiles):
+    import pandas as pd
+
+    # Filas como dicts + DataFrame + workbook en BytesIO: las tres copias del export previo
+    rows = [dict(zip(EXPORT_COLUMNS, row)) for row in relation_rows(perfiles)]
+    df = pd.DataFrame(rows, columns=list(EXPORT_COLUMNS))
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine="openpyxl") as writer:
+        df.to_excel(writer, index=False, sheet_name="export")
+    return len(output.getvalue())
+
+
+def _streaming(fmt):
+    def run(perfiles):
+        total = 0
+        for chunk in export_chunks(relation_rows(perfiles), fmt):
+            total += len(chunk)
+        return total
+    return run
+
+
+def measure(name, fn, perfiles):
+    gc.collect()
+    t0 = time.perf_counter()
+    size = fn(perfiles)
+    elapsed = time.perf_counter() - t0
+    gc.collect()
+    tracemalloc.start()
+    fn(perfiles)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:8s} s={elapsed:.2f} peak_mb={peak / 1e6:.1f} out_mb={size / 1e6:.1f}")
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de memoria/tiempo del export")
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--perfiles', type=int, default=10)
+    parser.add_argument('--skip-legacy', action='store_true', help='No medir el camino pandas (lento y costoso en memoria)')
+    args = parser.parse_args()
+
+    perfiles = make_payload(args.rows, args.perfiles)
+    print(f"rows={sum(len(p['perfiles_relacionados']) for p in perfiles)} perfiles={len(perfiles)}")
+
+    formats = ['xlsx', 'csv']
+    if importlib.util.find_spec('pyarrow') is not None:
+        formats.append('parquet')
+    else:
+        print("parquet: pyarrow no instalado, se omite")
+
+    results = {fmt: measure(fmt, _streaming(fmt), perfiles) for fmt in formats}
+    if not args.skip_legacy:
+        legacy_s, legacy_peak = measure('legacy', _legacy, perfiles)
+        xlsx_s, xlsx_peak = results['xlsx']
+        print(f"xlsx vs legacy: time x{legacy_s / xlsx_s:.2f} peak memory x{legacy_peak / xlsx_peak:.0f} smaller")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Benchmark de serialización de grafos: json.dumps(indent=2) vs orjson vs iter_json en streaming.
+
+Toma ``graph.json`` de la raíz del repo (~570 KB, 517 nodos / 615 aristas), lo
+escala ``--scale`` veces (copias de nodos y aristas con ids sufijados) y mide
+tiempo, memoria pico (tracemalloc) y tamaño de salida de:
+
+    legacy   json.dumps(obj, ensure_ascii=False, indent=2).encode()  (como analyze.py antes)
+    compact  json.dumps compacto de la stdlib
+    dumps    api.json_stream.dumps (orjson si está instalado)
+    stream   api.json_stream.iter_json consumido por trozos (lo que ven FTP/HTTP)
+
+Uso:
+    python scripts/bench_graph_json.py --scale 100
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from api import json_stream
+from api.json_stream import dumps, iter_json, loads
+
+GRAPH_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'graph.json'))
+
+
+def scaled_graph(scale: int) -> dict:
+    with open(GRAPH_PATH, 'rb') as f:
+        graph = json.load(f)
+    nodes, edges = graph['elements']['nodes'], graph['elements']['edges']
+    out_nodes, out_edges = [], []
+    for i in range(scale):
+        suffix = f"_{i}" if i else ''
+        for n in nodes:
+            data = dict(n['data'], id=f"{n['data']['id']}{suffix}")
+            out_nodes.append({**n, 'data': data})
+        for e in edges:
+            data = dict(e['data'], id=f"{e['data']['id']}{suffix}",
+                        source=f"{e['data']['source']}{suffix}", target=f"{e['data']['target']}{suffix}")
+            out_edges.append({**e, 'data': data})
+    return {**graph, 'elements': {'nodes': out_nodes, 'edges': out_edges}}
+
+
+def _legacy(obj):
+    return json.dumps(obj, ensure_ascii=False, indent=2).encode('utf-8')
+
+
+def _compact(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _stream(obj):
+    # Simula el consumidor (socket / storbinary): cada trozo se descarta tras "enviarlo"
+    total = 0
+    for chunk in iter_json(obj):
+        total += len(chunk)
+    return total
+
+
+def measure(name, fn, obj):
+    gc.collect()
+    t0 = time.perf_counter()
+    out = fn(obj)
+    elapsed = time.perf_counter() - t0
+    size = out if isinstance(out, int) else len(out)
+    del out
+    gc.collect()
+    tracemalloc.start()
+    fn(obj)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:8s} s={elapsed:.3f} peak_mb={peak / 1e6:.1f} out_mb={size / 1e6:.1f}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de serialización JSON de grafos")
+    parser.add_argument('--scale', type=int, default=100)
+    args = parser.parse_args()
+
+    graph = scaled_graph(args.scale)
+    print(f"orjson={'yes' if json_stream.orjson is not None else 'no'} "
+          f"nodes={len(graph['elements']['nodes'])} edges={len(graph['elements']['edges'])}")
+    legacy_s = measure('legacy', _legacy, graph)
+    measure('compact', _compact, graph)
+    dumps_s = measure('dumps', dumps, graph)
+    stream_s = measure('stream', _stream, graph)
+    print(f"speedup dumps x{legacy_s / dumps_s:.1f} stream x{legacy_s / stream_s:.1f}")
+
+    same = loads(b''.join(iter_json(graph))) == graph
+    print(f"stream_roundtrip_equal={same}")
+    if not same:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
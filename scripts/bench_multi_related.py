@@ -0,0 +1,134 @@
+"""Benchmark de /multi-related: expansión por capas (GraphExtractor) vs una consulta por perfil.
+
+Siembra en red_x un grafo sintético (por defecto ~100k aristas):
+    raíz -> F1 perfiles (nivel 1) -> F2 aristas cada uno hacia un pool de P perfiles (nivel 2)
+    cada perfil del pool -> 1 arista a otro perfil del pool (nivel 3)
+mide la latencia de GraphExtractor para depth 1/2/3 y, opcionalmente, la del
+algoritmo anterior (SELECT por perfil visitado + dedup lineal) hasta --legacy-max-depth.
+Los datos sembrados se borran al final salvo --keep.
+
+Uso:
+    python scripts/bench_multi_related.py --f1 2000 --f2 39 --pool 20000 --legacy-max-depth 1
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import uuid
+from collections import deque
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from api.db import get_conn
+from api.bulk_writer import BulkWriter
+from api.services.multi_related import GraphExtractor
+
+PLATFORM = 'x'
+
+
+def seed(prefix: str, f1: int, f2: int, pool: int, rng: random.Random) -> int:
+    root = f"{prefix}_root"
+    level1 = [f"{prefix}_a{i}" for i in range(f1)]
+    level2 = [f"{prefix}_b{i}" for i in range(pool)]
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            writer = BulkWriter(cur, PLATFORM)
+            for u in level1:
+                writer.add_relationship(root, u, 'following')
+                for v in rng.sample(level2, f2):
+                    writer.add_relationship(u, v, 'following')
+            for u in level2:
+                writer.add_relationship(u, rng.choice(level2), 'follower')
+            edges = writer.flush()['relationships']
+        conn.commit()
+    return edges
+
+
+def cleanup(prefix: str) -> None:
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM red_x.profiles WHERE platform = 'x' AND username LIKE %s", (f"{prefix}\\_%",))
+        conn.commit()
+
+
+def legacy_expand(root_username: str, depth: int) -> tuple:
+    """Algoritmo previo: un SELECT por perfil visitado y dedup con recorrido lineal."""
+    queries = 0
+    relations = []
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT id FROM red_x.profiles WHERE platform='x' AND username=%s", (root_username,))
+            root_id = cur.fetchone()['id']
+            visited = {root_username}
+            queue = deque([(root_username, root_id, 0)])
+            while queue:
+                username, pid, d = queue.popleft()
+                if d >= depth:
+                    continue
+                cur.execute(
+                    """
+                    SELECT p.id, p.username, r.rel_type FROM red_x.relationships r
+                    JOIN red_x.profiles p ON p.id = r.related_profile_id
+                    WHERE r.owner_profile_id = %s
+                    """,
+                    (pid,)
+                )
+                queries += 1
+                for row in cur.fetchall():
+                    rel = (username, row['username'], row['rel_type'])
+                    if not any(r == rel for r in relations):
+                        relations.append(rel)
+                    if row['username'] in visited:
+                        continue
+                    visited.add(row['username'])
+                    if d + 1 < depth:
+                        queue.append((row['username'], row['id'], d + 1))
+    return len(visited), len(relations), queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de expansión de grafo para /multi-related")
+    parser.add_argument('--f1', type=int, default=2000, help='Vecinos directos de la raíz')
+    parser.add_argument('--f2', type=int, default=39, help='Aristas por perfil de nivel 1')
+    parser.add_argument('--pool', type=int, default=20000, help='Perfiles de nivel 2')
+    parser.add_argument('--depths', default='1,2,3')
+    parser.add_argument('--legacy-max-depth', type=int, default=1,
+                        help='Profundidad máxima para medir el algoritmo previo (O(R²) en relaciones)')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--keep', action='store_true', help='No borrar el grafo sembrado')
+    args = parser.parse_args()
+
+    prefix = f"bench_{uuid.uuid4().hex[:8]}"
+    t0 = time.perf_counter()
+    edges = seed(prefix, args.f1, args.f2, args.pool, random.Random(args.seed))
+    print(f"seed prefix={prefix} edges={edges} s={time.perf_counter() - t0:.1f}")
+
+    try:
+        for depth in (int(d) for d in args.depths.split(',')):
+            extractor = GraphExtractor(
+                roots=[{'platform': PLATFORM, 'username': f"{prefix}_root"}],
+                depth=depth, include_inter_root=True, relation_types=None, max_profiles=None,
+            )
+            t0 = time.perf_counter()
+            out = extractor.execute()
+            elapsed = time.perf_counter() - t0
+            print(
+                f"layers  depth={depth} s={elapsed:.3f} profiles={out['meta']['total_profiles']} "
+                f"relations={out['meta']['total_relations']} queries={extractor.layer_queries}"
+            )
+            if depth <= args.legacy_max_depth:
+                t0 = time.perf_counter()
+                profiles, relations, queries = legacy_expand(f"{prefix}_root", depth)
+                legacy_s = time.perf_counter() - t0
+                print(
+                    f"legacy  depth={depth} s={legacy_s:.3f} profiles={profiles} relations={relations} "
+                    f"queries={queries} speedup=x{legacy_s / elapsed:.1f}"
+                )
+    finally:
+        if not args.keep:
+            cleanup(prefix)
+
+
+if __name__ == '__main__':
+    main()
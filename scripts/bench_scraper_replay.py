@@ -0,0 +1,264 @@
+"""Benchmark offline de scrapers: graba HAR + snapshots DOM una vez y los reproduce sin red.
+
+record  corre el escenario contra la plataforma real (sesión guardada) y deja en
+        ``data/har_fixtures/<escenario>/``: recording.har, meta.json y snapshots/*.html
+replay  corre el mismo escenario con ``HarReplayRouter`` (context.route, sin red) y mide
+        por corrida: tiempo, items, items/s, llamadas IPC al driver de Playwright,
+        iteraciones de scroll_loop y requests servidos / faltantes del HAR
+
+Escenarios (entradas reales de los scrapers):
+    instagram.followers / instagram.following   scrap_seguidores / scrap_seguidos -> extraer_usuarios_instagram
+    x.followers / x.following                   scrap_seguidores / scrap_seguidos -> extraer_usuarios_lista
+    facebook.friends / .followers / .following  scrap_list_network_scrapling
+
+Con ``--baseline`` sale con código 1 si items/s cae o las llamadas IPC suben más de
+``--max-regression`` (o si cambia la cantidad de items); ``--json-out`` escribe el
+resumen que sirve como baseline.
+
+Uso:
+    python scripts/bench_scraper_replay.py record instagram.followers https://www.instagram.com/usuario/ --headed
+    python scripts/bench_scraper_replay.py replay instagram.followers --runs 3 --json-out bench_ig.json
+    python scripts/bench_scraper_replay.py replay instagram.followers --baseline bench_ig.json
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from paths import HAR_FIXTURES_DIR
+from src.scrapers.har_replay import HarRecorder, HarReplayRouter
+from src.utils.metrics import get_metrics_registry
+from src.utils.url import extract_username_from_url
+
+# escenario -> (plataforma, módulo, función, list_type de scrap_list_network_scrapling)
+SCENARIOS = {
+    'instagram.followers': ('instagram', 'src.scrapers.instagram.lists', 'scrap_seguidores', None),
+    'instagram.following': ('instagram', 'src.scrapers.instagram.lists', 'scrap_seguidos', None),
+    'x.followers': ('x', 'src.scrapers.x.lists', 'scrap_seguidores', None),
+    'x.following': ('x', 'src.scrapers.x.lists', 'scrap_seguidos', None),
+    'facebook.friends': ('facebook', 'src.scrapers.facebook.scrapling_spider', 'scrap_list_network_scrapling', 'friends_all'),
+    'facebook.followers': ('facebook', 'src.scrapers.facebook.scrapling_spider', 'scrap_list_network_scrapling', 'followers'),
+    'facebook.following': ('facebook', 'src.scrapers.facebook.scrapling_spider', 'scrap_list_network_scrapling', 'followed'),
+}
+
+STORAGE_STATES = {
+    'instagram': 'data/storage/instagram_storage_state.json',
+    'x': 'data/storage/x_storage_state.json',
+    'facebook': 'data/storage/facebook_storage_state.json',
+}
+
+# Mensajes de routing: los genera el propio replay, no el scraper
+_ROUTE_METHODS = {'fulfill', 'abort', 'continue'}
+
+
+class IpcCounter:
+    """Cuenta mensajes cliente -> driver de Playwright (evaluate, querySelector, wheel...).
+
+    Parchea ``Connection._send_message_to_server`` (API interna); si cambia entre
+    versiones de Playwright el conteo queda en None y el benchmark sigue.
+    """
+
+    def __init__(self):
+        self.by_method: Counter = Counter()
+        self.available = False
+        self._orig = None
+
+    def __enter__(self) -> 'IpcCounter':
+        try:
+            from playwright._impl._connection import Connection
+        except ImportError:
+            return self
+        orig = getattr(Connection, '_send_message_to_server', None)
+        if orig is None:
+            return self
+        by_method = self.by_method
+
+        def counted(conn, obj, method, *args, **kwargs):
+            by_method[method] += 1
+            return orig(conn, obj, method, *args, **kwargs)
+
+        self._orig = orig
+        Connection._send_message_to_server = counted
+        self.available = True
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self._orig is not None:
+            from playwright._impl._connection import Connection
+            Connection._send_message_to_server = self._orig
+
+    def calls(self) -> Optional[int]:
+        if not self.available:
+            return None
+        return sum(n for method, n in self.by_method.items() if method not in _ROUTE_METHODS)
+
+
+def _scroll_iterations() -> float:
+    metric = get_metrics_registry().get('scr4per_scroll_iterations_total')
+    return sum(value for _, _, value in metric.samples()) if metric is not None else 0.0
+
+
+async def run_scenario(name: str, page, profile_url: str) -> List[dict]:
+    platform, module, func, list_type = SCENARIOS[name]
+    fn = getattr(importlib.import_module(module), func)
+    if list_type is not None:
+        return await fn(page, profile_url, list_type)
+    username = extract_username_from_url(platform, profile_url) or profile_url
+    return await fn(page, profile_url, username)
+
+
+async def _launch(pw, headless: bool):
+    from src.scrapers.browser_pool import LAUNCH_ARGS
+    return await pw.chromium.launch(headless=headless, args=LAUNCH_ARGS)
+
+
+async def record(args) -> None:
+    from playwright.async_api import async_playwright
+
+    platform = SCENARIOS[args.scenario][0]
+    out_dir = os.path.join(args.fixtures_dir, args.scenario)
+    recorder = HarRecorder(out_dir)
+    storage_state = args.storage_state or STORAGE_STATES[platform]
+    async with async_playwright() as pw:
+        browser = await _launch(pw, headless=not args.headed)
+        context = await browser.new_context(
+            storage_state=storage_state if os.path.exists(storage_state) else None,
+            **recorder.context_options(),
+        )
+        page = await context.new_page()
+        t0 = time.perf_counter()
+        with IpcCounter() as ipc:
+            items = await run_scenario(args.scenario, page, args.profile_url)
+        wall_s = time.perf_counter() - t0
+        await recorder.snapshot(page, 'end')
+        # El HAR se escribe al cerrar el contexto
+        await context.close()
+        await browser.close()
+    meta_path = recorder.write_meta(
+        scenario=args.scenario, platform=platform, profile_url=args.profile_url,
+        items=len(items), wall_s=round(wall_s, 3), ipc_calls=ipc.calls(),
+    )
+    with open(os.path.join(out_dir, 'items.json'), 'w', encoding='utf-8') as f:
+        json.dump(items, f, ensure_ascii=False, indent=1, default=str)
+    print(f"recorded scenario={args.scenario} items={len(items)} wall_s={wall_s:.2f} meta={meta_path}")
+
+
+async def replay(args) -> Dict[str, Any]:
+    from playwright.async_api import async_playwright
+
+    fixture_dir = os.path.join(args.fixtures_dir, args.scenario)
+    router = HarReplayRouter.load(fixture_dir, latency_scale=args.latency_scale)
+    profile_url = router.meta['profile_url']
+    runs: List[Dict[str, Any]] = []
+    async with async_playwright() as pw:
+        browser = await _launch(pw, headless=True)
+        for i in range(max(1, args.runs)):
+            router.reset()
+            context = await browser.new_context(**router.context_options())
+            await router.install(context)
+            page = await context.new_page()
+            scrolls_before = _scroll_iterations()
+            t0 = time.perf_counter()
+            with IpcCounter() as ipc:
+                items = await run_scenario(args.scenario, page, profile_url)
+            wall_s = time.perf_counter() - t0
+            await context.close()
+            run = {
+                'wall_s': round(wall_s, 3),
+                'items': len(items),
+                'items_per_s': round(len(items) / wall_s, 2) if wall_s > 0 else 0.0,
+                'ipc_calls': ipc.calls(),
+                'scroll_iterations': int(_scroll_iterations() - scrolls_before),
+                **router.stats(),
+            }
+            runs.append(run)
+            print(
+                f"run={i + 1} wall_s={run['wall_s']:.2f} items={run['items']} items_per_s={run['items_per_s']:.1f} "
+                f"ipc_calls={run['ipc_calls']} scrolls={run['scroll_iterations']} "
+                f"har_hits={run['hits']} har_misses={run['misses']} snapshot_hits={run['snapshot_hits']}"
+            )
+            if args.top_ipc and ipc.available:
+                top = ', '.join(f"{m}={n}" for m, n in ipc.by_method.most_common(args.top_ipc))
+                print(f"  ipc_top {top}")
+        await browser.close()
+
+    def median(key):
+        values = [r[key] for r in runs if r[key] is not None]
+        return statistics.median(values) if values else None
+
+    summary = {
+        'scenario': args.scenario,
+        'runs': len(runs),
+        'recorded_items': router.meta.get('items'),
+        'items': median('items'),
+        'wall_s': median('wall_s'),
+        'items_per_s': median('items_per_s'),
+        'ipc_calls': median('ipc_calls'),
+        'scroll_iterations': median('scroll_iterations'),
+        'har_misses': median('misses'),
+        'missed_urls': runs[-1]['missed_urls'],
+    }
+    print(json.dumps({k: v for k, v in summary.items() if k != 'missed_urls'}))
+    if runs[-1]['misses']:
+        print(f"har misses (primeras): {runs[-1]['missed_urls']}")
+    return summary
+
+
+def compare(summary: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    failures = []
+    if baseline.get('items') is not None and summary['items'] != baseline['items']:
+        failures.append(f"items {summary['items']} != baseline {baseline['items']}")
+    if baseline.get('items_per_s') and summary['items_per_s'] < baseline['items_per_s'] * (1 - max_regression):
+        failures.append(f"items_per_s {summary['items_per_s']} < baseline {baseline['items_per_s']} -{max_regression:.0%}")
+    if baseline.get('ipc_calls') and summary['ipc_calls'] is not None \
+            and summary['ipc_calls'] > baseline['ipc_calls'] * (1 + max_regression):
+        failures.append(f"ipc_calls {summary['ipc_calls']} > baseline {baseline['ipc_calls']} +{max_regression:.0%}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de scrapers con grabación/replay de HAR (sin red)")
+    parser.add_argument('mode', choices=('record', 'replay'))
+    parser.add_argument('scenario', choices=sorted(SCENARIOS))
+    parser.add_argument('profile_url', nargs='?', help='Perfil a scrapear (sólo record)')
+    parser.add_argument('--fixtures-dir', default=HAR_FIXTURES_DIR)
+    parser.add_argument('--storage-state', help='storage_state de la sesión (record; default: data/storage/<plataforma>_storage_state.json)')
+    parser.add_argument('--headed', action='store_true', help='Navegador visible al grabar')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--latency-scale', type=float, default=0.0,
+                        help='Replay: fracción de la latencia grabada a reproducir (0 = sin espera, determinista)')
+    parser.add_argument('--top-ipc', type=int, default=0, help='Replay: métodos IPC más frecuentes a listar por corrida')
+    parser.add_argument('--json-out', help='Replay: escribir el resumen (sirve como --baseline)')
+    parser.add_argument('--baseline', help='Replay: resumen previo contra el que comparar')
+    parser.add_argument('--max-regression', type=float, default=0.25)
+    args = parser.parse_args()
+
+    if args.mode == 'record':
+        if not args.profile_url:
+            parser.error('record requiere profile_url')
+        asyncio.run(record(args))
+        return
+
+    summary = asyncio.run(replay(args))
+    if args.json_out:
+        with open(args.json_out, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            failures = compare(summary, json.load(f), args.max_regression)
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        if failures:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""Presupuesto de arranque del API: tiempo de import, RSS base y módulos pesados.
+
+Importa ``api.main`` (que construye la app con todos los routers) en procesos
+nuevos y mide:
+
+- tiempo de import acumulado según ``python -X importtime`` y los paquetes que más pesan
+- tiempo de arranque (wall) y RSS máximo del proceso (mediana de ``--runs``)
+- módulos pesados cargados en el arranque: Playwright, SQLAlchemy, pandas, openpyxl,
+  pyarrow, Pillow y los scrapers deben importarse al primer uso, no al levantar un worker
+
+Sale con código 1 si se supera ``--budget-ms`` (env ``IMPORT_TIME_BUDGET_MS``) o si
+se carga algún módulo de ``HEAVY_MODULES``; sirve como chequeo en CI.
+
+Uso:
+    python scripts/check_import_time.py
+    python scripts/check_import_time.py --budget-ms 900 --runs 5 --top 15
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+IMPORT_TIME_BUDGET_MS = float(os.getenv('IMPORT_TIME_BUDGET_MS') or 1000)
+
+# Sólo deben cargarse al primer uso (scraping, pool de cuentas, export, miniaturas)
+HEAVY_MODULES = (
+    'playwright',
+    'sqlalchemy',
+    'db.models',
+    'pandas',
+    'openpyxl',
+    'pyarrow',
+    'PIL',
+    'src.scrapers.facebook.scraper',
+    'src.scrapers.instagram.scraper',
+    'src.scrapers.x.scraper',
+)
+
+_PROBE = """
+import json, resource, sys, time
+t0 = time.perf_counter()
+import api.main
+elapsed = time.perf_counter() - t0
+print(json.dumps({
+    'boot_ms': elapsed * 1000,
+    'maxrss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'modules': sorted(sys.modules),
+}))
+"""
+
+
+def _env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env['PYTHONPATH'] = REPO_ROOT + os.pathsep + env.get('PYTHONPATH', '')
+    # db.py arma la URL de SQLAlchemy al importar; no se conecta
+    env.setdefault('POSTGRES_USER', 'import_check')
+    env.setdefault('POSTGRES_PASSWORD', 'import_check')
+    return env
+
+
+def import_times() -> List[Tuple[int, int, str]]:
+    """[(self_us, cumulative_us, módulo), ...] de ``-X importtime`` al importar api.main."""
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import api.main'],
+        cwd=REPO_ROOT, env=_env(), capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr[-4000:])
+        sys.exit(2)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        # Tras el '|' va un espacio y luego 2 espacios por nivel de anidamiento
+        rows.append((int(self_us), int(cumulative_us), name[1:].rstrip()))
+    return rows
+
+
+def total_import_ms(rows: List[Tuple[int, int, str]]) -> float:
+    """Acumulado de los imports de nivel superior (ms)."""
+    return sum(cumulative_us for _, cumulative_us, name in rows if not name.startswith(' ')) / 1000
+
+
+def probe() -> Dict[str, object]:
+    proc = subprocess.run([sys.executable, '-c', _PROBE], cwd=REPO_ROOT, env=_env(),
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr[-4000:])
+        sys.exit(2)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chequeo de tiempo de import / RSS del arranque del API")
+    parser.add_argument('--budget-ms', type=float, default=IMPORT_TIME_BUDGET_MS)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=12, help='Paquetes (por tiempo propio) a listar')
+    args = parser.parse_args()
+
+    rows = import_times()
+    total_ms = total_import_ms(rows)
+    # Por paquete: suma del tiempo propio
+    by_package: Dict[str, int] = {}
+    for self_us, _cumulative_us, name in rows:
+        package = name.strip().split('.')[0]
+        by_package[package] = by_package.get(package, 0) + self_us
+
+    probes = [probe() for _ in range(max(1, args.runs))]
+    boot_ms = statistics.median(p['boot_ms'] for p in probes)
+    rss_mb = statistics.median(p['maxrss_kb'] for p in probes) / 1024
+    loaded = set(probes[-1]['modules'])
+    heavy = [m for m in HEAVY_MODULES if m in loaded]
+
+    print(f"import_total_ms={total_ms:.0f} budget_ms={args.budget_ms:.0f}")
+    print(f"boot_ms_median={boot_ms:.0f} maxrss_mb_median={rss_mb:.1f} modules={len(loaded)}")
+    for package, us in sorted(by_package.items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"  {package:28s} {us / 1000:8.1f} ms")
+    print(f"heavy_modules_loaded={','.join(heavy) or 'none'}")
+
+    if heavy or total_ms > args.budget_ms:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
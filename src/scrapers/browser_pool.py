@@ -0,0 +1,391 @@
+"""Pool de navegadores Chromium compartido por todo el proceso.
+
+Evita lanzar/cerrar un Chromium (y un driver de Playwright) por cada request:
+routers, adapters y el orquestador toman prestado un navegador caliente con
+``lease()`` y lo devuelven al terminar.
+
+Reglas:
+ - Un pool por (plataforma, headless) con tamaño configurable por plataforma
+   (``browser_pool.size`` vía overrides / ``IG_BROWSER_POOL_SIZE``...) o global (``BROWSER_POOL_SIZE``).
+ - Un navegador atiende hasta ``browser_pool.leases_per_browser`` leases a la vez
+   (``BROWSER_POOL_LEASES_PER_BROWSER``): cada trabajo abre sus propios contextos, que son
+   la unidad de aislamiento. Capacidad del pool = size * leases_per_browser.
+ - Health check en cada checkout/checkin (``is_connected``); navegadores caídos se descartan.
+ - Reciclaje tras ``browser_pool.max_contexts`` contextos creados (deja de recibir leases
+   y se cierra cuando termina el último).
+ - Métricas vía ``stats()`` (expuestas en ``GET /pool/browsers``).
+
+Uso:
+    async with get_browser_pool().lease('facebook', headless=True) as browser:
+        context = await browser.new_context(...)
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from src.scrapers import config_runtime
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 2
+# >= GLOBAL_SEMAPHORE de api.routers.analyze: un solo navegador admite todos los análisis en vuelo
+DEFAULT_LEASES_PER_BROWSER = 3
+DEFAULT_MAX_CONTEXTS = 50
+DEFAULT_LEASE_TIMEOUT_S = 300.0
+
+LAUNCH_ARGS = [
+    "--disable-blink-features=AutomationControlled",
+    "--disable-dev-shm-usage",
+    "--no-sandbox",
+    "--disable-setuid-sandbox",
+    "--disable-gpu",
+    "--disable-software-rasterizer",
+    "--disable-extensions",
+    "--disable-infobars",
+    "--disable-background-networking",
+    "--disable-background-timer-throttling",
+    "--disable-backgrounding-occluded-windows",
+    "--disable-breakpad",
+    "--disable-component-extensions-with-background-pages",
+    "--disable-features=TranslateUI,BlinkGenPropertyTrees,IsolateOrigins,site-per-process",
+    "--disable-ipc-flooding-protection",
+    "--disable-renderer-backgrounding",
+    "--enable-features=NetworkService,NetworkServiceInProcess",
+    "--force-color-profile=srgb",
+    "--metrics-recording-only",
+    "--no-first-run",
+    "--safebrowsing-disable-auto-update",
+    "--password-store=basic",
+    "--use-mock-keychain",
+    "--disable-accelerated-2d-canvas",
+    "--disable-accelerated-jpeg-decoding",
+    "--disable-accelerated-mjpeg-decode",
+    "--disable-accelerated-video-decode",
+]
+
+PoolKey = Tuple[str, bool]
+
+# Singleton instance
+_browser_pool_instance: Optional['BrowserPool'] = None
+
+
+def _env_int(name: str) -> Optional[int]:
+    val = os.getenv(name)
+    if val is None or not val.strip().isdigit():
+        return None
+    return int(val)
+
+
+class _PooledBrowser:
+    __slots__ = ("browser", "key", "contexts_served", "launched_at", "last_used_at", "active", "retired")
+
+    def __init__(self, browser, key: PoolKey):
+        self.browser = browser
+        self.key = key
+        self.contexts_served = 0
+        self.launched_at = time.time()
+        self.last_used_at = self.launched_at
+        self.active = 0
+        # Retirado (caído o reciclado): no recibe leases nuevos; se cierra con el último checkin
+        self.retired = False
+
+    def is_healthy(self) -> bool:
+        try:
+            return bool(self.browser.is_connected())
+        except Exception:
+            return False
+
+
+class LeasedBrowser:
+    """Proxy fino sobre ``playwright.Browser`` entregado por ``BrowserPool.lease``.
+
+    Cuenta los contextos creados (para el reciclaje) y convierte ``close()`` en no-op:
+    el ciclo de vida del navegador pertenece al pool.
+    """
+
+    def __init__(self, entry: _PooledBrowser):
+        self._entry = entry
+
+    @property
+    def raw(self):
+        return self._entry.browser
+
+    async def new_context(self, **kwargs: Any):
+        self._entry.contexts_served += 1
+        return await self._entry.browser.new_context(**kwargs)
+
+    async def close(self) -> None:
+        return
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._entry.browser, name)
+
+
+class BrowserPool:
+    """Pool de navegadores Chromium por (plataforma, headless)."""
+
+    def __init__(
+        self,
+        *,
+        default_size: Optional[int] = None,
+        max_contexts: Optional[int] = None,
+        leases_per_browser: Optional[int] = None,
+        lease_timeout_s: float = DEFAULT_LEASE_TIMEOUT_S,
+    ) -> None:
+        self.default_size = default_size or _env_int("BROWSER_POOL_SIZE") or DEFAULT_POOL_SIZE
+        self.max_contexts = max_contexts or _env_int("BROWSER_POOL_MAX_CONTEXTS") or DEFAULT_MAX_CONTEXTS
+        self.leases_per_browser = (
+            leases_per_browser or _env_int("BROWSER_POOL_LEASES_PER_BROWSER") or DEFAULT_LEASES_PER_BROWSER
+        )
+        self.lease_timeout_s = lease_timeout_s
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pw = None
+        self._pw_lock: Optional[asyncio.Lock] = None
+        self._browsers: Dict[PoolKey, List[_PooledBrowser]] = {}
+        self._leased: Dict[PoolKey, int] = {}
+        self._slots: Dict[PoolKey, asyncio.Semaphore] = {}
+        self._checkout_locks: Dict[PoolKey, asyncio.Lock] = {}
+        self._sizes: Dict[PoolKey, int] = {}
+        self._counters: Dict[str, float] = {}
+        self._reset_counters()
+
+    # ------------------------------ Config -----------------------------------
+    def size_for(self, platform: str) -> int:
+        try:
+            size = int(config_runtime.get(platform, 'browser_pool.size', self.default_size) or self.default_size)
+        except Exception:
+            size = self.default_size
+        return max(1, size)
+
+    def leases_per_browser_for(self, platform: str) -> int:
+        try:
+            per = int(config_runtime.get(platform, 'browser_pool.leases_per_browser', self.leases_per_browser)
+                      or self.leases_per_browser)
+        except Exception:
+            per = self.leases_per_browser
+        return max(1, per)
+
+    def max_contexts_for(self, platform: str) -> int:
+        try:
+            return max(1, int(config_runtime.get(platform, 'browser_pool.max_contexts', self.max_contexts) or self.max_contexts))
+        except Exception:
+            return self.max_contexts
+
+    # ------------------------------ Lease ------------------------------------
+    @asynccontextmanager
+    async def lease(self, platform: str = 'default', *, headless: bool = True, prefer=None) -> AsyncIterator[LeasedBrowser]:
+        """Presta un navegador caliente; lo devuelve (o recicla) al salir del bloque.
+
+        El navegador puede estar atendiendo otros leases a la vez: usar contextos propios
+        (``new_context`` / ``ContextCache``), nunca los de otro trabajo.
+
+        ``prefer``: navegador a priorizar si tiene cupo (afinidad con contextos cacheados).
+        """
+        self._bind_loop()
+        key: PoolKey = ((platform or 'default').lower(), bool(headless))
+        slots = self._slots_for(key)
+        t0 = time.perf_counter()
+        try:
+            await asyncio.wait_for(slots.acquire(), timeout=self.lease_timeout_s)
+        except asyncio.TimeoutError:
+            self._counters['lease_timeouts'] += 1
+            logger.error(f"browser_pool.lease_timeout platform={key[0]} headless={key[1]} timeout_s={self.lease_timeout_s}")
+            raise
+        wait_ms = (time.perf_counter() - t0) * 1000.0
+        self._counters['leases'] += 1
+        self._counters['lease_wait_ms_total'] += wait_ms
+        self._counters['lease_wait_ms_max'] = max(self._counters['lease_wait_ms_max'], wait_ms)
+        entry: Optional[_PooledBrowser] = None
+        try:
+            entry = await self._checkout(key, prefer)
+            self._leased[key] = self._leased.get(key, 0) + 1
+            logger.info(
+                f"browser_pool.lease platform={key[0]} headless={key[1]} wait_ms={wait_ms:.0f} "
+                f"contexts_served={entry.contexts_served} browser={id(entry.browser)}"
+            )
+            yield LeasedBrowser(entry)
+        finally:
+            if entry is not None:
+                self._leased[key] = max(0, self._leased.get(key, 0) - 1)
+                await self._checkin(entry)
+            slots.release()
+
+    async def _checkout(self, key: PoolKey, prefer=None) -> _PooledBrowser:
+        # El lock evita que dos checkouts simultáneos lancen dos navegadores cuando basta uno
+        lock = self._checkout_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            per_browser = self.leases_per_browser_for(key[0])
+            browsers = self._browsers.setdefault(key, [])
+            for entry in list(browsers):
+                if not entry.is_healthy():
+                    self._counters['crashed'] += 1
+                    logger.warning(f"browser_pool.discard_unhealthy platform={key[0]} browser={id(entry.browser)}")
+                    await self._retire(entry)
+            available = [e for e in browsers if e.active < per_browser]
+            entry = None
+            if prefer is not None:
+                entry = next((e for e in available if e.browser is prefer), None)
+            if entry is None and available:
+                # El menos cargado (reparte los trabajos entre navegadores ya lanzados)
+                entry = min(available, key=lambda e: e.active)
+            if entry is None:
+                entry = await self._launch(key)
+                browsers.append(entry)
+            entry.active += 1
+            return entry
+
+    async def _checkin(self, entry: _PooledBrowser) -> None:
+        key = entry.key
+        entry.active = max(0, entry.active - 1)
+        entry.last_used_at = time.time()
+        if not entry.retired:
+            if not entry.is_healthy():
+                self._counters['crashed'] += 1
+                logger.warning(f"browser_pool.crashed platform={key[0]} browser={id(entry.browser)}")
+                await self._retire(entry)
+            elif entry.contexts_served >= self.max_contexts_for(key[0]):
+                self._counters['recycled'] += 1
+                logger.info(f"browser_pool.recycle platform={key[0]} contexts_served={entry.contexts_served}")
+                await self._retire(entry)
+        elif not entry.active:
+            await self._close_entry(entry)
+
+    async def _retire(self, entry: _PooledBrowser) -> None:
+        """Saca el navegador del pool; se cierra ya si nadie lo usa, si no con el último checkin."""
+        entry.retired = True
+        browsers = self._browsers.get(entry.key, [])
+        if entry in browsers:
+            browsers.remove(entry)
+        if not entry.active:
+            await self._close_entry(entry)
+
+    # --------------------------- Lifecycle -----------------------------------
+    async def _ensure_playwright(self):
+        if self._pw is not None:
+            return self._pw
+        if self._pw_lock is None:
+            self._pw_lock = asyncio.Lock()
+        async with self._pw_lock:
+            if self._pw is None:
+                from playwright.async_api import async_playwright
+                self._pw = await async_playwright().start()
+        return self._pw
+
+    async def _launch(self, key: PoolKey) -> _PooledBrowser:
+        pw = await self._ensure_playwright()
+        t0 = time.perf_counter()
+        browser = await pw.chromium.launch(headless=key[1], args=LAUNCH_ARGS)
+        launch_ms = (time.perf_counter() - t0) * 1000.0
+        self._counters['launched'] += 1
+        self._counters['launch_ms_total'] += launch_ms
+        logger.info(f"browser_pool.launch platform={key[0]} headless={key[1]} launch_ms={launch_ms:.0f} browser={id(browser)}")
+        return _PooledBrowser(browser, key)
+
+    async def _close_entry(self, entry: _PooledBrowser) -> None:
+        try:
+            await entry.browser.close()
+        except Exception as e:
+            logger.debug(f"browser_pool.close_error platform={entry.key[0]} err={e}")
+
+    async def close(self) -> None:
+        """Cierra todos los navegadores y detiene el driver de Playwright."""
+        for entries in self._browsers.values():
+            while entries:
+                await self._close_entry(entries.pop())
+        if self._pw is not None:
+            try:
+                await self._pw.stop()
+            except Exception as e:
+                logger.debug(f"browser_pool.pw_stop_error err={e}")
+            self._pw = None
+        logger.info("browser_pool.closed")
+
+    def _bind_loop(self) -> None:
+        """Los objetos de Playwright están atados a un event loop; si cambia, se descarta el estado."""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        if self._loop is not None:
+            logger.warning("browser_pool.loop_changed resetting state")
+        self._loop = loop
+        self._pw = None
+        self._pw_lock = None
+        self._browsers = {}
+        self._leased = {}
+        self._slots = {}
+        self._checkout_locks = {}
+        self._sizes = {}
+
+    def _slots_for(self, key: PoolKey) -> asyncio.Semaphore:
+        slots = self._slots.get(key)
+        if slots is None:
+            size = self.size_for(key[0])
+            slots = asyncio.Semaphore(size * self.leases_per_browser_for(key[0]))
+            self._slots[key] = slots
+            self._sizes[key] = size
+        return slots
+
+    # ------------------------------ Metrics ----------------------------------
+    def _reset_counters(self) -> None:
+        self._counters = {
+            'leases': 0,
+            'lease_timeouts': 0,
+            'lease_wait_ms_total': 0.0,
+            'lease_wait_ms_max': 0.0,
+            'launched': 0,
+            'launch_ms_total': 0.0,
+            'recycled': 0,
+            'crashed': 0,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        c = self._counters
+        pools: Dict[str, Dict[str, Any]] = {}
+        for key, size in self._sizes.items():
+            browsers = self._browsers.get(key, [])
+            pools[f"{key[0]}:{'headless' if key[1] else 'headed'}"] = {
+                'size': size,
+                'leases_per_browser': self.leases_per_browser_for(key[0]),
+                'browsers': len(browsers),
+                'idle': sum(1 for e in browsers if not e.active),
+                'leased': self._leased.get(key, 0),
+                'contexts_served': sum(e.contexts_served for e in browsers),
+            }
+        return {
+            'pools': pools,
+            'leases': int(c['leases']),
+            'lease_timeouts': int(c['lease_timeouts']),
+            'lease_wait_ms_avg': round(c['lease_wait_ms_total'] / c['leases'], 1) if c['leases'] else 0.0,
+            'lease_wait_ms_max': round(c['lease_wait_ms_max'], 1),
+            'launched': int(c['launched']),
+            'launch_ms_avg': round(c['launch_ms_total'] / c['launched'], 1) if c['launched'] else 0.0,
+            'recycled': int(c['recycled']),
+            'crashed': int(c['crashed']),
+            'max_contexts': self.max_contexts,
+        }
+
+
+def get_browser_pool() -> BrowserPool:
+    """
+    Get singleton browser pool instance.
+
+    Returns:
+        BrowserPool instance
+    """
+    global _browser_pool_instance
+    if _browser_pool_instance is None:
+        _browser_pool_instance = BrowserPool()
+    return _browser_pool_instance
+
+
+__all__ = [
+    'BrowserPool',
+    'LeasedBrowser',
+    'LAUNCH_ARGS',
+    'get_browser_pool',
+]
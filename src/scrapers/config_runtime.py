@@ -51,6 +51,9 @@ def _env_overrides() -> Dict[str, Dict[str, Any]]:
             'IG_TIMEOUT_LIST_MS': 'timeouts.list_ms',
             'IG_MAX_POSTS': 'posts.max_posts',
             'IG_STORAGE_STATE': 'storage_state_path',
+            'IG_BROWSER_POOL_SIZE': 'browser_pool.size',
+            'IG_BROWSER_POOL_MAX_CONTEXTS': 'browser_pool.max_contexts',
+            'IG_BROWSER_POOL_LEASES_PER_BROWSER': 'browser_pool.leases_per_browser',
         },
         'facebook': {
             'FB_MAX_SCROLLS': 'scroll.max_scrolls',
@@ -58,6 +61,9 @@ def _env_overrides() -> Dict[str, Dict[str, Any]]:
             'FB_TIMEOUT_LIST_MS': 'timeouts.list_ms',
             'FB_MAX_POSTS': 'posts.max_posts',
             'FB_STORAGE_STATE': 'storage_state_path',
+            'FB_BROWSER_POOL_SIZE': 'browser_pool.size',
+            'FB_BROWSER_POOL_MAX_CONTEXTS': 'browser_pool.max_contexts',
+            'FB_BROWSER_POOL_LEASES_PER_BROWSER': 'browser_pool.leases_per_browser',
         },
         'x': {
             'X_MAX_SCROLLS': 'scroll.max_scrolls',
@@ -65,6 +71,9 @@ def _env_overrides() -> Dict[str, Dict[str, Any]]:
             'X_TIMEOUT_LIST_MS': 'timeouts.list_ms',
             'X_MAX_POSTS': 'posts.max_posts',
             'X_STORAGE_STATE': 'storage_state_path',
+            'X_BROWSER_POOL_SIZE': 'browser_pool.size',
+            'X_BROWSER_POOL_MAX_CONTEXTS': 'browser_pool.max_contexts',
+            'X_BROWSER_POOL_LEASES_PER_BROWSER': 'browser_pool.leases_per_browser',
         },
     }
 
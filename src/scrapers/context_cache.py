@@ -0,0 +1,307 @@
+"""Cache de BrowserContext pre-autenticados por cuenta del pool.
+
+Cada fase (perfil, seguidores, seguidos, engagement...) abría un ``new_context``
+desde ``storage_state``: re-parseo de cookies, re-inyección del init script y
+caché HTTP fría en cada fase. Este módulo mantiene un contexto logueado por
+``ScraperAccount.id`` y entrega páginas nuevas dentro de él.
+
+Reglas:
+ - Un contexto vive en el navegador que lo creó; sólo se reutiliza si el lease actual
+   es ese mismo navegador. El navegador puede estar prestado a varios trabajos a la vez,
+   pero cada cuenta tiene su propio contexto (y su lock), así que nadie toca uno ajeno.
+ - Entre fases se cierran las páginas (rutas, modales y DOM se van con ellas); cookies y caché se conservan.
+ - Evicción por: sesión expirada/baneada (``invalidate``), TTL de inactividad,
+   cambio de storage_state / context_opts / init script, navegador caído o exceso de entradas (LRU).
+ - Un contexto con páginas prestadas nunca se cierra bajo los pies de otra fase: si hay que
+   reemplazarlo se retira del cache y se cierra cuando se devuelve su última página.
+
+Uso:
+    cache = get_context_cache()
+    context, page = await cache.open_page(browser, account_id, storage_state, context_opts=CONTEXT_OPTS)
+    try:
+        ...
+    finally:
+        await cache.release_page(account_id, page)
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from src.scrapers.list_collector import COLLECTOR_INIT_SCRIPT
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_IDLE_TTL_S = 600.0
+DEFAULT_MAX_ENTRIES = 16
+
+STEALTH_INIT_SCRIPT = """
+    Object.defineProperty(navigator, 'webdriver', {get: () => undefined});
+    window.chrome = {runtime: {}};
+"""
+
+# Singleton instance
+_context_cache_instance: Optional['ContextCache'] = None
+
+
+def _raw_browser(browser):
+    """Devuelve el ``playwright.Browser`` real aunque venga envuelto por el pool."""
+    return getattr(browser, 'raw', browser)
+
+
+def _state_fingerprint(storage_state: Any, context_opts: Optional[Dict[str, Any]] = None,
+                       init_script: Optional[str] = None) -> str:
+    """Huella de todo lo que fija un contexto al crearse: cookies, opciones (UA, locale, viewport) e init script."""
+    if isinstance(storage_state, str):
+        try:
+            mtime = os.path.getmtime(storage_state)
+        except OSError:
+            mtime = 0
+        state = f"path:{storage_state}:{mtime}"
+    else:
+        try:
+            raw = json.dumps(storage_state, sort_keys=True, default=str)
+        except Exception:
+            raw = repr(storage_state)
+        state = hashlib.sha1(raw.encode('utf-8')).hexdigest()
+    # Adapters (api.services.adapters) y orquestador usan CONTEXT_OPTS distintos y sólo
+    # el orquestador inyecta el stealth script: no deben compartir contexto
+    opts = json.dumps(context_opts or {}, sort_keys=True, default=str) + '\0' + (init_script or '')
+    return f"{state}:{hashlib.sha1(opts.encode('utf-8')).hexdigest()[:16]}"
+
+
+class _CachedContext:
+    __slots__ = ("context", "browser", "fingerprint", "created_at", "last_used_at", "pages_served", "in_use")
+
+    def __init__(self, context, browser, fingerprint: str):
+        self.context = context
+        self.browser = browser
+        self.fingerprint = fingerprint
+        self.created_at = time.time()
+        self.last_used_at = self.created_at
+        self.pages_served = 0
+        self.in_use = 0
+
+    def is_alive(self) -> bool:
+        try:
+            return bool(self.browser.is_connected())
+        except Exception:
+            return False
+
+
+class ContextCache:
+    """Contextos logueados por cuenta, con TTL de inactividad y tope LRU."""
+
+    def __init__(self, *, idle_ttl_s: Optional[float] = None, max_entries: Optional[int] = None) -> None:
+        self.idle_ttl_s = idle_ttl_s or float(os.getenv('CONTEXT_CACHE_IDLE_TTL_S') or DEFAULT_IDLE_TTL_S)
+        self.max_entries = max_entries or int(os.getenv('CONTEXT_CACHE_MAX_ENTRIES') or DEFAULT_MAX_ENTRIES)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._entries: "OrderedDict[Hashable, _CachedContext]" = OrderedDict()
+        # Reemplazados mientras tenían páginas en uso: se cierran en el último release_page
+        self._retired: List[_CachedContext] = []
+        self._locks: Dict[Hashable, asyncio.Lock] = {}
+        self._counters: Dict[str, int] = {
+            'hits': 0,
+            'misses': 0,
+            'pages_served': 0,
+            'evicted_ttl': 0,
+            'evicted_stale': 0,
+            'evicted_dead': 0,
+            'evicted_lru': 0,
+            'invalidated': 0,
+            'retired': 0,
+        }
+
+    def browser_for(self, key: Optional[Hashable]):
+        """Navegador que aloja el contexto cacheado de ``key`` (para afinidad en ``BrowserPool.lease``)."""
+        entry = self._entries.get(key) if key is not None else None
+        return entry.browser if entry and entry.is_alive() else None
+
+    async def open_page(
+        self,
+        browser,
+        key: Hashable,
+        storage_state: Any,
+        *,
+        context_opts: Optional[Dict[str, Any]] = None,
+        init_script: Optional[str] = None,
+    ) -> Tuple[Any, Any]:
+        """Devuelve ``(context, page)`` con una página nueva dentro del contexto cacheado de ``key``."""
+        self._bind_loop()
+        await self.sweep()
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            entry = await self._get_or_create(browser, key, storage_state, context_opts or {}, init_script)
+            try:
+                page = await entry.context.new_page()
+            except Exception as e:
+                # Contexto roto (crash de renderer, cierre externo): recrear una vez
+                logger.warning(f"ctxcache.page_error key={key} err={e}")
+                self._counters['evicted_dead'] += 1
+                await self._evict_or_retire(key)
+                entry = await self._get_or_create(browser, key, storage_state, context_opts or {}, init_script)
+                page = await entry.context.new_page()
+            entry.last_used_at = time.time()
+            entry.in_use += 1
+            entry.pages_served += 1
+            self._counters['pages_served'] += 1
+            return entry.context, page
+
+    async def release_page(self, key: Hashable, page) -> None:
+        """Cierra la página de la fase; el contexto (cookies, caché) queda caliente para la siguiente."""
+        context = getattr(page, 'context', None)
+        try:
+            await page.close()
+        except Exception:
+            pass
+        retired = next((e for e in self._retired if e.context is context), None) if context is not None else None
+        if retired is not None:
+            retired.in_use = max(0, retired.in_use - 1)
+            if not retired.in_use:
+                self._retired.remove(retired)
+                await self._close_entry(key, retired)
+            return
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        entry.last_used_at = time.time()
+        entry.in_use = max(0, entry.in_use - 1)
+        if entry.in_use:
+            return
+        try:
+            for leftover in list(entry.context.pages):
+                await leftover.close()
+        except Exception as e:
+            logger.debug(f"ctxcache.reset_error key={key} err={e}")
+
+    async def invalidate(self, key: Optional[Hashable], reason: str = '') -> None:
+        """Descarta el contexto de ``key`` (p.ej. sesión expirada o cuenta baneada)."""
+        if key is None or key not in self._entries:
+            return
+        self._counters['invalidated'] += 1
+        logger.info(f"ctxcache.invalidate key={key} reason={reason}")
+        await self._evict_or_retire(key)
+
+    async def sweep(self) -> None:
+        """Evicta contextos inactivos más allá del TTL o cuyo navegador murió."""
+        now = time.time()
+        for key, entry in list(self._entries.items()):
+            if not entry.is_alive():
+                self._counters['evicted_dead'] += 1
+                await self._evict(key)
+            elif not entry.in_use and now - entry.last_used_at > self.idle_ttl_s:
+                self._counters['evicted_ttl'] += 1
+                await self._evict(key)
+        # Con el navegador caído sus páginas ya no se devolverán limpiamente
+        self._retired = [e for e in self._retired if e.is_alive()]
+
+    async def close(self) -> None:
+        for key in list(self._entries.keys()):
+            await self._evict(key)
+        retired, self._retired = self._retired, []
+        for entry in retired:
+            await self._close_entry(None, entry)
+
+    def _bind_loop(self) -> None:
+        """Igual que el pool: los contextos pertenecen a un event loop; si cambia se olvidan."""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._entries = OrderedDict()
+        self._retired = []
+        self._locks = {}
+
+    async def _get_or_create(self, browser, key, storage_state, context_opts, init_script) -> _CachedContext:
+        raw = _raw_browser(browser)
+        fingerprint = _state_fingerprint(storage_state, context_opts, init_script)
+        entry = self._entries.get(key)
+        if entry is not None:
+            if not entry.is_alive():
+                self._counters['evicted_dead'] += 1
+                await self._evict(key)
+            elif entry.fingerprint != fingerprint or entry.browser is not raw:
+                # Cookies u opciones distintas (otro caller) o lease en otro navegador
+                self._counters['evicted_stale'] += 1
+                await self._evict_or_retire(key)
+            else:
+                self._counters['hits'] += 1
+                self._entries.move_to_end(key)
+                return entry
+        self._counters['misses'] += 1
+        context = await browser.new_context(storage_state=storage_state, **context_opts)
+        if init_script:
+            await context.add_init_script(init_script)
+        # Recolector de listas (MutationObserver) disponible en todas las páginas del contexto
+        await context.add_init_script(COLLECTOR_INIT_SCRIPT)
+        entry = _CachedContext(context, raw, fingerprint)
+        self._entries[key] = entry
+        logger.info(f"ctxcache.create key={key} ctx={id(context)} entries={len(self._entries)}")
+        # La entrada recién creada aún tiene in_use == 0 (open_page lo sube después): nunca es candidata
+        for old_key in [k for k, e in self._entries.items() if not e.in_use and k != key]:
+            if len(self._entries) <= self.max_entries:
+                break
+            self._counters['evicted_lru'] += 1
+            await self._evict(old_key)
+        return entry
+
+    async def _evict(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        await self._close_entry(key, entry)
+
+    async def _evict_or_retire(self, key: Hashable) -> None:
+        """Como ``_evict``, pero si el contexto tiene páginas en uso sólo lo saca del cache."""
+        entry = self._entries.get(key)
+        if entry is None or not entry.in_use:
+            await self._evict(key)
+            return
+        del self._entries[key]
+        self._retired.append(entry)
+        self._counters['retired'] += 1
+        logger.info(f"ctxcache.retire key={key} in_use={entry.in_use}")
+
+    async def _close_entry(self, key: Optional[Hashable], entry: _CachedContext) -> None:
+        try:
+            await entry.context.close()
+        except Exception:
+            pass
+        logger.info(f"ctxcache.evict key={key} pages_served={entry.pages_served}")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._counters['hits'] + self._counters['misses']
+        return {
+            'entries': len(self._entries),
+            'retired_open': len(self._retired),
+            'max_entries': self.max_entries,
+            'idle_ttl_s': self.idle_ttl_s,
+            'hit_ratio': round(self._counters['hits'] / lookups, 3) if lookups else 0.0,
+            **self._counters,
+        }
+
+
+def get_context_cache() -> ContextCache:
+    """
+    Get singleton context cache instance.
+
+    Returns:
+        ContextCache instance
+    """
+    global _context_cache_instance
+    if _context_cache_instance is None:
+        _context_cache_instance = ContextCache()
+    return _context_cache_instance
+
+
+__all__ = [
+    'ContextCache',
+    'STEALTH_INIT_SCRIPT',
+    'get_context_cache',
+]
@@ -5,11 +5,16 @@ from typing import Dict, List, Optional
 from urllib.parse import urljoin, urlparse
 
 from src.scrapers.facebook.config import FACEBOOK_CONFIG
+from src.scrapers.list_collector import ListCollector
+from src.scrapers.scrolling import ScrollReadiness
 from src.utils.list_parser import build_user_item
 from src.utils.url import normalize_input_url, absolute_url_keep_query
 
 logger = logging.getLogger(__name__)
 
+# Respuestas mayores a esto se parsean fuera del event loop
+GRAPHQL_THREAD_PARSE_BYTES = 256 * 1024
+
 
 async def _open_reactions_overlay(page) -> bool:
     """Encuentra y abre el disparador de reacciones visible con heurísticas de texto."""
@@ -281,7 +286,7 @@ async def get_profile_data_scrapling(page, profile_url: str) -> dict:
 async def scrap_list_network_scrapling(page, profile_url: str, list_type: str) -> List[dict]:
     """
     Scrapea una lista (followers, following, friends) usando:
-    1. Scroll + extracción DOM por JS (igual que extraer_usuarios_listado original)
+    1. Scroll + recolector DOM en página (MutationObserver, sólo tarjetas nuevas)
     2. Interception GraphQL como suplemento
     """
     INVALID_PATHS = [
@@ -304,31 +309,8 @@ async def scrap_list_network_scrapling(page, profile_url: str, list_type: str) -
     main_slug = normalize_input_url('facebook', profile_url).rstrip('/').split('facebook.com/')[-1].strip('/')
 
     extracted_users: dict = {}
-    graphql_responses: list = []
-
-    # JS batch extractor — mismo patrón que el scraper original
-    _JS_BATCH = '''
-    () => {
-      const root = document.querySelector('div[role="main"]') || document;
-      const anchors = Array.from(root.querySelectorAll('a[href]'));
-      const out = [];
-      for (const a of anchors) {
-        const href = a.getAttribute('href') || '';
-        if (!href || href.startsWith('javascript:') || href === '#') continue;
-        const text = (a.textContent || '').trim();
-        let img = '';
-        const cont = a.closest('div');
-        const imgel = cont
-          ? (cont.querySelector('img, image') || a.querySelector('img, image'))
-          : a.querySelector('img, image');
-        if (imgel) {
-          img = imgel.currentSrc || imgel.src || imgel.getAttribute('xlink:href') || '';
-        }
-        out.push({ href, text, img });
-      }
-      return out;
-    }
-    '''
+    graphql_stats = {'chunks': 0, 'users': 0}
+    pending_parses: set = set()
 
     def _process_dom_batch(raw_data: list):
         added = 0
@@ -369,66 +351,116 @@ async def scrap_list_network_scrapling(page, profile_url: str, list_type: str) -
                 continue
         return added
 
-    # Interceptar GraphQL en paralelo como suplemento
-    async def intercept_graphql(response):
-        if "graphql" in response.url.lower() and response.request.method == "POST":
+    # Interceptar GraphQL en paralelo: cada respuesta se lee y parsea una sola vez
+    # y sus usuarios se fusionan en extracted_users al llegar (no se acumulan payloads)
+    async def _parse_graphql(response):
+        try:
+            body = await response.body()
+        except Exception:
+            return
+        if b'"node"' not in body or not (b'Profile' in body or b'User' in body or b'"name"' in body):
+            return
+        if len(body) > GRAPHQL_THREAD_PARSE_BYTES:
+            docs = await asyncio.to_thread(_parse_graphql_documents, body)
+        else:
+            docs = _parse_graphql_documents(body)
+        before = len(extracted_users)
+        for doc in docs:
             try:
-                text = await response.text()
-                if "node" in text and ("Profile" in text or "User" in text or "name" in text):
-                    data = await response.json()
-                    graphql_responses.append(data)
+                _extract_users_from_json(doc, extracted_users)
             except Exception:
                 pass
+        graphql_stats['chunks'] += 1
+        graphql_stats['users'] += len(extracted_users) - before
+
+    def intercept_graphql(response):
+        if "graphql" in response.url.lower() and response.request.method == "POST":
+            task = asyncio.ensure_future(_parse_graphql(response))
+            pending_parses.add(task)
+            task.add_done_callback(pending_parses.discard)
 
     page.on("response", intercept_graphql)
 
     logger.info(f"Navegando a {target_url} con Network Interception...")
     await page.goto(target_url)
     await asyncio.sleep(3)  # carga inicial
+    # Recolector en página: cada scroll drena sólo las tarjetas nuevas (no re-escanea la lista)
+    collector = await ListCollector.start(page, 'facebook', name=f"facebook.{suffix}")
+    readiness = ScrollReadiness(page, 'facebook', collector=collector, max_wait_ms=2500)
 
     max_scrolls = 60
     no_new = 0
     last_total = 0
 
     for i in range(max_scrolls):
-        # Extraer DOM visible en este scroll
+        # Extraer tarjetas montadas desde el último scroll
         try:
-            raw = await page.evaluate(_JS_BATCH)
-            added_dom = _process_dom_batch(raw or [])
+            added_dom = _process_dom_batch(await collector.drain())
         except Exception:
             added_dom = 0
 
         # Scroll — igual que el original (mouse wheel + window.scrollBy)
+        readiness.arm()
         try:
             await page.mouse.wheel(0, 3000)
         except Exception:
             await page.evaluate("window.scrollBy(0, 3000)")
-        await asyncio.sleep(0.9)
+        # Esperar a tarjetas nuevas o respuesta GraphQL (no una pausa fija de 0.9 s)
+        await readiness.wait()
+        # Esperar a que terminen los parseos en curso para que cuenten en la estancación
+        if pending_parses:
+            await asyncio.gather(*list(pending_parses), return_exceptions=True)
 
+        # El total incluye usuarios DOM y GraphQL: si ninguna fuente aporta, la lista se agotó
         current_total = len(extracted_users)
         if current_total == last_total:
             no_new += 1
             if no_new >= 4:
-                logger.info("Sin nuevos usuarios. Fin de lista.")
+                logger.info("Sin nuevos usuarios (DOM ni GraphQL). Fin de lista.")
                 break
         else:
             no_new = 0
 
         last_total = current_total
-        logger.info(f"Scroll {i+1}: {current_total} usuarios DOM | {len(graphql_responses)} tramos GraphQL")
+        logger.info(
+            f"Scroll {i+1}: {current_total} usuarios | +{added_dom} DOM | "
+            f"{graphql_stats['users']} GraphQL en {graphql_stats['chunks']} tramos"
+        )
 
+    logger.info(f"facebook.list.{suffix} readiness={readiness.stats()}")
+    readiness.close()
+    await collector.stop()
     page.remove_listener("response", intercept_graphql)
-
-    # Suplementar con GraphQL (puede agregar perfiles con ID numérico que el DOM no muestra)
-    for payload in graphql_responses:
-        try:
-            _extract_users_from_json(payload, extracted_users)
-        except Exception:
-            pass
+    if pending_parses:
+        await asyncio.gather(*list(pending_parses), return_exceptions=True)
 
     return list(extracted_users.values())
 
 
+def _parse_graphql_documents(body: bytes) -> list:
+    """
+    Decodifica una respuesta GraphQL de Facebook una sola vez.
+    Las respuestas con @defer/@stream traen varios documentos JSON separados por salto de línea.
+    """
+    text = body.decode('utf-8', errors='ignore').strip()
+    if text.startswith('for (;;);'):
+        text = text[len('for (;;);'):]
+    try:
+        return [json.loads(text)]
+    except ValueError:
+        pass
+    docs = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            docs.append(json.loads(line))
+        except ValueError:
+            continue
+    return docs
+
+
 def _extract_users_from_json(data, result_dict: dict, depth: int = 0):
     """
     Busca nodos de usuario en JSON de GraphQL de Facebook.
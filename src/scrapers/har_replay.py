@@ -0,0 +1,258 @@
+"""Grabación y reproducción offline (HAR + snapshots DOM) para medir scrapers sin red.
+
+Grabar (contra la plataforma real, con sesión):
+    recorder = HarRecorder(fixture_dir)
+    context = await browser.new_context(**recorder.context_options(), storage_state=...)
+    page = await context.new_page()
+    ... scrape ...
+    await recorder.snapshot(page, 'end')
+    await context.close()                  # Playwright escribe el HAR al cerrar el contexto
+    recorder.write_meta(scenario='instagram.followers', items=812)
+
+Reproducir (CI, sin red):
+    replay = HarReplayRouter.load(fixture_dir)
+    context = await browser.new_context(**replay.context_options())
+    await replay.install(context)          # responde desde el HAR y aborta lo que no esté grabado
+    ... scrape ...
+    replay.stats()  # {'hits': 412, 'misses': 3, 'snapshot_hits': 0, ...}
+
+Cada request se busca por (método, URL, cuerpo), luego por (método, URL) y por último
+por (método, URL sin query); dentro de una clave las respuestas se sirven en el orden
+grabado (la última se repite). Una navegación sin entrada en el HAR se sirve con el
+snapshot DOM grabado para esa URL, si existe.
+
+``ListResourceBlocker`` usa ``route.fallback()`` con los recursos permitidos, así que
+estas rutas de contexto aplican aunque el blocker esté activo en la página.
+"""
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+HAR_FILENAME = 'recording.har'
+META_FILENAME = 'meta.json'
+SNAPSHOT_DIR = 'snapshots'
+
+# Opciones de contexto que deben coincidir entre grabación y replay (cuántas tarjetas caben por scroll)
+REPLAY_CONTEXT_OPTS: Dict[str, Any] = {
+    'viewport': {'width': 1280, 'height': 900},
+    'locale': 'en-US',
+}
+
+# El cuerpo ya viene decodificado en el HAR; las longitudes las recalcula fulfill()
+_DROP_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection', 'keep-alive'}
+
+
+def _body_key(body: Optional[str]) -> str:
+    return hashlib.sha1(body.encode('utf-8', 'surrogatepass')).hexdigest() if body else ''
+
+
+def _strip_query(url: str) -> str:
+    return url.split('#', 1)[0].split('?', 1)[0]
+
+
+class HarRecorder:
+    """Opciones de contexto para grabar el HAR y snapshots DOM en ``out_dir``."""
+
+    def __init__(self, out_dir: str):
+        self.out_dir = out_dir
+        self.har_path = os.path.join(out_dir, HAR_FILENAME)
+        self.snapshots: List[Dict[str, Any]] = []
+        os.makedirs(os.path.join(out_dir, SNAPSHOT_DIR), exist_ok=True)
+
+    def context_options(self) -> Dict[str, Any]:
+        return {
+            **REPLAY_CONTEXT_OPTS,
+            'record_har_path': self.har_path,
+            'record_har_content': 'embed',
+            'record_har_mode': 'full',
+            # Un service worker respondería fuera del HAR (y fuera del routing en el replay)
+            'service_workers': 'block',
+        }
+
+    async def snapshot(self, page, label: str) -> Optional[str]:
+        """Guarda ``page.content()`` como ``snapshots/NNN_label.html``."""
+        try:
+            html = await page.content()
+        except Exception as e:
+            logger.warning(f"har.snapshot_error label={label} err={e}")
+            return None
+        filename = f"{len(self.snapshots):03d}_{label}.html"
+        with open(os.path.join(self.out_dir, SNAPSHOT_DIR, filename), 'w', encoding='utf-8') as f:
+            f.write(html)
+        self.snapshots.append({'file': filename, 'label': label, 'url': page.url, 'bytes': len(html)})
+        logger.info(f"har.snapshot label={label} url={page.url} bytes={len(html)}")
+        return filename
+
+    def write_meta(self, **meta: Any) -> str:
+        """``meta.json``: escenario, URL, items y métricas de la grabación + snapshots."""
+        path = os.path.join(self.out_dir, META_FILENAME)
+        payload = {
+            'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'context': REPLAY_CONTEXT_OPTS,
+            **meta,
+            'snapshots': self.snapshots,
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False, indent=2)
+        return path
+
+
+class _Response:
+    __slots__ = ('status', 'headers', 'body', 'time_ms')
+
+    def __init__(self, status: int, headers: Dict[str, str], body: bytes, time_ms: float):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.time_ms = time_ms
+
+
+class HarReplayRouter:
+    """Sirve las respuestas de un HAR con ``context.route`` (sin red)."""
+
+    def __init__(self, entries: List[Dict[str, Any]], *, snapshots: Optional[Dict[str, str]] = None,
+                 meta: Optional[Dict[str, Any]] = None, latency_scale: float = 0.0,
+                 max_latency_ms: float = 2000.0):
+        self.meta = meta or {}
+        self.latency_scale = latency_scale
+        self.max_latency_ms = max_latency_ms
+        self._snapshots = snapshots or {}
+        self._exact: Dict[Tuple[str, str, str], List[_Response]] = {}
+        self._by_url: Dict[Tuple[str, str], List[_Response]] = {}
+        self._by_path: Dict[Tuple[str, str], List[_Response]] = {}
+        self._served: Dict[Tuple[Any, ...], int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.snapshot_hits = 0
+        self.bytes_served = 0
+        self.missed_urls: List[str] = []
+        for entry in entries:
+            self._add(entry)
+
+    @classmethod
+    def load(cls, fixture_dir: str, **kwargs: Any) -> 'HarReplayRouter':
+        """Carga ``recording.har``, ``meta.json`` y los snapshots de ``fixture_dir``."""
+        with open(os.path.join(fixture_dir, HAR_FILENAME), encoding='utf-8') as f:
+            entries = json.load(f)['log']['entries']
+        meta: Dict[str, Any] = {}
+        meta_path = os.path.join(fixture_dir, META_FILENAME)
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+        snapshots = {}
+        for snap in meta.get('snapshots', []):
+            with open(os.path.join(fixture_dir, SNAPSHOT_DIR, snap['file']), encoding='utf-8') as f:
+                # El último snapshot de una URL gana (el DOM más completo)
+                snapshots[_strip_query(snap['url'])] = f.read()
+        router = cls(entries, snapshots=snapshots, meta=meta, **kwargs)
+        logger.info(f"har.replay.load dir={fixture_dir} entries={len(entries)} snapshots={len(snapshots)}")
+        return router
+
+    def _add(self, entry: Dict[str, Any]) -> None:
+        request = entry.get('request') or {}
+        response = entry.get('response') or {}
+        status = int(response.get('status') or 0)
+        if status <= 0:
+            # Request abortado o fallido en la grabación: no hay respuesta que servir
+            return
+        content = response.get('content') or {}
+        text = content.get('text') or ''
+        body = base64.b64decode(text) if content.get('encoding') == 'base64' else text.encode('utf-8', 'surrogatepass')
+        headers: Dict[str, str] = {}
+        for header in response.get('headers') or []:
+            name = header.get('name', '').lower()
+            if not name or name.startswith(':') or name in _DROP_HEADERS:
+                continue
+            value = header.get('value', '')
+            headers[name] = f"{headers[name]}\n{value}" if name == 'set-cookie' and name in headers else value
+        if content.get('mimeType') and 'content-type' not in headers:
+            headers['content-type'] = content['mimeType']
+        resp = _Response(status, headers, body, float(entry.get('time') or 0.0))
+        method = (request.get('method') or 'GET').upper()
+        url = request.get('url') or ''
+        post = (request.get('postData') or {}).get('text')
+        self._exact.setdefault((method, url, _body_key(post)), []).append(resp)
+        self._by_url.setdefault((method, url), []).append(resp)
+        self._by_path.setdefault((method, _strip_query(url)), []).append(resp)
+
+    def context_options(self) -> Dict[str, Any]:
+        return {**(self.meta.get('context') or REPLAY_CONTEXT_OPTS), 'service_workers': 'block'}
+
+    def _next(self, index: Dict[Any, List[_Response]], key: Tuple[Any, ...]) -> Optional[_Response]:
+        responses = index.get(key)
+        if not responses:
+            return None
+        served_key = (id(index),) + key
+        n = self._served.get(served_key, 0)
+        self._served[served_key] = n + 1
+        return responses[min(n, len(responses) - 1)]
+
+    def match(self, method: str, url: str, post_data: Optional[str] = None) -> Optional[_Response]:
+        method = method.upper()
+        return (
+            self._next(self._exact, (method, url, _body_key(post_data)))
+            or self._next(self._by_url, (method, url))
+            or self._next(self._by_path, (method, _strip_query(url)))
+        )
+
+    async def _handle(self, route) -> None:
+        request = route.request
+        try:
+            post_data = request.post_data
+        except Exception:
+            post_data = None
+        resp = self.match(request.method, request.url, post_data)
+        if resp is None:
+            snapshot = self._snapshots.get(_strip_query(request.url)) if request.resource_type == 'document' else None
+            if snapshot is not None:
+                self.snapshot_hits += 1
+                await route.fulfill(status=200, headers={'content-type': 'text/html; charset=utf-8'}, body=snapshot)
+                return
+            self.misses += 1
+            if len(self.missed_urls) < 50:
+                self.missed_urls.append(f"{request.method} {request.url[:200]}")
+            logger.debug(f"har.replay.miss method={request.method} url={request.url[:200]}")
+            await route.abort('internetdisconnected')
+            return
+        self.hits += 1
+        self.bytes_served += len(resp.body)
+        if self.latency_scale > 0 and resp.time_ms > 0:
+            await asyncio.sleep(min(resp.time_ms * self.latency_scale, self.max_latency_ms) / 1000)
+        await route.fulfill(status=resp.status, headers=resp.headers, body=resp.body)
+
+    async def install(self, context) -> 'HarReplayRouter':
+        await context.route('**/*', self._handle)
+        return self
+
+    def reset(self) -> None:
+        """Reinicia el orden de respuestas y los contadores (una corrida nueva del benchmark)."""
+        self._served.clear()
+        self.hits = self.misses = self.snapshot_hits = self.bytes_served = 0
+        self.missed_urls = []
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'snapshot_hits': self.snapshot_hits,
+            'bytes_served': self.bytes_served,
+            'missed_urls': list(self.missed_urls[:10]),
+        }
+
+
+__all__ = [
+    'HAR_FILENAME',
+    'HarRecorder',
+    'HarReplayRouter',
+    'META_FILENAME',
+    'REPLAY_CONTEXT_OPTS',
+]
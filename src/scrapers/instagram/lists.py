@@ -4,7 +4,8 @@ from src.utils.dom import find_scroll_container, scroll_element, scroll_window
 from src.utils.list_parser import build_user_item
 from src.utils.url import normalize_input_url
 from src.scrapers.resource_blocking import start_list_blocking
-from src.scrapers.scrolling import scroll_loop
+from src.scrapers.scrolling import scroll_loop, ScrollReadiness
+from src.scrapers.list_collector import ListCollector
 from src.scrapers.selector_registry import get_selectors, registry_version
 from src.scrapers.errors import classify_page_state, ErrorCode
 
@@ -13,7 +14,24 @@ logger = logging.getLogger(__name__)
 def _ts() -> str:
     return time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime())
 
+_JS_MODAL_USERS = """
+(sel) => {
+  const out = [];
+  for (const el of document.querySelectorAll(sel)) {
+    const a = el.querySelector("a[role='link']") || (el.matches("a[role='link']") ? el : null);
+    if (!a) continue;
+    const href = a.getAttribute("href") || "";
+    if (!href.startsWith("/") || href.split("/").length < 2) continue;
+    const img = el.querySelector("img");
+    const text = (el.innerText || "").trim();
+    out.push({ href, text: text.split("\\n")[0] || "", img: img ? (img.getAttribute("src") || "") : "" });
+  }
+  return out;
+}
+"""
+
 async def procesar_usuarios_en_modal(page, usuarios_dict, usuario_principal, tipo_lista):
+    # Un solo page.evaluate por selector: antes eran varios round-trips por elemento y scroll
     try:
         selectores_contenedor = [
             'div[role="dialog"] div[style*="flex-direction: column"] > div',
@@ -22,58 +40,45 @@ async def procesar_usuarios_en_modal(page, usuarios_dict, usuario_principal, tip
             f'div[aria-label="{tipo_lista.capitalize()}"] div:has(a)',
             'div[role="dialog"] a[role="link"]'
         ]
-        elementos_usuarios = []
+        registros = []
         for selector in selectores_contenedor:
             try:
-                elementos = await page.query_selector_all(selector)
-                if elementos:
-                    elementos_validos = []
-                    for elemento in elementos:
-                        try:
-                            enlace = await elemento.query_selector('a[role="link"]') or elemento
-                            if enlace:
-                                href = await enlace.get_attribute("href")
-                                if href and href.startswith('/') and len(href.split('/')) >= 2:
-                                    elementos_validos.append(elemento)
-                        except:
-                            continue
-                    if elementos_validos:
-                        elementos_usuarios = elementos_validos
-                        logger.info(f"{_ts()} instagram.list selector hit selector='{selector}' elements={len(elementos_usuarios)}")
-                        break
-            except:
-                continue
-        if not elementos_usuarios:
+                registros = await page.evaluate(_JS_MODAL_USERS, selector)
+            except Exception:
+                registros = []
+            if registros:
+                logger.info(f"{_ts()} instagram.list selector hit selector='{selector}' elements={len(registros)}")
+                break
+        if not registros:
             logger.info(f"{_ts()} instagram.list empty_scroll")
             return
-        for elemento in elementos_usuarios:
-            try:
-                enlace = await elemento.query_selector('a[role="link"]') or elemento
-                if not enlace:
-                    continue
-                href = await enlace.get_attribute("href")
-                if not href or not href.startswith('/'):
-                    continue
-                url_usuario_abs = f"https://www.instagram.com{href}"
-                texto_elemento = await elemento.inner_text()
-                lineas = texto_elemento.strip().split('\n')
-                nombre_completo_usuario = lineas[0] if lineas and lineas[0] else None
-                img_element = await elemento.query_selector('img')
-                url_foto = await img_element.get_attribute("src") if img_element else ""
-                item = build_user_item('instagram', url_usuario_abs, nombre_completo_usuario, url_foto)
-                url_limpia = item['link_usuario']
-                username_usuario = item['username_usuario']
-                if username_usuario == usuario_principal:
-                    continue
-                if url_limpia in usuarios_dict:
-                    continue
-                usuarios_dict[url_limpia] = item
-            except Exception as e:
-                logger.warning(f"Error procesando usuario individual: {e}")
-                continue
+        agregar_registros(registros, usuarios_dict, usuario_principal)
     except Exception as e:
         logger.warning(f"Error procesando usuarios en modal: {e}")
 
+def agregar_registros(registros, usuarios_dict, usuario_principal) -> int:
+    """Agrega registros ``{href, text, img}`` (lote JS o ListCollector) y devuelve cuántos eran nuevos."""
+    agregados = 0
+    for rec in registros:
+        try:
+            href = rec.get('href') or ''
+            if not href.startswith('/') or len(href.split('/')) < 2:
+                continue
+            url_usuario_abs = f"https://www.instagram.com{href}"
+            item = build_user_item('instagram', url_usuario_abs, rec.get('text') or None, rec.get('img') or "")
+            url_limpia = item['link_usuario']
+            username_usuario = item['username_usuario']
+            if username_usuario == usuario_principal:
+                continue
+            if url_limpia in usuarios_dict:
+                continue
+            usuarios_dict[url_limpia] = item
+            agregados += 1
+        except Exception as e:
+            logger.warning(f"Error procesando usuario individual: {e}")
+            continue
+    return agregados
+
 async def extraer_usuarios_instagram(page, tipo_lista="seguidores", usuario_principal=""):
     logger.info(f"{_ts()} instagram.list start type={tipo_lista}")
     usuarios_dict = {}
@@ -81,12 +86,12 @@ async def extraer_usuarios_instagram(page, tipo_lista="seguidores", usuario_prin
     t0 = time.time()
     container = await find_scroll_container(page)
     iter_state = {'count': 0}
+    collector = await ListCollector.start(page, 'instagram', name=f"instagram.{tipo_lista}")
+    readiness = ScrollReadiness(page, 'instagram', collector=collector)
 
-    async def process_once() -> int:
-        before = len(usuarios_dict)
-        await procesar_usuarios_en_modal(page, usuarios_dict, usuario_principal, tipo_lista)
+    def consume(registros) -> int:
         iter_state['count'] += 1
-        return len(usuarios_dict) - before
+        return agregar_registros(registros, usuarios_dict, usuario_principal)
 
     async def do_scroll():
         nonlocal container
@@ -172,7 +177,9 @@ async def extraer_usuarios_instagram(page, tipo_lista="seguidores", usuario_prin
             return False
 
     stats = await scroll_loop(
-        process_once=process_once,
+        collector=collector,
+        consume=consume,
+        readiness=readiness,
         do_scroll=do_scroll,
         max_scrolls=300,
         pause_ms=800,
@@ -185,6 +192,8 @@ async def extraer_usuarios_instagram(page, tipo_lista="seguidores", usuario_prin
         timeout_ms=120000,
     )
 
+    readiness.close()
+    await collector.stop()
     await blocker.stop()
     if stats['reason'] == 'bottom' and stats.get('iterations', 0) <= 4 and len(usuarios_dict) < 30:
         logger.warning(f"{_ts()} instagram.list suspicion=EARLY_BOTTOM type={tipo_lista} total={len(usuarios_dict)} iter={stats.get('iterations')} reason={stats['reason']}")
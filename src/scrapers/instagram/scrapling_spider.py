@@ -1,8 +1,11 @@
 import asyncio
 import logging
-from typing import Dict, List, Optional
+import re
+import time
+from typing import Dict, List, Optional, Tuple
 
 from src.utils.list_parser import build_user_item
+from src.utils.photo_pipeline import current_photo_pipeline
 from src.utils.url import normalize_input_url
 
 logger = logging.getLogger(__name__)
@@ -449,9 +452,169 @@ async def _scroll_dialog_container(page) -> bool:
     return bool(moved)
 
 
+# ---------------------------------------------------------------------------
+# Followers / Following: motor por intercepcion de red (fallback DOM)
+# ---------------------------------------------------------------------------
+
+_FRIENDSHIPS_LIST_RE = re.compile(r'/api/v1/friendships/\d+/(followers|following)/')
+_GRAPHQL_LIST_EDGES = {'followers': 'edge_followed_by', 'following': 'edge_follow'}
+
+NETWORK_FIRST_PAGE_TIMEOUT_S = 6.0
+NETWORK_PAGE_TIMEOUT_S = 3.0
+NETWORK_IDLE_SCROLLS = 5
+NETWORK_MAX_SCROLLS = 400
+
+# Totales por motor para comparar rendimiento (items/s) entre ejecuciones
+_LIST_ENGINE_TOTALS: Dict[str, Dict[str, float]] = {}
+
+
+def _list_user_item(node: dict, owner_l: str) -> Optional[dict]:
+    username = node.get('username')
+    if not isinstance(username, str):
+        return None
+    username = username.strip()
+    if not _looks_like_instagram_username(username) or username.lower() == owner_l:
+        return None
+    full_name = node.get('full_name') if isinstance(node.get('full_name'), str) else None
+    photo = node.get('profile_pic_url') or node.get('profile_pic_url_hd') or ''
+    return build_user_item('instagram', f"https://www.instagram.com/{username}/", full_name or username, photo)
+
+
+def _parse_list_page(url: str, payload, list_type: str, owner_username: str) -> Optional[Tuple[List[dict], bool]]:
+    """
+    Si la respuesta es una pagina de followers/following devuelve (usuarios, hay_mas).
+    Soporta el endpoint REST ``friendships/<id>/followers/`` (cursor ``next_max_id``)
+    y GraphQL con ``edge_followed_by``/``edge_follow`` (``page_info.has_next_page``).
+    """
+    owner_l = (owner_username or '').lower()
+    match = _FRIENDSHIPS_LIST_RE.search(url)
+    if match:
+        if match.group(1) != list_type or not isinstance(payload, dict):
+            return None
+        users = payload.get('users')
+        if not isinstance(users, list):
+            return None
+        items = [it for it in (_list_user_item(u, owner_l) for u in users if isinstance(u, dict)) if it]
+        return items, bool(payload.get('next_max_id'))
+
+    if 'graphql' in url:
+        edge_key = _GRAPHQL_LIST_EDGES[list_type]
+        for node in _iter_dicts(payload):
+            edge = node.get(edge_key)
+            # Las respuestas de perfil traen edge_followed_by sólo con 'count'
+            if not isinstance(edge, dict) or not isinstance(edge.get('edges'), list):
+                continue
+            items = []
+            for e in edge['edges']:
+                user = e.get('node') if isinstance(e, dict) else None
+                item = _list_user_item(user, owner_l) if isinstance(user, dict) else None
+                if item:
+                    items.append(item)
+            page_info = edge.get('page_info') or {}
+            return items, bool(page_info.get('has_next_page'))
+    return None
+
+
+class _ListNetworkCapture:
+    """Parsea las paginas JSON de followers/following a medida que llegan (page.on('response'))."""
+
+    def __init__(self, list_type: str, owner_username: str, users: Dict[str, dict]):
+        self.list_type = list_type
+        self.owner_username = owner_username
+        self.users = users
+        self.pages = 0
+        self.has_more = True
+        self.page_event = asyncio.Event()
+        self._tasks: set = set()
+        # Se captura aquí: los callbacks de page.on('response') no heredan el contexto
+        self.photos = current_photo_pipeline()
+
+    def on_response(self, response) -> None:
+        url = (response.url or '').lower()
+        if 'friendships' not in url and 'graphql' not in url:
+            return
+        task = asyncio.ensure_future(self._parse(response))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _parse(self, response) -> None:
+        try:
+            payload = await response.json()
+        except Exception:
+            return
+        parsed = _parse_list_page(response.url or '', payload, self.list_type, self.owner_username)
+        if parsed is None:
+            return
+        items, has_more = parsed
+        for item in items:
+            key = item.get('link_usuario')
+            if key and key not in self.users:
+                self.users[key] = item
+                if self.photos is not None:
+                    self.photos.prefetch(item.get('foto_usuario'))
+        self.pages += 1
+        self.has_more = has_more
+        self.page_event.set()
+
+    async def wait_page(self, timeout_s: float) -> bool:
+        try:
+            await asyncio.wait_for(self.page_event.wait(), timeout=timeout_s)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def drain(self) -> None:
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+
+def _record_list_engine(engine: str, list_type: str, items: int, duration_s: float, pages: int = 0) -> None:
+    totals = _LIST_ENGINE_TOTALS.setdefault(engine, {'runs': 0, 'items': 0, 'seconds': 0.0})
+    totals['runs'] += 1
+    totals['items'] += items
+    totals['seconds'] += duration_s
+    rate = items / duration_s if duration_s > 0 else 0.0
+    logger.info(
+        'instagram.list engine=%s type=%s items=%d pages=%d duration_ms=%d items_per_s=%.1f',
+        engine, list_type, items, pages, int(duration_s * 1000), rate,
+    )
+
+
+def get_list_engine_stats() -> Dict[str, Dict[str, float]]:
+    """Items/segundo acumulados por motor de listas ('network', 'dom')."""
+    out: Dict[str, Dict[str, float]] = {}
+    for engine, totals in _LIST_ENGINE_TOTALS.items():
+        seconds = totals['seconds']
+        out[engine] = {
+            **totals,
+            'seconds': round(seconds, 2),
+            'items_per_s': round(totals['items'] / seconds, 1) if seconds > 0 else 0.0,
+        }
+    return out
+
+
+async def _scrape_list_via_network(page, capture: _ListNetworkCapture) -> None:
+    """Scrollea sólo para disparar la siguiente pagina hasta agotar el cursor."""
+    idle = 0
+    for _ in range(NETWORK_MAX_SCROLLS):
+        if not capture.has_more:
+            break
+        capture.page_event.clear()
+        await _scroll_dialog_container(page)
+        if await capture.wait_page(NETWORK_PAGE_TIMEOUT_S):
+            idle = 0
+            continue
+        idle += 1
+        if idle >= NETWORK_IDLE_SCROLLS:
+            logger.info('instagram.list network_idle pages=%d has_more=%s', capture.pages, capture.has_more)
+            break
+    await capture.drain()
+
+
 async def scrap_list_network_scrapling(page, profile_url: str, list_type: str) -> List[dict]:
     """
-    Extrae followers/following desde modal con parseo dinamico.
+    Extrae followers/following interceptando las respuestas JSON de la lista.
+    Sólo si no se observa ninguna pagina JSON se recurre a parsear el modal (DOM).
     list_type esperado: 'followers' o 'following'.
     """
     if list_type not in ('followers', 'following'):
@@ -461,11 +624,38 @@ async def scrap_list_network_scrapling(page, profile_url: str, list_type: str) -
     profile = await get_profile_data_scrapling(page, profile_url)
     owner_username = profile.get('username') or ''
 
-    if not await _open_relationship_modal(page, list_type):
-        logger.warning('No fue posible abrir modal de %s', list_type)
-        return []
-
     users: Dict[str, dict] = {}
+    capture = _ListNetworkCapture(list_type, owner_username, users)
+    # Registrar antes de abrir el modal: la primera pagina llega con la apertura
+    page.on('response', capture.on_response)
+    try:
+        t0 = time.time()
+        if not await _open_relationship_modal(page, list_type):
+            logger.warning('No fue posible abrir modal de %s', list_type)
+            return []
+
+        if capture.pages == 0:
+            await capture.wait_page(NETWORK_FIRST_PAGE_TIMEOUT_S)
+        if capture.pages:
+            await _scrape_list_via_network(page, capture)
+            _record_list_engine('network', list_type, len(users), time.time() - t0, capture.pages)
+        else:
+            logger.info('instagram.list no_json type=%s fallback=dom', list_type)
+            t_dom = time.time()
+            await _scrape_list_via_dom(page, owner_username, users)
+            _record_list_engine('dom', list_type, len(users), time.time() - t_dom)
+    finally:
+        try:
+            page.remove_listener('response', capture.on_response)
+        except Exception:
+            pass
+
+    logger.info('Extraidos %d usuarios de %s via Scrapling', len(users), list_type)
+    return list(users.values())
+
+
+async def _scrape_list_via_dom(page, owner_username: str, users: Dict[str, dict]) -> None:
+    """Motor de respaldo: parsea el modal tras cada scroll."""
     no_new = 0
     loading_wait_cycles = 0
 
@@ -498,9 +688,6 @@ async def scrap_list_network_scrapling(page, profile_url: str, list_type: str) -
 
         await asyncio.sleep(0.25)
 
-    logger.info('Extraidos %d usuarios de %s via Scrapling', len(users), list_type)
-    return list(users.values())
-
 
 # ---------------------------------------------------------------------------
 # Post Engagement Scraping
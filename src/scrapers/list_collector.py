@@ -0,0 +1,286 @@
+"""Recolector de tarjetas de usuario dentro de la página (MutationObserver).
+
+Los scrapers de listas re-extraían todos los anchors del contenedor en cada scroll
+y deduplicaban en Python: el costo por iteración crece con la lista y las listas
+virtualizadas (FB, X) pierden filas que se desmontan entre dos escaneos.
+
+Este módulo inyecta una vez por contexto (``add_init_script``) un recolector que
+observa las mutaciones del DOM, registra cada href nuevo al montarse en un buffer
+en la página con un seen-set propio, y entrega sólo el delta en cada ``drain``.
+
+La unidad es la tarjeta (el ancestro más alto cuyos anchors apuntan todos al mismo
+href), no el anchor: el avatar sin texto y el anchor del nombre son la misma fila.
+Texto e img se leen de la tarjeta al drenar, cuando la hidratación ya los completó;
+``text: 'firstLine'`` toma la primera línea del ``innerText`` de la tarjeta (Instagram).
+
+Uso:
+    collector = await ListCollector.start(page, 'x')
+    stats = await scroll_loop(collector=collector, consume=agregar_registros, do_scroll=..., ...)
+
+Cada registro drenado es ``{href, text, img}`` (mismo formato que los ``_JS_BATCH`` previos).
+"""
+from __future__ import annotations
+
+import logging
+import weakref
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+COLLECTOR_INIT_SCRIPT = r"""
+(() => {
+  if (window.__scr4perCollector) return;
+  const collectors = {};
+
+  function validHref(a, cfg) {
+    const href = a.getAttribute('href') || '';
+    if (!href || href === '#' || href.startsWith('javascript:')) return null;
+    if (cfg.hrefPrefix && !href.startsWith(cfg.hrefPrefix)) return null;
+    if (cfg.exclude && cfg.exclude.some((p) => href.includes(p))) return null;
+    return href;
+  }
+
+  // Tarjeta = el ancestro más alto (bajo root) cuyos anchors válidos apuntan todos a href:
+  // reúne avatar (anchor sin texto), anchor del nombre e img de la misma fila
+  function cardOf(a, href, c) {
+    let card = a;
+    for (let i = 0; i < 12; i++) {
+      const parent = card.parentElement;
+      if (!parent || parent === document.body || (c.cfg.root && parent.matches(c.cfg.root))) break;
+      let other = false;
+      for (const x of parent.querySelectorAll(c.cfg.anchor)) {
+        const h = validHref(x, c.cfg);
+        if (h && h !== href) { other = true; break; }
+      }
+      if (other) break;
+      card = parent;
+    }
+    return card;
+  }
+
+  // Texto e img se resuelven al drenar (la hidratación los completa después de montar la fila);
+  // si la fila ya se desmontó (listas virtualizadas) queda lo último leído
+  function resolve(rec, c) {
+    if (!rec.anchor.isConnected) return;
+    const card = cardOf(rec.anchor, rec.href, c);
+    let text = '';
+    if (c.cfg.text === 'firstLine') {
+      text = ((card.innerText || '').trim().split('\n')[0] || '').trim();
+    } else {
+      const anchors = card.matches(c.cfg.anchor) ? [card] : Array.from(card.querySelectorAll(c.cfg.anchor));
+      for (const x of anchors) {
+        if (x.getAttribute('href') !== rec.href) continue;
+        text = (x.textContent || '').trim();
+        if (text) break;
+      }
+    }
+    let imgel = c.cfg.img ? card.querySelector(c.cfg.img) : null;
+    if (!imgel && c.cfg.img && card.matches(c.cfg.img)) imgel = card;
+    const img = imgel ? (imgel.currentSrc || imgel.src || imgel.getAttribute('xlink:href') || '') : '';
+    if (text) rec.text = text;
+    if (img) rec.img = img;
+  }
+
+  function scan(c, node) {
+    if (!(node instanceof Element)) return;
+    const anchors = node.matches(c.cfg.anchor) ? [node] : [];
+    for (const a of node.querySelectorAll(c.cfg.anchor)) anchors.push(a);
+    for (const a of anchors) {
+      if (c.cfg.root && !a.closest(c.cfg.root)) continue;
+      const href = validHref(a, c.cfg);
+      if (!href) continue;
+      const pending = c.pending.get(href);
+      if (pending) {
+        // Fila re-renderizada antes del drain: seguir al anchor montado
+        if (!pending.anchor.isConnected) pending.anchor = a;
+        continue;
+      }
+      if (c.seen.has(href)) continue;
+      c.seen.add(href);
+      const rec = { href, text: '', img: '', anchor: a };
+      resolve(rec, c);
+      c.pending.set(href, rec);
+      c.buffer.push(rec);
+    }
+    if (c.buffer.length && c.waiters.length) {
+      const waiters = c.waiters;
+      c.waiters = [];
+      for (const w of waiters) w();
+    }
+  }
+
+  window.__scr4perCollector = {
+    install(name, cfg) {
+      this.stop(name);
+      const c = { cfg, seen: new Set(), pending: new Map(), buffer: [], waiters: [], observer: null };
+      c.observer = new MutationObserver((mutations) => {
+        for (const m of mutations) {
+          if (m.type === 'attributes') { scan(c, m.target); continue; }
+          for (const n of m.addedNodes) scan(c, n);
+        }
+      });
+      c.observer.observe(document.documentElement, {
+        childList: true, subtree: true, attributes: true, attributeFilter: ['href'],
+      });
+      collectors[name] = c;
+      scan(c, document.body || document.documentElement);
+      return c.buffer.length;
+    },
+    drain(name) {
+      const c = collectors[name];
+      if (!c) return null;
+      const out = [];
+      for (const rec of c.buffer) {
+        resolve(rec, c);
+        out.push({ href: rec.href, text: rec.text, img: rec.img });
+      }
+      c.buffer = [];
+      c.pending.clear();
+      return out;
+    },
+    waitFor(name, timeoutMs) {
+      const c = collectors[name];
+      if (!c) return Promise.resolve(false);
+      if (c.buffer.length) return Promise.resolve(true);
+      return new Promise((resolve) => {
+        const done = () => { clearTimeout(timer); resolve(true); };
+        const timer = setTimeout(() => {
+          c.waiters = c.waiters.filter((w) => w !== done);
+          resolve(false);
+        }, timeoutMs);
+        c.waiters.push(done);
+      });
+    },
+    stats(name) {
+      const c = collectors[name];
+      return c ? { seen: c.seen.size, buffered: c.buffer.length } : null;
+    },
+    stop(name) {
+      const c = collectors[name];
+      if (c && c.observer) c.observer.disconnect();
+      delete collectors[name];
+    },
+  };
+})();
+"""
+
+# Selectores por plataforma (equivalentes a los extractores por lote previos)
+COLLECTOR_SPECS: Dict[str, Dict[str, Any]] = {
+    'facebook': {
+        'root': 'div[role="main"]',
+        'anchor': 'a[href]',
+        'img': 'img, image',
+    },
+    'instagram': {
+        'root': 'div[role="dialog"], div[aria-modal="true"]',
+        'anchor': 'a[href^="/"]',
+        'hrefPrefix': '/',
+        'img': 'img',
+        # Como _JS_MODAL_USERS: primera línea del innerText de la fila
+        'text': 'firstLine',
+    },
+    'x': {
+        'root': '[data-testid="primaryColumn"]',
+        'anchor': 'a[role="link"][href^="/"]',
+        'hrefPrefix': '/',
+        'exclude': ['/status/'],
+        'img': 'img[src*="profile_images"], img[alt*="avatar"]',
+    },
+}
+
+_pages_with_script: "weakref.WeakSet[Any]" = weakref.WeakSet()
+
+
+async def ensure_collector_script(page) -> None:
+    """
+    Garantiza que el recolector esté definido en la página actual.
+    Los contextos del ``ContextCache`` ya lo traen como init script; para páginas
+    creadas por otras vías se registra aquí una sola vez por página.
+    """
+    if await page.evaluate("() => !!window.__scr4perCollector"):
+        return
+    if page not in _pages_with_script:
+        try:
+            await page.add_init_script(COLLECTOR_INIT_SCRIPT)
+        except Exception as e:
+            logger.debug(f"collector.init_script_error err={e}")
+        _pages_with_script.add(page)
+    # El init script sólo aplica a navegaciones futuras: inyectar en el documento actual
+    await page.evaluate(COLLECTOR_INIT_SCRIPT)
+
+
+class ListCollector:
+    """Handle Python de un recolector instalado en la página."""
+
+    def __init__(self, page, name: str, spec: Dict[str, Any]):
+        self.page = page
+        self.name = name
+        self.spec = spec
+        self.drained = 0
+        self.drains = 0
+        self.reinstalls = 0
+
+    @classmethod
+    async def start(cls, page, platform: str, *, name: Optional[str] = None, **overrides) -> 'ListCollector':
+        spec = {**COLLECTOR_SPECS[platform], **overrides}
+        collector = cls(page, name or f"{platform}.list", spec)
+        await collector._install()
+        return collector
+
+    async def _install(self) -> None:
+        await ensure_collector_script(self.page)
+        initial = await self.page.evaluate(
+            "([name, cfg]) => window.__scr4perCollector.install(name, cfg)", [self.name, self.spec]
+        )
+        logger.info(f"collector.install name={self.name} initial={initial}")
+
+    async def drain(self) -> List[dict]:
+        """Devuelve sólo las tarjetas montadas desde el último drain."""
+        try:
+            batch = await self.page.evaluate(
+                "(name) => window.__scr4perCollector ? window.__scr4perCollector.drain(name) : null", self.name
+            )
+        except Exception as e:
+            logger.debug(f"collector.drain_error name={self.name} err={e}")
+            return []
+        if batch is None:
+            # Navegación: el documento nuevo no tiene el recolector instalado
+            self.reinstalls += 1
+            try:
+                await self._install()
+                batch = await self.page.evaluate("(name) => window.__scr4perCollector.drain(name)", self.name)
+            except Exception as e:
+                logger.debug(f"collector.reinstall_error name={self.name} err={e}")
+                return []
+        self.drains += 1
+        self.drained += len(batch or [])
+        return batch or []
+
+    async def wait_for_items(self, timeout_ms: float) -> bool:
+        """Resuelve en cuanto hay tarjetas nuevas en el buffer (True) o al vencer ``timeout_ms`` (False)."""
+        try:
+            return bool(await self.page.evaluate(
+                "([name, ms]) => window.__scr4perCollector ? window.__scr4perCollector.waitFor(name, ms) : false",
+                [self.name, int(timeout_ms)],
+            ))
+        except Exception:
+            return False
+
+    async def stop(self) -> None:
+        try:
+            await self.page.evaluate(
+                "(name) => window.__scr4perCollector && window.__scr4perCollector.stop(name)", self.name
+            )
+        except Exception:
+            pass
+
+    def stats(self) -> Dict[str, int]:
+        return {'drained': self.drained, 'drains': self.drains, 'reinstalls': self.reinstalls}
+
+
+__all__ = [
+    'COLLECTOR_INIT_SCRIPT',
+    'COLLECTOR_SPECS',
+    'ListCollector',
+    'ensure_collector_script',
+]
@@ -3,7 +3,7 @@ from __future__ import annotations
 
 Encapsula:
  - Validación de requests
- - Ciclo de Playwright (una sola instancia)
+ - Navegadores prestados por el pool compartido (src.scrapers.browser_pool)
  - Creación de contexts por plataforma usando storage_state
  - Uso de adapters (PlatformScraper) registrados
  - Ingesta en Aggregator (perfiles + relaciones + actividades)
@@ -18,12 +18,12 @@ import logging
 import time
 import re
 
-from playwright.async_api import async_playwright
-
 from src.scrapers.base import PlatformScraper
+from src.scrapers.browser_pool import get_browser_pool
+from src.scrapers.context_cache import get_context_cache, STEALTH_INIT_SCRIPT
 from src.utils.images import local_or_proxy_photo_url
 from api.services.aggregation import Aggregator, make_profile, normalize_username, valid_username
-from api.repositories import upsert_profile, add_relationship
+from api.bulk_writer import BulkWriter
 from api.db import get_conn
 
 logger = logging.getLogger(__name__)
@@ -33,6 +33,12 @@ REL_FOLLOWER = 'seguidor'
 REL_FOLLOWING = 'seguido'
 REL_FRIEND = 'amigo'
 
+CONTEXT_OPTS = {
+    'viewport': {'width': 1280, 'height': 720},
+    'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36',
+    'locale': 'en-US',
+}
+
 
 @dataclass
 class ScrapeRequest:
@@ -47,6 +53,7 @@ class ScrapeOrchestrator:
         *,
         scraper_registry: Dict[str, Type[PlatformScraper]],
         storage_state_resolver: Callable[[str], Optional[Dict[str, Any]]],
+        account_id_resolver: Optional[Callable[[str], Optional[int]]] = None,
         max_roots: int = 5,
         persist: bool = True,
         headless: bool = True,
@@ -56,6 +63,7 @@ class ScrapeOrchestrator:
     ) -> None:
         self.scraper_registry = scraper_registry
         self.storage_state_resolver = storage_state_resolver
+        self.account_id_resolver = account_id_resolver
         self.max_roots = max_roots
         self.persist = persist
         self.headless = headless
@@ -68,58 +76,24 @@ class ScrapeOrchestrator:
         norm = self._normalize_and_validate(raw_requests)
         agg = Aggregator()
         timings: Dict[str, Dict[str, Any]] = {}
-        async with async_playwright() as pw:
-            # Launch with aggressive anti-crash flags and stealth to avoid Facebook detection
-            browser = await pw.chromium.launch(
-                headless=self.headless,
-                args=[
-                    "--disable-blink-features=AutomationControlled",  # Hide automation
-                    "--disable-dev-shm-usage",  # Prevent shared memory issues
-                    "--no-sandbox",  # Required for some environments
-                    "--disable-setuid-sandbox",
-                    "--disable-gpu",  # Prevent GPU crashes
-                    "--disable-software-rasterizer",
-                    "--disable-extensions",
-                    "--disable-background-networking",
-                    "--disable-background-timer-throttling",
-                    "--disable-backgrounding-occluded-windows",
-                    "--disable-breakpad",
-                    "--disable-component-extensions-with-background-pages",
-                    "--disable-features=TranslateUI,BlinkGenPropertyTrees",
-                    "--disable-ipc-flooding-protection",
-                    "--disable-renderer-backgrounding",
-                    "--enable-features=NetworkService,NetworkServiceInProcess",
-                    "--force-color-profile=srgb",
-                    "--metrics-recording-only",
-                    "--no-first-run",
-                    "--safebrowsing-disable-auto-update",
-                    "--password-store=basic",
-                    "--use-mock-keychain",
-                    "--disable-accelerated-2d-canvas",
-                    "--disable-accelerated-jpeg-decoding",
-                    "--disable-accelerated-mjpeg-decode",
-                    "--disable-accelerated-video-decode",
-                ]
-            )
-            sem = asyncio.Semaphore(self.max_concurrency)
+        browser_pool = get_browser_pool()
+        sem = asyncio.Semaphore(self.max_concurrency)
 
-            async def runner(req: ScrapeRequest):
-                async with sem:
-                    key = f"{req.platform}:{req.username}"
-                    started = time.time()
+        async def runner(req: ScrapeRequest):
+            async with sem:
+                key = f"{req.platform}:{req.username}"
+                started = time.time()
+                async with browser_pool.lease(req.platform, headless=self.headless) as browser:
                     await self._process_one(agg, browser, req)
-                    elapsed = time.time() - started
-                    timings[key] = {"seconds": round(elapsed, 3)}
+                elapsed = time.time() - started
+                timings[key] = {"seconds": round(elapsed, 3)}
 
-            try:
-                # Lanzar concurrente si max_concurrency > 1
-                if self.max_concurrency > 1:
-                    await asyncio.gather(*(runner(r) for r in norm))
-                else:
-                    for r in norm:
-                        await runner(r)
-            finally:
-                await browser.close()
+        # Lanzar concurrente si max_concurrency > 1
+        if self.max_concurrency > 1:
+            await asyncio.gather(*(runner(r) for r in norm))
+        else:
+            for r in norm:
+                await runner(r)
 
         payload = agg.build_payload(roots_requested=len(norm))
         # Inyectar métricas de roots (opcional: se puede mover a meta detallada)
@@ -154,24 +128,9 @@ class ScrapeOrchestrator:
         if not storage_state:
             agg.warnings.append({"code": "ROOT_SKIPPED", "message": f"Missing storage_state for {platform}"})
             return
-        
-        # Helper to create fresh context+page
-        async def create_context_and_page():
-            context = await browser.new_context(
-                storage_state=storage_state,
-                viewport={'width': 1280, 'height': 720},
-                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36',
-                locale='en-US',
-            )
-            # Stealth: hide webdriver flag
-            await context.add_init_script("""
-                Object.defineProperty(navigator, 'webdriver', {get: () => undefined});
-                window.chrome = {runtime: {}};
-            """)
-            page = await context.new_page()
-            return context, page
-        
-        context, page = await create_context_and_page()
+        account_id = self.account_id_resolver(platform) if self.account_id_resolver else None
+
+        context, page = await self._open_phase_page(browser, storage_state, account_id)
         scraper: PlatformScraper = scraper_cls(page, platform)
         username = req.username
         try:
@@ -188,22 +147,22 @@ class ScrapeOrchestrator:
             
             # Recreate fresh contexts for fragile platforms to avoid residual modals/DOM and crashes
             if platform == 'facebook':
-                followers = await self._fb_list_with_fresh_context(browser, storage_state, scraper_cls, username, 'followers')
-                following = await self._fb_list_with_fresh_context(browser, storage_state, scraper_cls, username, 'following')
-                friends = await self._fb_list_with_fresh_context(browser, storage_state, scraper_cls, username, 'friends')
+                followers = await self._fb_list_with_fresh_context(browser, storage_state, scraper_cls, username, 'followers', account_id=account_id)
+                following = await self._fb_list_with_fresh_context(browser, storage_state, scraper_cls, username, 'following', account_id=account_id)
+                friends = await self._fb_list_with_fresh_context(browser, storage_state, scraper_cls, username, 'friends', account_id=account_id)
                 if req.max_photos > 0:
-                    commenters = await self._fb_list_with_fresh_context(browser, storage_state, scraper_cls, username, 'commenters', req.max_photos)
-                    reactors = await self._fb_list_with_fresh_context(browser, storage_state, scraper_cls, username, 'reactors', req.max_photos)
+                    commenters = await self._fb_list_with_fresh_context(browser, storage_state, scraper_cls, username, 'commenters', req.max_photos, account_id=account_id)
+                    reactors = await self._fb_list_with_fresh_context(browser, storage_state, scraper_cls, username, 'reactors', req.max_photos, account_id=account_id)
                 else:
                     commenters = []
                     reactors = []
             elif platform == 'instagram':
-                followers = await self._ig_list_with_fresh_context(browser, storage_state, scraper_cls, username, 'followers')
-                following = await self._ig_list_with_fresh_context(browser, storage_state, scraper_cls, username, 'following')
+                followers = await self._ig_list_with_fresh_context(browser, storage_state, scraper_cls, username, 'followers', account_id=account_id)
+                following = await self._ig_list_with_fresh_context(browser, storage_state, scraper_cls, username, 'following', account_id=account_id)
                 friends = []
                 if req.max_photos > 0:
-                    commenters = await self._ig_list_with_fresh_context(browser, storage_state, scraper_cls, username, 'commenters', req.max_photos)
-                    reactors = await self._ig_list_with_fresh_context(browser, storage_state, scraper_cls, username, 'reactors', req.max_photos)
+                    commenters = await self._ig_list_with_fresh_context(browser, storage_state, scraper_cls, username, 'commenters', req.max_photos, account_id=account_id)
+                    reactors = await self._ig_list_with_fresh_context(browser, storage_state, scraper_cls, username, 'reactors', req.max_photos, account_id=account_id)
                 else:
                     commenters = []
                     reactors = []
@@ -231,31 +190,43 @@ class ScrapeOrchestrator:
             self._ingest_activity_list(agg, platform, username, reactors, rel_type='reaccionó')
 
             if self.persist:
-                self._persist(platform, username, root_profile, followers, following, friends, commenters, reactors)
+                await asyncio.to_thread(self._persist, platform, username, root_profile, followers, following, friends, commenters, reactors)
         except Exception as e:  # noqa: BLE001
             agg.warnings.append({"code": "PARTIAL_FAILURE", "message": f"{platform}:{username} {str(e)}"})
             logger.exception("orchestrator.scrape_error platform=%s username=%s", platform, username)
         finally:
-            await context.close()
+            await self._close_phase_page(context, page, account_id)
+
+    async def _open_phase_page(self, browser, storage_state, account_id: Optional[int]):
+        """Página para una fase: dentro del contexto cacheado de la cuenta si se conoce, si no en un contexto nuevo."""
+        if account_id is not None:
+            return await get_context_cache().open_page(
+                browser, account_id, storage_state, context_opts=CONTEXT_OPTS, init_script=STEALTH_INIT_SCRIPT
+            )
+        ctx = await browser.new_context(storage_state=storage_state, **CONTEXT_OPTS)
+        # Stealth: hide webdriver flag
+        await ctx.add_init_script(STEALTH_INIT_SCRIPT)
+        pg = await ctx.new_page()
+        return ctx, pg
 
-    async def _ig_list_with_fresh_context(self, browser, storage_state, scraper_cls, username: str, list_type: str, max_items: int = 0):
-        """Execute a single Instagram phase with a fresh context to prevent stuck clicks/crashes.
+    async def _close_phase_page(self, ctx, pg, account_id: Optional[int]) -> None:
+        try:
+            if account_id is not None:
+                await get_context_cache().release_page(account_id, pg)
+            else:
+                await ctx.close()
+        except Exception:
+            pass
+
+    async def _ig_list_with_fresh_context(self, browser, storage_state, scraper_cls, username: str, list_type: str, max_items: int = 0, account_id: Optional[int] = None):
+        """Execute a single Instagram phase with a fresh page (and context, unless cached) to prevent stuck clicks/crashes.
         Mirrors the strategy used for Facebook.
         """
         logger.info(f"orchestrator.ig_fresh_context list={list_type} username={username}")
         ctx = None
+        pg = None
         try:
-            ctx = await browser.new_context(
-                storage_state=storage_state,
-                viewport={'width': 1280, 'height': 720},
-                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36',
-                locale='en-US',
-            )
-            await ctx.add_init_script("""
-                Object.defineProperty(navigator, 'webdriver', {get: () => undefined});
-                window.chrome = {runtime: {}};
-            """)
-            pg = await ctx.new_page()
+            ctx, pg = await self._open_phase_page(browser, storage_state, account_id)
             scraper = scraper_cls(pg, 'instagram')
 
             if list_type == 'followers':
@@ -272,27 +243,15 @@ class ScrapeOrchestrator:
             return []
         finally:
             if ctx:
-                try:
-                    await ctx.close()
-                except Exception:
-                    pass
+                await self._close_phase_page(ctx, pg, account_id)
 
-    async def _fb_list_with_fresh_context(self, browser, storage_state, scraper_cls, username: str, list_type: str, max_items: int = 0) -> List[dict]:
-        """Execute a single Facebook list extraction with a fresh context to prevent crashes."""
+    async def _fb_list_with_fresh_context(self, browser, storage_state, scraper_cls, username: str, list_type: str, max_items: int = 0, account_id: Optional[int] = None) -> List[dict]:
+        """Execute a single Facebook list extraction with a fresh page (and context, unless cached) to prevent crashes."""
         logger.info(f"orchestrator.fb_fresh_context list={list_type} username={username}")
         ctx = None
+        pg = None
         try:
-            ctx = await browser.new_context(
-                storage_state=storage_state,
-                viewport={'width': 1280, 'height': 720},
-                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36',
-                locale='en-US',
-            )
-            await ctx.add_init_script("""
-                Object.defineProperty(navigator, 'webdriver', {get: () => undefined});
-                window.chrome = {runtime: {}};
-            """)
-            pg = await ctx.new_page()
+            ctx, pg = await self._open_phase_page(browser, storage_state, account_id)
             scraper = scraper_cls(pg, 'facebook')
             
             if list_type == 'followers':
@@ -314,10 +273,7 @@ class ScrapeOrchestrator:
             return []
         finally:
             if ctx:
-                try:
-                    await ctx.close()
-                except Exception:
-                    pass
+                await self._close_phase_page(ctx, pg, account_id)
 
     # ------------------- Normalization & Ingestion ---------------------------
     def _normalize_user_item(self, platform: str, raw: Dict[str, Any]) -> Dict[str, Any]:  # noqa: D401
@@ -375,29 +331,20 @@ class ScrapeOrchestrator:
             from api.services.aggregation import valid_username as _valid
             with get_conn() as conn:
                 with conn.cursor() as cur:
-                    upsert_profile(cur, platform, root_username, root_profile.get('full_name'), root_profile.get('profile_url'), root_profile.get('photo_url'))
-                    # Followers: root -> fu (follower) [align with legacy scrape]
-                    for rel_item in followers or []:
-                        norm = self._normalize_user_item(platform, rel_item)
-                        fu = norm.get('username')
-                        if fu and _valid(fu) and fu != root_username:
-                            upsert_profile(cur, platform, fu, norm.get('full_name'), norm.get('profile_url'), norm.get('photo_url'))
-                            add_relationship(cur, platform, root_username, fu, 'follower')
-                    # Following: root -> fu (following)
-                    for rel_item in following or []:
-                        norm = self._normalize_user_item(platform, rel_item)
-                        fu = norm.get('username')
-                        if fu and _valid(fu) and fu != root_username:
-                            upsert_profile(cur, platform, fu, norm.get('full_name'), norm.get('profile_url'), norm.get('photo_url'))
-                            add_relationship(cur, platform, root_username, fu, 'following')
-                    # Friends (Facebook): single direction root -> fu (friend) [align with legacy]
+                    writer = BulkWriter(cur, platform)
+                    writer.add_profile(root_username, root_profile.get('full_name'), root_profile.get('profile_url'), root_profile.get('photo_url'))
+                    # root -> fu (follower / following; friend single direction, Facebook only) [align with legacy scrape]
+                    rel_lists = [(followers, 'follower'), (following, 'following')]
                     if platform == 'facebook':
-                        for rel_item in friends or []:
+                        rel_lists.append((friends, 'friend'))
+                    for items, rel_type in rel_lists:
+                        for rel_item in items or []:
                             norm = self._normalize_user_item(platform, rel_item)
                             fu = norm.get('username')
                             if fu and _valid(fu) and fu != root_username:
-                                upsert_profile(cur, platform, fu, norm.get('full_name'), norm.get('profile_url'), norm.get('photo_url'))
-                                add_relationship(cur, platform, root_username, fu, 'friend')
+                                writer.add_profile(fu, norm.get('full_name'), norm.get('profile_url'), norm.get('photo_url'))
+                                writer.add_relationship(root_username, fu, rel_type)
+                    writer.flush()
                     # Commenters/Reactors: omit persistence in relationships table (they belong to comments/reactions tables)
                 conn.commit()
         except Exception:  # noqa: BLE001
@@ -2,6 +2,8 @@ import time
 import logging
 from typing import Dict
 
+from src.utils.metrics import counter
+
 logger = logging.getLogger(__name__)
 
 BLOCK_EXTENSIONS = (
@@ -12,6 +14,11 @@ BLOCK_EXTENSIONS = (
 
 BLOCK_RESOURCE_TYPES = {'image', 'media', 'font'}  # playwright resource_type set
 
+_RESBLOCK_REQUESTS = counter(
+    'scr4per_resblock_requests_total', 'Requests vistos por ListResourceBlocker',
+    ('platform', 'phase', 'action', 'resource_type'),
+)
+
 class ListResourceBlocker:
     """Intercepta y bloquea recursos pesados (imágenes, video, fuentes) durante fases de listas.
 
@@ -41,25 +48,28 @@ class ListResourceBlocker:
             
             if should_block:
                 self.blocked += 1
+                _RESBLOCK_REQUESTS.inc(platform=self.platform, phase=self.phase, action='blocked', resource_type=rtype)
                 try:
                     await route.abort()
                 except Exception as abort_err:
-                    # Si abort falla, intentar continue para no romper el flujo
+                    # Si abort falla, dejar pasar el request para no romper el flujo
                     logger.debug(f"resblock.abort_failed platform={self.platform} url={url[:100]} err={abort_err}")
                     try:
-                        await route.continue_()
+                        await route.fallback()
                     except Exception:
                         pass
                 return
             
             self.allowed += 1
-            await route.continue_()
+            _RESBLOCK_REQUESTS.inc(platform=self.platform, phase=self.phase, action='allowed', resource_type=rtype)
+            # fallback (no continue_): las rutas del contexto (p.ej. replay de HAR) siguen aplicando
+            await route.fallback()
             
         except Exception as e:
             # Captura cualquier error no previsto y permite la request
             logger.warning(f"resblock.handler_error platform={self.platform} error={type(e).__name__}:{str(e)[:100]}")
             try:
-                await route.continue_()
+                await route.fallback()
             except Exception:
                 # Última línea de defensa: si ni siquiera continue funciona, abandonar silenciosamente
                 pass
@@ -1,20 +1,175 @@
 import time
 import logging
 import asyncio
-from typing import Callable, Awaitable, Optional, Any, Literal
+from typing import Callable, Awaitable, Optional, Any, Literal, List, Dict, Sequence, TYPE_CHECKING
+
+from src.utils.metrics import counter, histogram
+from src.utils.photo_pipeline import prefetch_photos
+
+if TYPE_CHECKING:
+    from src.scrapers.list_collector import ListCollector
 
 logger = logging.getLogger(__name__)
 
 EarlyExitReason = Literal['empty','stagnation','bottom','max','timeout']
+ReadyTrigger = Literal['items','network','timeout']
+
+# Respuestas XHR/fetch que traen la siguiente página de cada lista
+READY_URL_PATTERNS: Dict[str, Sequence[str]] = {
+    'facebook': ('/api/graphql',),
+    'instagram': ('/graphql', '/api/v1/friendships/', '/api/v1/'),
+    'x': ('/graphql/',),
+}
+
+# Latencia observada scroll -> contenido listo (EWMA por plataforma, ms)
+_READY_LATENCY_MS: Dict[str, float] = {}
+_READY_EWMA_ALPHA = 0.3
+
+_SCROLL_RUNS = counter('scr4per_scroll_runs_total', 'Ejecuciones de scroll_loop por motivo de salida', ('platform', 'list', 'reason'))
+_SCROLL_ITERATIONS = counter('scr4per_scroll_iterations_total', 'Iteraciones de scroll_loop', ('platform', 'list'))
+_SCROLL_ITEMS = counter('scr4per_scroll_items_total', 'Items nuevos extraídos por scroll_loop', ('platform', 'list'))
+_SCROLL_SECONDS = histogram('scr4per_scroll_duration_seconds', 'Duración de scroll_loop', ('platform', 'list'))
+_SCROLL_ITEMS_PER_SECOND = histogram(
+    'scr4per_scroll_items_per_second', 'Items/s de cada ejecución de scroll_loop', ('platform', 'list'),
+    buckets=(0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+
+def _scroll_labels(log_prefix: str) -> Dict[str, str]:
+    """'instagram.list type=seguidores rid=..' -> platform=instagram, list=seguidores (sin ids: cardinalidad acotada)."""
+    parts = log_prefix.split()
+    labels = {'platform': parts[0].split('.')[0] if parts else 'unknown', 'list': 'unknown'}
+    for part in parts[1:]:
+        if part.startswith('type='):
+            labels['list'] = part[len('type='):]
+    return labels
 
 class ScrollStats(dict):
     @property
     def duration_ms(self) -> int:
         return self.get('duration_ms', 0)
 
+class ScrollReadiness:
+    """Espera tras cada scroll hasta que aparezca contenido en lugar de dormir pause_ms fijo.
+
+    Listo = nuevas tarjetas en el recolector de la página, o terminó una respuesta
+    XHR/GraphQL relevante, o venció la espera máxima. La espera máxima se adapta a
+    la latencia observada por plataforma (3x la EWMA, acotada a [min_cap_ms, max_wait_ms]);
+    ``scroll_loop`` la sube al menos a su ``pause_ms`` y, si una espera recortada vence
+    sin items, repite con ``max_wait_ms`` antes de contarla como estancamiento (la EWMA
+    es global por plataforma: una cuenta lenta no debe heredar la prisa de otra rápida).
+    """
+
+    def __init__(
+        self,
+        page,
+        platform: str,
+        *,
+        collector: Optional['ListCollector'] = None,
+        url_patterns: Optional[Sequence[str]] = None,
+        max_wait_ms: int = 2500,
+        min_cap_ms: int = 400,
+        settle_ms: int = 150,
+    ):
+        self.page = page
+        self.platform = platform
+        self.collector = collector
+        self.url_patterns = tuple(p.lower() for p in (url_patterns or READY_URL_PATTERNS.get(platform, ('graphql',))))
+        self.max_wait_ms = max_wait_ms
+        self.min_cap_ms = min_cap_ms
+        self.settle_ms = settle_ms
+        self._network = asyncio.Event()
+        self.triggers: Dict[str, int] = {'items': 0, 'network': 0, 'timeout': 0}
+        self.last_cap_ms = 0.0
+        self.full_waits = 0
+        self.waits = 0
+        self.wait_ms = 0.0
+        page.on('requestfinished', self._on_request_finished)
+
+    def _on_request_finished(self, request) -> None:
+        try:
+            if request.resource_type not in ('xhr', 'fetch'):
+                return
+            url = (request.url or '').lower()
+        except Exception:
+            return
+        if any(p in url for p in self.url_patterns):
+            self._network.set()
+
+    def cap_ms(self, floor_ms: float = 0.0) -> float:
+        ewma = _READY_LATENCY_MS.get(self.platform)
+        if ewma is None:
+            return float(self.max_wait_ms)
+        return max(float(self.min_cap_ms), float(floor_ms), min(float(self.max_wait_ms), 3 * ewma))
+
+    def arm(self) -> None:
+        """Llamar justo antes del scroll: descarta señales anteriores."""
+        self._network.clear()
+
+    async def wait(self, *, floor_ms: float = 0.0, full: bool = False) -> ReadyTrigger:
+        """``floor_ms``: cota inferior del cap; ``full=True`` espera hasta ``max_wait_ms`` sin EWMA."""
+        cap = float(self.max_wait_ms) if full else self.cap_ms(floor_ms)
+        self.last_cap_ms = cap
+        if full:
+            self.full_waits += 1
+        t0 = time.time()
+        network = asyncio.ensure_future(self._network.wait())
+        tasks = {network}
+        items = None
+        if self.collector is not None:
+            items = asyncio.ensure_future(self.collector.wait_for_items(cap))
+            tasks.add(items)
+        done, pending = await asyncio.wait(tasks, timeout=cap / 1000, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        trigger: ReadyTrigger = 'timeout'
+        if items is not None and items in done and not items.cancelled() and items.result():
+            trigger = 'items'
+        elif network in done:
+            trigger = 'network'
+            if self.collector is not None:
+                # Las plataformas disparan GraphQL no relacionado: dar margen a que rendericen tarjetas
+                remaining = cap - (time.time() - t0) * 1000
+                if remaining > 0 and await self.collector.wait_for_items(min(remaining, 4 * self.settle_ms)):
+                    trigger = 'items'
+            else:
+                # La respuesta llegó; dar un instante al render antes de extraer
+                await asyncio.sleep(self.settle_ms / 1000)
+        elapsed_ms = (time.time() - t0) * 1000
+        self._observe(elapsed_ms if trigger != 'timeout' else cap)
+        self.triggers[trigger] += 1
+        self.waits += 1
+        self.wait_ms += elapsed_ms
+        return trigger
+
+    def _observe(self, latency_ms: float) -> None:
+        prev = _READY_LATENCY_MS.get(self.platform)
+        _READY_LATENCY_MS[self.platform] = latency_ms if prev is None else (
+            _READY_EWMA_ALPHA * latency_ms + (1 - _READY_EWMA_ALPHA) * prev
+        )
+
+    def close(self) -> None:
+        try:
+            self.page.remove_listener('requestfinished', self._on_request_finished)
+        except Exception:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'waits': self.waits,
+            'wait_ms_avg': round(self.wait_ms / self.waits, 1) if self.waits else 0.0,
+            'triggers': dict(self.triggers),
+            'full_waits': self.full_waits,
+            'latency_ewma_ms': round(_READY_LATENCY_MS.get(self.platform, 0.0), 1),
+            'cap_ms': round(self.cap_ms(), 1),
+        }
+
+def get_ready_latency() -> Dict[str, float]:
+    """EWMA de latencia scroll -> contenido listo por plataforma (ms)."""
+    return {k: round(v, 1) for k, v in _READY_LATENCY_MS.items()}
+
 async def scroll_loop(
     *,
-    process_once: Callable[[], Awaitable[int]],
+    process_once: Optional[Callable[[], Awaitable[int]]] = None,
     do_scroll: Callable[[], Awaitable[None]],
     max_scrolls: int = 100,
     pause_ms: int = 900,
@@ -26,16 +181,40 @@ async def scroll_loop(
     min_scrolls_after_decay: int = 2,
     log_prefix: str = "scroll",
     timeout_ms: Optional[int] = None,
+    collector: Optional['ListCollector'] = None,
+    consume: Optional[Callable[[List[dict]], int]] = None,
+    readiness: Optional[ScrollReadiness] = None,
 ) -> ScrollStats:
     """Generic scroll loop with early-exit and optional adaptive mode.
     Added timeout_ms: abort if total elapsed exceeds this value.
+    With collector+consume, each iteration drains only the cards mounted since the
+    previous one (in-page MutationObserver) instead of calling process_once.
+    With readiness, the post-scroll pause ends as soon as new items or a relevant
+    XHR/GraphQL response arrive (the adaptive cap never goes below pause_ms, and a
+    capped wait that times out empty is retried at max_wait_ms before it counts
+    toward stagnation).
+    Stats report time spent extracting vs waiting.
     """
+    if collector is not None:
+        if consume is None:
+            raise ValueError("scroll_loop: collector requires consume")
+        async def process_once() -> int:
+            batch = await collector.drain()
+            # Las fotos empiezan a bajarse mientras se sigue scrolleando (si hay PhotoPipeline activo)
+            prefetch_photos(rec.get('img') for rec in batch)
+            return consume(batch)
+    elif process_once is None:
+        raise ValueError("scroll_loop: process_once or collector is required")
     start = time.time()
+    extract_ms = 0.0
+    wait_ms = 0.0
     total = 0
     stagnation_seq = 0
     empty_seq = 0
     reason: EarlyExitReason | None = None
     effective_max = max_scrolls
+    last_trigger: Optional[ReadyTrigger] = None
+    full_wait = False
     for i in range(max_scrolls):
         # Timeout check at loop start
         if timeout_ms is not None and (time.time() - start) * 1000 >= timeout_ms:
@@ -43,14 +222,20 @@ async def scroll_loop(
             logger.warning(f"{log_prefix} timeout_exceeded elapsed_ms={(time.time()-start)*1000:.0f} limit_ms={timeout_ms}")
             break
         new_items = 0
+        t_extract = time.time()
         try:
             new_items = await process_once()
             total += new_items
         except Exception as e:
             logger.debug(f"{log_prefix} process_error scroll={i+1} err={e}")
+        extract_ms += (time.time() - t_extract) * 1000
         if new_items == 0:
-            stagnation_seq += 1
-            empty_seq += 1
+            if readiness is not None and last_trigger == 'timeout' and readiness.last_cap_ms < readiness.max_wait_ms:
+                # La espera se cortó por la EWMA: repetir con la espera completa antes de contarla
+                full_wait = True
+            else:
+                stagnation_seq += 1
+                empty_seq += 1
         else:
             stagnation_seq = 0
             empty_seq = 0
@@ -72,6 +257,8 @@ async def scroll_loop(
             reason = 'max'
             break
         # Scroll
+        if readiness is not None:
+            readiness.arm()
         try:
             await do_scroll()
         except Exception:
@@ -85,9 +272,33 @@ async def scroll_loop(
             except Exception:
                 pass
         # Pause
-        await asyncio.sleep(pause_ms / 1000)
+        t_wait = time.time()
+        if readiness is not None:
+            last_trigger = await readiness.wait(floor_ms=pause_ms, full=full_wait)
+            full_wait = False
+        else:
+            await asyncio.sleep(pause_ms / 1000)
+        wait_ms += (time.time() - t_wait) * 1000
     duration_ms = int((time.time() - start) * 1000)
     if reason is None:
         reason = 'max'
-    logger.info(f"{log_prefix} end total={total} reason={reason} duration_ms={duration_ms}")
-    return ScrollStats(total=total, reason=reason, duration_ms=duration_ms, scrolls=i+1, iterations=i+1)
+    logger.info(
+        f"{log_prefix} end total={total} reason={reason} duration_ms={duration_ms} "
+        f"extract_ms={extract_ms:.0f} wait_ms={wait_ms:.0f} mode={'ready' if readiness is not None else 'fixed'}"
+    )
+    labels = _scroll_labels(log_prefix)
+    _SCROLL_RUNS.inc(reason=reason, **labels)
+    _SCROLL_ITERATIONS.inc(i+1, **labels)
+    _SCROLL_ITEMS.inc(total, **labels)
+    _SCROLL_SECONDS.observe(duration_ms / 1000, **labels)
+    if duration_ms > 0:
+        _SCROLL_ITEMS_PER_SECOND.observe(total * 1000 / duration_ms, **labels)
+    stats = ScrollStats(
+        total=total, reason=reason, duration_ms=duration_ms, scrolls=i+1, iterations=i+1,
+        extract_ms=int(extract_ms), wait_ms=int(wait_ms),
+    )
+    if collector is not None:
+        stats['collector'] = collector.stats()
+    if readiness is not None:
+        stats['readiness'] = readiness.stats()
+    return stats
@@ -5,10 +5,11 @@ from src.utils.dom import scroll_window
 from src.utils.list_parser import build_user_item
 from src.utils.url import normalize_post_url
 from src.scrapers.resource_blocking import start_list_blocking
-from src.scrapers.scrolling import scroll_loop
+from src.scrapers.scrolling import scroll_loop, ScrollReadiness
 from src.scrapers.selector_registry import get_selectors, registry_version
 from src.scrapers.errors import classify_page_state, ErrorCode
-from .utils import procesar_usuarios_en_pagina
+from src.scrapers.list_collector import ListCollector
+from .utils import agregar_registros
 
 logger = logging.getLogger(__name__)
 
@@ -20,10 +21,10 @@ async def extraer_usuarios_lista(page, tipo_lista="seguidores", rid: str | None
     logger.info(f"{_ts()} x.list start type={tipo_lista}{ridp}")
     usuarios_dict = {}
     blocker = await start_list_blocking(page, 'x', phase=f'list.{tipo_lista}')
-    async def process_once() -> int:
-        before = len(usuarios_dict)
-        await procesar_usuarios_en_pagina(page, usuarios_dict)
-        return len(usuarios_dict) - before
+    collector = await ListCollector.start(page, 'x', name=f"x.{tipo_lista}")
+    readiness = ScrollReadiness(page, 'x', collector=collector)
+    def consume(registros) -> int:
+        return agregar_registros(registros, usuarios_dict)
     async def do_scroll():
         try:
             await scroll_window(page, 0)
@@ -35,7 +36,9 @@ async def extraer_usuarios_lista(page, tipo_lista="seguidores", rid: str | None
         except Exception:
             return False
     stats = await scroll_loop(
-        process_once=process_once,
+        collector=collector,
+        consume=consume,
+        readiness=readiness,
         do_scroll=do_scroll,
         max_scrolls=40,
         pause_ms=1000,
@@ -47,6 +50,8 @@ async def extraer_usuarios_lista(page, tipo_lista="seguidores", rid: str | None
         log_prefix=f"x.list type={tipo_lista}{ridp}",
         timeout_ms=32000,
     )
+    readiness.close()
+    await collector.stop()
     await blocker.stop()
     if stats['reason'] == 'timeout':
         logger.warning(f"{_ts()} x.list error.code=TIMEOUT type={tipo_lista} duration_ms={stats['duration_ms']}{ridp}")
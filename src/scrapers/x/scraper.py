@@ -9,15 +9,17 @@ from src.utils.url import normalize_post_url
 from src.scrapers.x.utils import (
     obtener_foto_perfil_x,
     obtener_nombre_usuario_x,
-    procesar_usuarios_en_pagina
+    procesar_usuarios_en_pagina,
+    agregar_registros,
 )
+from src.scrapers.list_collector import ListCollector
 
 import logging
 logger = logging.getLogger(__name__)
 
 async def extraer_usuarios_lista(page, tipo_lista="seguidores"):
     """Extraer usuarios de una lista (seguidores o seguidos) con scroll optimizado.
-    Patrón: evaluate en lote + espera adaptativa + procesar-solo-nuevos.
+    Patrón: recolector en página (sólo celdas nuevas por ciclo) + espera adaptativa.
     """
     logger.info("Cargando %s...", tipo_lista)
     usuarios_dict = {}
@@ -29,35 +31,8 @@ async def extraer_usuarios_lista(page, tipo_lista="seguidores"):
 
     await page.wait_for_timeout(4000)
 
-    async def _extract_visible_batch(page_):
-        js = '''
-        () => {
-          const root = document.querySelector('[data-testid="primaryColumn"]') || document;
-          const anchors = Array.from(root.querySelectorAll('a[role="link"][href^="/"]'));
-          const out = [];
-          for (const a of anchors) {
-            const href = a.getAttribute('href') || '';
-            if (!href || href.includes('/status/')) continue;
-            // filtrar anchors de navegación no-usuario (heurístico: 1 segmento)
-            const m = href.match(/^\/([A-Za-z0-9_\.]+)(\/?|$)/);
-            if (!m) continue;
-            let img = '';
-            const cont = a.closest('article, div');
-            const imgel = cont ? (cont.querySelector('img[src*="profile_images"], img[alt*="avatar"]') || a.querySelector('img')) : a.querySelector('img');
-            if (imgel) {
-              img = imgel.currentSrc || imgel.src || '';
-            }
-            const text = (a.textContent || '').trim();
-            out.push({ href, text, img });
-          }
-          return out;
-        }
-        '''
-        try:
-            data = await page_.evaluate(js)
-            return data or []
-        except Exception:
-            return []
+    # Recolector en página: cada ciclo drena sólo las celdas montadas desde el anterior
+    collector = await ListCollector.start(page, 'x', name=f"x.{tipo_lista}")
 
     while scroll_attempts < max_scroll_attempts and no_new_content_count < max_no_new_content:
         try:
@@ -71,27 +46,7 @@ async def extraer_usuarios_lista(page, tipo_lista="seguidores"):
             except Exception:
                 pass
 
-            batch = await _extract_visible_batch(page)
-            added_now = 0
-            for rec in batch:
-                try:
-                    href = rec.get('href') or ''
-                    if not href or '/status/' in href:
-                        continue
-                    url_usuario = f"https://x.com{href}"
-                    item = build_user_item('x', url_usuario, None, rec.get('img') or None)
-                    url_limpia = item['link_usuario']
-                    username_usuario = item['username_usuario']
-                    # Validaciones rápidas
-                    if (not username_usuario) or username_usuario.isdigit() or len(username_usuario) < 2 or len(username_usuario) > 50:
-                        continue
-                    if url_limpia in usuarios_dict:
-                        continue
-                    nombre = (rec.get('text') or '').strip() or username_usuario
-                    usuarios_dict[url_limpia] = build_user_item('x', url_usuario, nombre, rec.get('img') or None)
-                    added_now += 1
-                except Exception:
-                    continue
+            added_now = agregar_registros(await collector.drain(), usuarios_dict)
 
             if len(usuarios_dict) > current_user_count:
                 no_new_content_count = 0
@@ -123,6 +78,7 @@ async def extraer_usuarios_lista(page, tipo_lista="seguidores"):
             except Exception:
                 pass
 
+    await collector.stop()
     logger.info("Scroll completado para %s. Total de scrolls: %d", tipo_lista, scroll_attempts)
     logger.info("Usuarios únicos extraídos: %d", len(usuarios_dict))
 
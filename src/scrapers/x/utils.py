@@ -121,4 +121,30 @@ async def procesar_usuarios_en_pagina(page, usuarios_dict):
     except Exception as e:
         logger.error(f"Error general procesando usuarios en página: {e}")
 
-    return usuarios_procesados
\ No newline at end of file
+    return usuarios_procesados
+
+def agregar_registros(registros, usuarios_dict) -> int:
+    """Agrega registros ``{href, text, img}`` (ListCollector) y devuelve cuántos eran nuevos."""
+    from src.scrapers.x.config import X_CONFIG
+    from src.utils.list_parser import build_user_item
+    agregados = 0
+    for rec in registros:
+        try:
+            href = rec.get('href') or ''
+            if not href.startswith('/') or any(pattern in href for pattern in X_CONFIG["patterns_to_exclude"]):
+                continue
+            url_usuario = f"https://x.com{href}"
+            item = build_user_item('x', url_usuario, None, rec.get('img') or None)
+            url_limpia = item['link_usuario']
+            username_usuario = item['username_usuario']
+            if ((not username_usuario) or username_usuario.isdigit() or len(username_usuario) < 2 or
+                    len(username_usuario) > 50 or username_usuario in ['followers', 'following', 'status']):
+                continue
+            if url_limpia in usuarios_dict:
+                continue
+            nombre = (rec.get('text') or '').strip() or username_usuario
+            usuarios_dict[url_limpia] = build_user_item('x', url_usuario, nombre, rec.get('img') or None)
+            agregados += 1
+        except Exception:
+            continue
+    return agregados
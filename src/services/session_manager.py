@@ -11,15 +11,12 @@ from sqlalchemy import text
 from datetime import datetime
 
 from db.models import ScraperAccount, AccountStatus
+# Re-export: vive en src.utils.exceptions para importarla sin cargar SQLAlchemy
+from src.utils.exceptions import ResourceExhaustedException  # noqa: F401
 
 logger = logging.getLogger(__name__)
 
 
-class ResourceExhaustedException(Exception):
-    """Se lanza cuando no hay cuentas disponibles en el pool."""
-    pass
-
-
 class SessionManager:
     """
     Gestor del pool global de cuentas.
@@ -0,0 +1,153 @@
+"""Expiración de URLs firmadas de CDN y caché negativa de descargas fallidas.
+
+Las fotos de perfil de Instagram/Facebook llevan la firma ``oh=`` y la expiración
+``oe=`` (timestamp unix en hexadecimal). Pasada esa hora el CDN responde 403 y
+ningún reintento la recupera; lo mismo ocurre con 404/410. Antes
+``local_or_proxy_photo_url`` reintentaba hasta ``retries`` veces con backoff
+cada URL perdida.
+
+- ``url_expiry`` / ``is_expired``: lee ``oe=`` para descartar (o priorizar) fotos.
+- ``NegativeCache``: recuerda las URLs con fallo permanente durante un TTL; los
+  fallos transitorios (5xx, timeouts) no se registran y se siguen reintentando.
+
+Uso:
+    failures = get_negative_cache()
+    reason = failures.skip_reason(url)    # 'expired' | 'http_403' | ... | None
+    ...
+    failures.record(url, status)          # tras agotar HTTP + fallback con página
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+logger = logging.getLogger(__name__)
+
+# Segundos antes de ``oe`` a partir de los cuales la URL ya no merece un intento
+PHOTO_EXPIRY_MARGIN_S = float(os.getenv('PHOTO_EXPIRY_MARGIN_S') or 10)
+PHOTO_NEGATIVE_TTL_S = float(os.getenv('PHOTO_NEGATIVE_TTL_S') or 3600)
+PHOTO_NEGATIVE_CACHE_SIZE = int(os.getenv('PHOTO_NEGATIVE_CACHE_SIZE') or 50000)
+
+# Estados que no cambian reintentando la misma URL
+PERMANENT_STATUSES = frozenset({401, 403, 404, 410})
+# 404/410: el asset ya no existe; 401/403: firma inválida o sin permisos
+_TTL_FACTOR = {404: 6.0, 410: 6.0}
+
+# Rango razonable para ``oe`` (2015..2100): descarta valores que no son timestamps
+_OE_MIN = 1420070400
+_OE_MAX = 4102444800
+
+# Singleton instance
+_negative_cache_instance: Optional['NegativeCache'] = None
+
+
+def url_expiry(url: Optional[str]) -> Optional[float]:
+    """Timestamp unix de expiración de la firma (``oe=`` hex) o None si la URL no lo trae."""
+    if not url or 'oe=' not in url:
+        return None
+    try:
+        for key, value in parse_qsl(urlsplit(url).query):
+            if key == 'oe':
+                ts = int(value, 16)
+                return float(ts) if _OE_MIN <= ts <= _OE_MAX else None
+    except ValueError:
+        return None
+    return None
+
+
+def is_expired(url: Optional[str], now: Optional[float] = None,
+               margin_s: float = PHOTO_EXPIRY_MARGIN_S) -> bool:
+    expiry = url_expiry(url)
+    if expiry is None:
+        return False
+    return expiry - margin_s <= (time.time() if now is None else now)
+
+
+def expiry_priority(url: Optional[str]) -> float:
+    """Clave de orden: primero las firmas que caducan antes; sin ``oe`` al final."""
+    expiry = url_expiry(url)
+    return expiry if expiry is not None else float('inf')
+
+
+class NegativeCache:
+    """URLs con fallo permanente -> (instante de caducidad, motivo), con TTL y tamaño acotado."""
+
+    def __init__(self, ttl_s: float = PHOTO_NEGATIVE_TTL_S, max_entries: int = PHOTO_NEGATIVE_CACHE_SIZE):
+        self.ttl_s = ttl_s
+        self.max_entries = max(1, max_entries)
+        self._entries: 'OrderedDict[str, Tuple[float, str]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {
+            'checks': 0, 'skipped_expired': 0, 'skipped_cached': 0, 'recorded': 0, 'evicted': 0,
+        }
+
+    def _ttl_for(self, url: str, status: int) -> float:
+        ttl = self.ttl_s * _TTL_FACTOR.get(status, 1.0)
+        expiry = url_expiry(url)
+        if expiry is not None and status in (401, 403):
+            # Con la firma ya caducada la URL se descarta por ``oe``; no hace falta recordarla más
+            ttl = min(ttl, max(0.0, expiry - time.time()) + PHOTO_EXPIRY_MARGIN_S)
+        return ttl
+
+    def record(self, url: Optional[str], status: Optional[int]) -> bool:
+        """Registra un fallo; sólo los permanentes (401/403/404/410) quedan en caché."""
+        if not url or status not in PERMANENT_STATUSES:
+            return False
+        until = time.monotonic() + self._ttl_for(url, status)
+        with self._lock:
+            self._entries[url] = (until, f"http_{status}")
+            self._entries.move_to_end(url)
+            self._counters['recorded'] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters['evicted'] += 1
+        return True
+
+    def skip_reason(self, url: Optional[str]) -> Optional[str]:
+        """Motivo para no intentar la descarga ('expired', 'http_403', ...) o None."""
+        if not url:
+            return None
+        with self._lock:
+            self._counters['checks'] += 1
+            if is_expired(url):
+                self._counters['skipped_expired'] += 1
+                return 'expired'
+            entry = self._entries.get(url)
+            if entry is None:
+                return None
+            until, reason = entry
+            if until <= time.monotonic():
+                del self._entries[url]
+                return None
+            self._counters['skipped_cached'] += 1
+            return reason
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._counters, 'entries': len(self._entries)}
+
+
+def get_negative_cache() -> NegativeCache:
+    global _negative_cache_instance
+    if _negative_cache_instance is None:
+        _negative_cache_instance = NegativeCache()
+    return _negative_cache_instance
+
+
+__all__ = [
+    'NegativeCache',
+    'PERMANENT_STATUSES',
+    'expiry_priority',
+    'get_negative_cache',
+    'is_expired',
+    'url_expiry',
+]
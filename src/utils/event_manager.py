@@ -1,7 +1,7 @@
 import asyncio
 import json
 from datetime import datetime
-from typing import List, Optional
+from typing import Callable, List, Optional
 from fastapi import Request
 
 
@@ -67,6 +67,9 @@ class EventManager:
 
     def __init__(self):
         self.listeners: List[asyncio.Queue] = []
+        # En procesos worker los eventos no tienen suscriptores locales: se publican
+        # hacia el API (ver api.services.job_queue.relay_events).
+        self.publisher: Optional[Callable[[dict], None]] = None
 
     # ------------------------------------------------------------------
     # Suscripción
@@ -96,6 +99,14 @@ class EventManager:
     # ------------------------------------------------------------------
     async def _broadcast(self, payload: dict):
         payload.setdefault("ts", datetime.utcnow().isoformat())
+        if self.publisher is not None:
+            # El publisher de la cola hace I/O bloqueante (disco o pg_notify)
+            await asyncio.to_thread(self.publisher, payload)
+            return
+        await self.broadcast_local(payload)
+
+    async def broadcast_local(self, payload: dict):
+        """Entrega el payload a los suscriptores SSE de este proceso."""
         message = json.dumps(payload, ensure_ascii=False)
         for queue in list(self.listeners):
             await queue.put(message)
@@ -10,6 +10,7 @@ Cada excepción indica una acción específica:
 - NetworkException → No penalizar cuenta (problema de infraestructura)
 - LayoutChangeException → Alerta técnica (cambios en la plataforma)
 - StorageException → Error de infraestructura (FTP)
+- ResourceExhaustedException → No hay cuentas disponibles en el pool
 """
 
 
@@ -195,6 +196,11 @@ class StorageException(ScraperException):
         self.file_path = file_path
 
 
+class ResourceExhaustedException(Exception):
+    """Se lanza cuando no hay cuentas disponibles en el pool."""
+    pass
+
+
 # Utility para logging estructurado
 def log_exception(exception: ScraperException, logger):
     """
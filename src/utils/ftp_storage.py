@@ -7,27 +7,86 @@ Organizes files by platform and scraped username:
 Example structure:
     ftp/upload/RS/red_x/Yerrix3/images/Yerrix3.jpg
     ftp/upload/RS/red_instagram/usuario123/graphs/red_instagram__usuario123.json
+
+Las operaciones se reparten sobre un pool de ``FTP_POOL_SIZE`` conexiones ``ftplib.FTP``
+(una transferencia por conexión). Desde código async se usan las variantes ``a*``
+(``aupload_file``, ``adownload``, ...), que ejecutan la transferencia en un executor
+acotado al tamaño del pool y esperan los reintentos con ``asyncio.sleep``.
 """
 import os
 import io
 import re
 import time
+import asyncio
 import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from ftplib import FTP, error_perm
-from typing import Optional, List
-from functools import wraps
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from functools import partial, wraps
 
 logger = logging.getLogger(__name__)
 
+# Pool de conexiones por proceso
+FTP_POOL_SIZE = int(os.getenv('FTP_POOL_SIZE') or 4)
+FTP_POOL_TIMEOUT_S = float(os.getenv('FTP_POOL_TIMEOUT_S') or 30.0)
+# Una conexión ociosa más tiempo que esto se verifica con NOOP antes de prestarla
+FTP_HEALTHCHECK_IDLE_S = float(os.getenv('FTP_HEALTHCHECK_IDLE_S') or 15.0)
+# Ventana para calcular files/s y bytes/s
+FTP_METRICS_WINDOW_S = 60.0
+
+# Errores que no se resuelven reintentando
+_NON_RETRYABLE = (FileNotFoundError, ValueError)
+
 # Singleton instance
 _ftp_client_instance: Optional['FTPClient'] = None
 
 
+class _ChunkReader(io.RawIOBase):
+    """File-like ``read`` over an iterable of byte chunks (for ``storbinary``)."""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._chunk = b''
+        self._pos = 0
+        self.total = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        parts = []
+        wanted = size if size >= 0 else float('inf')
+        while wanted > 0:
+            if self._pos >= len(self._chunk):
+                chunk = next(self._chunks, None)
+                if chunk is None:
+                    break
+                self._chunk, self._pos = chunk, 0
+                continue
+            end = len(self._chunk) if wanted == float('inf') else min(len(self._chunk), self._pos + wanted)
+            parts.append(self._chunk[self._pos:end])
+            wanted -= end - self._pos
+            self._pos = end
+        data = b''.join(parts)
+        self.total += len(data)
+        return data
+
+
+class FTPPoolTimeoutError(ConnectionError):
+    """No se liberó ninguna conexión FTP dentro de ``FTP_POOL_TIMEOUT_S``."""
+
+
 def retry_on_ftp_error(max_attempts=3, backoff=1.0):
     """
     Decorator to retry FTP operations with exponential backoff.
     
     After max_attempts failures, raises the last exception caught.
+    FileNotFoundError / ValueError are raised immediately (not transient).
+    The policy is exposed as ``wrapper.retry_policy`` so the async wrappers
+    can apply it with ``asyncio.sleep`` instead of blocking a thread.
     
     Args:
         max_attempts: Maximum number of retry attempts (default: 3)
@@ -40,6 +99,8 @@ def retry_on_ftp_error(max_attempts=3, backoff=1.0):
             for attempt in range(max_attempts):
                 try:
                     return func(*args, **kwargs)
+                except _NON_RETRYABLE:
+                    raise
                 except Exception as e:
                     last_exception = e
                     is_final_attempt = (attempt == max_attempts - 1)
@@ -49,12 +110,15 @@ def retry_on_ftp_error(max_attempts=3, backoff=1.0):
                         raise  # Re-raise the exception to stop execution
                     
                     wait_time = backoff * (2 ** attempt)
+                    if args and isinstance(args[0], FTPClient):
+                        args[0]._count('retries')
                     logger.warning(f"{func.__name__} failed (attempt {attempt + 1}/{max_attempts}), retrying in {wait_time}s: {e}")
                     time.sleep(wait_time)
             
             # This should never be reached, but just in case
             if last_exception:
                 raise last_exception
+        wrapper.retry_policy = (max_attempts, backoff)
         return wrapper
     return decorator
 
@@ -72,9 +136,13 @@ class FTPClient:
         FTP_BASE_PATH: Base directory relative to FTP_ABSOLUTE_PATH (e.g., rs)
         FTP_TIMEOUT: Connection timeout in seconds (default: 30)
         FTP_ENCODING: File encoding (default: utf-8)
+        FTP_POOL_SIZE: Conexiones simultáneas al servidor (default: 4)
+        FTP_POOL_TIMEOUT_S: Espera máxima por una conexión libre (default: 30)
+        FTP_HEALTHCHECK_IDLE_S: Inactividad tras la cual se hace NOOP al prestar (default: 15)
     """
     
-    def __init__(self):
+    def __init__(self, pool_size: int = FTP_POOL_SIZE, pool_timeout_s: float = FTP_POOL_TIMEOUT_S,
+                 healthcheck_idle_s: float = FTP_HEALTHCHECK_IDLE_S):
         """Initialize FTP client with credentials from environment variables."""
         # Read configuration
         ftp_host_raw = os.getenv('FTP_HOST')
@@ -90,17 +158,38 @@ class FTPClient:
         self.timeout = int(os.getenv('FTP_TIMEOUT'))
         self.encoding = os.getenv('FTP_ENCODING')
         
-        self.connection: Optional[FTP] = None
+        # Pool: conexiones ociosas (LIFO, con marca de último uso) + semáforo de préstamos
+        self.pool_size = max(1, pool_size)
+        self.pool_timeout_s = pool_timeout_s
+        self.healthcheck_idle_s = healthcheck_idle_s
+        self._idle: List[Tuple[FTP, float]] = []
+        self._slots = threading.BoundedSemaphore(self.pool_size)
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._in_use = 0
+        # Tras close() las conexiones prestadas se cierran al devolverse, no vuelven al pool
+        self._closed = False
+        self._counters: Dict[str, float] = {
+            'leases': 0, 'waited': 0, 'wait_ms_total': 0.0, 'timeouts': 0,
+            'opened': 0, 'discarded': 0, 'health_checks': 0, 'health_failures': 0,
+            'retries': 0, 'uploads': 0, 'downloads': 0, 'upload_skipped': 0,
+            'bytes_up': 0, 'bytes_down': 0, 'transfer_s': 0.0,
+        }
+        self._window: Deque[Tuple[float, int]] = deque()
+
         # Cache de directorios ya creados para evitar intentos repetidos
         self._created_dirs: set = set()
         # Cache de archivos ya subidos para evitar subidas redundantes
         self._uploaded_files: set = set()
         
-        logger.info(f"FTPClient initialized: {self.host}:{self.port}, absolute_path={self.absolute_path}, base_path={self.base_path}")
+        logger.info(f"FTPClient initialized: {self.host}:{self.port}, absolute_path={self.absolute_path}, base_path={self.base_path}, pool_size={self.pool_size}")
     
-    def _connect(self) -> FTP:
+    # ------------------------------------------------------------------
+    # Pool de conexiones
+    # ------------------------------------------------------------------
+    def _open(self) -> FTP:
         """
-        Establish FTP connection.
+        Establish a new FTP connection.
         
         Note: This method does NOT retry. It's the caller's responsibility
         to handle retries using the retry_on_ftp_error decorator.
@@ -108,16 +197,6 @@ class FTPClient:
         Raises:
             ConnectionError: If connection fails
         """
-        if self.connection:
-            try:
-                # Test if connection is still alive
-                self.connection.voidcmd("NOOP")
-                return self.connection
-            except Exception:
-                # Connection lost, close and reconnect
-                logger.debug("Existing connection lost, reconnecting...")
-                self._disconnect()
-        
         try:
             logger.info(f"Connecting to FTP server {self.host}:{self.port}...")
             ftp = FTP(timeout=self.timeout)
@@ -134,30 +213,162 @@ class FTPClient:
                 logger.warning(f"Could not change to {self.absolute_path}: {e}")
                 # Don't fail here, just log the warning
             
-            self.connection = ftp
+            self._count('opened')
             logger.info("FTP connection established successfully")
             return ftp
         except Exception as e:
             logger.error(f"Failed to connect to FTP server: {e}")
-            self.connection = None
             raise ConnectionError(f"FTP connection failed: {e}")
     
-    def _disconnect(self):
-        """Close FTP connection."""
-        if self.connection:
+    @staticmethod
+    def _close_quietly(ftp: FTP) -> None:
+        try:
+            ftp.quit()
+        except Exception:
             try:
-                self.connection.quit()
+                ftp.close()
             except Exception:
                 pass
-            finally:
-                self.connection = None
+
+    def _ping(self, ftp: FTP) -> bool:
+        """Health check de una conexión ociosa (NOOP)."""
+        self._count('health_checks')
+        try:
+            ftp.voidcmd("NOOP")
+            return True
+        except Exception as e:
+            self._count('health_failures')
+            logger.debug(f"ftp.pool.health_failed err={e}")
+            return False
+
+    def _checkout(self) -> FTP:
+        while True:
+            with self._lock:
+                entry = self._idle.pop() if self._idle else None
+            if entry is None:
+                return self._open()
+            ftp, last_used = entry
+            if time.monotonic() - last_used < self.healthcheck_idle_s or self._ping(ftp):
+                return ftp
+            # Conexión caída (timeout del servidor, red): descartar y probar la siguiente
+            self._close_quietly(ftp)
+            self._count('discarded')
+
+    def _checkin(self, ftp: FTP, healthy: bool) -> None:
+        if healthy:
+            with self._lock:
+                if not self._closed:
+                    self._idle.append((ftp, time.monotonic()))
+                    return
+            self._close_quietly(ftp)
+        else:
+            self._close_quietly(ftp)
+            self._count('discarded')
+
+    @contextmanager
+    def _lease(self) -> Iterator[FTP]:
+        """
+        Presta una conexión del pool durante una operación.
+
+        Si la operación falla con un error de transporte la conexión se descarta;
+        las respuestas de protocolo (``error_perm``, p. ej. 550) la devuelven al pool.
+        """
+        t0 = time.perf_counter()
+        if not self._slots.acquire(timeout=self.pool_timeout_s):
+            self._count('timeouts')
+            raise FTPPoolTimeoutError(f"ftp pool exhausted (size={self.pool_size})")
+        wait_ms = (time.perf_counter() - t0) * 1000
+        with self._lock:
+            self._in_use += 1
+            self._counters['leases'] += 1
+            self._counters['wait_ms_total'] += wait_ms
+            if wait_ms >= 1.0:
+                self._counters['waited'] += 1
+        ftp = None
+        healthy = True
+        try:
+            ftp = self._checkout()
+            yield ftp
+        except BaseException as e:
+            healthy = isinstance(e, (error_perm,) + _NON_RETRYABLE)
+            raise
+        finally:
+            if ftp is not None:
+                self._checkin(ftp, healthy)
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    def _count(self, key: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[key] += value
+
+    def _record_transfer(self, direction: str, nbytes: int, elapsed_s: float) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._counters['uploads' if direction == 'up' else 'downloads'] += 1
+            self._counters['bytes_up' if direction == 'up' else 'bytes_down'] += nbytes
+            self._counters['transfer_s'] += elapsed_s
+            self._window.append((now, nbytes))
+            while self._window and now - self._window[0][0] > FTP_METRICS_WINDOW_S:
+                self._window.popleft()
+
+    def stats(self) -> Dict[str, Any]:
+        """Ocupación del pool y throughput de transferencias (ventana de ``FTP_METRICS_WINDOW_S``)."""
+        now = time.monotonic()
+        with self._lock:
+            while self._window and now - self._window[0][0] > FTP_METRICS_WINDOW_S:
+                self._window.popleft()
+            c = dict(self._counters)
+            idle = len(self._idle)
+            in_use = self._in_use
+            window_files = len(self._window)
+            window_bytes = sum(n for _, n in self._window)
+        transfers = c['uploads'] + c['downloads']
+        total_bytes = c['bytes_up'] + c['bytes_down']
+        return {
+            'size': self.pool_size,
+            'open': idle + in_use,
+            'in_use': in_use,
+            'idle': idle,
+            'leases': int(c['leases']),
+            'waited': int(c['waited']),
+            'wait_ms_avg': round(c['wait_ms_total'] / c['leases'], 2) if c['leases'] else 0.0,
+            'timeouts': int(c['timeouts']),
+            'opened': int(c['opened']),
+            'discarded': int(c['discarded']),
+            'health_checks': int(c['health_checks']),
+            'health_failures': int(c['health_failures']),
+            'retries': int(c['retries']),
+            'uploads': int(c['uploads']),
+            'downloads': int(c['downloads']),
+            'upload_skipped': int(c['upload_skipped']),
+            'bytes_up': int(c['bytes_up']),
+            'bytes_down': int(c['bytes_down']),
+            'transfer_ms_avg': round(c['transfer_s'] * 1000 / transfers, 1) if transfers else 0.0,
+            'per_connection_bytes_per_s': round(total_bytes / c['transfer_s']) if c['transfer_s'] else 0,
+            'files_per_s': round(window_files / FTP_METRICS_WINDOW_S, 2),
+            'bytes_per_s': round(window_bytes / FTP_METRICS_WINDOW_S),
+            'window_s': FTP_METRICS_WINDOW_S,
+        }
+
+    def close(self) -> None:
+        """Cierra las conexiones ociosas y el executor; las prestadas se cierran al devolverse."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for ftp, _ in idle:
+            self._close_quietly(ftp)
     
     def check_connection(self) -> bool:
         """
         Verifica si la conexión FTP está operativa.
         
         Intenta:
-        1. Conectar al servidor FTP
+        1. Obtener una conexión del pool (o abrir una nueva)
         2. Ejecutar comando NOOP (no-operation)
         3. Listar directorio raíz
         
@@ -172,21 +383,19 @@ class FTPClient:
                 print("FTP Down")
         """
         try:
-            # Intentar conectar (usa retry interno si está decorado)
-            ftp = self._connect()
-            
-            # Test 1: NOOP command
-            ftp.voidcmd("NOOP")
+            with self._lease() as ftp:
+                # Test 1: NOOP command
+                ftp.voidcmd("NOOP")
             
-            # Test 2: List current directory
-            ftp.nlst()
+                # Test 2: List current directory
+                ftp.nlst()
             
             logger.info("FTP health check: OK")
             return True
             
         except Exception as e:
+            # La conexión fallida ya fue descartada por _lease
             logger.error(f"FTP health check: FAILED - {e}")
-            self._disconnect()  # Limpiar conexión fallida
             return False
     
     def _sanitize_path(self, path_part: str) -> str:
@@ -259,21 +468,22 @@ class FTPClient:
         path = '/'.join(parts).replace('\\', '/')
         return path
     
-    @retry_on_ftp_error(max_attempts=3, backoff=1.0)
-    def _ensure_directory(self, path: str):
+    def _ensure_directory(self, ftp: FTP, path: str):
         """
         Create directory and all parent directories if they don't exist.
         Uses cache to avoid repeated creation attempts for same directory.
         
+        Runs on the connection already leased by the caller (no nested lease,
+        so a pool of size 1 cannot deadlock).
+
         Args:
+            ftp: Leased connection
             path: Directory path to create (relative to working dir: ftp/upload)
         """
         # Check cache first - if already created, skip entirely
         if path in self._created_dirs:
             return
         
-        ftp = self._connect()
-        
         # Build list of all paths (including parents) that need to be created
         parts = [p for p in path.replace('\\', '/').split('/') if p]
         paths_to_create = []
@@ -301,6 +511,30 @@ class FTPClient:
         # Ensure final path is in cache
         self._created_dirs.add(path)
     
+    def _store(self, ftp: FTP, ftp_path: str, data: bytes) -> None:
+        t0 = time.perf_counter()
+        try:
+            ftp.storbinary(f'STOR {ftp_path}', io.BytesIO(data))
+        except Exception as e:
+            logger.error(f"FTP upload failed for {ftp_path}: {e}")
+            raise
+        self._record_transfer('up', len(data), time.perf_counter() - t0)
+        logger.info(f"FTP upload successful: {ftp_path} ({len(data)} bytes)")
+        self._uploaded_files.add(ftp_path)
+
+    def _retrieve(self, ftp: FTP, ftp_path: str) -> bytes:
+        bio = io.BytesIO()
+        t0 = time.perf_counter()
+        try:
+            ftp.retrbinary(f'RETR {ftp_path}', bio.write)
+        except error_perm as e:
+            if '550' in str(e):  # File not found
+                raise FileNotFoundError(f"File not found on FTP: {ftp_path}")
+            raise
+        self._record_transfer('down', bio.tell(), time.perf_counter() - t0)
+        logger.info(f"FTP download successful: {ftp_path} ({bio.tell()} bytes)")
+        return bio.getvalue()
+
     @retry_on_ftp_error(max_attempts=3, backoff=1.0)
     def upload_file(self, path: str, data: bytes) -> str:
         """
@@ -318,33 +552,61 @@ class FTPClient:
         
         # Check cache first
         if ftp_path in self._uploaded_files:
+            self._count('upload_skipped')
             logger.debug(f"Skipping upload, file already exists in cache: {ftp_path}")
             return ftp_path
 
-        # Ensure directory exists
         dir_path = os.path.dirname(path).replace('\\', '/')
-        self._ensure_directory(dir_path)
         
-        ftp = self._connect()
+        with self._lease() as ftp:
+            # Ensure directory exists
+            self._ensure_directory(ftp, dir_path)
         
-        # Ensure we're in the correct working directory
-        try:
-            current = ftp.pwd()
-            if not current.endswith(self.absolute_path):
-                ftp.cwd(self.absolute_path)
-        except:
-            pass
+            # Ensure we're in the correct working directory
+            try:
+                current = ftp.pwd()
+                if not current.endswith(self.absolute_path):
+                    ftp.cwd(self.absolute_path)
+            except:
+                pass
             
-        bio = io.BytesIO(data)
+            self._store(ftp, ftp_path, data)
+        return ftp_path
         
-        try:
-            ftp.storbinary(f'STOR {ftp_path}', bio)
-            logger.info(f"FTP upload successful: {ftp_path} ({len(data)} bytes)")
-            self._uploaded_files.add(ftp_path)
-            return ftp_path
-        except Exception as e:
-            logger.error(f"FTP upload failed for {ftp_path}: {e}")
-            raise
+    @retry_on_ftp_error(max_attempts=3, backoff=1.0)
+    def upload_stream(self, path: str, chunks: Callable[[], Iterable[bytes]]) -> str:
+        """
+        Upload content produced incrementally (e.g. ``iter_json``) without building it in memory.
+
+        Args:
+            path: Full relative path
+            chunks: Factory returning the byte chunks; called again on each retry
+
+        Returns:
+            The path used
+        """
+        ftp_path = path.replace('\\', '/')
+        dir_path = os.path.dirname(ftp_path)
+
+        with self._lease() as ftp:
+            self._ensure_directory(ftp, dir_path)
+            try:
+                current = ftp.pwd()
+                if not current.endswith(self.absolute_path):
+                    ftp.cwd(self.absolute_path)
+            except Exception:
+                pass
+
+            reader = _ChunkReader(chunks())
+            t0 = time.perf_counter()
+            try:
+                ftp.storbinary(f'STOR {ftp_path}', reader)
+            except Exception as e:
+                logger.error(f"FTP upload failed for {ftp_path}: {e}")
+                raise
+            self._record_transfer('up', reader.total, time.perf_counter() - t0)
+            logger.info(f"FTP upload successful: {ftp_path} ({reader.total} bytes, streamed)")
+        return ftp_path
 
     @retry_on_ftp_error(max_attempts=3, backoff=1.0)
     def download_file(self, path: str) -> bytes:
@@ -357,21 +619,46 @@ class FTPClient:
         Returns:
             File content as bytes
         """
-        ftp = self._connect()
-        bio = io.BytesIO()
-        
         # Use forward slashes
         ftp_path = path.replace('\\', '/')
         
-        try:
-            ftp.retrbinary(f'RETR {ftp_path}', bio.write)
-            logger.info(f"FTP download successful: {ftp_path} ({bio.tell()} bytes)")
-            bio.seek(0)
-            return bio.read()
-        except error_perm as e:
-            if '550' in str(e):
-                raise FileNotFoundError(f"File not found on FTP: {ftp_path}")
-            raise
+        with self._lease() as ftp:
+            return self._retrieve(ftp, ftp_path)
+
+    def download_files(self, paths: List[str]) -> Dict[str, Union[bytes, Exception]]:
+        """
+        Descarga varios archivos en paralelo sobre el pool (código síncrono).
+
+        Los reintentos se esperan en el hilo que llama, no dentro del executor:
+        un ``time.sleep`` ahí ocuparía un hilo que necesitan las variantes async.
+
+        Returns:
+            {path: bytes} o {path: excepción} para los que fallaron
+        """
+        executor = self._get_executor()
+        fetch = FTPClient.download_file.__wrapped__
+        max_attempts, backoff = FTPClient.download_file.retry_policy
+        pending = list(dict.fromkeys(paths))
+        results: Dict[str, Union[bytes, Exception]] = {}
+        for attempt in range(max_attempts):
+            futures = {p: executor.submit(fetch, self, p) for p in pending}
+            pending = []
+            for p, fut in futures.items():
+                try:
+                    results[p] = fut.result()
+                except _NON_RETRYABLE as e:
+                    results[p] = e
+                except Exception as e:
+                    results[p] = e
+                    if attempt < max_attempts - 1:
+                        pending.append(p)
+            if not pending:
+                break
+            wait_time = backoff * (2 ** attempt)
+            self._count('retries', len(pending))
+            logger.warning(f"download_files: {len(pending)} failed (attempt {attempt + 1}/{max_attempts}), retrying in {wait_time}s")
+            time.sleep(wait_time)
+        return results
 
     @retry_on_ftp_error(max_attempts=3, backoff=1.0)
     def upload(self, platform: str, username: str, category: str, filename: str, data: bytes) -> str:
@@ -393,43 +680,32 @@ class FTPClient:
             ConnectionError: If FTP operation fails
         """
         file_path = self._build_path(platform, username, category, filename)
+        # Return relative path for DB storage (without base_path)
+        relative_path = f"{platform}/{username}/{category}/{filename}"
         
         # Check cache first
         if file_path in self._uploaded_files:
+            self._count('upload_skipped')
             logger.debug(f"Skipping upload, file already exists in cache: {file_path}")
-            # Return relative path for DB storage (without base_path)
-            relative_path = f"{platform}/{username}/{category}/{filename}"
             return relative_path
 
         dir_path = self._build_path(platform, username, category)
         
-        # Ensure directory exists
-        self._ensure_directory(dir_path)
+        with self._lease() as ftp:
+            # Ensure directory exists
+            self._ensure_directory(ftp, dir_path)
         
-        # Upload file
-        ftp = self._connect()
-        
-        # Ensure we're in the correct working directory
-        try:
-            current = ftp.pwd()
-            if not current.endswith('/ftp/upload'):
-                ftp.cwd('/ftp/upload')
-                logger.debug(f"Reset to working directory: {ftp.pwd()}")
-        except:
-            pass
-        
-        bio = io.BytesIO(data)
+            # Ensure we're in the correct working directory
+            try:
+                current = ftp.pwd()
+                if not current.endswith('/ftp/upload'):
+                    ftp.cwd('/ftp/upload')
+                    logger.debug(f"Reset to working directory: {ftp.pwd()}")
+            except:
+                pass
         
-        try:
-            ftp.storbinary(f'STOR {file_path}', bio)
-            logger.info(f"FTP upload successful: {file_path} ({len(data)} bytes)")
-            self._uploaded_files.add(file_path)
-        except Exception as e:
-            logger.error(f"FTP upload failed for {file_path}: {e}")
-            raise
+            self._store(ftp, file_path, data)
         
-        # Return relative path for DB storage (without base_path)
-        relative_path = f"{platform}/{username}/{category}/{filename}"
         return relative_path
     
     @retry_on_ftp_error(max_attempts=3, backoff=1.0)
@@ -451,18 +727,8 @@ class FTPClient:
             ConnectionError: If FTP operation fails
         """
         file_path = self._build_path(platform, username, category, filename)
-        ftp = self._connect()
-        bio = io.BytesIO()
-        
-        try:
-            ftp.retrbinary(f'RETR {file_path}', bio.write)
-            logger.info(f"FTP download successful: {file_path} ({bio.tell()} bytes)")
-            bio.seek(0)
-            return bio.read()
-        except error_perm as e:
-            if '550' in str(e):  # File not found
-                raise FileNotFoundError(f"File not found on FTP: {file_path}")
-            raise
+        with self._lease() as ftp:
+            return self._retrieve(ftp, file_path)
     
     @retry_on_ftp_error(max_attempts=3, backoff=1.0)
     def exists(self, platform: str, username: str, category: str, filename: str) -> bool:
@@ -479,13 +745,12 @@ class FTPClient:
             True if file exists, False otherwise
         """
         file_path = self._build_path(platform, username, category, filename)
-        ftp = self._connect()
-        
-        try:
-            ftp.size(file_path)
-            return True
-        except error_perm:
-            return False
+        with self._lease() as ftp:
+            try:
+                ftp.size(file_path)
+                return True
+            except error_perm:
+                return False
     
     @retry_on_ftp_error(max_attempts=3, backoff=1.0)
     def list_files(self, platform: str, username: str, category: str) -> List[str]:
@@ -501,17 +766,16 @@ class FTPClient:
             List of filenames
         """
         dir_path = self._build_path(platform, username, category)
-        ftp = self._connect()
-        
-        try:
-            files = []
-            ftp.retrlines(f'NLST {dir_path}', files.append)
-            # Extract just filenames
-            return [f.split('/')[-1] for f in files]
-        except error_perm as e:
-            if '550' in str(e):  # Directory not found
-                return []
-            raise
+        with self._lease() as ftp:
+            try:
+                files = []
+                ftp.retrlines(f'NLST {dir_path}', files.append)
+                # Extract just filenames
+                return [f.split('/')[-1] for f in files]
+            except error_perm as e:
+                if '550' in str(e):  # Directory not found
+                    return []
+                raise
     
     @retry_on_ftp_error(max_attempts=3, backoff=1.0)
     def delete(self, platform: str, username: str, category: str, filename: str) -> bool:
@@ -528,16 +792,64 @@ class FTPClient:
             True if deleted successfully, False if file didn't exist
         """
         file_path = self._build_path(platform, username, category, filename)
-        ftp = self._connect()
-        
-        try:
-            ftp.delete(file_path)
-            logger.info(f"FTP delete successful: {file_path}")
-            return True
-        except error_perm as e:
-            if '550' in str(e):  # File not found
-                return False
-            raise
+        with self._lease() as ftp:
+            try:
+                ftp.delete(file_path)
+                logger.info(f"FTP delete successful: {file_path}")
+                return True
+            except error_perm as e:
+                if '550' in str(e):  # File not found
+                    return False
+                raise
+        
+    # ------------------------------------------------------------------
+    # Variantes async: no bloquean el event loop
+    # ------------------------------------------------------------------
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # Un hilo por conexión: las transferencias encoladas esperan en el
+                    # executor, no bloqueadas sobre el semáforo del pool
+                    self._executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix='ftp')
+        return self._executor
+
+    async def _run_async(self, method, *args, **kwargs):
+        """Ejecuta ``method`` (sin su retry síncrono) en el executor, reintentando con ``asyncio.sleep``."""
+        func = getattr(method, '__wrapped__', method)
+        max_attempts, backoff = getattr(method, 'retry_policy', (1, 0.0))
+        loop = asyncio.get_running_loop()
+        for attempt in range(max_attempts):
+            try:
+                return await loop.run_in_executor(self._get_executor(), partial(func, self, *args, **kwargs))
+            except _NON_RETRYABLE:
+                raise
+            except Exception as e:
+                if attempt == max_attempts - 1:
+                    logger.error(f"{func.__name__} failed after {max_attempts} attempts. Final error: {e}")
+                    raise
+                wait_time = backoff * (2 ** attempt)
+                self._count('retries')
+                logger.warning(f"{func.__name__} failed (attempt {attempt + 1}/{max_attempts}), retrying in {wait_time}s: {e}")
+                await asyncio.sleep(wait_time)
+
+    async def aupload_file(self, path: str, data: bytes) -> str:
+        return await self._run_async(FTPClient.upload_file, path, data)
+
+    async def aupload_stream(self, path: str, chunks: Callable[[], Iterable[bytes]]) -> str:
+        return await self._run_async(FTPClient.upload_stream, path, chunks)
+
+    async def adownload_file(self, path: str) -> bytes:
+        return await self._run_async(FTPClient.download_file, path)
+
+    async def aupload(self, platform: str, username: str, category: str, filename: str, data: bytes) -> str:
+        return await self._run_async(FTPClient.upload, platform, username, category, filename, data)
+
+    async def adownload(self, platform: str, username: str, category: str, filename: str) -> bytes:
+        return await self._run_async(FTPClient.download, platform, username, category, filename)
+
+    async def acheck_connection(self) -> bool:
+        return await self._run_async(FTPClient.check_connection)
 
 
 def get_ftp_client() -> FTPClient:
@@ -551,3 +863,9 @@ def get_ftp_client() -> FTPClient:
     if _ftp_client_instance is None:
         _ftp_client_instance = FTPClient()
     return _ftp_client_instance
+
+
+def close_ftp_client() -> None:
+    """Cierra el pool FTP si fue creado (shutdown de la app)."""
+    if _ftp_client_instance is not None:
+        _ftp_client_instance.close()
@@ -0,0 +1,337 @@
+"""Caché LRU en disco local delante del FTP para servir imágenes.
+
+``/files/scraped-image*`` descargaba el archivo completo del FTP a memoria en cada
+request, y un grafo pinta cientos de avatares. Aquí la primera petición copia el
+archivo a ``IMAGE_CACHE_DIR`` y las siguientes se leen de disco local; con ETag
+fuerte el navegador revalida con ``If-None-Match`` y recibe 304 sin cuerpo.
+
+Mientras una respuesta sirve un archivo la entrada queda fijada (``pin``/``unpin``):
+la expulsión LRU la salta y borra otras, así ``FileResponse`` nunca encuentra la
+ruta borrada entre el lookup y el envío.
+
+- Los blobs del image store (``.../blobs/<sha[:2]>/<sha256><ext>``) y sus miniaturas
+  (``<sha256>_<px>.webp``) son inmutables: su ETag sale del nombre y nunca caducan.
+- Otras rutas (archivos legacy, subidas con ruta fija) pueden sobrescribirse: su
+  ETag es el sha256 del contenido y se vuelven a pedir pasados
+  ``IMAGE_DISK_CACHE_MUTABLE_TTL_S`` segundos.
+- Tamaño acotado por ``IMAGE_DISK_CACHE_MAX_MB``; al pasarse se borran los menos
+  usados. Al arrancar se reconstruye el índice con lo que haya en el directorio.
+
+Uso:
+    cache = get_image_disk_cache()
+    entry = await cache.get(ftp_path, lambda: ftp.adownload_file(ftp_path))
+    if cache.pin(ftp_path, entry):               # False si se expulsó entretanto
+        return PinnedFileResponse(cache, entry, headers={'ETag': entry.etag_header})
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional
+
+from paths import IMAGE_CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+IMAGE_DISK_CACHE_MAX_MB = int(os.getenv('IMAGE_DISK_CACHE_MAX_MB') or 1024)
+IMAGE_DISK_CACHE_MUTABLE_TTL_S = float(os.getenv('IMAGE_DISK_CACHE_MUTABLE_TTL_S') or 3600)
+
+_BLOB_RE = re.compile(r'(?:^|/)blobs/[0-9a-f]{2}/([0-9a-f]{64}(?:_\d{1,4})?)(\.[A-Za-z0-9]{1,9})$')
+
+# Singleton instance
+_image_disk_cache_instance: Optional['ImageDiskCache'] = None
+
+
+def blob_sha(ftp_path: str) -> Optional[str]:
+    """sha256 (``<sha256>_<px>`` en miniaturas) si ``ftp_path`` es un blob direccionado por contenido."""
+    match = _BLOB_RE.search(ftp_path or '')
+    return match.group(1) if match else None
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Comparación débil de ``If-None-Match`` (RFC 9110 §13.1.2) contra un ETag sin comillas."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*':
+            return True
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate.strip('"') == etag:
+            return True
+    return False
+
+
+@dataclass(frozen=True)
+class CachedImage:
+    path: str
+    etag: str
+    size: int
+    immutable: bool
+    stored_at: float
+    media_type: Optional[str] = None
+
+    @property
+    def etag_header(self) -> str:
+        return f'"{self.etag}"'
+
+
+class ImageDiskCache:
+    """Archivos en disco indexados por ruta FTP, con expulsión LRU por bytes."""
+
+    def __init__(self, directory: str = IMAGE_CACHE_DIR, max_bytes: int = IMAGE_DISK_CACHE_MAX_MB * 1024 * 1024,
+                 mutable_ttl_s: float = IMAGE_DISK_CACHE_MUTABLE_TTL_S):
+        self.directory = directory
+        self.max_bytes = max(1, max_bytes)
+        self.mutable_ttl_s = mutable_ttl_s
+        self._index: 'OrderedDict[str, CachedImage]' = OrderedDict()
+        self._bytes = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # Archivos que una respuesta está enviando (ruta -> respuestas): la expulsión no los borra
+        self._pins: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {
+            'hits': 0, 'misses': 0, 'inflight_joins': 0, 'stale_refreshes': 0, 'not_modified': 0,
+            'bytes_served_from_disk': 0, 'bytes_filled': 0, 'evictions': 0, 'bytes_evicted': 0,
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        self._load_index()
+
+    # ------------------------------------------------------------------
+    # Índice
+    # ------------------------------------------------------------------
+    def _file_for(self, ftp_path: str) -> str:
+        digest = hashlib.sha1(ftp_path.encode('utf-8')).hexdigest()
+        _, ext = os.path.splitext(ftp_path)
+        return os.path.join(self.directory, digest[:2], f"{digest}{ext[:10]}")
+
+    def _load_index(self) -> None:
+        """Reconstruye el índice desde disco (orden LRU por mtime) tras un reinicio.
+
+        Los nombres en disco son hashes de la ruta FTP, que no se puede recuperar:
+        los archivos se cuentan para el límite de tamaño y se expulsan primero, pero
+        no generan hits hasta volver a pedirse (se reescriben con el mismo nombre).
+        """
+        found = []
+        for root, _dirs, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                if name.endswith('.tmp'):
+                    self._remove_quietly(path)
+                    continue
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                found.append((st.st_mtime, path, st.st_size))
+        found.sort()
+        for mtime, path, size in found:
+            self._index[f"orphan:{path}"] = CachedImage(path, '', size, False, mtime)
+            self._bytes += size
+        if found:
+            logger.info(f"image_disk_cache.loaded files={len(found)} bytes={self._bytes} dir={self.directory}")
+        self._evict()
+
+    @staticmethod
+    def _remove_quietly(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        # Llamar con self._lock tomado (o durante __init__)
+        if self._bytes <= self.max_bytes:
+            return
+        # Lo fijado no se puede borrar ni cuenta contra el resto: se reintenta en unpin
+        pinned = sum(e.size for e in self._index.values() if e.path in self._pins) if self._pins else 0
+        excess = self._bytes - pinned - self.max_bytes
+        victims = []
+        for key, entry in self._index.items():
+            if excess <= 0:
+                break
+            if entry.path in self._pins:
+                continue
+            victims.append((key, entry))
+            excess -= entry.size
+        for key, entry in victims:
+            del self._index[key]
+            self._bytes -= entry.size
+            self._counters['evictions'] += 1
+            self._counters['bytes_evicted'] += entry.size
+            self._remove_quietly(entry.path)
+
+    def _lookup(self, ftp_path: str) -> Optional[CachedImage]:
+        with self._lock:
+            entry = self._index.get(ftp_path)
+            if entry is None:
+                return None
+            if not entry.immutable and time.time() - entry.stored_at > self.mutable_ttl_s:
+                self._counters['stale_refreshes'] += 1
+                return None
+            if not os.path.exists(entry.path):
+                # Borrado por fuera (limpieza manual del directorio)
+                del self._index[ftp_path]
+                self._bytes -= entry.size
+                return None
+            self._index.move_to_end(ftp_path)
+            self._counters['hits'] += 1
+            self._counters['bytes_served_from_disk'] += entry.size
+            return entry
+
+    def _write(self, ftp_path: str, data: bytes, media_type: Optional[str] = None) -> CachedImage:
+        path = self._file_for(ftp_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+        sha = blob_sha(ftp_path)
+        etag = sha or hashlib.sha256(data).hexdigest()
+        return CachedImage(path, etag, len(data), sha is not None, time.time(), media_type)
+
+    def _admit(self, ftp_path: str, entry: CachedImage) -> None:
+        with self._lock:
+            previous = self._index.pop(ftp_path, None)
+            if previous is not None:
+                self._bytes -= previous.size
+            orphan = self._index.pop(f"orphan:{entry.path}", None)
+            if orphan is not None:
+                self._bytes -= orphan.size
+            self._index[ftp_path] = entry
+            self._bytes += entry.size
+            self._counters['bytes_filled'] += entry.size
+            self._evict()
+
+    # ------------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------------
+    def known_etag(self, ftp_path: str) -> Optional[str]:
+        """ETag conocido sin tocar disco ni FTP (para responder 304 directamente)."""
+        sha = blob_sha(ftp_path)
+        if sha:
+            return sha
+        with self._lock:
+            entry = self._index.get(ftp_path)
+            if entry is None or time.time() - entry.stored_at > self.mutable_ttl_s:
+                return None
+            return entry.etag
+
+    def lookup(self, key: str) -> Optional[CachedImage]:
+        """Entrada fresca en disco o None (cuenta el miss); para quien llena la caché con ``put``."""
+        entry = self._lookup(key)
+        if entry is None:
+            with self._lock:
+                self._counters['misses'] += 1
+        return entry
+
+    async def put(self, key: str, data: bytes, media_type: Optional[str] = None) -> CachedImage:
+        """Guarda ``data`` bajo ``key`` (p. ej. una respuesta ya enviada en streaming)."""
+        entry = await asyncio.to_thread(self._write, key, data, media_type)
+        self._admit(key, entry)
+        return entry
+
+    def pin(self, key: str, entry: CachedImage) -> bool:
+        """Fija ``entry`` mientras se envía; False si el archivo ya no está (el caller lo recarga)."""
+        with self._lock:
+            if not os.path.exists(entry.path):
+                # Expulsado (u otro proceso limpió el directorio) después del lookup
+                if self._index.get(key) is entry:
+                    del self._index[key]
+                    self._bytes -= entry.size
+                return False
+            self._pins[entry.path] = self._pins.get(entry.path, 0) + 1
+            return True
+
+    def unpin(self, entry: CachedImage) -> None:
+        with self._lock:
+            remaining = self._pins.get(entry.path, 0) - 1
+            if remaining > 0:
+                self._pins[entry.path] = remaining
+            else:
+                self._pins.pop(entry.path, None)
+            # Lo que no se pudo expulsar mientras estaba fijado
+            self._evict()
+
+    def count_not_modified(self) -> None:
+        with self._lock:
+            self._counters['not_modified'] += 1
+
+    async def get(self, ftp_path: str, loader: Callable[[], Awaitable[bytes]]) -> Optional[CachedImage]:
+        """
+        Entrada en disco para ``ftp_path``; en miss llama ``loader()`` (una sola vez por
+        ruta aunque lleguen peticiones concurrentes). Devuelve None si el loader no trae datos.
+        """
+        entry = self._lookup(ftp_path)
+        if entry is not None:
+            return entry
+
+        inflight = self._inflight.get(ftp_path)
+        if inflight is not None:
+            with self._lock:
+                self._counters['inflight_joins'] += 1
+            return await asyncio.shield(inflight)
+
+        with self._lock:
+            self._counters['misses'] += 1
+        # Llenado en su propia task: cancelar la petición que lo inició (cliente
+        # desconectado) no hace fallar a las demás que esperan la misma ruta
+        task = asyncio.ensure_future(self._fill(ftp_path, loader))
+        self._inflight[ftp_path] = task
+        task.add_done_callback(lambda t: self._fill_done(ftp_path, t))
+        return await asyncio.shield(task)
+
+    async def _fill(self, ftp_path: str, loader: Callable[[], Awaitable[bytes]]) -> Optional[CachedImage]:
+        data = await loader()
+        if not data:
+            return None
+        entry = await asyncio.to_thread(self._write, ftp_path, data)
+        self._admit(ftp_path, entry)
+        return entry
+
+    def _fill_done(self, ftp_path: str, task: asyncio.Future) -> None:
+        if self._inflight.get(ftp_path) is task:
+            del self._inflight[ftp_path]
+        if not task.cancelled():
+            task.exception()  # evita "exception was never retrieved" si nadie esperaba
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            c = dict(self._counters)
+            entries = len(self._index)
+            pinned = len(self._pins)
+            size = self._bytes
+        lookups = c['hits'] + c['misses']
+        return {
+            **c,
+            'hit_ratio': round(c['hits'] / lookups, 3) if lookups else 0.0,
+            'entries': entries,
+            'pinned': pinned,
+            'bytes': size,
+            'max_bytes': self.max_bytes,
+            'directory': self.directory,
+        }
+
+
+def get_image_disk_cache() -> ImageDiskCache:
+    global _image_disk_cache_instance
+    if _image_disk_cache_instance is None:
+        _image_disk_cache_instance = ImageDiskCache()
+    return _image_disk_cache_instance
+
+
+__all__ = [
+    'CachedImage',
+    'ImageDiskCache',
+    'blob_sha',
+    'etag_matches',
+    'get_image_disk_cache',
+]
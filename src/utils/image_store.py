@@ -0,0 +1,403 @@
+"""Almacén de imágenes direccionado por contenido.
+
+``download_profile_image`` guardaba ``{photo_owner}.jpg`` dentro de la carpeta de
+cada root/caso: la misma persona vista desde diez roots se descargaba del CDN y
+se subía al FTP diez veces. Aquí cada imagen distinta se sube una sola vez:
+
+    {FTP_BASE_PATH}/blobs/<sha256[:2]>/<sha256><ext>
+
+y las rutas por root/caso (las que sirven ``/files/scraped-image*``) son filas
+de ``entidades.image_refs`` que apuntan al blob. Antes de pedir al CDN se busca
+la URL normalizada (sin parámetros de firma ni edge) en ``entidades.image_sources``;
+si ya se descargó, no hay request saliente.
+
+Tablas: db/migrations/2026-10-16_add_image_store.sql. Sin la migración el store
+funciona sólo en memoria del proceso (se registra un warning una vez); ``link``
+devuelve entonces False y los callers suben la copia por root en la ruta legacy.
+
+Uso:
+    store = get_image_store()
+    blob = await store.get_or_fetch(photo_url, fetch)   # fetch() -> (bytes, ext)
+    await store.link(ref_path, blob)
+    ...
+    blob_path = await store.resolve(ref_path)           # /files/scraped-image*
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from psycopg2 import errors as pg_errors
+
+from src.utils.ftp_storage import get_ftp_client
+from src.utils.thumbnails import IMAGE_THUMBNAIL_SIZES, make_thumbnails, thumbnail_path, thumbnails_available
+
+logger = logging.getLogger(__name__)
+
+IMAGE_STORE_CACHE_SIZE = int(os.getenv('IMAGE_STORE_CACHE_SIZE') or 20000)
+
+# Parámetros de firma/edge de los CDN de Meta: cambian entre requests para la misma imagen
+_VOLATILE_PARAMS = frozenset({'oh', 'oe', 'ccb', 'edm', 'efg', 'ig_cache_key', 'dl'})
+# Los POPs (scontent-mad1-1.cdninstagram.com, scontent.fmex5-1.fna.fbcdn.net, ...) sirven el mismo asset
+_CDN_FAMILIES = ('cdninstagram.com', 'fbcdn.net')
+
+# Singleton instance
+_image_store_instance: Optional['ImageStore'] = None
+
+
+def normalize_cdn_url(url: str) -> str:
+    """URL canónica de una imagen de CDN: host de familia, sin firma ni fragmento, query ordenada."""
+    parts = urlsplit((url or '').strip())
+    host = (parts.hostname or '').lower()
+    for family in _CDN_FAMILIES:
+        if host == family or host.endswith('.' + family):
+            host = family
+            break
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not (k.startswith('_nc_') or k in _VOLATILE_PARAMS)
+    )
+    return urlunsplit(('https', host, parts.path, urlencode(query), ''))
+
+
+def url_key(url: str) -> Tuple[str, str]:
+    """(sha1 de la URL normalizada, URL normalizada)."""
+    normalized = normalize_cdn_url(url)
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest(), normalized
+
+
+@dataclass(frozen=True)
+class ImageBlob:
+    sha256: str
+    ext: str
+    size: int
+    ftp_path: str
+
+
+class _LRU:
+    """Mapa acotado en memoria (el más antiguo sale primero)."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max(1, max_entries)
+        self._data: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def _row_to_blob(row) -> Optional[ImageBlob]:
+    if not row:
+        return None
+    return ImageBlob(row['sha256'], row['ext'], row['size_bytes'], row['ftp_path'])
+
+
+def _db_lookup_url(conn, key: str) -> Optional[ImageBlob]:
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE entidades.image_sources s
+               SET hits = s.hits + 1, last_seen = NOW()
+              FROM entidades.image_blobs b
+             WHERE s.url_key = %s AND b.sha256 = s.sha256
+            RETURNING b.sha256, b.ext, b.size_bytes, b.ftp_path
+            """,
+            (key,)
+        )
+        row = cur.fetchone()
+    conn.commit()
+    return _row_to_blob(row)
+
+
+def _db_get_blob(conn, sha256: str) -> Optional[ImageBlob]:
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT sha256, ext, size_bytes, ftp_path FROM entidades.image_blobs WHERE sha256 = %s",
+            (sha256,)
+        )
+        return _row_to_blob(cur.fetchone())
+
+
+def _db_save(conn, blob: ImageBlob, key: str, normalized_url: str) -> None:
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO entidades.image_blobs (sha256, ext, size_bytes, ftp_path)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (sha256) DO NOTHING
+            """,
+            (blob.sha256, blob.ext, blob.size, blob.ftp_path)
+        )
+        cur.execute(
+            """
+            INSERT INTO entidades.image_sources (url_key, normalized_url, sha256)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (url_key) DO UPDATE SET sha256 = EXCLUDED.sha256, last_seen = NOW()
+            """,
+            (key, normalized_url, blob.sha256)
+        )
+    conn.commit()
+
+
+def _db_link(conn, ref_path: str, sha256: str) -> None:
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO entidades.image_refs (ref_path, sha256)
+            VALUES (%s, %s)
+            ON CONFLICT (ref_path) DO UPDATE SET sha256 = EXCLUDED.sha256, updated_at = NOW()
+            """,
+            (ref_path, sha256)
+        )
+    conn.commit()
+
+
+def _db_resolve(conn, ref_path: str) -> Optional[ImageBlob]:
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT b.sha256, b.ext, b.size_bytes, b.ftp_path
+              FROM entidades.image_refs r
+              JOIN entidades.image_blobs b ON b.sha256 = r.sha256
+             WHERE r.ref_path = %s
+            """,
+            (ref_path,)
+        )
+        return _row_to_blob(cur.fetchone())
+
+
+class ImageStore:
+    """Blobs únicos en FTP + índices URL→blob y ruta lógica→blob (BD con cache LRU en memoria)."""
+
+    def __init__(self, max_entries: int = IMAGE_STORE_CACHE_SIZE):
+        self._by_url = _LRU(max_entries)
+        self._by_sha = _LRU(max_entries)
+        self._refs = _LRU(max_entries)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._db_enabled = True
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {
+            'requests': 0, 'url_hits': 0, 'inflight_joins': 0, 'fetched': 0,
+            'content_hits': 0, 'uploads': 0, 'bytes_uploaded': 0, 'bytes_saved': 0,
+            'links': 0, 'resolves': 0, 'resolve_misses': 0, 'db_errors': 0,
+            'thumbnails': 0, 'thumbnail_bytes': 0, 'thumbnail_source_bytes': 0, 'thumbnail_errors': 0,
+        }
+
+    def _count(self, key: str, value: int = 1) -> None:
+        with self._lock:
+            self._counters[key] += value
+
+    async def _db(self, fn: Callable[..., Any], *args, strict: bool = False) -> Any:
+        """Llama ``fn`` vía ``run_db``; ante error degrada a sólo-memoria en lugar de fallar la descarga.
+
+        ``strict=True`` re-lanza los errores (salvo tabla inexistente) en lugar de tragarlos.
+        """
+        if not self._db_enabled:
+            return None
+        try:
+            from api.db import run_db
+            return await run_db(fn, *args)
+        except pg_errors.UndefinedTable:
+            self._db_enabled = False
+            logger.warning("image_store.db_disabled reason=missing_tables (apply db/migrations/2026-10-16_add_image_store.sql)")
+        except Exception as e:
+            self._count('db_errors')
+            logger.debug(f"image_store.db_error fn={fn.__name__} err={e}")
+            if strict:
+                raise
+        return None
+
+    def _remember(self, blob: ImageBlob, key: Optional[str] = None) -> None:
+        self._by_sha.put(blob.sha256, blob)
+        if key:
+            self._by_url.put(key, blob)
+
+    async def lookup_url(self, url: str) -> Optional[ImageBlob]:
+        """Blob ya descargado desde esta URL (normalizada), sin tocar el CDN."""
+        key, _ = url_key(url)
+        blob = self._by_url.get(key)
+        if blob is None:
+            blob = await self._db(_db_lookup_url, key)
+            if blob is not None:
+                self._remember(blob, key)
+        return blob
+
+    async def put(self, url: Optional[str], data: bytes, ext: str) -> ImageBlob:
+        """Guarda ``data`` (sube al FTP sólo si el hash es nuevo) y asocia la URL de origen."""
+        sha256 = hashlib.sha256(data).hexdigest()
+        blob = self._by_sha.get(sha256) or await self._db(_db_get_blob, sha256)
+        if blob is not None:
+            self._count('content_hits')
+            self._count('bytes_saved', len(data))
+        else:
+            ftp = get_ftp_client()
+            path = f"{ftp.base_path}/blobs/{sha256[:2]}/{sha256}{ext}"
+            await ftp.aupload_file(path, data)
+            blob = ImageBlob(sha256, ext, len(data), path)
+            self._count('uploads')
+            self._count('bytes_uploaded', len(data))
+            await self._put_thumbnails(path, data)
+        key = None
+        if url:
+            key, normalized = url_key(url)
+            await self._db(_db_save, blob, key, normalized)
+        self._remember(blob, key)
+        return blob
+
+    async def _put_thumbnails(self, path: str, data: bytes) -> None:
+        """Sube las miniaturas WebP del blob nuevo; si fallan, /files las genera al pedirlas."""
+        if not thumbnails_available():
+            return
+        try:
+            variants = await asyncio.to_thread(make_thumbnails, data)
+            ftp = get_ftp_client()
+            await asyncio.gather(*(
+                ftp.aupload_file(thumbnail_path(path, size), thumb) for size, thumb in variants.items()
+            ))
+        except Exception as e:
+            self._count('thumbnail_errors')
+            logger.debug(f"image_store.thumbnail_failed path={path} err={e}")
+            return
+        self._count('thumbnails', len(variants))
+        self._count('thumbnail_bytes', sum(len(t) for t in variants.values()))
+        self._count('thumbnail_source_bytes', len(data) * len(variants))
+
+    async def get_or_fetch(
+        self,
+        url: str,
+        fetch: Callable[[], Awaitable[Tuple[bytes, str]]],
+        *,
+        force: bool = False,
+    ) -> ImageBlob:
+        """
+        Blob de ``url``: índice de URLs primero; si no está, ``fetch()`` -> (bytes, ext) y ``put``.
+
+        Requests concurrentes por la misma URL comparten una sola descarga.
+        ``force=True`` ignora el índice de URLs (la deduplicación por contenido sigue aplicando).
+        """
+        self._count('requests')
+        key, _ = url_key(url)
+        if not force:
+            blob = await self.lookup_url(url)
+            if blob is not None:
+                self._count('url_hits')
+                self._count('bytes_saved', blob.size)
+                return blob
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self._count('inflight_joins')
+            blob = await asyncio.shield(pending)
+            self._count('bytes_saved', blob.size)
+            return blob
+
+        # Descarga en su propia task: si el request que la inició se cancela (cliente
+        # desconectado) los demás que esperan la misma URL siguen recibiendo el blob
+        task = asyncio.ensure_future(self._fetch_and_put(url, fetch))
+        self._inflight[key] = task
+        task.add_done_callback(lambda t: self._fetch_done(key, t))
+        return await asyncio.shield(task)
+
+    async def _fetch_and_put(self, url: str, fetch: Callable[[], Awaitable[Tuple[bytes, str]]]) -> ImageBlob:
+        data, ext = await fetch()
+        self._count('fetched')
+        return await self.put(url, data, ext)
+
+    def _fetch_done(self, key: str, task: asyncio.Future) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # evita "exception was never retrieved" si nadie esperaba
+
+    async def link(self, ref_path: str, blob: ImageBlob) -> bool:
+        """
+        Registra ``ref_path`` (ruta lógica por root/caso) como referencia a ``blob``.
+
+        Returns:
+            True si la referencia quedó en BD; False en modo sólo-memoria (sin migración),
+            donde otros procesos no la ven.
+
+        Raises:
+            Los errores de BD: una referencia que sólo vive en este proceso da 404 en los demás.
+        """
+        ref_path = ref_path.replace('\\', '/')
+        self._refs.put(ref_path, blob)
+        self._count('links')
+        if not self._db_enabled:
+            return False
+        await self._db(_db_link, ref_path, blob.sha256, strict=True)
+        return self._db_enabled
+
+    async def resolve(self, ref_path: str) -> Optional[str]:
+        """Ruta FTP del blob referenciado por ``ref_path``, o None si es un archivo legacy."""
+        ref_path = ref_path.replace('\\', '/')
+        self._count('resolves')
+        blob = self._refs.get(ref_path)
+        if blob is None:
+            blob = await self._db(_db_resolve, ref_path)
+            if blob is None:
+                self._count('resolve_misses')
+                return None
+            self._refs.put(ref_path, blob)
+        return blob.ftp_path
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            c = dict(self._counters)
+        deduped = c['url_hits'] + c['inflight_joins'] + c['content_hits']
+        return {
+            **c,
+            'dedupe_ratio': round(deduped / c['requests'], 3) if c['requests'] else 0.0,
+            'cdn_requests_saved': c['url_hits'] + c['inflight_joins'],
+            'content_dedupe_ratio': round(c['content_hits'] / c['fetched'], 3) if c['fetched'] else 0.0,
+            'thumbnail_sizes': list(IMAGE_THUMBNAIL_SIZES) if thumbnails_available() else [],
+            'thumbnail_size_ratio': (
+                round(c['thumbnail_bytes'] / c['thumbnail_source_bytes'], 3) if c['thumbnail_source_bytes'] else 0.0
+            ),
+            'db_enabled': self._db_enabled,
+            'cached_urls': len(self._by_url),
+            'cached_blobs': len(self._by_sha),
+            'cached_refs': len(self._refs),
+        }
+
+
+def get_image_store() -> ImageStore:
+    """
+    Get singleton image store instance.
+
+    Returns:
+        ImageStore (IMAGE_STORE_CACHE_SIZE entradas en memoria por índice)
+    """
+    global _image_store_instance
+    if _image_store_instance is None:
+        _image_store_instance = ImageStore()
+    return _image_store_instance
+
+
+__all__ = [
+    'ImageBlob',
+    'ImageStore',
+    'get_image_store',
+    'normalize_cdn_url',
+    'url_key',
+]
@@ -1,15 +1,57 @@
+import importlib.util
 import os
 import re
-from typing import Optional
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
 import httpx
 from urllib.parse import quote_plus, urlencode
 import asyncio
 import logging
 from paths import IMAGES_DIR, PUBLIC_IMAGES_PREFIX_PRIMARY, ensure_dirs
+from src.utils.cdn_expiry import PERMANENT_STATUSES, get_negative_cache, is_expired
+from src.utils.ftp_storage import get_ftp_client
+from src.utils.image_store import ImageBlob, get_image_store
+from src.utils.metrics import counter, histogram
 
 logger = logging.getLogger(__name__)
 
 
+class PhotoUnavailableError(RuntimeError):
+    """La URL está caducada (``oe=``) o en la caché negativa: no se pide al CDN."""
+
+
+# source: 'http' (cliente compartido), 'page' (Playwright con cookies), 'prefetch' (PhotoPipeline), 'path'
+_IMAGE_FETCHES = counter('scr4per_image_fetches_total', 'Descargas de imágenes al CDN por origen y resultado', ('source', 'outcome'))
+_IMAGE_FETCH_BYTES = counter('scr4per_image_fetch_bytes_total', 'Bytes de imágenes descargados', ('source',))
+_IMAGE_FETCH_SECONDS = histogram(
+    'scr4per_image_fetch_seconds', 'Latencia de descarga de imágenes', ('source',),
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30),
+)
+_IMAGE_RESULTS = counter('scr4per_image_downloads_total', 'Resultado de download_profile_image', ('result',))
+
+
+def _instrumented(source: str, fetch: Callable[[], Awaitable[Tuple[bytes, str]]]) -> Callable[[], Awaitable[Tuple[bytes, str]]]:
+    """Envuelve un fetch del image store con métricas (sólo corre si la URL no estaba en el índice)."""
+    async def run() -> Tuple[bytes, str]:
+        t0 = time.perf_counter()
+        outcome = 'error'
+        try:
+            data, ext = await fetch()
+            outcome = 'ok'
+            _IMAGE_FETCH_BYTES.inc(len(data), source=source)
+            return data, ext
+        except PhotoUnavailableError:
+            outcome = 'skipped'
+            raise
+        except httpx.HTTPStatusError:
+            outcome = 'http_error'
+            raise
+        finally:
+            _IMAGE_FETCH_SECONDS.observe(time.perf_counter() - t0, source=source)
+            _IMAGE_FETCHES.inc(source=source, outcome=outcome)
+    return run
+
+
 def _safe_filename(name: str) -> str:
     """Sanitize a username for filesystem use."""
     name = name or "user"
@@ -57,6 +99,103 @@ DEFAULT_HEADERS = {
     "Referer": "https://www.instagram.com/",
 }
 
+# Cliente HTTP/2 compartido por plataforma (keep-alive contra los hosts del CDN)
+PHOTO_HTTP_MAX_CONNECTIONS = int(os.getenv("PHOTO_HTTP_MAX_CONNECTIONS") or 20)
+PHOTO_HTTP_TIMEOUT_S = float(os.getenv("PHOTO_HTTP_TIMEOUT_S") or 20.0)
+# httpx sólo negocia HTTP/2 con el extra 'h2' instalado (httpx[http2]); sin él cae a HTTP/1.1 keep-alive
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+_PLATFORM_REFERERS = {
+    "instagram": "https://www.instagram.com/",
+    "facebook": "https://www.facebook.com/",
+    "x": "https://x.com/",
+}
+_http_clients: Dict[str, Tuple[httpx.AsyncClient, asyncio.AbstractEventLoop]] = {}
+
+
+def get_http_client(platform: Optional[str] = None) -> httpx.AsyncClient:
+    """
+    Cliente httpx de larga vida por plataforma ('instagram' o 'red_instagram', ...).
+
+    Reutiliza conexiones HTTP/2 entre fotos en lugar de un handshake TLS por imagen.
+    Ligado al event loop que lo creó: en otro loop se crea uno nuevo.
+    """
+    key = (platform or "").replace("red_", "") or "default"
+    loop = asyncio.get_running_loop()
+    entry = _http_clients.get(key)
+    if entry is not None and entry[1] is loop and not entry[0].is_closed:
+        return entry[0]
+    headers = {**DEFAULT_HEADERS, "Referer": _PLATFORM_REFERERS.get(key, DEFAULT_HEADERS["Referer"])}
+    client = httpx.AsyncClient(
+        timeout=PHOTO_HTTP_TIMEOUT_S,
+        follow_redirects=True,
+        headers=headers,
+        http2=HTTP2_AVAILABLE,
+        limits=httpx.Limits(
+            max_connections=PHOTO_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=PHOTO_HTTP_MAX_CONNECTIONS,
+            keepalive_expiry=30.0,
+        ),
+    )
+    _http_clients[key] = (client, loop)
+    logger.info(f"images.http_client.open platform={key}")
+    return client
+
+
+async def close_http_clients() -> None:
+    """Cierra los clientes creados en el loop actual (shutdown del API / worker)."""
+    loop = asyncio.get_running_loop()
+    for key, (client, client_loop) in list(_http_clients.items()):
+        if client_loop is loop:
+            await client.aclose()
+            _http_clients.pop(key, None)
+
+
+def _save_local(owner: str, data: bytes, ext: str) -> str:
+    """Fallback cuando el FTP no está disponible: guarda en IMAGES_DIR."""
+    ensure_dirs()
+    filename = f"{_safe_filename(owner)}{ext}"
+    file_path = os.path.join(IMAGES_DIR, filename)
+    tmp_path = f"{file_path}.part"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, file_path)
+    return f"{PUBLIC_IMAGES_PREFIX_PRIMARY}/{filename}"
+
+
+async def _link_or_copy(store, ref_path: str, blob: ImageBlob, data: Optional[bytes],
+                        legacy: Optional[Tuple[str, str, str]] = None) -> bool:
+    """
+    Registra ``ref_path`` -> ``blob``; si la referencia no queda en BD sube una copia del archivo.
+
+    Sin fila en ``image_refs`` /files no encuentra el blob desde otro proceso (o tras un
+    reinicio) y cae a la ruta legacy: ``legacy`` = (platform, username, filename) para
+    /files/scraped-image, o ``ref_path`` tal cual para /files/scraped-image-path.
+
+    Returns:
+        True si quedó la referencia, False si se subió la copia.
+    """
+    try:
+        if await store.link(ref_path, blob):
+            return True
+    except Exception as e:
+        logger.warning(f"image_store link failed ref={ref_path}, uploading per-root copy: {e}")
+    ftp = get_ftp_client()
+    if data is None:
+        data = await ftp.adownload_file(blob.ftp_path)
+    if legacy:
+        await ftp.aupload(legacy[0], legacy[1], 'images', legacy[2], data)
+    else:
+        await ftp.aupload_file(ref_path, data)
+    return False
+
+
+def _image_ref(platform: str, username: str, filename: str, ftp_path: Optional[str]) -> Tuple[str, str]:
+    """(ruta lógica registrada en el image store, URL pública que la sirve)."""
+    if ftp_path:
+        final_path = f"{ftp_path}{filename}" if ftp_path.endswith('/') else ftp_path
+        return final_path, f"/files/scraped-image-path/{final_path}"
+    return f"{platform}/{username}/images/{filename}", f"/files/scraped-image/{platform}/{username}/{filename}"
+
 
 async def download_profile_image(
     photo_url: str,
@@ -71,121 +210,85 @@ async def download_profile_image(
     ftp_path: Optional[str] = None,
 ) -> str:
     """
-    Descarga la foto de perfil y la sube al FTP.
+    Descarga la foto de perfil y la registra en el image store (src/utils/image_store.py).
 
-    - username: Usuario root (carpeta FTP: rs/{platform}/{username}/images/)
-    - photo_owner: Usuario dueño de la foto (filename: {photo_owner}.jpg)
-    - ftp_path: Ruta completa opcional para guardar en FTP (ignora username/platform/photo_owner para la ruta)
-    - Sube a FTP en la estructura: rs/{platform}/{username}/images/{photo_owner}.{ext}
+    - username: Usuario root (ruta lógica: {platform}/{username}/images/)
+    - photo_owner: Usuario dueño de la foto (filename: {photo_owner}.{ext})
+    - ftp_path: Ruta completa opcional (ignora username/platform/photo_owner para la ruta)
+    - La imagen se sube una sola vez al FTP por hash de contenido; la ruta por root/caso
+      queda como referencia al blob y la sirve el mismo endpoint de siempre.
+    - Si la URL (normalizada) ya se descargó antes no se pide al CDN (a menos que overwrite=True).
     - Deduce la extensión por content-type o URL (fallback .jpg).
-    - Evita re-descargar si ya existe (a menos que overwrite=True).
 
-    Returns: ruta FTP tipo "/files/scraped-image/{platform}/{username}/{filename}" o la ruta FTP directa si se usó ftp_path
+    Returns: "/files/scraped-image/{platform}/{username}/{filename}" o "/files/scraped-image-path/{ruta}" si se usó ftp_path
     """
     if not photo_url:
         return ""
 
-    ensure_dirs()
-
-    # First do a lightweight HEAD to probe content-type (best-effort)
-    content_type: Optional[str] = None
-    try:
-        async with httpx.AsyncClient(timeout=timeout, follow_redirects=True, headers=DEFAULT_HEADERS, http2=True) as client:
-            try:
-                head = await client.head(photo_url)
-                if head.status_code < 400:
-                    content_type = head.headers.get("content-type")
-            except Exception:
-                # Ignore HEAD failures; we'll try GET next
-                pass
-
-            ext = _extension_from_headers(content_type, photo_url)
-            owner = photo_owner or username
-            filename = f"{_safe_filename(owner)}{ext}"
-            file_path = os.path.join(IMAGES_DIR, filename)
+    owner = photo_owner or username
+    store = get_image_store()
+    # Último payload descargado: permite el fallback local si falla la subida al FTP
+    fetched: Dict[str, Any] = {}
+    # Último estado HTTP de error del CDN (decide si el fallo va a la caché negativa)
+    failure: Dict[str, Any] = {}
 
-            if not overwrite and os.path.exists(file_path) and not ftp_path:
-                return f"{PUBLIC_IMAGES_PREFIX_PRIMARY}/{filename}"
+    async def _store_and_link(fetch, force: bool) -> str:
+        fetched.clear()
+        try:
+            blob = await store.get_or_fetch(photo_url, fetch, force=force)
+        except Exception as store_error:
+            if 'data' not in fetched:
+                raise
+            logger.warning(f"FTP upload failed, using local fallback: {store_error}")
+            _IMAGE_RESULTS.inc(result='local_fallback')
+            return _save_local(owner, fetched['data'], fetched['ext'])
+        filename = f"{_safe_filename(owner)}{blob.ext}"
+        ref_path, public_url = _image_ref(platform, username, filename, ftp_path)
+        legacy = None if ftp_path else (platform, username, filename)
+        linked = await _link_or_copy(store, ref_path, blob, fetched.get('data'), legacy)
+        _IMAGE_RESULTS.inc(result='stored' if linked else 'ref_copy')
+        return public_url
 
-            # Download the image
-            resp = await client.get(photo_url)
-            resp.raise_for_status()
+    async def _fetch_http() -> Tuple[bytes, str]:
+        # Sólo se llega aquí si la URL no está en el índice del store
+        reason = get_negative_cache().skip_reason(photo_url)
+        if reason:
+            failure['skipped'] = reason
+            raise PhotoUnavailableError(reason)
+        # Un solo GET: el tipo sale de su content-type
+        resp = await get_http_client(platform).get(photo_url, timeout=timeout)
+        if resp.status_code >= 400:
+            failure['status'] = resp.status_code
+        resp.raise_for_status()
+        fetched['data'] = resp.content
+        fetched['ext'] = _extension_from_headers(resp.headers.get("content-type"), photo_url)
+        return fetched['data'], fetched['ext']
 
-            # If GET reveals a better content-type, adjust extension once
-            final_ct = resp.headers.get("content-type")
-            final_ext = _extension_from_headers(final_ct, photo_url)
-            if final_ext != ext:
-                owner = photo_owner or username
-                filename = f"{_safe_filename(owner)}{final_ext}"
-                file_path = os.path.join(IMAGES_DIR, filename)
+    async def _fetch_page() -> Tuple[bytes, str]:
+        r = await page.request.get(photo_url, headers=DEFAULT_HEADERS, timeout=20000)
+        if not r.ok:
+            failure['status'] = r.status
+            raise RuntimeError(f"HTTP {r.status}")
+        ct = r.headers.get("content-type", "")
+        fetched['data'] = await r.body()
+        fetched['ext'] = ".png" if "png" in ct else ".webp" if "webp" in ct else ".jpg"
+        return fetched['data'], fetched['ext']
 
-            # Upload to FTP
-            try:
-                from src.utils.ftp_storage import get_ftp_client
-                ftp = get_ftp_client()
-                
-                if ftp_path:
-                    # Use provided path directly
-                    final_path = ftp_path
-                    if ftp_path.endswith('/'):
-                        final_path = f"{ftp_path}{filename}"
-                        
-                    ftp.upload_file(final_path, resp.content)
-                    # Return URL pointing to the new endpoint
-                    return f"/files/scraped-image-path/{final_path}"
-                else:
-                    ftp.upload(
-                        platform=platform,
-                        username=username,
-                        category='images',
-                        filename=filename,
-                        data=resp.content
-                    )
-                    return f"/files/scraped-image/{platform}/{username}/{filename}"
-            except Exception as ftp_error:
-                # Fallback to local storage on FTP failure
-                import logging
-                logger = logging.getLogger(__name__)
-                logger.warning(f"FTP upload failed, using local fallback: {ftp_error}")
-                ensure_dirs()
-                tmp_path = f"{file_path}.part"
-                with open(tmp_path, "wb") as f:
-                    f.write(resp.content)
-                os.replace(tmp_path, file_path)
-                return f"{PUBLIC_IMAGES_PREFIX_PRIMARY}/{filename}"
+    try:
+        return await _store_and_link(_instrumented('http', _fetch_http), overwrite)
     except Exception:
         # Fallback using Playwright page with session cookies if provided
-        if page is not None:
+        # (no sirve para firmas caducadas, 404/410 ni URLs ya descartadas)
+        if page is not None and not failure.get('skipped') and failure.get('status') not in (404, 410) \
+                and not is_expired(photo_url):
             try:
-                r = await page.request.get(photo_url, headers=DEFAULT_HEADERS, timeout=20000)
-                if r.ok:
-                    ct = r.headers.get("content-type", "")
-                    ext = ".png" if "png" in ct else ".webp" if "webp" in ct else ".jpg"
-                    owner = photo_owner or username
-                    filename = f"{_safe_filename(owner)}{ext}"
-                    body_data = await r.body()
-                    
-                    try:
-                        from src.utils.ftp_storage import get_ftp_client
-                        ftp = get_ftp_client()
-                        if ftp_path:
-                            final_path = ftp_path
-                            if ftp_path.endswith('/'):
-                                final_path = f"{ftp_path}{filename}"
-                            ftp.upload_file(final_path, body_data)
-                            return f"/files/scraped-image-path/{final_path}"
-                        else:
-                            ftp.upload(platform, username, 'images', filename, body_data)
-                            return f"/files/scraped-image/{platform}/{username}/{filename}"
-                    except:
-                        # Local fallback
-                        file_path = os.path.join(IMAGES_DIR, filename)
-                        with open(file_path, "wb") as f:
-                            f.write(body_data)
-                        return f"{PUBLIC_IMAGES_PREFIX_PRIMARY}/{filename}"
+                return await _store_and_link(_instrumented('page', _fetch_page), True)
             except Exception:
                 pass
+        if failure.get('status') in PERMANENT_STATUSES:
+            get_negative_cache().record(photo_url, failure['status'])
         # Final fallback policy
+        _IMAGE_RESULTS.inc(result='failed')
         if on_failure == "proxy":
             logger.info(f"download_profile_image fallback to proxy username={username}")
             return f"/proxy-image?{urlencode({'url': photo_url})}"
@@ -229,11 +332,17 @@ async def local_or_proxy_photo_url(
         return photo_url
 
     attempts = max(1, int(retries))
+    negative_cache = get_negative_cache()
     for i in range(attempts):
         result = await download_profile_image(photo_url, username, platform, photo_owner=photo_owner, page=page, on_failure='proxy', ftp_path=ftp_path)
         # Accept result if it's a valid path (not a proxy fallback)
         if result and not result.startswith('/proxy-image'):
             return result
+        # Firma caducada o fallo permanente: reintentar no cambia el resultado
+        reason = negative_cache.skip_reason(photo_url)
+        if reason:
+            logger.debug(f"local_or_proxy_photo_url.skip reason={reason} attempt={i + 1} username={photo_owner or username}")
+            break
         if i < attempts - 1:
             try:
                 await asyncio.sleep(backoff_seconds * (i + 1))
@@ -253,7 +362,7 @@ async def download_image_to_path(
     timeout: float = 20.0
 ) -> str:
     """
-    Descarga una imagen desde una URL y la sube a una ruta específica del FTP.
+    Descarga una imagen desde una URL y la registra en el image store bajo una ruta específica.
     
     Args:
         photo_url: URL de la imagen
@@ -266,23 +375,43 @@ async def download_image_to_path(
     if not photo_url:
         return ""
         
-    from src.utils.ftp_storage import get_ftp_client
-    
+    async def _fetch() -> Tuple[bytes, str]:
+        response = await get_http_client().get(photo_url, timeout=timeout)
+        response.raise_for_status()
+        if not response.content:
+            raise ValueError("empty image body")
+        return response.content, _extension_from_headers(response.headers.get("content-type"), photo_url)
+
     try:
-        async with httpx.AsyncClient(timeout=timeout, follow_redirects=True, headers=DEFAULT_HEADERS, http2=True) as client:
-            response = await client.get(photo_url)
-            if response.status_code >= 400:
-                return ""
-                
-            content = response.content
-            if not content:
-                return ""
-                
-            ftp = get_ftp_client()
-            ftp.upload_file(ftp_path, content)
-            return ftp_path
-            
+        # Blob único por contenido; ftp_path queda como referencia
+        store = get_image_store()
+        blob = await store.get_or_fetch(photo_url, _instrumented('path', _fetch))
+        await _link_or_copy(store, ftp_path, blob, None)
+        return ftp_path
+
     except Exception as e:
         # Log error but don't crash
         print(f"Error downloading image {photo_url}: {e}")
         return ""
+
+
+async def prefetch_photo(photo_url: str, platform: Optional[str] = None, timeout: float = 20.0) -> Optional[ImageBlob]:
+    """
+    Descarga la foto al image store sin registrar ninguna ruta.
+
+    La usa ``PhotoPipeline`` mientras se scrollean las listas: cuando después se
+    procesa el item, ``download_profile_image`` encuentra la URL en el índice y
+    sólo registra la referencia.
+    """
+    if not photo_url or not str(photo_url).startswith("http"):
+        return None
+
+    async def _fetch() -> Tuple[bytes, str]:
+        reason = get_negative_cache().skip_reason(photo_url)
+        if reason:
+            raise PhotoUnavailableError(reason)
+        resp = await get_http_client(platform).get(photo_url, timeout=timeout)
+        resp.raise_for_status()
+        return resp.content, _extension_from_headers(resp.headers.get("content-type"), photo_url)
+
+    return await get_image_store().get_or_fetch(photo_url, _instrumented('prefetch', _fetch))
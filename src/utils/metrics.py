@@ -0,0 +1,309 @@
+"""Registro de métricas estilo Prometheus (counters, gauges, histogramas) sin dependencias.
+
+Los módulos instrumentados declaran sus métricas a nivel de módulo y las actualizan
+en el hot path (una suma bajo un lock por muestra). ``GET /metrics`` del API y, en
+los workers, ``serve_metrics(port)`` las exponen en el formato de texto de
+Prometheus (``text/plain; version=0.0.4``). Cada proceso tiene su propio registro.
+
+Uso:
+    _ITEMS = counter('scr4per_scroll_items_total', 'Items extraídos por scroll_loop', ('platform', 'list'))
+    _ITEMS.inc(12, platform='instagram', list='seguidores')
+
+    _LATENCY = histogram('scr4per_db_statement_seconds', 'Latencia por sentencia', ('kind',))
+    with _LATENCY.time(kind='insert'):
+        cur.execute(...)
+
+    phases = PhaseTimer(_JOB_PHASE_SECONDS, kind='analyze', platform='instagram')
+    ...scrape...
+    phases.lap('scrape')
+"""
+from __future__ import annotations
+
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0,
+)
+
+# (nombre de la muestra, labels, valor)
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + '}'
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], Any] = {}
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name}: labels esperados {self.labelnames}, recibidos {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def _labels(self, key: Tuple[str, ...]) -> Dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            return [(self.name, self._labels(key), float(value)) for key, value in self._values.items()]
+
+    def value(self, **labels: Any) -> float:
+        """Valor actual de la serie (0 si no existe)."""
+        with self._lock:
+            return float(self._values.get(self._key(labels), 0.0))
+
+
+class Counter(_Metric):
+    """Contador monotónico."""
+    kind = 'counter'
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        if amount < 0:
+            raise ValueError(f"{self.name}: un counter no puede decrementar")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    """Valor que sube y baja (ocupación, tamaño de colas...)."""
+    kind = 'gauge'
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Distribución acumulada por buckets (``_bucket``/``_sum``/``_count``)."""
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [conteo por bucket (no acumulado)..., +Inf], suma
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            counts = state[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            state[1] += value
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        """Observa la duración (s) del bloque, también si termina con excepción."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def samples(self) -> List[Sample]:
+        out: List[Sample] = []
+        with self._lock:
+            items = [(key, list(state[0]), state[1]) for key, state in self._values.items()]
+        for key, counts, total in items:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                out.append((f"{self.name}_bucket", {**labels, 'le': _format_value(bound)}, float(cumulative)))
+            out.append((f"{self.name}_sum", labels, total))
+            out.append((f"{self.name}_count", labels, float(cumulative)))
+        return out
+
+    def count(self, **labels: Any) -> int:
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return sum(state[0]) if state else 0
+
+
+class PhaseTimer:
+    """Duración por fase de un trabajo: ``lap(fase)`` observa el tiempo desde el lap anterior."""
+
+    def __init__(self, metric: Histogram, **labels: Any):
+        self.metric = metric
+        self.labels = labels
+        self.start = self._last = time.perf_counter()
+
+    def lap(self, phase: str) -> float:
+        now = time.perf_counter()
+        elapsed = now - self._last
+        self._last = now
+        self.metric.observe(elapsed, phase=phase, **self.labels)
+        return elapsed
+
+    def total(self) -> float:
+        return time.perf_counter() - self.start
+
+
+class MetricsRegistry:
+    """Métricas del proceso; ``counter``/``gauge``/``histogram`` devuelven la existente si ya se declaró."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+
+    def _get_or_create(self, cls, name: str, documentation: str, labelnames: Sequence[str], **kwargs) -> Any:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Métrica {name} ya registrada como {metric.kind}{metric.labelnames}")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        with self._lock:
+            return self._metrics.get(name)
+
+    def register_collector(self, collect: Callable[[], None]) -> None:
+        """``collect()`` se llama antes de cada render (p.ej. para copiar stats de pools a gauges)."""
+        with self._lock:
+            if collect not in self._collectors:
+                self._collectors.append(collect)
+
+    def render(self) -> str:
+        with self._lock:
+            collectors = list(self._collectors)
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        for collect in collectors:
+            try:
+                collect()
+            except Exception as e:
+                logger.debug(f"metrics.collector_error collector={getattr(collect, '__name__', collect)} err={e}")
+        lines: List[str] = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {_escape(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+# Singleton instance
+_registry_instance: Optional[MetricsRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    global _registry_instance
+    if _registry_instance is None:
+        with _registry_lock:
+            if _registry_instance is None:
+                _registry_instance = MetricsRegistry()
+    return _registry_instance
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return get_metrics_registry().counter(name, documentation, labelnames)
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+    return get_metrics_registry().gauge(name, documentation, labelnames)
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (),
+              buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return get_metrics_registry().histogram(name, documentation, labelnames, buckets)
+
+
+def serve_metrics(port: int, host: str = '0.0.0.0'):
+    """Expone ``/metrics`` en un hilo daemon (procesos sin FastAPI, p.ej. ``api.worker``)."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = get_metrics_registry().render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):  # sin access log por scrape
+            pass
+
+    server = ThreadingHTTPServer((host, port), _Handler)
+    threading.Thread(target=server.serve_forever, name=f"metrics-{port}", daemon=True).start()
+    logger.info(f"metrics.serve port={port}")
+    return server
+
+
+__all__ = [
+    'CONTENT_TYPE',
+    'Counter',
+    'Gauge',
+    'Histogram',
+    'MetricsRegistry',
+    'PhaseTimer',
+    'counter',
+    'gauge',
+    'get_metrics_registry',
+    'histogram',
+    'serve_metrics',
+]
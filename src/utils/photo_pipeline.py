@@ -0,0 +1,269 @@
+"""Pipeline acotado de fotos de perfil (cola + workers) por adapter/trabajo.
+
+Antes los adapters esperaban a terminar cada lista y lanzaban un ``asyncio.gather``
+sin límite sobre todos los seguidores (miles de descargas simultáneas contra el
+CDN). Aquí:
+
+- ``process(items, ...)`` encola una tarea por foto y las ejecutan
+  ``PHOTO_PIPELINE_CONCURRENCY`` workers (con backpressure si la cola se llena).
+- Mientras se scrollea una lista, ``scroll_loop`` y la captura JSON de Instagram
+  llaman ``prefetch_photos`` con las URLs recién vistas; si hay un pipeline activo
+  (``with pipeline.collecting():``) las descarga al image store en segundo plano.
+  Al procesar la lista, esas fotos ya están en el índice de URLs y sólo se
+  registra la referencia.
+- La cola es de prioridad por expiración de la firma (``oe=``): primero las URLs
+  que caducan antes; las ya caducadas no se pre-descargan y en ``process`` se
+  resuelven sin request (ver ``src/utils/cdn_expiry.py``).
+
+Uso:
+    pipeline = PhotoPipeline('red_x')
+    with pipeline.collecting():
+        rows = await scrap_seguidores(page, url, username)
+    await pipeline.process(items, username, page=page, ftp_path=ftp_path)
+    ...
+    await pipeline.aclose()   # registra photos/s del trabajo
+"""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+from src.utils.cdn_expiry import expiry_priority, get_negative_cache, is_expired
+
+logger = logging.getLogger(__name__)
+
+PHOTO_PIPELINE_CONCURRENCY = int(os.getenv('PHOTO_PIPELINE_CONCURRENCY') or 8)
+PHOTO_PIPELINE_QUEUE_SIZE = int(os.getenv('PHOTO_PIPELINE_QUEUE_SIZE') or 500)
+# Un worker sin trabajo durante este tiempo termina; el siguiente submit lo recrea
+_WORKER_IDLE_S = 5.0
+
+_current_pipeline: ContextVar[Optional['PhotoPipeline']] = ContextVar('photo_pipeline', default=None)
+
+
+def current_photo_pipeline() -> Optional['PhotoPipeline']:
+    return _current_pipeline.get()
+
+
+def prefetch_photos(urls: Iterable[Optional[str]]) -> None:
+    """Pre-descarga best-effort en el pipeline activo del contexto (no-op si no hay)."""
+    pipeline = _current_pipeline.get()
+    if pipeline is None:
+        return
+    for url in urls:
+        pipeline.prefetch(url)
+
+
+class PhotoPipeline:
+    """Cola acotada de descargas de fotos con métricas de throughput."""
+
+    def __init__(self, platform_ftp: str, *, concurrency: int = PHOTO_PIPELINE_CONCURRENCY,
+                 queue_size: int = PHOTO_PIPELINE_QUEUE_SIZE):
+        self.platform_ftp = platform_ftp
+        self.concurrency = max(1, concurrency)
+        self.queue_size = max(1, queue_size)
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        # Desempate FIFO entre jobs con la misma prioridad (los callables no son comparables)
+        self._seq = itertools.count()
+        self._workers: Set[asyncio.Task] = set()
+        self._prefetch_seen: Set[str] = set()
+        self._first_at: Optional[float] = None
+        self._last_at: Optional[float] = None
+        self._counters: Dict[str, float] = {
+            'photos': 0, 'photos_ok': 0, 'photos_fallback': 0, 'photos_failed': 0, 'photos_expired': 0,
+            'prefetch_submitted': 0, 'prefetch_skipped': 0, 'prefetch_ok': 0, 'prefetch_failed': 0, 'prefetch_dropped': 0,
+            'prefetch_bytes': 0, 'busy_s': 0.0,
+        }
+
+    # ------------------------------------------------------------------
+    # Workers
+    # ------------------------------------------------------------------
+    def _ensure_queue(self) -> asyncio.PriorityQueue:
+        if self._queue is None:
+            self._queue = asyncio.PriorityQueue(maxsize=self.queue_size)
+        return self._queue
+
+    def _ensure_workers(self) -> None:
+        queue = self._ensure_queue()
+        while len(self._workers) < min(self.concurrency, max(1, queue.qsize())):
+            task = asyncio.ensure_future(self._worker())
+            self._workers.add(task)
+
+    async def _worker(self) -> None:
+        queue = self._ensure_queue()
+        me = asyncio.current_task()
+        try:
+            while True:
+                try:
+                    _prio, _seq, job = await asyncio.wait_for(queue.get(), timeout=_WORKER_IDLE_S)
+                except asyncio.TimeoutError:
+                    # Sin await entre el chequeo y la baja: un submit posterior verá al worker fuera del set
+                    if queue.empty():
+                        return
+                    continue
+                t0 = time.perf_counter()
+                try:
+                    await job()
+                except Exception as e:  # los jobs manejan sus errores; red de seguridad
+                    logger.debug(f"photo_pipeline.job_error platform={self.platform_ftp} err={e}")
+                finally:
+                    self._counters['busy_s'] += time.perf_counter() - t0
+                    self._last_at = time.perf_counter()
+                    queue.task_done()
+        finally:
+            self._workers.discard(me)
+
+    def _mark_start(self) -> None:
+        if self._first_at is None:
+            self._first_at = time.perf_counter()
+
+    # ------------------------------------------------------------------
+    # Prefetch (durante el scroll)
+    # ------------------------------------------------------------------
+    def prefetch(self, url: Optional[str]) -> None:
+        """Encola la pre-descarga de ``url``; si la cola está llena se descarta (se bajará en ``process``)."""
+        if not url or not str(url).startswith('http') or url in self._prefetch_seen:
+            return
+        if get_negative_cache().skip_reason(url):
+            self._prefetch_seen.add(url)
+            self._counters['prefetch_skipped'] += 1
+            return
+        queue = self._ensure_queue()
+        try:
+            queue.put_nowait((expiry_priority(url), next(self._seq), partial(self._prefetch_one, url)))
+        except asyncio.QueueFull:
+            self._counters['prefetch_dropped'] += 1
+            return
+        self._prefetch_seen.add(url)
+        self._counters['prefetch_submitted'] += 1
+        self._mark_start()
+        self._ensure_workers()
+
+    async def _prefetch_one(self, url: str) -> None:
+        from src.utils.images import prefetch_photo
+        try:
+            blob = await prefetch_photo(url, self.platform_ftp)
+            self._counters['prefetch_ok'] += 1
+            if blob is not None:
+                self._counters['prefetch_bytes'] += blob.size
+        except Exception as e:
+            self._counters['prefetch_failed'] += 1
+            logger.debug(f"photo_pipeline.prefetch_failed platform={self.platform_ftp} err={e}")
+
+    @contextmanager
+    def collecting(self) -> Iterator['PhotoPipeline']:
+        """Activa este pipeline como destino de ``prefetch_photos`` en el contexto actual."""
+        token = _current_pipeline.set(self)
+        try:
+            yield self
+        finally:
+            _current_pipeline.reset(token)
+
+    # ------------------------------------------------------------------
+    # Procesamiento de listas
+    # ------------------------------------------------------------------
+    async def _submit(self, job: Callable[[], Awaitable[None]], priority: float = float('inf')) -> None:
+        queue = self._ensure_queue()
+        self._mark_start()
+        self._ensure_workers()
+        await queue.put((priority, next(self._seq), job))
+        self._ensure_workers()
+
+    async def _photo_one(self, item: Dict[str, Any], username: str, page, ftp_path: Optional[str],
+                         done: asyncio.Future) -> None:
+        from src.utils.images import local_or_proxy_photo_url
+        try:
+            result = await local_or_proxy_photo_url(
+                item['photo_url'],
+                username,
+                self.platform_ftp,
+                mode='download',
+                photo_owner=item.get('username'),
+                page=page,
+                ftp_path=ftp_path,
+            )
+            item['photo_url'] = result
+            if result and not result.startswith('/proxy-image'):
+                self._counters['photos_ok'] += 1
+            else:
+                self._counters['photos_fallback'] += 1
+        except Exception as e:
+            self._counters['photos_failed'] += 1
+            logger.debug(f"photo_pipeline.photo_failed platform={self.platform_ftp} username={item.get('username')} err={e}")
+        finally:
+            if not done.done():
+                done.set_result(None)
+
+    async def process(self, items: List[Dict[str, Any]], username: str, *, page=None,
+                      ftp_path: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Reemplaza ``photo_url`` de cada item por la ruta servida por ``/files`` (o el proxy
+        si falla), con concurrencia acotada. Devuelve la misma lista.
+
+        Se encolan primero las fotos cuya firma caduca antes, para bajarlas mientras
+        sigue siendo válida.
+        """
+        loop = asyncio.get_running_loop()
+        pending: List[asyncio.Future] = []
+        ordered = sorted(
+            ((expiry_priority(item['photo_url']), item) for item in items if item.get('photo_url')),
+            key=lambda pair: pair[0],
+        )
+        for priority, item in ordered:
+            done = loop.create_future()
+            self._counters['photos'] += 1
+            if is_expired(item['photo_url']):
+                self._counters['photos_expired'] += 1
+            await self._submit(partial(self._photo_one, item, username, page, ftp_path, done), priority)
+            pending.append(done)
+        if pending:
+            await asyncio.gather(*pending)
+        return items
+
+    # ------------------------------------------------------------------
+    # Métricas / cierre
+    # ------------------------------------------------------------------
+    def stats(self) -> Dict[str, Any]:
+        c = dict(self._counters)
+        elapsed = (self._last_at - self._first_at) if self._first_at and self._last_at else 0.0
+        downloaded = c['photos_ok'] + c['prefetch_ok']
+        return {
+            'platform': self.platform_ftp,
+            'concurrency': self.concurrency,
+            **{k: int(v) for k, v in c.items() if k != 'busy_s'},
+            'elapsed_s': round(elapsed, 2),
+            'busy_s': round(c['busy_s'], 2),
+            'photos_per_s': round(c['photos_ok'] / elapsed, 2) if elapsed > 0 else 0.0,
+            'downloads_per_s': round(downloaded / elapsed, 2) if elapsed > 0 else 0.0,
+            'prefetch_bytes_per_s': round(c['prefetch_bytes'] / elapsed) if elapsed > 0 else 0,
+        }
+
+    async def aclose(self) -> Dict[str, Any]:
+        """Cancela los workers (pre-descargas pendientes incluidas) y registra las métricas del trabajo."""
+        workers = list(self._workers)
+        for task in workers:
+            task.cancel()
+        if workers:
+            await asyncio.gather(*workers, return_exceptions=True)
+        stats = self.stats()
+        if stats['photos'] or stats['prefetch_submitted']:
+            logger.info(
+                f"photo_pipeline.done platform={self.platform_ftp} photos={stats['photos']} ok={stats['photos_ok']} "
+                f"fallback={stats['photos_fallback']} failed={stats['photos_failed']} expired={stats['photos_expired']} "
+                f"prefetch={stats['prefetch_ok']}/{stats['prefetch_submitted']} dropped={stats['prefetch_dropped']} "
+                f"elapsed_s={stats['elapsed_s']} photos_per_s={stats['photos_per_s']}"
+            )
+        return stats
+
+
+__all__ = [
+    'PhotoPipeline',
+    'current_photo_pipeline',
+    'prefetch_photos',
+]
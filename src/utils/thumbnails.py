@@ -0,0 +1,111 @@
+"""Miniaturas WebP de fotos de perfil.
+
+Los avatares se guardaban tal cual los devolvía el CDN (JPEG de 150–1080 px) y los
+grafos con miles de nodos los pedían a tamaño completo. Al ingresar una imagen
+nueva en el image store se generan variantes WebP de ``IMAGE_THUMBNAIL_SIZES``
+píxeles (lado mayor) junto al blob:
+
+    {FTP_BASE_PATH}/blobs/<sha[:2]>/<sha256><ext>          original
+    {FTP_BASE_PATH}/blobs/<sha[:2]>/<sha256>_64.webp       miniatura
+    {FTP_BASE_PATH}/blobs/<sha[:2]>/<sha256>_160.webp
+
+``/files/scraped-image*?size=N`` sirve la variante más pequeña >= N (la genera al
+vuelo y la sube si el blob es anterior a este cambio) y los payloads de grafo
+apuntan ``photo_url`` a la de ``GRAPH_THUMBNAIL_SIZE`` px, dejando el original en
+``photo_url_full``.
+
+Requiere Pillow; sin él no se generan miniaturas y ``size=`` se ignora.
+"""
+from __future__ import annotations
+
+import importlib.util
+import logging
+import os
+from io import BytesIO
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+# Pillow se importa en la primera miniatura (no al arrancar el API); sin Pillow se sirven sólo originales
+PIL_AVAILABLE = importlib.util.find_spec("PIL") is not None
+
+logger = logging.getLogger(__name__)
+
+IMAGE_THUMBNAIL_SIZES: Tuple[int, ...] = tuple(sorted({
+    int(s) for s in (os.getenv('IMAGE_THUMBNAIL_SIZES') or '64,160').split(',') if s.strip()
+}))
+IMAGE_THUMBNAIL_QUALITY = int(os.getenv('IMAGE_THUMBNAIL_QUALITY') or 80)
+GRAPH_THUMBNAIL_SIZE = int(os.getenv('GRAPH_THUMBNAIL_SIZE') or 64)
+
+# Prefijos de las rutas servidas por api/routers/files.py
+_FILES_PREFIXES = ('/files/scraped-image/', '/files/scraped-image-path/')
+
+
+def thumbnails_available() -> bool:
+    return PIL_AVAILABLE and bool(IMAGE_THUMBNAIL_SIZES)
+
+
+def pick_size(requested: Optional[int]) -> Optional[int]:
+    """Miniatura más pequeña que cubre ``requested`` px; None = servir el original."""
+    if not requested or not thumbnails_available():
+        return None
+    for size in IMAGE_THUMBNAIL_SIZES:
+        if size >= requested:
+            return size
+    return None
+
+
+def thumbnail_path(ftp_path: str, size: int) -> str:
+    """Ruta de la variante ``size`` junto al original (``<stem>_<size>.webp``)."""
+    stem, _ext = os.path.splitext(ftp_path)
+    return f"{stem}_{size}.webp"
+
+
+def make_thumbnail(data: bytes, size: int) -> bytes:
+    """WebP con lado mayor ``size`` (sin ampliar). CPU: llamar fuera del event loop."""
+    if not PIL_AVAILABLE:
+        raise RuntimeError("Pillow no está instalado")
+    from PIL import Image, ImageOps
+    with Image.open(BytesIO(data)) as img:
+        # JPEG: decodifica ya reducido (1/2, 1/4, 1/8) en vez de a tamaño completo
+        img.draft('RGB', (size, size))
+        img = ImageOps.exif_transpose(img)
+        img = img.convert('RGBA' if img.mode in ('RGBA', 'LA', 'P') else 'RGB')
+        img.thumbnail((size, size), Image.LANCZOS)
+        out = BytesIO()
+        img.save(out, format='WEBP', quality=IMAGE_THUMBNAIL_QUALITY, method=4)
+        return out.getvalue()
+
+
+def make_thumbnails(data: bytes, sizes: Iterable[int] = IMAGE_THUMBNAIL_SIZES) -> Dict[int, bytes]:
+    return {size: make_thumbnail(data, size) for size in sizes}
+
+
+def thumbnail_url(photo_url: Optional[str], size: int = GRAPH_THUMBNAIL_SIZE) -> Optional[str]:
+    """``photo_url`` servida por ``/files`` con ``?size=``; otras URLs (proxy, externas) sin cambios."""
+    if not photo_url or not thumbnails_available() or not photo_url.startswith(_FILES_PREFIXES):
+        return photo_url
+    if 'size=' in photo_url:
+        return photo_url
+    return f"{photo_url}{'&' if '?' in photo_url else '?'}size={size}"
+
+
+def with_graph_thumbnail(profile: Dict[str, Any], size: int = GRAPH_THUMBNAIL_SIZE) -> Dict[str, Any]:
+    """Apunta ``photo_url`` de un perfil de grafo a la miniatura; el original queda en ``photo_url_full``."""
+    if 'photo_url_full' in profile:
+        return profile
+    original = profile.get('photo_url')
+    profile['photo_url_full'] = original
+    profile['photo_url'] = thumbnail_url(original, size)
+    return profile
+
+
+__all__ = [
+    'GRAPH_THUMBNAIL_SIZE',
+    'IMAGE_THUMBNAIL_SIZES',
+    'make_thumbnail',
+    'make_thumbnails',
+    'pick_size',
+    'thumbnail_path',
+    'thumbnail_url',
+    'thumbnails_available',
+    'with_graph_thumbnail',
+]
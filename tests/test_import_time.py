@@ -0,0 +1,163 @@
+"""Presupuesto de arranque del API y helpers puros de los hot paths.
+
+El chequeo de import reutiliza ``scripts/check_import_time.py`` (procesos nuevos,
+``-X importtime``); el resto son pruebas unitarias sin red, FTP ni navegador.
+"""
+import json
+import os
+import sys
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scripts import check_import_time  # noqa: E402
+from scripts.bench_aggregator import LegacyAggregator, canonical, ingest, make_items  # noqa: E402
+
+
+# ----------------------------------------------------------------------
+# Arranque del API
+# ----------------------------------------------------------------------
+def test_import_time_within_budget():
+    total_ms = check_import_time.total_import_ms(check_import_time.import_times())
+    assert total_ms <= check_import_time.IMPORT_TIME_BUDGET_MS, f"import api.main: {total_ms:.0f} ms"
+
+
+def test_no_heavy_modules_at_startup():
+    loaded = set(check_import_time.probe()['modules'])
+    assert 'api.main' in loaded
+    assert [m for m in check_import_time.HEAVY_MODULES if m in loaded] == []
+
+
+# ----------------------------------------------------------------------
+# image_store / image_disk_cache
+# ----------------------------------------------------------------------
+def test_normalize_cdn_url_drops_signature_and_pop():
+    from src.utils.image_store import normalize_cdn_url
+
+    a = ('http://scontent-mad1-1.cdninstagram.com/v/t51/p.jpg'
+         '?stp=dst-jpg&_nc_ht=x&_nc_cat=1&oh=aa&oe=65F0A1B2&ig_cache_key=k#frag')
+    b = 'https://scontent.fmex5-1.cdninstagram.com/v/t51/p.jpg?oe=65F0FFFF&oh=bb&stp=dst-jpg&_nc_ohc=y'
+    assert normalize_cdn_url(a) == normalize_cdn_url(b) == 'https://cdninstagram.com/v/t51/p.jpg?stp=dst-jpg'
+    assert normalize_cdn_url('https://example.com/a.jpg?b=2&a=1') == 'https://example.com/a.jpg?a=1&b=2'
+    assert normalize_cdn_url('https://cdninstagram.com/a.jpg') != normalize_cdn_url('https://cdninstagram.com/b.jpg')
+
+
+@pytest.mark.parametrize('header, expected', [
+    (None, False),
+    ('', False),
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"x", W/"abc"', True),
+    ('*', True),
+    ('"abd"', False),
+])
+def test_etag_matches(header, expected):
+    from src.utils.image_disk_cache import etag_matches
+
+    assert etag_matches(header, 'abc') is expected
+
+
+# ----------------------------------------------------------------------
+# json_stream
+# ----------------------------------------------------------------------
+def test_iter_json_round_trip():
+    from api.json_stream import dumps, iter_json, loads
+
+    obj = {
+        'profiles': [{'username': f'user_{i}', 'full_name': 'Ñandú ✓', 'sources': ['x:root']} for i in range(2500)],
+        'relations': [],
+        'meta': {1: None, 'ok': True, 'ratio': 0.5},
+    }
+    chunks = list(iter_json(obj, chunk_bytes=4096))
+    assert len(chunks) > 1
+    assert b''.join(chunks) == dumps(obj)
+    expected = json.loads(json.dumps(obj))  # claves no-str -> str
+    assert loads(b''.join(chunks)) == expected
+    assert loads(b''.join(iter_json([]))) == []
+
+
+# ----------------------------------------------------------------------
+# cdn_expiry.NegativeCache
+# ----------------------------------------------------------------------
+def test_negative_cache_ttls(monkeypatch):
+    from src.utils import cdn_expiry
+
+    now = [1000.0]
+    monkeypatch.setattr(cdn_expiry, 'time', types.SimpleNamespace(monotonic=lambda: now[0], time=cdn_expiry.time.time))
+    cache = cdn_expiry.NegativeCache(ttl_s=10.0)
+
+    assert cache.record('https://cdn/a.jpg', 403)
+    assert cache.record('https://cdn/b.jpg', 404)
+    # Transitorios: no se recuerdan
+    assert not cache.record('https://cdn/c.jpg', 503)
+    assert not cache.record('https://cdn/d.jpg', None)
+    assert cache.skip_reason('https://cdn/a.jpg') == 'http_403'
+    assert cache.skip_reason('https://cdn/c.jpg') is None
+
+    now[0] += 11
+    assert cache.skip_reason('https://cdn/a.jpg') is None
+    # 404/410 duran ``_TTL_FACTOR`` veces más
+    assert cache.skip_reason('https://cdn/b.jpg') == 'http_404'
+    now[0] += 50
+    assert cache.skip_reason('https://cdn/b.jpg') is None
+
+    # Firma ``oe`` ya caducada: se descarta sin registrar nada
+    assert cache.skip_reason('https://cdn/e.jpg?oe=5F5E1000') == 'expired'
+    assert cache.stats()['entries'] == 0
+
+
+# ----------------------------------------------------------------------
+# aggregation.Aggregator
+# ----------------------------------------------------------------------
+def test_aggregator_payload_matches_legacy():
+    from api.services.aggregation import Aggregator
+
+    data = make_items(roots=3, per_root=400, overlap=0.25, seed=7)
+    legacy, compact = LegacyAggregator(), Aggregator()
+    ingest(legacy, data)
+    ingest(compact, data)
+    payload = compact.build_payload(roots_requested=len(data))
+    assert canonical(payload) == canonical(legacy.build_payload(roots_requested=len(data)))
+    assert payload['schema_version'] == 2
+    assert payload['meta']['roots_processed'] == 3
+
+
+# ----------------------------------------------------------------------
+# metrics
+# ----------------------------------------------------------------------
+def test_metrics_render():
+    from src.utils.metrics import MetricsRegistry
+
+    registry = MetricsRegistry()
+    items = registry.counter('t_items_total', 'Items "extraídos"', ('platform',))
+    items.inc(3, platform='instagram')
+    items.inc(platform='instagram')
+    registry.gauge('t_in_use', 'En uso').set(2)
+    latency = registry.histogram('t_seconds', 'Latencia', buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        latency.observe(value)
+    seen = []
+    registry.register_collector(lambda: seen.append(True))
+
+    assert registry.render() == '\n'.join([
+        '# HELP t_in_use En uso',
+        '# TYPE t_in_use gauge',
+        't_in_use 2',
+        '# HELP t_items_total Items \\"extraídos\\"',
+        '# TYPE t_items_total counter',
+        't_items_total{platform="instagram"} 4',
+        '# HELP t_seconds Latencia',
+        '# TYPE t_seconds histogram',
+        't_seconds_bucket{le="0.1"} 1',
+        't_seconds_bucket{le="1"} 2',
+        't_seconds_bucket{le="+Inf"} 3',
+        't_seconds_sum 5.55',
+        't_seconds_count 3',
+    ]) + '\n'
+    assert seen == [True]
+    with pytest.raises(ValueError):
+        items.inc(-1, platform='instagram')
+    with pytest.raises(ValueError):
+        registry.gauge('t_items_total', 'otro tipo')